@@ -0,0 +1,196 @@
+"""
+Content Hash Index
+
+SQLite index of SHA-256 content hashes used for idempotent ingestion. Identical
+uploaded files map to the document that first stored them, and identical chunks
+are stored once in ChromaDB and referenced by every document that contains them.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ContentHashIndex:
+    """
+    File and chunk hash index with per-document chunk references.
+
+    Tables:
+        files: file_hash -> doc_id of the document created from those bytes
+        chunks: chunk_hash -> stored ChromaDB chunk id and the document owning it
+        chunk_refs: (doc_id, chunk_index) -> chunk_hash and the chunk id it resolves to
+
+    The owning document's metadata is what ChromaDB holds for a shared chunk.
+    When the owner is deleted while other documents still reference the chunk,
+    ownership moves to one of them instead of the chunk being removed.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize content hash index.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                file_hash TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_doc_id ON files (doc_id);
+
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_hash TEXT PRIMARY KEY,
+                chunk_id TEXT NOT NULL,
+                owner_doc_id TEXT NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS chunk_refs (
+                doc_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (doc_id, chunk_index)
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunk_refs_chunk_id ON chunk_refs (chunk_id);
+        """)
+        self._conn.commit()
+
+    def find_file(self, file_hash: str) -> Optional[str]:
+        """Return the doc_id already created from a file with this hash, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id FROM files WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def register_file(self, file_hash: str, doc_id: str):
+        """Record that a file with this hash was ingested as doc_id."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO files (file_hash, doc_id) VALUES (?, ?)",
+                (file_hash, str(doc_id))
+            )
+            self._conn.commit()
+
+    def lookup_chunks(self, chunk_hashes: List[str]) -> Dict[str, str]:
+        """Map already-stored chunk hashes to their ChromaDB chunk ids."""
+        found = {}
+        unique_hashes = list(dict.fromkeys(chunk_hashes))
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT chunk_hash, chunk_id FROM chunks WHERE chunk_hash IN ({placeholders})",
+                    batch
+                ).fetchall()
+                found.update(rows)
+
+        return found
+
+    def add_document_refs(self,
+                          doc_id: str,
+                          refs: List[Tuple[int, str, str]],
+                          new_chunks: List[Tuple[str, str]]):
+        """
+        Record a document's chunks.
+
+        Args:
+            doc_id: Document identifier
+            refs: (chunk_index, chunk_hash, chunk_id) for every chunk of the document
+            new_chunks: (chunk_hash, chunk_id) for chunks this document stored and owns
+        """
+        doc_id = str(doc_id)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (chunk_hash, chunk_id, owner_doc_id) VALUES (?, ?, ?)",
+                [(chunk_hash, chunk_id, doc_id) for chunk_hash, chunk_id in new_chunks]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_refs (doc_id, chunk_index, chunk_hash, chunk_id) VALUES (?, ?, ?, ?)",
+                [(doc_id, index, chunk_hash, chunk_id) for index, chunk_hash, chunk_id in refs]
+            )
+            self._conn.commit()
+
+    def document_chunk_count(self, doc_id: str) -> int:
+        """Number of chunks referenced by a document."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM chunk_refs WHERE doc_id = ?", (str(doc_id),)
+            ).fetchone()
+        return row[0]
+
+    def release_document(self, doc_id: str) -> Dict[str, Tuple[str, int]]:
+        """
+        Drop a document's references and hand its shared chunks to other documents.
+
+        Returns:
+            Mapping of chunk_id -> (new_owner_doc_id, chunk_index in that document)
+            for chunks the document owned that other documents still reference.
+            Every other chunk carrying this doc_id can be deleted.
+        """
+        doc_id = str(doc_id)
+        reassigned = {}
+
+        with self._lock:
+            owned = self._conn.execute(
+                "SELECT chunk_hash, chunk_id FROM chunks WHERE owner_doc_id = ?", (doc_id,)
+            ).fetchall()
+
+            for chunk_hash, chunk_id in owned:
+                heir = self._conn.execute(
+                    "SELECT doc_id, chunk_index FROM chunk_refs "
+                    "WHERE chunk_id = ? AND doc_id != ? ORDER BY doc_id, chunk_index LIMIT 1",
+                    (chunk_id, doc_id)
+                ).fetchone()
+
+                if heir:
+                    self._conn.execute(
+                        "UPDATE chunks SET owner_doc_id = ? WHERE chunk_hash = ?", (heir[0], chunk_hash)
+                    )
+                    reassigned[chunk_id] = (heir[0], heir[1])
+                else:
+                    self._conn.execute("DELETE FROM chunks WHERE chunk_hash = ?", (chunk_hash,))
+
+            self._conn.execute("DELETE FROM chunk_refs WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM files WHERE doc_id = ?", (doc_id,))
+            self._conn.commit()
+
+        return reassigned
+
+    def clear(self):
+        """Remove all hashes and references."""
+        with self._lock:
+            self._conn.executescript("DELETE FROM files; DELETE FROM chunks; DELETE FROM chunk_refs;")
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get deduplication statistics."""
+        with self._lock:
+            files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            unique_chunks = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            chunk_refs = self._conn.execute("SELECT COUNT(*) FROM chunk_refs").fetchone()[0]
+
+        return {
+            "files": files,
+            "unique_chunks": unique_chunks,
+            "chunk_references": chunk_refs,
+            "dedup_ratio": chunk_refs / unique_chunks if unique_chunks > 0 else 1.0
+        }
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
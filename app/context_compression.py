@@ -0,0 +1,397 @@
+"""
+Context Compression
+
+Query-aware selection of the sentences that go into an LLM prompt. Chunks are
+split into sentences at ingest; each sentence's character offsets within its
+chunk and its embedding are stored in a SQLite sidecar keyed by chunk id. At
+query time the sentences of the retrieved chunks are ranked by cosine
+similarity to the question and taken greedily until a token budget, measured
+with a real tokenizer, is spent. Prefill time on a CPU-bound LLM grows with the
+prompt, so a prompt holding only the relevant sentences answers faster.
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Iterable, Tuple, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Sentence ends followed by whitespace, and paragraph breaks
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+def split_sentences(text: str, min_chars: int = 15) -> List[Tuple[int, int]]:
+    """
+    Split text into sentences.
+
+    Fragments shorter than min_chars (list markers, "Fig. 2.") are merged into
+    the following sentence.
+
+    Returns:
+        (start, end) character offsets of each sentence, whitespace trimmed
+    """
+    spans = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+
+    sentences = []
+    pending_start = None
+    for span_start, span_end in spans:
+        while span_start < span_end and text[span_start].isspace():
+            span_start += 1
+        while span_end > span_start and text[span_end - 1].isspace():
+            span_end -= 1
+        if span_start == span_end:
+            continue
+        if pending_start is not None:
+            span_start = pending_start
+            pending_start = None
+        if span_end - span_start < min_chars:
+            pending_start = span_start
+            continue
+        sentences.append((span_start, span_end))
+
+    if pending_start is not None:
+        if sentences:
+            sentences[-1] = (sentences[-1][0], len(text.rstrip()))
+        else:
+            sentences.append((pending_start, len(text.rstrip())))
+    return sentences
+
+class TokenCounter:
+    """
+    Token counts from a Hugging Face tokenizer.
+
+    Without a usable tokenizer, counts fall back to the words * 1.3 estimate
+    used elsewhere for context sizing.
+    """
+
+    def __init__(self, tokenizer=None, name: Optional[str] = None):
+        """
+        Initialize token counter.
+
+        Args:
+            tokenizer: Tokenizer with a __call__ returning input_ids (transformers style)
+            name: Tokenizer name for diagnostics
+        """
+        self.tokenizer = tokenizer
+        self.name = name if tokenizer is not None else "estimate"
+        self._failed = False
+
+    @classmethod
+    def load(cls, name: Optional[str], fallback=None, fallback_name: Optional[str] = None) -> "TokenCounter":
+        """
+        Load the LLM's tokenizer by Hugging Face name or local path.
+
+        Falls back to another tokenizer (e.g. the embedding model's) when name
+        is not set or cannot be loaded.
+        """
+        if name:
+            try:
+                from transformers import AutoTokenizer
+                return cls(AutoTokenizer.from_pretrained(name), name)
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer '{name}' ({e}); using {fallback_name or 'estimate'}")
+        return cls(fallback, fallback_name)
+
+    @staticmethod
+    def estimate(text: str) -> int:
+        return int(len(text.split()) * 1.3)
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        """Count the tokens of each text in one tokenizer call."""
+        if not texts:
+            return []
+        if self.tokenizer is not None and not self._failed:
+            try:
+                input_ids = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+                return [len(ids) for ids in input_ids]
+            except Exception as e:
+                logger.warning(f"Tokenizer '{self.name}' failed ({e}); estimating token counts")
+                self._failed = True
+                self.name = "estimate"
+        return [self.estimate(text) for text in texts]
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+class SentenceIndex:
+    """
+    Sentence offsets and embeddings per chunk, persisted in SQLite.
+
+    Rows are tagged with the encoder model; lookups ignore rows written by a
+    different model, so switching encoders recomputes sentence embeddings on
+    demand instead of comparing vectors from different spaces.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize sentence index.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sentences (
+                chunk_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                start_offset INTEGER NOT NULL,
+                end_offset INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (chunk_id, position)
+            )
+        """)
+        self._conn.commit()
+
+    def add_chunks(self, model: str, chunks: Iterable[Tuple[str, List[Tuple[int, int]], np.ndarray]]):
+        """
+        Store the sentences of chunks, replacing any stored for the same chunk ids.
+
+        Args:
+            model: Encoder that produced the vectors
+            chunks: (chunk_id, sentence offsets, sentence vectors) per chunk
+        """
+        chunk_ids, rows = [], []
+        for chunk_id, offsets, vectors in chunks:
+            chunk_ids.append(chunk_id)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            for position, ((start, end), vector) in enumerate(zip(offsets, vectors)):
+                rows.append((chunk_id, position, model, start, end, vector.tobytes()))
+        if not chunk_ids:
+            return
+
+        with self._lock:
+            self._conn.executemany("DELETE FROM sentences WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self._conn.executemany(
+                "INSERT INTO sentences (chunk_id, position, model, start_offset, end_offset, vector) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def get_many(self, model: str, chunk_ids: List[str]) -> Dict[str, Tuple[List[Tuple[int, int]], np.ndarray]]:
+        """
+        Look up stored sentences.
+
+        Returns:
+            chunk_id -> (sentence offsets, float32 matrix of sentence vectors)
+            for the chunks indexed with model
+        """
+        found: Dict[str, Tuple[List[Tuple[int, int]], List[np.ndarray]]] = {}
+        unique_ids = list(dict.fromkeys(chunk_ids))
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_ids), 500):
+                batch = unique_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT chunk_id, start_offset, end_offset, vector FROM sentences "
+                    f"WHERE model = ? AND chunk_id IN ({placeholders}) ORDER BY chunk_id, position",
+                    [model, *batch]
+                ).fetchall()
+                for chunk_id, sentence_start, sentence_end, blob in rows:
+                    offsets, vectors = found.setdefault(chunk_id, ([], []))
+                    offsets.append((sentence_start, sentence_end))
+                    vectors.append(np.frombuffer(blob, dtype=np.float32))
+
+        return {chunk_id: (offsets, np.vstack(vectors)) for chunk_id, (offsets, vectors) in found.items()}
+
+    def remove_chunks(self, chunk_ids: Iterable[str]):
+        """Delete the sentences of chunks."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM sentences WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every stored sentence."""
+        with self._lock:
+            self._conn.execute("DELETE FROM sentences")
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sentence index statistics."""
+        with self._lock:
+            sentences, chunks = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT chunk_id) FROM sentences"
+            ).fetchone()
+        return {
+            "db_path": self.db_path,
+            "chunks": chunks,
+            "sentences": sentences,
+            "size_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        }
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+class ContextCompressor:
+    """
+    Builds a prompt context from the retrieved chunks' most relevant sentences.
+
+    Sentences are ranked by cosine similarity to the query embedding and added
+    while they fit the token budget; the best sentence is always kept. Selected
+    sentences are grouped by document (best-scoring document first) and
+    printed in their original order, with "..." marking skipped text.
+    """
+
+    def __init__(self,
+                 sentence_index: SentenceIndex,
+                 token_counter: TokenCounter,
+                 encode: Callable[[List[str]], List[List[float]]],
+                 model: str,
+                 token_budget: int = 800,
+                 min_similarity: float = 0.2):
+        """
+        Initialize context compressor.
+
+        Args:
+            sentence_index: Stored sentence offsets and embeddings
+            token_counter: Counts tokens with the LLM's tokenizer
+            encode: Embeds a list of texts with the retrieval encoder
+            model: Encoder name the sentence vectors are tagged with
+            token_budget: Maximum context tokens (sentences and document headers)
+            min_similarity: Sentences below this similarity are left out once
+                one sentence has been selected
+        """
+        self.sentence_index = sentence_index
+        self.token_counter = token_counter
+        self.encode = encode
+        self.model = model
+        self.token_budget = token_budget
+        self.min_similarity = min_similarity
+
+    def _embed_sentences(self, text: str) -> Tuple[List[Tuple[int, int]], np.ndarray]:
+        offsets = split_sentences(text)
+        if not offsets:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        vectors = self.encode([text[start:end] for start, end in offsets])
+        return offsets, np.asarray(vectors, dtype=np.float32)
+
+    def index_chunks(self, chunks: Iterable[Tuple[str, str]]):
+        """Split chunks into sentences, embed them in one encoder call and store them."""
+        chunks = list(chunks)
+        split = [(chunk_id, text, split_sentences(text)) for chunk_id, text in chunks]
+        sentences = [text[start:end] for _, text, offsets in split for start, end in offsets]
+        if not sentences:
+            return
+
+        vectors = np.asarray(self.encode(sentences), dtype=np.float32)
+        entries, cursor = [], 0
+        for chunk_id, _, offsets in split:
+            entries.append((chunk_id, offsets, vectors[cursor:cursor + len(offsets)]))
+            cursor += len(offsets)
+        self.sentence_index.add_chunks(self.model, entries)
+
+    def _chunk_sentences(self, chunks: List[Dict]) -> List[Tuple[List[Tuple[int, int]], np.ndarray]]:
+        """Sentences of each chunk, from the index or computed (and stored) when missing."""
+        stored = self.sentence_index.get_many(
+            self.model, [chunk["chunk_id"] for chunk in chunks if chunk.get("chunk_id")]
+        )
+        result, backfill = [], []
+        for chunk in chunks:
+            chunk_id = chunk.get("chunk_id")
+            if chunk_id in stored:
+                result.append(stored[chunk_id])
+                continue
+            offsets, vectors = self._embed_sentences(chunk["content"])
+            result.append((offsets, vectors))
+            if chunk_id and offsets:
+                backfill.append((chunk_id, offsets, vectors))
+        if backfill:
+            self.sentence_index.add_chunks(self.model, backfill)
+        return result
+
+    def compress(self, query_embedding: List[float], chunks: List[Dict]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the context for chunks under the token budget.
+
+        Returns:
+            (context text, stats with sentence and token counts)
+        """
+        sentences = self._chunk_sentences(chunks)
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        candidates = []
+        for chunk_index, (offsets, vectors) in enumerate(sentences):
+            if not offsets:
+                continue
+            norms = np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+            similarities = vectors @ query / norms
+            candidates.extend((float(similarity), chunk_index, position)
+                              for position, similarity in enumerate(similarities))
+        candidates.sort(key=lambda item: -item[0])
+
+        texts = [chunks[chunk_index]["content"][slice(*sentences[chunk_index][0][position])]
+                 for _, chunk_index, position in candidates]
+        token_counts = self.token_counter.count_many(texts)
+
+        # Document headers are charged against the budget when a document is first used
+        header_tokens: Dict[str, int] = {}
+        selected: Dict[int, List[int]] = {}
+        used_tokens = 0
+        for (similarity, chunk_index, position), tokens in zip(candidates, token_counts):
+            if selected and similarity < self.min_similarity:
+                break
+            doc_key = str(chunks[chunk_index].get("doc_id", "unknown"))
+            header = 0
+            if doc_key not in header_tokens:
+                header = self.token_counter.count(f"Document: {chunks[chunk_index].get('title', '')}")
+            if selected and used_tokens + header + tokens > self.token_budget:
+                continue
+            if doc_key not in header_tokens:
+                header_tokens[doc_key] = header
+            used_tokens += header + tokens
+            selected.setdefault(chunk_index, []).append(position)
+
+        context = self._render(chunks, sentences, selected)
+        return context, {
+            "sentences_available": len(candidates),
+            "sentences_selected": sum(len(positions) for positions in selected.values()),
+            "context_tokens": used_tokens,
+            "token_budget": self.token_budget,
+            "tokenizer": self.token_counter.name
+        }
+
+    @staticmethod
+    def _render(chunks: List[Dict], sentences: List[Tuple[List[Tuple[int, int]], np.ndarray]],
+                selected: Dict[int, List[int]]) -> str:
+        """Group selected sentences by document, best document first, in reading order."""
+        by_doc: Dict[str, List[int]] = {}
+        for chunk_index in sorted(selected, key=lambda index: -chunks[index].get("score", 0.0)):
+            by_doc.setdefault(str(chunks[chunk_index].get("doc_id", "unknown")), []).append(chunk_index)
+
+        context_parts = []
+        for chunk_indexes in by_doc.values():
+            context_parts.append(f"Document: {chunks[chunk_indexes[0]].get('title', '')}")
+            for chunk_index in sorted(chunk_indexes, key=lambda index: chunks[index].get("chunk_index", 0)):
+                content = chunks[chunk_index]["content"]
+                offsets = sentences[chunk_index][0]
+                positions = sorted(selected[chunk_index])
+                pieces = []
+                for previous, position in zip([None] + positions, positions):
+                    if previous is not None and position != previous + 1:
+                        pieces.append("...")
+                    pieces.append(content[slice(*offsets[position])])
+                context_parts.append(" ".join(pieces))
+            context_parts.append("")  # Separator between documents
+
+        return "\n".join(context_parts)
@@ -0,0 +1,219 @@
+"""
+Conversation Sessions
+
+Multi-turn chat state keyed by session id. Each session keeps its recent
+question/answer turns; when their token count passes max_history_tokens, the
+oldest turns are folded into a short rolling summary so prompts stay bounded.
+History is rendered as a stable message prefix (system prompt, summary, earlier
+turns) with only the new question and its retrieved context appended, so
+Ollama can reuse the KV cache it kept for the previous turn's prompt instead of
+re-evaluating the whole conversation. Earlier turns keep the user message
+exactly as it was sent (retrieved context included) until they are folded into
+the summary; a rewritten turn would no longer match the cached prefix.
+"""
+
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+from .context_compression import TokenCounter, split_sentences
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ConversationTurn:
+    """One question and the answer given to it."""
+    question: str
+    answer: str
+    tokens: int
+    message: Optional[str] = None  # User message as sent, when it was more than the bare question
+    created_at: float = field(default_factory=time.time)
+
+@dataclass
+class ConversationSession:
+    """A conversation's recent turns and the summary of older ones."""
+    session_id: str
+    turns: List[ConversationTurn] = field(default_factory=list)
+    summary: List[str] = field(default_factory=list)
+    summary_tokens: int = 0
+    turn_count: int = 0
+    created_at: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.time)
+
+    @property
+    def history_tokens(self) -> int:
+        return self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    def history_messages(self) -> List[Dict[str, str]]:
+        """Summary and earlier turns as chat messages, oldest first."""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system",
+                             "content": "Summary of the earlier conversation:\n" + "\n".join(self.summary)})
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn.message or turn.question})
+            messages.append({"role": "assistant", "content": turn.answer})
+        return messages
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "turn_count": self.turn_count,
+            "turns": [{"question": turn.question, "answer": turn.answer, "created_at": turn.created_at}
+                      for turn in self.turns],
+            "summary": list(self.summary),
+            "history_tokens": self.history_tokens,
+            "created_at": self.created_at,
+            "last_active": self.last_active
+        }
+
+def summarize_turn(turn: ConversationTurn, max_chars: int = 200) -> str:
+    """One summary line for a turn: the question and the first sentence of its answer."""
+    sentences = split_sentences(turn.answer)
+    answer = turn.answer[slice(*sentences[0])] if sentences else turn.answer.strip()
+    if len(answer) > max_chars:
+        answer = answer[:max_chars].rstrip() + "..."
+    return f"- Q: {turn.question.strip()} A: {answer}"
+
+class ConversationSessionStore:
+    """
+    In-memory conversation sessions with LRU and idle eviction.
+
+    Summarization folds turns in bulk (down to half the history budget) rather
+    than one turn at a time, so the cached prompt prefix only changes every few
+    turns instead of on every turn once the budget is reached.
+    """
+
+    def __init__(self,
+                 token_counter: Optional[TokenCounter] = None,
+                 max_history_tokens: int = 4000,
+                 max_summary_tokens: int = 300,
+                 min_recent_turns: int = 2,
+                 max_sessions: int = 1000,
+                 idle_ttl: float = 3600.0,
+                 keep_alive: str = "30m"):
+        """
+        Initialize conversation session store.
+
+        Args:
+            token_counter: Counts history tokens (estimates if not given)
+            max_history_tokens: History size (summary and turns) that triggers folding
+            max_summary_tokens: Oldest summary lines are dropped beyond this size
+            min_recent_turns: Turns always kept verbatim
+            max_sessions: Least recently used sessions are evicted beyond this count
+            idle_ttl: Seconds of inactivity after which a session is dropped
+            keep_alive: How long Ollama keeps the model (and its prompt cache) loaded
+                between turns
+        """
+        self.token_counter = token_counter or TokenCounter()
+        self.max_history_tokens = max_history_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.min_recent_turns = min_recent_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.keep_alive = keep_alive
+
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self.stats = {"created": 0, "evicted": 0, "expired": 0, "folded_turns": 0}
+
+    def _expire(self, now: float):
+        """Drop idle sessions and enforce the session cap. Caller holds the lock."""
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_active <= self.idle_ttl:
+                break
+            del self._sessions[oldest.session_id]
+            self.stats["expired"] += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        """Get a live session without creating one."""
+        with self._lock:
+            self._expire(time.time())
+            return self._sessions.get(session_id)
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ConversationSession:
+        """Get a session, creating it (with a new id if none is given) when it does not exist."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ConversationSession(session_id=session_id or uuid.uuid4().hex)
+                self._sessions[session.session_id] = session
+                self.stats["created"] += 1
+            else:
+                self._sessions.move_to_end(session.session_id)
+            session.last_active = now
+            self._expire(now)
+            return session
+
+    def record_turn(self, session: ConversationSession, question: str, answer: str,
+                    message: Optional[str] = None):
+        """
+        Append a turn and fold old turns into the summary if the history is over budget.
+
+        Args:
+            session: Session the turn belongs to
+            question: The user's question, used in the summary once the turn is folded
+            answer: The answer given
+            message: User message exactly as sent to the LLM (defaults to the question);
+                replayed verbatim in later prompts so their prefix matches the KV cache
+        """
+        tokens = sum(self.token_counter.count_many([message or question, answer]))
+        with self._lock:
+            session.turns.append(ConversationTurn(question=question, answer=answer, tokens=tokens,
+                                                  message=message))
+            session.turn_count += 1
+            session.last_active = time.time()
+            if session.session_id in self._sessions:
+                self._sessions.move_to_end(session.session_id)
+            if session.history_tokens > self.max_history_tokens:
+                self._fold(session)
+
+    def _fold(self, session: ConversationSession):
+        """Move the oldest turns into the summary until history is at half budget. Caller holds the lock."""
+        target = self.max_history_tokens // 2
+        folded = []
+        while len(session.turns) > self.min_recent_turns and session.history_tokens > target:
+            turn = session.turns.pop(0)
+            line = summarize_turn(turn)
+            session.summary.append(line)
+            session.summary_tokens += self.token_counter.count(line)
+            folded.append(turn)
+
+        while session.summary and session.summary_tokens > self.max_summary_tokens:
+            session.summary_tokens -= self.token_counter.count(session.summary.pop(0))
+
+        self.stats["folded_turns"] += len(folded)
+        if folded:
+            logger.debug(f"Session {session.session_id}: folded {len(folded)} turns into summary "
+                         f"({session.history_tokens} history tokens)")
+
+    def delete(self, session_id: str) -> bool:
+        """Forget a session."""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def clear(self):
+        """Forget every session."""
+        with self._lock:
+            self._sessions.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session store statistics."""
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "max_history_tokens": self.max_history_tokens,
+                "keep_alive": self.keep_alive,
+                **self.stats
+            }
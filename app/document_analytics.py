@@ -761,7 +761,7 @@ class DocumentAnalyticsEngine:
         try:
             # Use RAG system to find similar documents
             query = content[:500]  # Use first part of content as query
-            similar_docs = self.rag_system.adaptive_retrieval(query, max_chunks=max_related * 2)
+            similar_docs = await self.rag_system.adaptive_retrieval_async(query, max_chunks=max_related * 2)
             
             # Filter out the current document and extract unique doc_ids
             related_ids = []
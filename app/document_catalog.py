@@ -0,0 +1,302 @@
+"""
+Document Catalog
+
+SQLite table holding one row per document (title, sizes, chunk count, status,
+timestamps) so listing, filtering and paging documents never has to scan and
+group every chunk in ChromaDB. Rows are written in the same code paths that add,
+delete and update a document's chunks.
+"""
+
+import os
+import json
+import base64
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Columns mirroring DocumentMetadata; anything else is kept in the JSON "extra" column
+CATALOG_COLUMNS = {
+    "doc_id": "TEXT PRIMARY KEY",
+    "title": "TEXT NOT NULL DEFAULT ''",
+    "file_type": "TEXT NOT NULL DEFAULT 'txt'",
+    "original_filename": "TEXT NOT NULL DEFAULT ''",
+    "file_size": "INTEGER NOT NULL DEFAULT 0",
+    "upload_timestamp": "TEXT NOT NULL DEFAULT ''",
+    "status": "TEXT NOT NULL DEFAULT 'ready'",
+    "chunk_count": "INTEGER NOT NULL DEFAULT 0",
+    "content_preview": "TEXT NOT NULL DEFAULT ''",
+    "source": "TEXT NOT NULL DEFAULT 'unknown'",
+    "document_type": "TEXT NOT NULL DEFAULT 'plain_text'",
+    "content_structure": "TEXT NOT NULL DEFAULT 'unstructured'",
+    "intelligence_confidence": "REAL NOT NULL DEFAULT 0.5",
+    "suggested_chunk_size": "INTEGER NOT NULL DEFAULT 400",
+    "suggested_overlap": "INTEGER NOT NULL DEFAULT 50",
+    "processing_notes": "TEXT NOT NULL DEFAULT ''",
+    "extraction_method": "TEXT",
+    "quality_score": "REAL",
+    "page_count": "INTEGER",
+    "error_message": "TEXT NOT NULL DEFAULT ''",
+    "last_modified": "TEXT NOT NULL DEFAULT ''",
+    "file_hash": "TEXT",
+    "extra": "TEXT NOT NULL DEFAULT '{}'"
+}
+
+# Columns that may be used for sorting (each backed by an index together with doc_id)
+SORTABLE_COLUMNS = ("upload_timestamp", "title", "file_size", "chunk_count", "last_modified")
+
+class DocumentCatalog:
+    """
+    Per-document catalog with indexed filtering, sorting and keyset pagination.
+
+    Keyset pagination returns an opaque cursor encoding the sort value and
+    doc_id of the last row, so fetching the next page is an index seek rather
+    than an OFFSET scan over everything before it.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize document catalog.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+        columns = ",\n".join(f"{name} {definition}" for name, definition in CATALOG_COLUMNS.items())
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS documents ({columns})")
+        for column in SORTABLE_COLUMNS:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_documents_{column} ON documents ({column}, doc_id)"
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_file_type ON documents (file_type)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status)")
+        self._conn.commit()
+
+    def _to_row(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Split a document dict into catalog columns plus the JSON extra column."""
+        row = {}
+        extra = {}
+        for key, value in document.items():
+            if key == "extra":
+                continue
+            if key in CATALOG_COLUMNS:
+                if key == "processing_notes" and isinstance(value, list):
+                    value = "; ".join(str(note) for note in value)
+                row[key] = value
+            elif isinstance(value, (str, int, float, bool)) or value is None:
+                extra[key] = value
+        row["doc_id"] = str(row["doc_id"])
+        row["extra"] = json.dumps(extra)
+        return row
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a database row back into a document dict."""
+        document = dict(row)
+        extra = json.loads(document.pop("extra") or "{}")
+        return {**extra, **document}
+
+    def upsert_documents(self, documents: List[Dict[str, Any]]):
+        """Insert or replace documents in a single transaction."""
+        if not documents:
+            return
+
+        rows = [self._to_row(document) for document in documents]
+        with self._lock, self._conn:
+            for row in rows:
+                names = list(row.keys())
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO documents ({', '.join(names)}) "
+                    f"VALUES ({', '.join('?' * len(names))})",
+                    [row[name] for name in names]
+                )
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get a document by ID."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE doc_id = ?", (str(doc_id),)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def get_many(self, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several documents by ID in batched queries; missing IDs are omitted."""
+        unique_ids = list(dict.fromkeys(str(doc_id) for doc_id in doc_ids))
+        documents = {}
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_ids), 500):
+                batch = unique_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT * FROM documents WHERE doc_id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for row in rows:
+                    documents[row["doc_id"]] = self._from_row(row)
+
+        return documents
+
+    def update(self, doc_id: str, updates: Dict[str, Any]) -> bool:
+        """Update columns (and extra fields) of a document. Returns False if it does not exist."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE doc_id = ?", (str(doc_id),)
+            ).fetchone()
+            if row is None:
+                return False
+
+            merged = self._to_row({**self._from_row(row), **updates, "doc_id": doc_id})
+            assignments = ", ".join(f"{name} = ?" for name in merged if name != "doc_id")
+            self._conn.execute(
+                f"UPDATE documents SET {assignments} WHERE doc_id = ?",
+                [value for name, value in merged.items() if name != "doc_id"] + [str(doc_id)]
+            )
+        return True
+
+    def delete(self, doc_id: str) -> bool:
+        """Delete a document row. Returns False if it did not exist."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (str(doc_id),))
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def encode_cursor(sort_value: Any, doc_id: str) -> str:
+        """Encode the keyset position after a row as an opaque cursor."""
+        return base64.urlsafe_b64encode(json.dumps([sort_value, doc_id]).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[Any, str]:
+        """Decode a cursor produced by encode_cursor."""
+        try:
+            sort_value, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid pagination cursor: {cursor}") from e
+        return sort_value, doc_id
+
+    def query(self,
+              file_type: Optional[str] = None,
+              status: Optional[str] = None,
+              title_contains: Optional[str] = None,
+              uploaded_after: Optional[str] = None,
+              uploaded_before: Optional[str] = None,
+              min_size: Optional[int] = None,
+              max_size: Optional[int] = None,
+              sort_by: str = "upload_timestamp",
+              descending: bool = True,
+              limit: Optional[int] = None,
+              offset: int = 0,
+              cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        """
+        Filter, sort and page documents.
+
+        Args:
+            sort_by: One of SORTABLE_COLUMNS
+            descending: Sort direction
+            limit: Page size (None returns every match)
+            offset: Row offset, used only when no cursor is given
+            cursor: Keyset cursor returned by a previous page
+
+        Returns:
+            Tuple of (documents, total_matching_count, next_cursor)
+        """
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort documents by '{sort_by}'")
+
+        conditions, params = [], []
+        if file_type:
+            conditions.append("file_type = ?")
+            params.append(file_type)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if title_contains:
+            escaped = title_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if uploaded_after:
+            conditions.append("upload_timestamp >= ?")
+            params.append(uploaded_after)
+        if uploaded_before:
+            conditions.append("upload_timestamp <= ?")
+            params.append(uploaded_before)
+        if min_size:
+            conditions.append("file_size >= ?")
+            params.append(min_size)
+        if max_size:
+            conditions.append("file_size <= ?")
+            params.append(max_size)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        page_conditions, page_params = list(conditions), list(params)
+        if cursor:
+            sort_value, last_doc_id = self.decode_cursor(cursor)
+            comparison = "<" if descending else ">"
+            page_conditions.append(f"({sort_by}, doc_id) {comparison} (?, ?)")
+            page_params.extend([sort_value, last_doc_id])
+        page_where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+
+        direction = "DESC" if descending else "ASC"
+        sql = f"SELECT * FROM documents {page_where} ORDER BY {sort_by} {direction}, doc_id {direction}"
+        if limit:
+            sql += " LIMIT ?"
+            page_params.append(limit)
+            if not cursor and offset:
+                sql += " OFFSET ?"
+                page_params.append(offset)
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM documents {where}", params).fetchone()[0]
+            rows = self._conn.execute(sql, page_params).fetchall()
+
+        documents = [self._from_row(row) for row in rows]
+        next_cursor = None
+        if limit and len(documents) == limit:
+            last = documents[-1]
+            next_cursor = self.encode_cursor(last[sort_by], last["doc_id"])
+
+        return documents, total, next_cursor
+
+    def count(self, status: Optional[str] = None) -> int:
+        """Count documents, optionally with a given status."""
+        with self._lock:
+            if status:
+                return self._conn.execute(
+                    "SELECT COUNT(*) FROM documents WHERE status = ?", (status,)
+                ).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aggregate document count, size, chunk and file type statistics."""
+        with self._lock:
+            totals = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(file_size), 0), COALESCE(SUM(chunk_count), 0) FROM documents"
+            ).fetchone()
+            file_types = self._conn.execute(
+                "SELECT file_type, COUNT(*) FROM documents GROUP BY file_type"
+            ).fetchall()
+
+        return {
+            "total_documents": totals[0],
+            "total_size_bytes": totals[1],
+            "total_chunk_references": totals[2],
+            "file_type_distribution": {file_type: count for file_type, count in file_types}
+        }
+
+    def clear(self):
+        """Remove every document row."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents")
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -57,6 +57,9 @@ class DocumentMetadata:
     error_message: str = ""
     last_modified: str = ""
     
+    # SHA-256 of the uploaded file bytes, used to skip re-ingesting identical files
+    file_hash: Optional[str] = None
+    
     def __post_init__(self):
         if self.processing_notes is None:
             self.processing_notes = []
@@ -84,6 +87,9 @@ class DocumentFilter(BaseModel):
     max_size: Optional[int] = None
     limit: Optional[int] = None
     offset: Optional[int] = 0
+    cursor: Optional[str] = None
+    sort_by: str = "upload_timestamp"
+    sort_desc: bool = True
 
 class BulkOperationResult(BaseModel):
     """Result of bulk operations."""
@@ -130,6 +136,15 @@ class DocumentManager:
             ApplicationError: On creation failure
         """
         try:
+            # Identical file bytes resolve to the document already created from them
+            file_hash = metadata.get("file_hash") if metadata else None
+            if file_hash:
+                existing_doc_id = self.rag_system.find_document_by_file_hash(file_hash)
+                existing = await self.get_document(existing_doc_id) if existing_doc_id else None
+                if existing is not None:
+                    logger.info(f"Document '{title}' is identical to {existing_doc_id}; skipping ingestion")
+                    return existing_doc_id, existing
+            
             # Generate unique document ID
             timestamp = datetime.now().isoformat()
             doc_id = hashlib.md5(f"{title}_{timestamp}".encode()).hexdigest()[:12]
@@ -209,69 +224,88 @@ class DocumentManager:
             return cached_doc
         
         try:
-            with self._lock:
-                # Query ChromaDB for document chunks
-                results = self.rag_system.collection.get(
-                    where={"doc_id": doc_id},
-                    include=["metadatas"]
-                )
-                
-                # Try integer conversion if string search fails
-                if not results.get("ids"):
-                    try:
-                        results = self.rag_system.collection.get(
-                            where={"doc_id": int(doc_id)},
-                            include=["metadatas"]
-                        )
-                    except (ValueError, TypeError):
-                        pass
-                
-                if not results.get("metadatas"):
-                    return None
-                
-                # Build metadata from first chunk (all chunks share same document metadata)
-                metadata_dict = results["metadatas"][0]
-                
-                # Convert processing_notes back to list
-                processing_notes = []
-                if metadata_dict.get("processing_notes"):
-                    processing_notes = metadata_dict["processing_notes"].split("; ")
-                
-                doc_metadata = DocumentMetadata(
-                    doc_id=str(metadata_dict.get("doc_id", doc_id)),
-                    title=metadata_dict.get("title", "Unknown"),
-                    file_type=metadata_dict.get("file_type", "txt"),
-                    original_filename=metadata_dict.get("original_filename", ""),
-                    file_size=int(metadata_dict.get("file_size", 0)),
-                    upload_timestamp=metadata_dict.get("upload_timestamp", ""),
-                    status=metadata_dict.get("status", "ready"),
-                    chunk_count=len(results["ids"]),
-                    content_preview=metadata_dict.get("content_preview", ""),
-                    source=metadata_dict.get("source", "unknown"),
-                    document_type=metadata_dict.get("document_type", "plain_text"),
-                    content_structure=metadata_dict.get("content_structure", "unstructured"),
-                    intelligence_confidence=float(metadata_dict.get("intelligence_confidence", 0.5)),
-                    suggested_chunk_size=int(metadata_dict.get("suggested_chunk_size", 400)),
-                    suggested_overlap=int(metadata_dict.get("suggested_overlap", 50)),
-                    processing_notes=processing_notes,
-                    extraction_method=metadata_dict.get("extraction_method"),
-                    quality_score=float(metadata_dict.get("quality_score")) if metadata_dict.get("quality_score") else None,
-                    page_count=int(metadata_dict.get("page_count")) if metadata_dict.get("page_count") else None,
-                    error_message=metadata_dict.get("error_message", ""),
-                    last_modified=metadata_dict.get("last_modified", metadata_dict.get("upload_timestamp", ""))
-                )
-                
-                # Cache the result
-                self.document_cache.set(cache_key, doc_metadata, ttl=600.0)  # 10 minutes
-                logger.debug(f"Cached document metadata for {doc_id}")
-                
-                return doc_metadata
+            # Single primary-key lookup in the document catalog
+            entry = self.rag_system.document_catalog.get(doc_id)
+            if entry is None:
+                return None
+            
+            doc_metadata = self._metadata_from_catalog(entry)
+            
+            # Cache the result
+            self.document_cache.set(cache_key, doc_metadata, ttl=600.0)  # 10 minutes
+            logger.debug(f"Cached document metadata for {doc_id}")
+            
+            return doc_metadata
                 
         except Exception as e:
             app_error = handle_error(e)
             logger.error(f"Error retrieving document {doc_id}: {app_error.to_dict()}")
             return None
 
+    async def get_documents(self, doc_ids: List[str]) -> Dict[str, DocumentMetadata]:
+        """
+        Retrieve metadata for several documents with one catalog query for cache misses.
+
+        Args:
+            doc_ids: Document identifiers
+
+        Returns:
+            Mapping of doc_id to DocumentMetadata for the documents that exist
+        """
+        documents = {}
+        missing = []
+
+        for doc_id in dict.fromkeys(str(doc_id) for doc_id in doc_ids):
+            cached_doc = self.document_cache.get(self.document_cache._generate_key("doc_metadata", doc_id))
+            if cached_doc is not None:
+                documents[doc_id] = cached_doc
+            else:
+                missing.append(doc_id)
+
+        if not missing:
+            return documents
+
+        try:
+            for doc_id, entry in self.rag_system.document_catalog.get_many(missing).items():
+                doc_metadata = self._metadata_from_catalog(entry)
+                self.document_cache.set(self.document_cache._generate_key("doc_metadata", doc_id),
+                                        doc_metadata, ttl=600.0)
+                documents[doc_id] = doc_metadata
+        except Exception as e:
+            app_error = handle_error(e)
+            logger.error(f"Error retrieving documents {missing[:5]}: {app_error.to_dict()}")
+
+        return documents
+
+    def _metadata_from_catalog(self, entry: Dict[str, Any]) -> DocumentMetadata:
+        """Build DocumentMetadata from a document catalog row."""
+        processing_notes = entry["processing_notes"].split("; ") if entry.get("processing_notes") else []
+        
+        return DocumentMetadata(
+            doc_id=str(entry["doc_id"]),
+            title=entry.get("title") or "Unknown",
+            file_type=entry.get("file_type", "txt"),
+            original_filename=entry.get("original_filename", ""),
+            file_size=int(entry.get("file_size") or 0),
+            upload_timestamp=entry.get("upload_timestamp", ""),
+            status=entry.get("status", "ready"),
+            chunk_count=int(entry.get("chunk_count") or 0),
+            content_preview=entry.get("content_preview", ""),
+            source=entry.get("source", "unknown"),
+            document_type=entry.get("document_type", "plain_text"),
+            content_structure=entry.get("content_structure", "unstructured"),
+            intelligence_confidence=float(entry.get("intelligence_confidence", 0.5)),
+            suggested_chunk_size=int(entry.get("suggested_chunk_size", 400)),
+            suggested_overlap=int(entry.get("suggested_overlap", 50)),
+            processing_notes=processing_notes,
+            extraction_method=entry.get("extraction_method"),
+            quality_score=float(entry["quality_score"]) if entry.get("quality_score") is not None else None,
+            page_count=int(entry["page_count"]) if entry.get("page_count") is not None else None,
+            error_message=entry.get("error_message", ""),
+            last_modified=entry.get("last_modified") or entry.get("upload_timestamp", ""),
+            file_hash=entry.get("file_hash")
+        )
+
     async def list_documents(self, 
                            document_filter: Optional[DocumentFilter] = None) -> Tuple[List[DocumentMetadata], int]:
         """
@@ -283,104 +317,48 @@ class DocumentManager:
         Returns:
             Tuple of (documents_list, total_count)
         """
+        documents, total_count, _ = await self.list_documents_page(document_filter)
+        return documents, total_count
+
+    async def list_documents_page(self, 
+                                document_filter: Optional[DocumentFilter] = None
+                                ) -> Tuple[List[DocumentMetadata], int, Optional[str]]:
+        """
+        List documents from the document catalog with keyset pagination.
+        
+        Filtering, sorting and paging run as indexed SQLite queries, so the
+        cost depends on the page size rather than the number of chunks.
+        
+        Args:
+            document_filter: Filtering, sorting and pagination criteria
+            
+        Returns:
+            Tuple of (documents_list, total_count, next_cursor)
+        """
+        document_filter = document_filter or DocumentFilter()
+        
         try:
-            with self._lock:
-                # Get all documents from ChromaDB
-                results = self.rag_system.collection.get(include=["metadatas"])
-                
-                if not results.get("metadatas"):
-                    return [], 0
-                
-                # Group by document ID to avoid duplicates
-                doc_groups = {}
-                for metadata in results["metadatas"]:
-                    doc_id = str(metadata.get("doc_id", "unknown"))
-                    
-                    if doc_id not in doc_groups:
-                        # Convert processing_notes back to list
-                        processing_notes = []
-                        if metadata.get("processing_notes"):
-                            processing_notes = metadata["processing_notes"].split("; ")
-                        
-                        doc_groups[doc_id] = DocumentMetadata(
-                            doc_id=doc_id,
-                            title=metadata.get("title", "Unknown"),
-                            file_type=metadata.get("file_type", "txt"),
-                            original_filename=metadata.get("original_filename", ""),
-                            file_size=int(metadata.get("file_size", 0)),
-                            upload_timestamp=metadata.get("upload_timestamp", ""),
-                            status=metadata.get("status", "ready"),
-                            chunk_count=0,  # Will be calculated
-                            content_preview=metadata.get("content_preview", ""),
-                            source=metadata.get("source", "unknown"),
-                            document_type=metadata.get("document_type", "plain_text"),
-                            content_structure=metadata.get("content_structure", "unstructured"),
-                            intelligence_confidence=float(metadata.get("intelligence_confidence", 0.5)),
-                            suggested_chunk_size=int(metadata.get("suggested_chunk_size", 400)),
-                            suggested_overlap=int(metadata.get("suggested_overlap", 50)),
-                            processing_notes=processing_notes,
-                            extraction_method=metadata.get("extraction_method"),
-                            quality_score=float(metadata.get("quality_score")) if metadata.get("quality_score") else None,
-                            page_count=int(metadata.get("page_count")) if metadata.get("page_count") else None,
-                            error_message=metadata.get("error_message", ""),
-                            last_modified=metadata.get("last_modified", metadata.get("upload_timestamp", ""))
-                        )
-                    
-                    # Increment chunk count
-                    doc_groups[doc_id].chunk_count += 1
-                
-                documents = list(doc_groups.values())
-                
-                # Apply filters
-                if document_filter:
-                    documents = self._apply_filters(documents, document_filter)
-                
-                total_count = len(documents)
-                
-                # Apply pagination
-                if document_filter and document_filter.limit:
-                    offset = document_filter.offset or 0
-                    documents = documents[offset:offset + document_filter.limit]
-                
-                # Sort by upload date (newest first) by default
-                documents.sort(key=lambda x: x.upload_timestamp, reverse=True)
-                
-                return documents, total_count
+            entries, total_count, next_cursor = self.rag_system.document_catalog.query(
+                file_type=document_filter.file_type,
+                status=document_filter.status,
+                title_contains=document_filter.title_contains,
+                uploaded_after=document_filter.uploaded_after.isoformat() if document_filter.uploaded_after else None,
+                uploaded_before=document_filter.uploaded_before.isoformat() if document_filter.uploaded_before else None,
+                min_size=document_filter.min_size,
+                max_size=document_filter.max_size,
+                sort_by=document_filter.sort_by,
+                descending=document_filter.sort_desc,
+                limit=document_filter.limit,
+                offset=document_filter.offset or 0,
+                cursor=document_filter.cursor
+            )
+            
+            return [self._metadata_from_catalog(entry) for entry in entries], total_count, next_cursor
                 
         except Exception as e:
             app_error = handle_error(e)
             logger.error(f"Error listing documents: {app_error.to_dict()}")
-            return [], 0
-
-    def _apply_filters(self, documents: List[DocumentMetadata], filter_obj: DocumentFilter) -> List[DocumentMetadata]:
-        """Apply filtering criteria to document list."""
-        filtered = documents
-        
-        if filter_obj.file_type:
-            filtered = [d for d in filtered if d.file_type == filter_obj.file_type]
-        
-        if filter_obj.status:
-            filtered = [d for d in filtered if d.status == filter_obj.status]
-        
-        if filter_obj.title_contains:
-            query = filter_obj.title_contains.lower()
-            filtered = [d for d in filtered if query in d.title.lower()]
-        
-        if filter_obj.min_size:
-            filtered = [d for d in filtered if d.file_size >= filter_obj.min_size]
-        
-        if filter_obj.max_size:
-            filtered = [d for d in filtered if d.file_size <= filter_obj.max_size]
-        
-        if filter_obj.uploaded_after:
-            after_str = filter_obj.uploaded_after.isoformat()
-            filtered = [d for d in filtered if d.upload_timestamp >= after_str]
-        
-        if filter_obj.uploaded_before:
-            before_str = filter_obj.uploaded_before.isoformat()
-            filtered = [d for d in filtered if d.upload_timestamp <= before_str]
-        
-        return filtered
+            return [], 0, None
 
     async def update_document_metadata(self, 
                                      doc_id: str, 
@@ -430,6 +408,14 @@ class DocumentManager:
                     metadatas=updated_metadatas
                 )
                 
+                # Keep the document catalog and cached metadata in step
+                self.rag_system.document_catalog.update(doc_id, {
+                    **updates,
+                    "last_modified": updated_metadatas[0]["last_modified"]
+                })
+                self.document_cache.delete(self.document_cache._generate_key("doc_metadata", doc_id))
+                self.rag_system.invalidate_documents([doc_id])
+                
                 logger.info(f"Updated metadata for document {doc_id}")
                 return True
                 
@@ -450,36 +436,18 @@ class DocumentManager:
         """
         try:
             with self._lock:
-                # Get all chunks for this document
-                results = self.rag_system.collection.get(
-                    where={"doc_id": doc_id},
-                    include=["metadatas"]
-                )
-                
-                # Try integer conversion if string search fails
-                if not results.get("ids"):
-                    try:
-                        results = self.rag_system.collection.get(
-                            where={"doc_id": int(doc_id)},
-                            include=["metadatas"]
-                        )
-                    except (ValueError, TypeError):
-                        pass
-                
-                chunk_ids = results.get("ids", [])
-                if not chunk_ids:
+                # Delete all chunks (chunks shared with other documents are handed over to them)
+                chunks_deleted = self.rag_system.delete_document_chunks(doc_id)
+                if chunks_deleted is None:
                     logger.warning(f"Document {doc_id} not found for deletion")
                     return False, 0
                 
-                # Delete all chunks
-                self.rag_system.collection.delete(ids=chunk_ids)
-                
                 # Invalidate cache for this document
                 cache_key = self.document_cache._generate_key("doc_metadata", doc_id)
                 self.document_cache.delete(cache_key)
                 
-                logger.info(f"Deleted document {doc_id} with {len(chunk_ids)} chunks")
-                return True, len(chunk_ids)
+                logger.info(f"Deleted document {doc_id} with {chunks_deleted} chunks")
+                return True, chunks_deleted
                 
         except Exception as e:
             app_error = handle_error(e)
@@ -558,12 +526,7 @@ class DocumentManager:
             Document count
         """
         try:
-            documents, _ = await self.list_documents()
-            
-            if status_filter:
-                documents = [d for d in documents if d.status == status_filter]
-            
-            return len(documents)
+            return self.rag_system.document_catalog.count(status_filter)
             
         except Exception as e:
             logger.error(f"Error getting document count: {e}")
@@ -579,16 +542,13 @@ class DocumentManager:
         try:
             with self._lock:
                 total_chunks = self.rag_system.collection.count()
-                documents, doc_count = await self.list_documents()
+                catalog_stats = self.rag_system.document_catalog.get_stats()
                 
                 # Calculate statistics
-                total_size = sum(doc.file_size for doc in documents)
+                doc_count = catalog_stats["total_documents"]
+                total_size = catalog_stats["total_size_bytes"]
                 avg_chunks_per_doc = total_chunks / max(doc_count, 1)
-                
-                # Get file type distribution
-                file_types = {}
-                for doc in documents:
-                    file_types[doc.file_type] = file_types.get(doc.file_type, 0) + 1
+                file_types = catalog_stats["file_type_distribution"]
                 
                 return {
                     "total_documents": doc_count,
@@ -1023,8 +1023,8 @@ class DocumentVersioning:
                 
                 # Remove old chunks and add new ones
                 with self._lock:
-                    # Delete existing chunks
-                    self.rag_system.collection.delete(where={"doc_id": doc_id})
+                    # Delete existing chunks and release their content hashes
+                    self.rag_system.delete_document_chunks(doc_id)
                     
                     # Add updated content
                     result = self.rag_system.add_documents([doc_dict])
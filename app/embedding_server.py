@@ -0,0 +1,411 @@
+"""
+Embedding Server
+
+Out-of-process encoder shared by every API worker on a host. One process loads
+the embedding model and serves encode requests over a Unix domain socket;
+requests from all workers go through one micro-batcher, so concurrent queries
+from different workers share forward passes and the model is held in memory
+once instead of once per worker.
+
+    python -m app.embedding_server --socket /tmp/rag-embeddings.sock
+
+Workers started with EMBEDDING_SERVER_SOCKET set get a RemoteEncoder from the
+model registry instead of loading the model. If the server stops answering,
+RemoteEncoder loads the model in process and encodes locally, retrying the
+server every retry_interval seconds.
+
+Framing (little-endian):
+    request:  request_id u32, op u8, count u32, payload_len u32, payload
+              encode payload: count u32 byte lengths, then the UTF-8 texts
+    response: request_id u32, status u8, rows u32, dim u32, payload_len u32, payload
+              encode payload: rows * dim float32; info payload and errors: UTF-8
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import asyncio
+import argparse
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .embedding_service import EmbeddingBatcher
+from .encoder_backends import Encoder, load_encoder, default_backend
+
+logger = logging.getLogger(__name__)
+
+REQUEST_HEADER = struct.Struct("<IBII")
+RESPONSE_HEADER = struct.Struct("<IBIII")
+
+OP_ENCODE = 1
+OP_INFO = 2
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# Largest request or response body either side will accept
+MAX_PAYLOAD_BYTES = 64 * 1024 * 1024
+
+class EmbeddingServerError(Exception):
+    """The embedding server could not serve a request."""
+
+def pack_texts(texts: List[str]) -> bytes:
+    """Encode payload: the byte length of each text, then the texts."""
+    encoded = [text.encode("utf-8") for text in texts]
+    lengths = np.array([len(data) for data in encoded], dtype="<u4")
+    return lengths.tobytes() + b"".join(encoded)
+
+def unpack_texts(payload: bytes, count: int) -> List[str]:
+    """Inverse of pack_texts."""
+    lengths = np.frombuffer(payload, dtype="<u4", count=count)
+    texts, offset = [], 4 * count
+    for length in lengths.tolist():
+        texts.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+    if offset != len(payload):
+        raise ValueError("Malformed encode payload")
+    return texts
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    """Read exactly size bytes from a blocking socket."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Embedding server closed the connection")
+        received += count
+    return bytes(buffer)
+
+class EmbeddingServer:
+    """
+    Serves one encoder over a Unix domain socket.
+
+    Small requests (typically single query texts) are merged across
+    connections by an EmbeddingBatcher; requests of at least a full batch
+    (ingestion) are encoded directly on a separate thread.
+    """
+
+    def __init__(self, socket_path: str, encoder: Encoder, max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0):
+        """
+        Initialize embedding server.
+
+        Args:
+            socket_path: Unix socket path to listen on
+            encoder: Encoder to serve
+            max_batch_size: Texts per batched forward pass
+            max_wait_ms: How long small requests wait for others to batch with
+        """
+        self.socket_path = socket_path
+        self.encoder = encoder
+        self.dimension = encoder.get_sentence_embedding_dimension()
+        self.batcher = EmbeddingBatcher(
+            encode_fn=lambda texts: encoder.encode(texts, batch_size=max_batch_size,
+                                                   show_progress_bar=False, convert_to_numpy=True),
+            name="embedding_server",
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding_server_bulk")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self.stats = {"connections": 0, "requests": 0, "texts": 0, "bulk_requests": 0, "errors": 0}
+
+    def info(self) -> Dict[str, Any]:
+        """Model served, for clients to check against the model they want."""
+        return {
+            "model": self.encoder.model_name,
+            "backend": self.encoder.backend,
+            "cache_key": self.encoder.cache_key,
+            "dimension": self.dimension,
+            "pid": os.getpid(),
+            "stats": dict(self.stats),
+            "batcher_stats": self.batcher.get_stats()
+        }
+
+    def _encode_bulk(self, texts: List[str]) -> Any:
+        return self.encoder.encode(texts, batch_size=self.batcher.max_batch_size,
+                                   show_progress_bar=False, convert_to_numpy=True)
+
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        if len(texts) >= self.batcher.max_batch_size:
+            self.stats["bulk_requests"] += 1
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(self._executor, self._encode_bulk, texts)
+        else:
+            vectors = await asyncio.gather(*(self.batcher.encode_async(text) for text in texts))
+        return np.asarray(vectors, dtype="<f4")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(REQUEST_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                request_id, op, count, size = REQUEST_HEADER.unpack(header)
+                if size > MAX_PAYLOAD_BYTES:
+                    logger.warning(f"Rejecting {size}-byte embedding request; closing connection")
+                    break
+                payload = await reader.readexactly(size)
+                self.stats["requests"] += 1
+
+                try:
+                    if op == OP_ENCODE:
+                        texts = unpack_texts(payload, count)
+                        self.stats["texts"] += len(texts)
+                        vectors = await self._encode(texts)
+                        rows, dim = vectors.shape if vectors.ndim == 2 else (0, 0)
+                        body = vectors.tobytes()
+                    elif op == OP_INFO:
+                        rows, dim, body = 0, 0, json.dumps(self.info()).encode("utf-8")
+                    else:
+                        raise ValueError(f"Unknown op {op}")
+                    writer.write(RESPONSE_HEADER.pack(request_id, STATUS_OK, rows, dim, len(body)) + body)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"Embedding request failed: {e}")
+                    message = str(e).encode("utf-8")
+                    writer.write(RESPONSE_HEADER.pack(request_id, STATUS_ERROR, 0, 0, len(message)) + message)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self):
+        """Bind the socket (replacing a stale one) and start accepting connections."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"Embedding server for {self.encoder} listening on {self.socket_path}")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop serving, drop open connections and release the socket and worker threads."""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+        self.batcher.shutdown()
+        self._executor.shutdown(wait=False)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+class EmbeddingServerClient:
+    """
+    Blocking client for the embedding server.
+
+    Connections are pooled so concurrent callers (executor threads, the
+    local batcher) each use their own; the server batches them together.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0, max_idle_connections: int = 8):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_idle_connections = max_idle_connections
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _request(self, op: int, count: int, payload: bytes) -> Tuple[int, int, bytes]:
+        """Send one request and return the response's (rows, dim, payload)."""
+        with self._lock:
+            sock = self._idle.pop() if self._idle else None
+        if sock is None:
+            sock = self._connect()
+
+        try:
+            request_id = next(self._ids) & 0xFFFFFFFF
+            sock.sendall(REQUEST_HEADER.pack(request_id, op, count, len(payload)) + payload)
+            response_id, status, rows, dim, size = RESPONSE_HEADER.unpack(_recv_exactly(sock, RESPONSE_HEADER.size))
+            if response_id != request_id or size > MAX_PAYLOAD_BYTES:
+                raise ConnectionError("Unexpected response from embedding server")
+            body = _recv_exactly(sock, size)
+        except Exception:
+            sock.close()
+            raise
+
+        with self._lock:
+            if len(self._idle) < self.max_idle_connections:
+                self._idle.append(sock)
+                sock = None
+        if sock is not None:
+            sock.close()
+
+        if status != STATUS_OK:
+            raise EmbeddingServerError(body.decode("utf-8", errors="replace"))
+        return rows, dim, body
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts; returns a (len(texts), dim) float32 array."""
+        rows, dim, body = self._request(OP_ENCODE, len(texts), pack_texts(texts))
+        return np.frombuffer(body, dtype="<f4").reshape(rows, dim).copy()
+
+    def info(self) -> Dict[str, Any]:
+        """The served model's name, backend, cache key and dimension, plus server stats."""
+        _, _, body = self._request(OP_INFO, 0, b"")
+        return json.loads(body.decode("utf-8"))
+
+    def close(self):
+        with self._lock:
+            for sock in self._idle:
+                sock.close()
+            self._idle.clear()
+
+class RemoteEncoder:
+    """
+    Encoder-compatible front end for the embedding server.
+
+    When the server fails, requests are encoded in process with the same
+    model and backend (loaded on first failure) and the server is retried
+    after retry_interval seconds.
+    """
+
+    def __init__(self, client: EmbeddingServerClient, info: Dict[str, Any], retry_interval: float = 30.0):
+        self.client = client
+        self.model_name = info["model"]
+        self.server_backend = info["backend"]
+        self.cache_key = info["cache_key"]
+        self.dimension = info.get("dimension")
+        self.retry_interval = retry_interval
+        self._local: Optional[Encoder] = None
+        self._local_lock = threading.Lock()
+        self._retry_at = 0.0
+        self.stats = {"remote_calls": 0, "fallback_calls": 0, "failures": 0}
+
+    @property
+    def backend(self) -> str:
+        return f"remote:{self.server_backend}"
+
+    @property
+    def device(self) -> str:
+        return "remote"
+
+    @property
+    def tokenizer(self) -> Any:
+        # The tokenizer lives with the model in the server process
+        return self._local.tokenizer if self._local is not None else None
+
+    def _local_encoder(self) -> Encoder:
+        with self._local_lock:
+            if self._local is None:
+                logger.info(f"Loading {self.model_name} in process for embedding server fallback")
+                self._local = load_encoder(self.model_name, self.server_backend)
+            return self._local
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        vectors = None
+        if time.time() >= self._retry_at:
+            try:
+                vectors = self.client.encode(texts)
+                self.stats["remote_calls"] += 1
+            except (OSError, EmbeddingServerError) as e:
+                self.stats["failures"] += 1
+                self._retry_at = time.time() + self.retry_interval
+                logger.warning(f"Embedding server unavailable ({e}); encoding in process "
+                               f"for the next {self.retry_interval:.0f}s")
+
+        if vectors is None:
+            self.stats["fallback_calls"] += 1
+            vectors = np.asarray(self._local_encoder().encode(texts, batch_size=batch_size,
+                                                              show_progress_bar=False, convert_to_numpy=True),
+                                 dtype=np.float32)
+
+        if normalize_embeddings:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        return self.dimension
+
+    def model_bytes(self) -> int:
+        return self._local.model_bytes() if self._local is not None else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"socket_path": self.client.socket_path, "server_backend": self.server_backend,
+                "local_fallback_loaded": self._local is not None, **self.stats}
+
+    def __repr__(self) -> str:
+        return f"RemoteEncoder(model={self.model_name}, socket={self.client.socket_path})"
+
+def connect_remote_encoder(socket_path: str, model_name: str, timeout: float = 30.0) -> Optional[RemoteEncoder]:
+    """
+    RemoteEncoder for a running server that serves model_name.
+
+    Returns None (so the caller loads the model in process) when the server
+    cannot be reached or serves a different model.
+    """
+    client = EmbeddingServerClient(socket_path, timeout=timeout)
+    try:
+        info = client.info()
+    except (OSError, EmbeddingServerError, ValueError) as e:
+        logger.warning(f"Embedding server at {socket_path} not reachable ({e}); encoding in process")
+        client.close()
+        return None
+
+    if info.get("model") != model_name:
+        logger.info(f"Embedding server serves {info.get('model')}, not {model_name}; encoding in process")
+        client.close()
+        return None
+
+    logger.info(f"Using embedding server at {socket_path} for {model_name} ({info.get('backend')})")
+    return RemoteEncoder(client, info)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an embedding model over a Unix domain socket")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SERVER_SOCKET", "/tmp/rag-embeddings.sock"))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backend", default=default_backend())
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    encoder = load_encoder(args.model, args.backend)
+    server = EmbeddingServer(args.socket, encoder, max_batch_size=args.max_batch_size,
+                             max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Embedding Service
+
+Dynamic micro-batching for query-time embeddings. Concurrent encode requests are
+gathered for a few milliseconds (or until a batch fills up), encoded with a single
+batched forward pass, and the vectors are fanned back out to the waiting callers.
+"""
+
+import time
+import queue
+import threading
+import logging
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from dataclasses import dataclass
+from concurrent.futures import Future
+
+from .performance_monitor import get_performance_monitor, PerformanceMonitor
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class EmbeddingServiceMetrics:
+    """Embedding service batching metrics."""
+    total_requests: int = 0
+    total_batches: int = 0
+    total_encoded: int = 0
+    max_batch_size_seen: int = 0
+    avg_batch_size: float = 0.0
+    avg_queue_wait_ms: float = 0.0
+    avg_encode_time_ms: float = 0.0
+    errors: int = 0
+
+class EmbeddingBatcher:
+    """
+    Micro-batching front end for an encoder.
+
+    Callers submit single texts from any thread (encode) or coroutine
+    (encode_async). A background worker collects requests for up to
+    max_wait_ms or max_batch_size items, encodes the unique texts in one call,
+    and resolves each caller's future with its vector.
+    """
+
+    def __init__(self,
+                 encode_fn: Callable[[List[str]], Any],
+                 name: str = "default",
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0,
+                 monitor: Optional[PerformanceMonitor] = None):
+        """
+        Initialize embedding batcher.
+
+        Args:
+            encode_fn: Function encoding a list of texts into a list/array of vectors
+            name: Service name used as the metrics label
+            max_batch_size: Maximum texts per encoder call
+            max_wait_ms: Maximum time to hold a request while a batch fills up
+            monitor: Performance monitor for batch-size and queue-wait metrics
+        """
+        self.encode_fn = encode_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.monitor = monitor or get_performance_monitor()
+
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.metrics = EmbeddingServiceMetrics()
+
+        # Worker thread is started lazily on first request
+        self._worker_thread = None
+        self._shutdown_event = threading.Event()
+
+        logger.info(f"Embedding service '{name}' initialized: "
+                   f"max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}")
+
+    def _ensure_worker(self):
+        """Start the batching worker thread if it is not running."""
+        if self._worker_thread is not None and self._worker_thread.is_alive():
+            return
+
+        with self._lock:
+            if self._worker_thread is None or not self._worker_thread.is_alive():
+                self._shutdown_event.clear()
+                self._worker_thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"embedding_batcher_{self.name}",
+                    daemon=True
+                )
+                self._worker_thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for encoding and return a future for its vector."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.time()))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """Encode a single text, blocking the calling thread until its batch completes."""
+        return self.submit(text).result(timeout=timeout)
+
+    def encode_many(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """Encode several texts through the shared batches."""
+        futures = [self.submit(text) for text in texts]
+        return [future.result(timeout=timeout) for future in futures]
+
+    async def encode_async(self, text: str) -> List[float]:
+        """Encode a single text without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect_batch(self) -> List[Tuple[str, Future, float]]:
+        """Wait for the first request, then gather more until the batch is full or the window closes."""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.time() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            try:
+                # Drain anything already queued without waiting, then wait out the window
+                item = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+
+        return batch
+
+    def _worker_loop(self):
+        """Background worker collecting and encoding batches."""
+        while not self._shutdown_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                try:
+                    self._process_batch(batch)
+                except Exception as e:
+                    logger.error(f"Embedding service '{self.name}' worker error: {e}")
+
+    def _process_batch(self, batch: List[Tuple[str, Future, float]]):
+        """Encode one batch and resolve its futures."""
+        started_at = time.time()
+
+        # Skip requests whose callers have given up
+        live = [(text, future, queued_at) for text, future, queued_at in batch
+                if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+
+        # Identical concurrent texts are encoded once
+        unique_texts = list(dict.fromkeys(text for text, _, _ in live))
+
+        try:
+            embeddings = self.encode_fn(unique_texts)
+            if hasattr(embeddings, "tolist"):
+                embeddings = embeddings.tolist()
+            vectors = {text: list(vector) for text, vector in zip(unique_texts, embeddings)}
+
+            for text, future, _ in live:
+                future.set_result(vectors[text])
+        except Exception as e:
+            self.metrics.errors += 1
+            logger.error(f"Embedding service '{self.name}' failed to encode batch of {len(unique_texts)}: {e}")
+            for _, future, _ in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        encode_time_ms = (time.time() - started_at) * 1000
+        avg_wait_ms = sum((started_at - queued_at) * 1000 for _, _, queued_at in live) / len(live)
+        self._record_batch(len(live), len(unique_texts), avg_wait_ms, encode_time_ms)
+
+    def _record_batch(self, batch_size: int, encoded: int, avg_wait_ms: float, encode_time_ms: float):
+        """Update running metrics and report them to the performance monitor."""
+        with self._lock:
+            m = self.metrics
+            m.total_batches += 1
+            m.total_requests += batch_size
+            m.total_encoded += encoded
+            m.max_batch_size_seen = max(m.max_batch_size_seen, batch_size)
+            m.avg_batch_size = m.total_requests / m.total_batches
+            m.avg_queue_wait_ms += (avg_wait_ms - m.avg_queue_wait_ms) / m.total_batches
+            m.avg_encode_time_ms += (encode_time_ms - m.avg_encode_time_ms) / m.total_batches
+
+        labels = {"service": self.name}
+        self.monitor.record_histogram("embedding_batch_size", batch_size, labels)
+        self.monitor.record_timer("embedding_queue_wait", avg_wait_ms, labels)
+        self.monitor.record_timer("embedding_batch_encode_time", encode_time_ms, labels)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get embedding service statistics."""
+        with self._lock:
+            return {
+                "service_name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "queue_depth": self._queue.qsize(),
+                "total_requests": self.metrics.total_requests,
+                "total_batches": self.metrics.total_batches,
+                "total_encoded": self.metrics.total_encoded,
+                "avg_batch_size": round(self.metrics.avg_batch_size, 2),
+                "max_batch_size_seen": self.metrics.max_batch_size_seen,
+                "avg_queue_wait_ms": round(self.metrics.avg_queue_wait_ms, 3),
+                "avg_encode_time_ms": round(self.metrics.avg_encode_time_ms, 3),
+                "errors": self.metrics.errors
+            }
+
+    def shutdown(self):
+        """Stop the worker thread, failing any requests still queued."""
+        self._shutdown_event.set()
+        if self._worker_thread and self._worker_thread.is_alive():
+            self._worker_thread.join(timeout=5.0)
+
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError(f"Embedding service '{self.name}' shut down"))
+
+        logger.info(f"Embedding service '{self.name}' shutdown completed")
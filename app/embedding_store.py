@@ -0,0 +1,230 @@
+"""
+Persistent Embedding Store
+
+SQLite-backed L2 cache for embeddings, keyed by (encoder model name, SHA-256 of
+the text). Sits underneath the in-memory embedding cache so warm restarts and
+re-ingestion of unchanged text skip the encoder entirely.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of text, used as the embedding key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class PersistentEmbeddingStore:
+    """
+    On-disk embedding cache with a size cap and least-recently-used eviction.
+
+    Vectors are stored as packed float32 blobs. When the number of entries
+    exceeds max_entries, the least recently accessed entries are deleted until
+    the store is back down to evict_to_ratio of the cap.
+
+    Reads never write: access times of hits are buffered in memory and
+    written in one statement on the next put, before an eviction pass, or
+    once touch_flush_size hits or touch_flush_interval seconds accumulate.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 500_000, evict_to_ratio: float = 0.9,
+                 touch_flush_size: int = 1000, touch_flush_interval: float = 60.0):
+        """
+        Initialize persistent embedding store.
+
+        Args:
+            db_path: Path of the SQLite database file
+            max_entries: Maximum number of stored embeddings across all models
+            evict_to_ratio: Fraction of max_entries to keep after an eviction pass
+            touch_flush_size: Buffered access-time updates that force a write
+            touch_flush_interval: Seconds after which buffered access times are written
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.evict_to_ratio = evict_to_ratio
+        self.touch_flush_size = touch_flush_size
+        self.touch_flush_interval = touch_flush_interval
+
+        self._lock = threading.Lock()
+        self._pending_touches: Dict[Tuple[str, str], float] = {}
+        self._last_touch_flush = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_accessed REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_accessed ON embeddings (last_accessed)"
+        )
+        self._conn.commit()
+
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Persistent embedding store opened at {db_path} ({self._count} entries)")
+
+    @staticmethod
+    def _pack(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for texts.
+
+        Returns:
+            List aligned with texts holding the stored vector or None on a miss
+        """
+        if not texts:
+            return []
+
+        hashes = [content_hash(text) for text in texts]
+        unique_hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_hashes), 500):
+                chunk = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = self._unpack(blob)
+
+            if found:
+                now = time.time()
+                for text_hash in found:
+                    self._pending_touches[(model, text_hash)] = now
+                if (len(self._pending_touches) >= self.touch_flush_size
+                        or now - self._last_touch_flush >= self.touch_flush_interval):
+                    self._flush_touches()
+                    self._conn.commit()
+
+            results = [found.get(text_hash) for text_hash in hashes]
+            hit_count = sum(1 for result in results if result is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Look up a single embedding."""
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Store embeddings for texts, evicting old entries if the cap is exceeded."""
+        if not texts:
+            return
+
+        now = time.time()
+        rows = [
+            (model, content_hash(text), len(vector), self._pack(vector), now)
+            for text, vector in zip(texts, embeddings)
+        ]
+
+        with self._lock:
+            # Recorded hits must land before eviction picks the oldest entries
+            self._flush_touches()
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, dim, vector, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._count += max(cursor.rowcount, 0)
+
+            if self._count > self.max_entries:
+                self._evict()
+
+            self._conn.commit()
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """Store a single embedding."""
+        self.put_many(model, [text], [embedding])
+
+    def _flush_touches(self):
+        """Write buffered access times without committing. Caller holds the lock."""
+        if self._pending_touches:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_accessed = ? WHERE model = ? AND text_hash = ?",
+                [(accessed, model, text_hash) for (model, text_hash), accessed in self._pending_touches.items()]
+            )
+            self._pending_touches.clear()
+        self._last_touch_flush = time.time()
+
+    def _evict(self):
+        """Delete least recently accessed entries down to the low-water mark. Caller holds the lock."""
+        target = int(self.max_entries * self.evict_to_ratio)
+        excess = self._count - target
+        if excess <= 0:
+            return
+
+        cursor = self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_accessed ASC LIMIT ?)",
+            (excess,)
+        )
+        removed = max(cursor.rowcount, 0)
+        self._count -= removed
+        self.evictions += removed
+        logger.info(f"Evicted {removed} embeddings from persistent store ({self._count} remaining)")
+
+    def clear(self, model: Optional[str] = None):
+        """Remove all stored embeddings, or only those of one model."""
+        with self._lock:
+            if model is None:
+                self._pending_touches.clear()
+                self._conn.execute("DELETE FROM embeddings")
+            else:
+                self._pending_touches = {key: accessed for key, accessed in self._pending_touches.items()
+                                         if key[0] != model}
+                self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+            self._conn.commit()
+            self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get persistent store statistics."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "db_path": self.db_path,
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+                "evictions": self.evictions,
+                "size_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+            }
+
+    def close(self):
+        """Write buffered access times and close the database connection."""
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
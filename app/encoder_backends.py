@@ -0,0 +1,264 @@
+"""
+Encoder Backends
+
+Embedding models behind one Encoder interface, loaded with a choice of
+inference backend:
+
+- torch: the SentenceTransformer PyTorch model (reference)
+- onnx: the same model run by ONNX Runtime
+- onnx-int8: an ONNX export dynamically quantized to int8 for this CPU,
+  created once from the same weights and kept under ENCODER_EXPORT_DIR
+
+The backend is chosen with EMBEDDING_BACKEND. A backend that cannot be
+loaded (e.g. optimum/onnxruntime not installed) falls back to torch.
+check_parity reports how far a backend's vectors drift from the reference
+and how much faster it encodes:
+
+    python -m app.encoder_backends --backend onnx-int8
+"""
+
+import os
+import glob
+import json
+import time
+import platform
+import argparse
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Short, varied texts used when no parity corpus is given
+PARITY_SAMPLE_TEXTS = [
+    "How do I reset my password?",
+    "The refund window is 30 days from the delivery date.",
+    "Docker containers share the host operating system kernel.",
+    "Quarterly revenue grew by 12 percent compared to last year.",
+    "Employees must submit expense reports within two weeks.",
+    "The API returns a 429 status code when the rate limit is exceeded.",
+    "Machine learning models learn patterns from labeled training data.",
+    "Backups run nightly and are retained for ninety days.",
+    "Wie kann ich meine Bestellung stornieren?",
+    "The meeting has been moved to Thursday afternoon.",
+    "Kubernetes schedules pods onto nodes based on resource requests.",
+    "Our office in Lisbon opened in 2019 and employs forty people.",
+]
+
+def default_backend() -> str:
+    """Backend named by EMBEDDING_BACKEND (torch if unset or unknown)."""
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown EMBEDDING_BACKEND '{backend}', using torch")
+        return "torch"
+    return backend
+
+def default_export_dir() -> str:
+    """Directory quantized ONNX exports are written to."""
+    return os.getenv("ENCODER_EXPORT_DIR", os.path.join("data", "encoders"))
+
+def quantization_target() -> str:
+    """ONNX Runtime dynamic quantization preset matching this CPU (ENCODER_QUANTIZATION overrides)."""
+    override = os.getenv("ENCODER_QUANTIZATION")
+    if override:
+        return override
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+class Encoder:
+    """
+    An embedding model loaded with one backend.
+
+    encode takes the same arguments as SentenceTransformer.encode, so callers
+    do not depend on which backend is underneath.
+    """
+
+    def __init__(self, model: Any, model_name: str, backend: str = "torch",
+                 model_path: Optional[str] = None):
+        self.model = model
+        self.model_name = model_name
+        self.backend = backend
+        self.model_path = model_path
+
+    @property
+    def cache_key(self) -> str:
+        """Name stored vectors are keyed by; int8 vectors are not interchangeable with float ones."""
+        if self.backend == "onnx-int8":
+            return f"{self.model_name}@{self.backend}"
+        return self.model_name
+
+    @property
+    def device(self) -> str:
+        return str(getattr(self.model, "device", "cpu"))
+
+    @property
+    def tokenizer(self) -> Any:
+        return getattr(self.model, "tokenizer", None)
+
+    def encode(self, sentences, **kwargs) -> Any:
+        return self.model.encode(sentences, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        return self.model.get_sentence_embedding_dimension()
+
+    def model_bytes(self) -> int:
+        """Size of the ONNX file, or of the PyTorch parameters and buffers."""
+        if self.model_path and os.path.isfile(self.model_path):
+            return os.path.getsize(self.model_path)
+        try:
+            tensors = list(self.model.parameters()) + list(self.model.buffers())
+            return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+        except Exception:
+            return 0
+
+    def __repr__(self) -> str:
+        return f"Encoder(model={self.model_name}, backend={self.backend})"
+
+def _onnx_model_path(model: Any) -> Optional[str]:
+    """Path of the ONNX file behind a SentenceTransformer loaded with the onnx backend."""
+    try:
+        return str(model[0].auto_model.model_path)
+    except Exception:
+        return None
+
+def _load_onnx_int8(name: str, export_dir: Optional[str] = None) -> Tuple[Any, str]:
+    """Load the int8 ONNX export of a model, exporting and quantizing it first if needed."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    target = quantization_target()
+    model_dir = os.path.join(export_dir or default_export_dir(), name.replace("/", "__"))
+    pattern = os.path.join(model_dir, "**", f"model_qint8_{target}.onnx")
+    exported = glob.glob(pattern, recursive=True)
+
+    if not exported:
+        logger.info(f"Exporting {name} to int8 ONNX ({target}) in {model_dir}")
+        onnx_model = SentenceTransformer(name, backend="onnx")
+        onnx_model.save(model_dir)
+        export_dynamic_quantized_onnx_model(onnx_model, target, model_dir)
+        exported = glob.glob(pattern, recursive=True)
+        if not exported:
+            raise FileNotFoundError(f"Quantized export not found under {model_dir}")
+
+    file_name = os.path.relpath(exported[0], model_dir)
+    model = SentenceTransformer(model_dir, backend="onnx", model_kwargs={"file_name": file_name})
+    return model, exported[0]
+
+def load_encoder(name: str, backend: Optional[str] = None, export_dir: Optional[str] = None) -> Encoder:
+    """
+    Load a model with the given backend (default_backend() if None).
+
+    ONNX backends fall back to torch when they cannot be loaded; the returned
+    Encoder's backend says which one is in use.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or default_backend()
+    if backend == "onnx":
+        try:
+            model = SentenceTransformer(name, backend="onnx")
+            return Encoder(model, name, "onnx", _onnx_model_path(model))
+        except Exception as e:
+            logger.warning(f"Could not load {name} with ONNX Runtime, using torch: {e}")
+    elif backend == "onnx-int8":
+        try:
+            model, path = _load_onnx_int8(name, export_dir)
+            return Encoder(model, name, "onnx-int8", path)
+        except Exception as e:
+            logger.warning(f"Could not load int8 ONNX export of {name}, using torch: {e}")
+    elif backend != "torch":
+        raise ValueError(f"Unknown encoder backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+
+    return Encoder(SentenceTransformer(name), name, "torch")
+
+def _timed_encode(encoder: Encoder, texts: List[str], batch_size: int) -> Tuple[np.ndarray, float]:
+    """Encode texts after a warm-up call; returns the vectors and elapsed seconds."""
+    encoder.encode(texts[:2], batch_size=batch_size, show_progress_bar=False)
+    start_time = time.perf_counter()
+    vectors = encoder.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start_time
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def check_parity(candidate: Encoder, reference: Encoder, texts: Optional[List[str]] = None,
+                 batch_size: int = 32, min_timed_texts: int = 256) -> Dict[str, Any]:
+    """
+    Compare a candidate encoder's vectors and speed against a reference.
+
+    Cosine drift is measured per text. neighbour_agreement is the share of
+    texts whose nearest other text is the same under both encoders, a proxy
+    for whether retrieval rankings survive the change. Throughput is measured
+    on the texts repeated to at least min_timed_texts.
+    """
+    texts = list(texts or PARITY_SAMPLE_TEXTS)
+    timed_texts = texts * max(1, -(-min_timed_texts // len(texts)))
+
+    reference_vectors = _normalize(np.asarray(
+        reference.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True),
+        dtype=np.float32))
+    candidate_vectors = _normalize(np.asarray(
+        candidate.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True),
+        dtype=np.float32))
+    cosine = np.sum(reference_vectors * candidate_vectors, axis=1)
+
+    neighbour_agreement = 1.0
+    if len(texts) > 1:
+        reference_similarity = reference_vectors @ reference_vectors.T
+        candidate_similarity = candidate_vectors @ candidate_vectors.T
+        np.fill_diagonal(reference_similarity, -np.inf)
+        np.fill_diagonal(candidate_similarity, -np.inf)
+        neighbour_agreement = float(np.mean(
+            reference_similarity.argmax(axis=1) == candidate_similarity.argmax(axis=1)))
+
+    _, reference_seconds = _timed_encode(reference, timed_texts, batch_size)
+    _, candidate_seconds = _timed_encode(candidate, timed_texts, batch_size)
+
+    return {
+        "model": reference.model_name,
+        "reference_backend": reference.backend,
+        "candidate_backend": candidate.backend,
+        "texts": len(texts),
+        "mean_cosine": float(np.mean(cosine)),
+        "min_cosine": float(np.min(cosine)),
+        "max_drift": float(1.0 - np.min(cosine)),
+        "neighbour_agreement": neighbour_agreement,
+        "reference_texts_per_sec": len(timed_texts) / max(reference_seconds, 1e-9),
+        "candidate_texts_per_sec": len(timed_texts) / max(candidate_seconds, 1e-9),
+        "speedup": reference_seconds / max(candidate_seconds, 1e-9),
+        "reference_model_mb": reference.model_bytes() / (1024 * 1024),
+        "candidate_model_mb": candidate.model_bytes() / (1024 * 1024)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an encoder backend against the PyTorch reference")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backend", default="onnx-int8", choices=BACKENDS)
+    parser.add_argument("--texts", help="File with one text per line (defaults to a built-in sample)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = None
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    reference = load_encoder(args.model, "torch")
+    candidate = load_encoder(args.model, args.backend)
+    print(json.dumps(check_parity(candidate, reference, texts, batch_size=args.batch_size), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -27,12 +27,13 @@ from sklearn.cluster import KMeans
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.linear_model import LogisticRegression
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
 
 from .rag_backend import get_rag_system
 from .document_manager import DocumentManager
 from .document_analytics import get_analytics_engine
 from .performance_cache import get_document_cache
+from .model_registry import get_model_registry
 from .error_handlers import handle_error, ApplicationError, ErrorCategory, ErrorSeverity
 
 logger = logging.getLogger(__name__)
@@ -195,7 +196,7 @@ class SemanticTagger:
     """Semantic tagging using embeddings and clustering."""
     
     def __init__(self):
-        self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.encoder = get_model_registry().get('all-MiniLM-L6-v2')
         self.tag_embeddings = {}
         self.cluster_cache = {}
         self._build_tag_embeddings()
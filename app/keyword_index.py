@@ -0,0 +1,305 @@
+"""
+Keyword Index
+
+Chunk-level BM25 inverted index kept in step with ChromaDB. Posting lists live
+in memory for scoring and are written through to SQLite, so the index survives
+restarts and is updated incrementally as chunks are added, deleted or handed to
+another document instead of being rebuilt from the collection.
+"""
+
+import os
+import re
+import math
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+    'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those',
+    'it', 'its', 'as', 'from', 'not', 'no', 'if', 'then', 'so', 'than'
+})
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric terms with stop words and single characters removed."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower())
+            if len(token) > 1 and token not in STOP_WORDS]
+
+class BM25Index:
+    """
+    Okapi BM25 over chunks.
+
+    Each chunk is indexed under its ChromaDB id together with the doc_id that
+    owns it. Chunks are numbered with dense ordinals; a reverse id array maps an
+    ordinal back to its chunk and document, and posting lists store ordinals.
+    Scoring is a sparse sum over the posting lists of the query's terms only,
+    followed by an argpartition top-k, so its cost follows the number of
+    matching postings rather than the size of the corpus.
+    """
+
+    def __init__(self, db_path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize BM25 index, loading any persisted postings.
+
+        Args:
+            db_path: Path of the SQLite database file
+            k1: Term frequency saturation
+            b: Length normalization strength
+        """
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+
+        # chunk_id -> ordinal, and the reverse id arrays indexed by ordinal
+        self._ordinals: Dict[str, int] = {}
+        self._chunk_ids: List[Optional[str]] = []
+        self._doc_ids: List[Optional[str]] = []
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._free_ordinals: List[int] = []
+        self._total_length = 0
+
+        # term -> {ordinal: term frequency}, with array copies built on demand for scoring
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._posting_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # ordinal -> its distinct terms, so removal only touches its own postings
+        self._chunk_terms: Dict[int, List[str]] = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                length INTEGER NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_postings_chunk_id ON postings (chunk_id);
+        """)
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        """Read persisted chunks and postings into memory."""
+        for chunk_id, doc_id, length in self._conn.execute("SELECT chunk_id, doc_id, length FROM chunks"):
+            self._assign_ordinal(chunk_id, doc_id, length)
+
+        for term, chunk_id, tf in self._conn.execute("SELECT term, chunk_id, tf FROM postings"):
+            ordinal = self._ordinals.get(chunk_id)
+            if ordinal is None:
+                continue
+            self._postings.setdefault(term, {})[ordinal] = tf
+            self._chunk_terms.setdefault(ordinal, []).append(term)
+
+        if self._ordinals:
+            logger.info(f"Loaded keyword index with {len(self._ordinals)} chunks and {len(self._postings)} terms")
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+    def _assign_ordinal(self, chunk_id: str, doc_id: str, length: int) -> int:
+        """Give a chunk a slot in the reverse id arrays. Caller holds the lock."""
+        if self._free_ordinals:
+            ordinal = self._free_ordinals.pop()
+            self._chunk_ids[ordinal] = chunk_id
+            self._doc_ids[ordinal] = doc_id
+        else:
+            ordinal = len(self._chunk_ids)
+            self._chunk_ids.append(chunk_id)
+            self._doc_ids.append(doc_id)
+            if ordinal >= len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+
+        self._ordinals[chunk_id] = ordinal
+        self._lengths[ordinal] = length
+        self._total_length += length
+        return ordinal
+
+    def _drop_chunk(self, chunk_id: str) -> bool:
+        """Remove a chunk from the in-memory index. Caller holds the lock."""
+        ordinal = self._ordinals.pop(chunk_id, None)
+        if ordinal is None:
+            return False
+
+        self._total_length -= int(self._lengths[ordinal])
+        self._lengths[ordinal] = 0
+        self._chunk_ids[ordinal] = None
+        self._doc_ids[ordinal] = None
+        self._free_ordinals.append(ordinal)
+
+        for term in self._chunk_terms.pop(ordinal, ()):
+            self._posting_arrays.pop(term, None)
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(ordinal, None)
+                if not postings:
+                    del self._postings[term]
+        return True
+
+    def add_chunks(self, chunks: Iterable[Tuple[str, str, str]]):
+        """
+        Index chunks, replacing any previous entry with the same id.
+
+        Args:
+            chunks: (chunk_id, doc_id, text) tuples
+        """
+        rows, posting_rows = [], []
+        replaced = []
+
+        with self._lock:
+            for chunk_id, doc_id, text in chunks:
+                term_counts = Counter(tokenize(text))
+                length = sum(term_counts.values())
+
+                if self._drop_chunk(chunk_id):
+                    replaced.append(chunk_id)
+
+                ordinal = self._assign_ordinal(chunk_id, str(doc_id), length)
+                self._chunk_terms[ordinal] = list(term_counts)
+                for term, tf in term_counts.items():
+                    self._postings.setdefault(term, {})[ordinal] = tf
+                    self._posting_arrays.pop(term, None)
+
+                rows.append((chunk_id, str(doc_id), length))
+                posting_rows.extend((term, chunk_id, tf) for term, tf in term_counts.items())
+
+            if not rows:
+                return
+
+            with self._conn:
+                if replaced:
+                    self._conn.executemany("DELETE FROM postings WHERE chunk_id = ?",
+                                           [(chunk_id,) for chunk_id in replaced])
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (chunk_id, doc_id, length) VALUES (?, ?, ?)", rows
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows
+                )
+
+    def remove_chunks(self, chunk_ids: Iterable[str]) -> int:
+        """Remove chunks from the index. Returns the number removed."""
+        with self._lock:
+            removed = [chunk_id for chunk_id in dict.fromkeys(chunk_ids) if self._drop_chunk(chunk_id)]
+            if not removed:
+                return 0
+
+            with self._conn:
+                params = [(chunk_id,) for chunk_id in removed]
+                self._conn.executemany("DELETE FROM postings WHERE chunk_id = ?", params)
+                self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", params)
+
+        return len(removed)
+
+    def reassign_chunks(self, owners: Dict[str, str]):
+        """Record new owning documents for shared chunks."""
+        with self._lock:
+            updates = []
+            for chunk_id, doc_id in owners.items():
+                ordinal = self._ordinals.get(chunk_id)
+                if ordinal is not None:
+                    self._doc_ids[ordinal] = str(doc_id)
+                    updates.append((str(doc_id), chunk_id))
+
+            if updates:
+                with self._conn:
+                    self._conn.executemany("UPDATE chunks SET doc_id = ? WHERE chunk_id = ?", updates)
+
+    def _posting_array(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Ordinals and term frequencies of a term as arrays. Caller holds the lock."""
+        arrays = self._posting_arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                      np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+            self._posting_arrays[term] = arrays
+        return arrays
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, str, float]]:
+        """
+        Score chunks against a query.
+
+        Returns:
+            Up to top_k (chunk_id, doc_id, score) tuples, best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+
+        with self._lock:
+            total_chunks = len(self._ordinals)
+            terms = [term for term in terms if term in self._postings]
+            if not terms or total_chunks == 0 or top_k <= 0:
+                return []
+
+            avg_length = self._total_length / total_chunks if self._total_length else 1.0
+            ordinal_parts, score_parts = [], []
+
+            for term in terms:
+                ordinals, tfs = self._posting_array(term)
+                df = len(ordinals)
+                idf = math.log(1.0 + (total_chunks - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * self._lengths[ordinals] / avg_length)
+                ordinal_parts.append(ordinals)
+                score_parts.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+            # Sum contributions per candidate chunk; only chunks containing a query term take part
+            if len(ordinal_parts) == 1:
+                candidates, scores = ordinal_parts[0], score_parts[0]
+            else:
+                candidates, inverse = np.unique(np.concatenate(ordinal_parts), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+
+            k = min(top_k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+            top = top[np.lexsort((candidates[top], -scores[top]))]
+
+            return [(self._chunk_ids[candidates[i]], self._doc_ids[candidates[i]], float(scores[i]))
+                    for i in top]
+
+    def clear(self):
+        """Remove every indexed chunk."""
+        with self._lock:
+            self._ordinals.clear()
+            self._chunk_ids.clear()
+            self._doc_ids.clear()
+            self._lengths = np.zeros(1024, dtype=np.float32)
+            self._free_ordinals.clear()
+            self._total_length = 0
+            self._postings.clear()
+            self._posting_arrays.clear()
+            self._chunk_terms.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM postings")
+                self._conn.execute("DELETE FROM chunks")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size statistics."""
+        with self._lock:
+            total_chunks = len(self._ordinals)
+            return {
+                "chunks": total_chunks,
+                "terms": len(self._postings),
+                "postings": sum(len(postings) for postings in self._postings.values()),
+                "avg_chunk_length": self._total_length / total_chunks if total_chunks else 0.0
+            }
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,216 @@
+"""
+LLM Backend Pool
+
+Routing across several Ollama servers. Each backend carries its own circuit
+breaker, health state and count of outstanding requests; a new request goes to
+the available backend with the fewest requests in flight, so load spreads across
+boxes and a slow or failing box is drained and skipped. When hedging is enabled
+a request that has produced no token after hedge_delay seconds is duplicated on
+a second backend and whichever answers first is kept.
+"""
+
+import hashlib
+import logging
+import threading
+import itertools
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterable, Callable
+from urllib.parse import urlparse
+
+from .performance_monitor import get_performance_monitor
+
+logger = logging.getLogger(__name__)
+
+def normalize_backend_url(host: str) -> str:
+    """Turn "host:port" or a full URL into a base URL without a trailing slash."""
+    host = host.strip().rstrip("/")
+    if "://" not in host:
+        host = f"http://{host}"
+    return host
+
+class LLMBackend:
+    """One Ollama server and its routing state."""
+
+    def __init__(self, url: str, circuit_breaker, http_pool=None):
+        """
+        Initialize LLM backend.
+
+        Args:
+            url: Base URL of the Ollama server
+            circuit_breaker: Breaker tracking this server's failures
+            http_pool: Pooled HTTP sessions for blocking requests
+        """
+        self.url = url
+        self.name = urlparse(url).netloc or url
+        self.circuit_breaker = circuit_breaker
+        self.http_pool = http_pool
+
+        # Async HTTP client, bound to the event loop that created it
+        self.async_client = None
+        self.async_client_loop = None
+
+        self.outstanding = 0
+        self.total_requests = 0
+        self.failures = 0
+        self.ttft_ewma: Optional[float] = None
+        self.last_successful_health_check: Optional[float] = None
+
+    def is_available(self) -> bool:
+        """Whether the circuit breaker lets a request through."""
+        return self.circuit_breaker.can_attempt()
+
+    def record_ttft(self, seconds: float, alpha: float = 0.2):
+        """Fold a time-to-first-token (or full response time) sample into the moving average."""
+        if self.ttft_ewma is None:
+            self.ttft_ewma = seconds
+        else:
+            self.ttft_ewma = alpha * seconds + (1 - alpha) * self.ttft_ewma
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "circuit_breaker_state": self.circuit_breaker.state,
+            "failure_count": self.circuit_breaker.failure_count,
+            "outstanding": self.outstanding,
+            "total_requests": self.total_requests,
+            "failures": self.failures,
+            "ttft_ewma_ms": self.ttft_ewma * 1000 if self.ttft_ewma is not None else None,
+            "last_successful_health_check": self.last_successful_health_check
+        }
+
+class LLMBackendPool:
+    """
+    Least-outstanding-requests routing over a list of backends.
+
+    Usage:
+        backend = pool.choose(exclude=already_failed)
+        with pool.track(backend):
+            ...request against backend.url...
+    """
+
+    def __init__(self, backends: List[LLMBackend],
+                 hedge_enabled: bool = False,
+                 hedge_delay: float = 1.5):
+        """
+        Initialize backend pool.
+
+        Args:
+            backends: Backends to route across (the first is the primary)
+            hedge_enabled: Duplicate slow requests on a second backend
+            hedge_delay: Seconds without a first token before hedging
+        """
+        if not backends:
+            raise ValueError("LLMBackendPool needs at least one backend")
+
+        self.backends = backends
+        self.hedge_enabled = hedge_enabled
+        self.hedge_delay = hedge_delay
+
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+        self.monitor = get_performance_monitor()
+
+        self.stats = {"hedged": 0, "hedge_wins": 0}
+
+    @classmethod
+    def from_urls(cls, urls: Iterable[str], breaker_factory: Callable[[], Any],
+                  pool_factory: Optional[Callable[[str, int], Any]] = None, **kwargs) -> "LLMBackendPool":
+        """Build a pool from base URLs, giving each backend its own breaker and HTTP pool."""
+        backends = []
+        for index, url in enumerate(dict.fromkeys(normalize_backend_url(url) for url in urls)):
+            http_pool = pool_factory(url, index) if pool_factory else None
+            backends.append(LLMBackend(url, breaker_factory(), http_pool))
+        return cls(backends, **kwargs)
+
+    @property
+    def primary(self) -> LLMBackend:
+        return self.backends[0]
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def any_available(self) -> bool:
+        return any(backend.is_available() for backend in self.backends)
+
+    def should_hedge(self, affinity: Optional[str] = None) -> bool:
+        """Hedge only when enabled, a second backend could take the duplicate and the request is not pinned."""
+        return affinity is None and self.hedge_enabled and sum(1 for backend in self.backends if backend.is_available()) > 1
+
+    def choose(self, exclude: Iterable[LLMBackend] = (), affinity: Optional[str] = None) -> Optional[LLMBackend]:
+        """
+        Pick the available backend with the fewest requests in flight.
+
+        Backends in exclude (e.g. ones that already failed this request) are
+        only used when no other backend is available. Ties rotate so idle
+        backends share new work evenly.
+
+        With an affinity key (e.g. a conversation session id) the choice is
+        sticky instead: rendezvous hashing maps the key to the same backend
+        while it is available, so the backend's prompt cache for that key is
+        reused, and only keys on a failed backend move elsewhere.
+
+        Returns:
+            A backend, or None if every circuit breaker is open
+        """
+        excluded = set(exclude)
+        available = [backend for backend in self.backends if backend.is_available()]
+        candidates = [backend for backend in available if backend not in excluded] or available
+        if not candidates:
+            return None
+
+        if affinity is not None:
+            return max(candidates, key=lambda backend: hashlib.md5(
+                f"{affinity}|{backend.url}".encode("utf-8")).digest())
+
+        with self._lock:
+            offset = next(self._rotation)
+            count = len(candidates)
+            return min(
+                enumerate(candidates),
+                key=lambda item: (item[1].outstanding, (item[0] - offset) % count)
+            )[1]
+
+    @contextmanager
+    def track(self, backend: LLMBackend):
+        """Count a request against a backend while it is in flight."""
+        with self._lock:
+            backend.outstanding += 1
+            backend.total_requests += 1
+            outstanding = backend.outstanding
+        self.monitor.record_gauge("llm_backend_outstanding", outstanding, {"backend": backend.name})
+        try:
+            yield backend
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+                outstanding = backend.outstanding
+            self.monitor.record_gauge("llm_backend_outstanding", outstanding, {"backend": backend.name})
+
+    def record_failure(self, backend: LLMBackend):
+        """Count a failed request against a backend and its circuit breaker."""
+        with self._lock:
+            backend.failures += 1
+        backend.circuit_breaker.record_failure()
+        self.monitor.record_counter("llm_backend_failures", 1.0, {"backend": backend.name})
+
+    def record_hedge(self, winner: Optional[LLMBackend] = None):
+        """Count a hedged request, or the hedge winning the race."""
+        with self._lock:
+            if winner is None:
+                self.stats["hedged"] += 1
+            else:
+                self.stats["hedge_wins"] += 1
+        if winner is None:
+            self.monitor.record_counter("llm_hedged_requests", 1.0)
+        else:
+            self.monitor.record_counter("llm_hedge_wins", 1.0, {"backend": winner.name})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-backend routing statistics."""
+        with self._lock:
+            return {
+                "hedge_enabled": self.hedge_enabled,
+                "hedge_delay_seconds": self.hedge_delay,
+                "backends": [backend.get_stats() for backend in self.backends],
+                **self.stats
+            }
@@ -0,0 +1,321 @@
+"""
+LLM Request Scheduler
+
+Admission control in front of Ollama. Every generation takes a slot for its
+model; each model has its own concurrency limit (a CPU-bound Ollama slows down
+sharply past a couple of parallel generations). Requests that cannot start
+immediately wait in a priority queue, so interactive queries are always
+dispatched before batch and background work, and a full queue rejects new
+work immediately instead of letting it pile up.
+"""
+
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+from enum import IntEnum
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+from .error_handlers import ApplicationError, ErrorCategory, ErrorSeverity, RecoveryAction
+from .performance_monitor import get_performance_monitor
+
+logger = logging.getLogger(__name__)
+
+class LLMPriority(IntEnum):
+    """Scheduling classes; lower values are dispatched first."""
+    INTERACTIVE = 0  # User-facing /query and chat requests
+    BATCH = 1        # Batch query endpoint
+    BACKGROUND = 2   # Translation, tagging and other offline jobs
+
+class LLMQueueFullError(ApplicationError):
+    """Raised when a request is rejected or displaced by the scheduler."""
+
+    def __init__(self, model: str, reason: str):
+        super().__init__(
+            message=f"LLM request for {model} not scheduled: {reason}",
+            category=ErrorCategory.LLM,
+            severity=ErrorSeverity.MEDIUM,
+            recovery_action=RecoveryAction.WAIT,
+            user_message="The language model is busy right now. Please try again in a moment.",
+            technical_details={"model": model, "reason": reason},
+            error_code="LLM_QUEUE_FULL"
+        )
+
+class _Waiter:
+    """A queued request; granted through a thread event or an event-loop future."""
+
+    def __init__(self, priority: LLMPriority, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.enqueued_at = time.time()
+        self.granted = False
+        self.error: Optional[Exception] = None
+        self.cancelled = False
+        self._loop = loop
+        self._event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def _resolve(self):
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._set_future)
+
+    def _set_future(self):
+        if self.future.done():
+            return
+        if self.error is not None:
+            self.future.set_exception(self.error)
+        else:
+            self.future.set_result(True)
+
+    def grant(self):
+        self.granted = True
+        self._resolve()
+
+    def reject(self, error: Exception):
+        self.error = error
+        self._resolve()
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        return self._event.wait(timeout)
+
+class _ModelQueue:
+    """Slot accounting and waiting requests for one model."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.heap: List[tuple] = []
+        self.queued = 0
+
+class LLMScheduler:
+    """
+    Priority admission control with per-model concurrency limits.
+
+    Usage:
+        with scheduler.slot(model, LLMPriority.INTERACTIVE):
+            ...blocking generation...
+
+        async with scheduler.async_slot(model, LLMPriority.BACKGROUND):
+            ...awaited generation...
+
+    When the queue is full, a request of higher priority than the lowest
+    queued one displaces it (the displaced request fails with
+    LLMQueueFullError); otherwise the new request is rejected at once.
+    """
+
+    def __init__(self,
+                 default_concurrency: int = 2,
+                 model_concurrency: Optional[Dict[str, int]] = None,
+                 max_queue_depth: int = 64,
+                 max_wait_seconds: float = 120.0):
+        """
+        Initialize LLM scheduler.
+
+        Args:
+            default_concurrency: Concurrent generations allowed per model
+            model_concurrency: Per-model overrides of default_concurrency
+            max_queue_depth: Maximum waiting requests per model
+            max_wait_seconds: Longest a request may wait for a slot
+        """
+        self.default_concurrency = default_concurrency
+        self.model_concurrency = dict(model_concurrency or {})
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_seconds = max_wait_seconds
+
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelQueue] = {}
+        self._sequence = itertools.count()
+        self.monitor = get_performance_monitor()
+
+        self.stats = {"granted": 0, "rejected": 0, "displaced": 0, "timed_out": 0}
+
+    def _queue_for(self, model: str) -> _ModelQueue:
+        """Get or create a model's queue. Caller holds the lock."""
+        queue = self._models.get(model)
+        if queue is None:
+            queue = _ModelQueue(self.model_concurrency.get(model, self.default_concurrency))
+            self._models[model] = queue
+        return queue
+
+    def set_concurrency(self, model: str, limit: int):
+        """Change a model's concurrency limit, starting queued requests if it grew."""
+        with self._lock:
+            self.model_concurrency[model] = max(1, limit)
+            queue = self._queue_for(model)
+            queue.limit = max(1, limit)
+            self._dispatch(model, queue)
+
+    def set_default_concurrency(self, limit: int):
+        """Change the limit of every model without its own override."""
+        with self._lock:
+            self.default_concurrency = max(1, limit)
+            for model, queue in self._models.items():
+                if model not in self.model_concurrency:
+                    queue.limit = self.default_concurrency
+                    self._dispatch(model, queue)
+
+    def _record_depth(self, model: str, queue: _ModelQueue):
+        self.monitor.record_gauge("llm_queue_depth", queue.queued, {"model": model})
+        self.monitor.record_gauge("llm_active_requests", queue.active, {"model": model})
+
+    def _enqueue(self, model: str, waiter: _Waiter) -> bool:
+        """
+        Admit a request: grant a free slot or queue it.
+
+        Returns:
+            True if granted immediately
+        """
+        with self._lock:
+            queue = self._queue_for(model)
+
+            if queue.active < queue.limit and queue.queued == 0:
+                queue.active += 1
+                self.stats["granted"] += 1
+                self._record_depth(model, queue)
+                return True
+
+            if queue.queued >= self.max_queue_depth:
+                victim = self._lowest_priority_waiter(queue)
+                if victim is None or victim.priority <= waiter.priority:
+                    self.stats["rejected"] += 1
+                    self.monitor.record_counter("llm_requests_rejected", 1.0,
+                                                {"model": model, "priority": waiter.priority.name.lower()})
+                    raise LLMQueueFullError(model, f"queue full ({queue.queued} waiting)")
+
+                victim.cancelled = True
+                queue.queued -= 1
+                self.stats["displaced"] += 1
+                victim.reject(LLMQueueFullError(model, "displaced by higher-priority request"))
+
+            heapq.heappush(queue.heap, (waiter.priority, next(self._sequence), waiter))
+            queue.queued += 1
+            self._record_depth(model, queue)
+            return False
+
+    @staticmethod
+    def _lowest_priority_waiter(queue: _ModelQueue) -> Optional[_Waiter]:
+        """Newest waiter of the lowest-priority class. Caller holds the lock."""
+        candidates = [(priority, seq, waiter) for priority, seq, waiter in queue.heap if not waiter.cancelled]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda item: (item[0], item[1]))[2]
+
+    def _dispatch(self, model: str, queue: _ModelQueue):
+        """Grant free slots to queued requests in priority order. Caller holds the lock."""
+        while queue.active < queue.limit and queue.heap:
+            _, _, waiter = heapq.heappop(queue.heap)
+            if waiter.cancelled:
+                continue
+            queue.queued -= 1
+            queue.active += 1
+            self.stats["granted"] += 1
+            waiter.grant()
+        self._record_depth(model, queue)
+
+    def _release(self, model: str):
+        """Free a slot and start the next queued request."""
+        with self._lock:
+            queue = self._queue_for(model)
+            queue.active = max(0, queue.active - 1)
+            self._dispatch(model, queue)
+
+    def _withdraw(self, model: str, waiter: _Waiter) -> bool:
+        """
+        Withdraw a waiting request after a timeout or cancellation.
+
+        Returns:
+            True if a slot was granted just before the withdrawal (the caller owns it)
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            if not waiter.cancelled and waiter.error is None:
+                waiter.cancelled = True
+                self._queue_for(model).queued -= 1
+                self.stats["timed_out"] += 1
+            return False
+
+    def _record_wait(self, model: str, priority: LLMPriority, started: float):
+        wait_ms = (time.time() - started) * 1000
+        self.monitor.record_histogram("llm_queue_wait", wait_ms,
+                                      {"model": model, "priority": priority.name.lower()})
+
+    @contextmanager
+    def slot(self, model: str, priority: LLMPriority = LLMPriority.INTERACTIVE,
+             timeout: Optional[float] = None):
+        """Hold a generation slot for model while the block runs (blocking wait)."""
+        waiter = _Waiter(priority)
+        started = time.time()
+
+        if not self._enqueue(model, waiter):
+            if not waiter.wait(timeout if timeout is not None else self.max_wait_seconds) \
+                    and not self._withdraw(model, waiter) and waiter.error is None:
+                raise LLMQueueFullError(model, "timed out waiting for a slot")
+            if waiter.error is not None:
+                raise waiter.error
+
+        self._record_wait(model, priority, started)
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    @asynccontextmanager
+    async def async_slot(self, model: str, priority: LLMPriority = LLMPriority.INTERACTIVE,
+                         timeout: Optional[float] = None):
+        """Hold a generation slot for model while the block runs (awaits without blocking the loop)."""
+        waiter = _Waiter(priority, loop=asyncio.get_running_loop())
+        started = time.time()
+
+        if not self._enqueue(model, waiter):
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future),
+                                       timeout if timeout is not None else self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                if not self._withdraw(model, waiter):
+                    raise waiter.error or LLMQueueFullError(model, "timed out waiting for a slot")
+            except asyncio.CancelledError:
+                if self._withdraw(model, waiter):
+                    self._release(model)
+                raise
+
+        self._record_wait(model, priority, started)
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-model slot usage and queue statistics."""
+        with self._lock:
+            models = {}
+            for model, queue in self._models.items():
+                waiting = [waiter.priority.name.lower() for _, _, waiter in queue.heap if not waiter.cancelled]
+                models[model] = {
+                    "concurrency_limit": queue.limit,
+                    "active": queue.active,
+                    "queued": queue.queued,
+                    "queued_by_priority": {name: waiting.count(name) for name in set(waiting)}
+                }
+            return {
+                "default_concurrency": self.default_concurrency,
+                "max_queue_depth": self.max_queue_depth,
+                "models": models,
+                **self.stats
+            }
+
+# Global scheduler shared by the sync and async LLM clients
+_llm_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Get the global LLM scheduler."""
+    global _llm_scheduler
+    with _scheduler_lock:
+        if _llm_scheduler is None:
+            _llm_scheduler = LLMScheduler()
+        return _llm_scheduler
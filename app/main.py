@@ -14,7 +14,10 @@ import logging
 from datetime import datetime
 import hashlib
 import asyncio
+import json
 from .rag_backend import get_rag_system
+from .document_catalog import DocumentCatalog, SORTABLE_COLUMNS
+from .llm_scheduler import get_llm_scheduler
 from .document_processing_tracker import processing_tracker, ProcessingStatus
 from .pdf_processor import pdf_processor, ExtractionMethod
 from .document_intelligence import document_intelligence, DocumentType
@@ -30,6 +33,9 @@ from .sharing_service import get_sharing_service, ShareRequest, ShareLink, Acces
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Concurrent generations each Ollama backend is given by the LLM scheduler
+LLM_CONCURRENCY_PER_BACKEND = 2
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle events."""
@@ -39,6 +45,14 @@ async def lifespan(app: FastAPI):
         rag_system = get_rag_system()
         logger.info(f"RAG system initialized with {rag_system.collection.count()} documents")
         
+        # Each Ollama backend serves LLM_CONCURRENCY_PER_BACKEND generations at
+        # once, so the scheduler's default per-model limit scales with their count
+        backend_count = len(rag_system.llm_client.backends)
+        if backend_count > 1:
+            get_llm_scheduler().set_default_concurrency(LLM_CONCURRENCY_PER_BACKEND * backend_count)
+            logger.info(f"LLM scheduler default concurrency set to "
+                        f"{LLM_CONCURRENCY_PER_BACKEND * backend_count} for {backend_count} backends")
+        
         # Initialize document manager and upload handler
         document_manager = get_document_manager()
         upload_handler = get_upload_handler()
@@ -67,6 +81,14 @@ async def lifespan(app: FastAPI):
     try:
         await health_monitor.stop_monitoring()
         logger.info("Health monitoring stopped")
+        
+        rag_sys = get_rag_system()
+        await rag_sys.async_llm_client.aclose()
+        rag_sys.embedding_service.shutdown()
+        rag_sys.embedding_store.close()
+        rag_sys.content_index.close()
+        rag_sys.document_catalog.close()
+        rag_sys.keyword_index.close()
     except Exception as e:
         logger.error(f"Shutdown error: {e}")
 
@@ -95,6 +117,14 @@ class Document(BaseModel):
 class QueryRequest(BaseModel):
     question: str
     max_chunks: Optional[int] = None
+    model_hint: Optional[str] = None  # Model route to use: "fast", "default" or "large"
+    session_id: Optional[str] = None  # Answer as the next turn of this conversation
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    max_chunks: Optional[int] = None
+    max_concurrency: Optional[int] = None
+    model_hint: Optional[str] = None
 
 class QueryResponse(BaseModel):
     answer: str
@@ -102,8 +132,11 @@ class QueryResponse(BaseModel):
     context_used: int
     context_tokens: int
     efficiency_ratio: float
-    response_type: Optional[str] = "rag"  # "rag", "general", or "error"
+    response_type: Optional[str] = "rag"  # "rag", "extractive", "general", or "error"
     fallback_reason: Optional[str] = None  # Reason for fallback when applicable
+    model_route: Optional[Dict[str, Any]] = None  # Model chosen for the answer and why
+    session_id: Optional[str] = None  # Conversation the answer belongs to, when one was given
+    stale: bool = False  # Served from an expired cache entry while it is being refreshed
 
 class HealthResponse(BaseModel):
     status: str
@@ -123,6 +156,7 @@ class DocumentInfo(BaseModel):
 class DocumentListResponse(BaseModel):
     documents: List[DocumentInfo]
     total_count: int
+    next_cursor: Optional[str] = None
 
 class DeleteResponse(BaseModel):
     message: str
@@ -250,6 +284,15 @@ async def api_info():
                 "description": "Query the knowledge base",
                 "example": {"question": "What documents do you have?", "max_chunks": 3}
             },
+            "query_stream": {
+                "method": "POST",
+                "path": "/query/stream",
+                "description": "Query the knowledge base with the answer streamed as Server-Sent Events"
+            },
+            "sessions": {
+                "get": {"method": "GET", "path": "/sessions/{session_id}", "description": "Get a conversation's recent turns and summary"},
+                "delete": {"method": "DELETE", "path": "/sessions/{session_id}", "description": "End a conversation session"}
+            },
             "documents": {
                 "list": {"method": "GET", "path": "/api/v1/documents", "description": "List documents with filtering"},
                 "upload": {"method": "POST", "path": "/api/v1/documents/upload", "description": "Upload files with real-time status"},
@@ -382,6 +425,9 @@ async def upload_files(files: List[UploadFile] = File(...)):
     try:
         documents = []
         processing_tasks = []
+        duplicate_tasks = []
+        rag_sys = get_rag_system()
+        seen_hashes = {}
         
         # Create processing tasks for each file
         for file in files:
@@ -399,8 +445,17 @@ async def upload_files(files: List[UploadFile] = File(...)):
                 file_type = "txt"
                 content_str = content.decode('utf-8')
             
+            # Identical bytes are short-circuited to the document already created from them
+            file_hash = hashlib.sha256(content).hexdigest()
+            existing_doc_id = seen_hashes.get(file_hash) or rag_sys.find_document_by_file_hash(file_hash)
+            if existing_doc_id:
+                logger.info(f"File {file.filename} is identical to document {existing_doc_id}; skipping ingestion")
+                duplicate_tasks.append(existing_doc_id)
+                continue
+            
             # Generate doc_id using filename and timestamp hash
             doc_id = hashlib.md5(f"{file.filename}_{datetime.now().isoformat()}".encode()).hexdigest()[:12]
+            seen_hashes[file_hash] = doc_id
             
             # Create processing task
             task = processing_tracker.create_task(
@@ -419,13 +474,13 @@ async def upload_files(files: List[UploadFile] = File(...)):
                 "file_size": len(content),
                 "upload_timestamp": datetime.now().isoformat(),
                 "doc_id": doc_id,
+                "file_hash": file_hash,
                 "raw_content": content,  # Raw bytes for PDF processing
                 "content": content_str   # Text content for TXT files
             }
             documents.append(doc_info)
         
         # Process documents with status tracking
-        rag_sys = get_rag_system()
         processed_docs = []
         
         for doc, task in zip(documents, processing_tasks):
@@ -522,8 +577,10 @@ async def upload_files(files: List[UploadFile] = File(...)):
                 logger.error(f"Error processing document {doc['title']}: {app_error.to_dict()}")
         
         return {
-            "message": f"Successfully uploaded {len(processed_docs)} of {len(files)} files",
+            "message": f"Successfully uploaded {len(processed_docs) + len(duplicate_tasks)} of {len(files)} files",
             "files_processed": len(processed_docs),
+            "duplicates_skipped": len(duplicate_tasks),
+            "duplicate_of": duplicate_tasks,
             "processing_tasks": [task.doc_id for task in processing_tasks]
         }
     
@@ -544,8 +601,8 @@ async def query_knowledge_base(request: QueryRequest):
     try:
         rag_sys = get_rag_system()
         
-        # Check if we have documents
-        if rag_sys.collection.count() == 0:
+        # Check if we have documents (ChromaDB access stays off the event loop)
+        if await rag_sys.run_in_executor(rag_sys.collection.count) == 0:
             raise ApplicationError(
                 message="No documents in knowledge base",
                 category=ErrorCategory.DATABASE,
@@ -554,7 +611,8 @@ async def query_knowledge_base(request: QueryRequest):
                 recovery_action=RecoveryAction.NONE
             )
         
-        result = rag_sys.rag_query(request.question, max_chunks=request.max_chunks)
+        result = await rag_sys.rag_query_async(request.question, max_chunks=request.max_chunks,
+                                               model_hint=request.model_hint, session_id=request.session_id)
         return QueryResponse(**result)
     except ApplicationError as e:
         app_error = e
@@ -575,6 +633,98 @@ async def query_knowledge_base(request: QueryRequest):
         "fallback_reason": "api_error"
     }
 
+@app.post("/query/stream")
+async def query_knowledge_base_stream(request: QueryRequest):
+    """
+    Query the knowledge base and stream the answer as Server-Sent Events.
+    
+    Emits a `sources` event first, then `token` events as the LLM generates,
+    and a final `done` event (or an `error` event on failure).
+    """
+    if request.session_id:
+        # Conversation turns are recorded and routed by /query only
+        raise HTTPException(status_code=400, detail="session_id is not supported by /query/stream; use /query")
+    
+    rag_sys = get_rag_system()
+    
+    def event_stream():
+        try:
+            if rag_sys.collection.count() == 0:
+                events = iter([{
+                    "type": "error",
+                    "error": "No documents in knowledge base",
+                    "message": "There are no documents to search. Please upload some documents first."
+                }])
+            else:
+                events = rag_sys.rag_query_stream(request.question, max_chunks=request.max_chunks,
+                                                  model_hint=request.model_hint)
+            
+            for event in events:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            app_error = handle_error(e)
+            logger.error(f"Error streaming query: {app_error.to_dict()}")
+            error_event = {"type": "error", "error": app_error.error_code, "message": app_error.user_message}
+            yield f"event: error\ndata: {json.dumps(error_event)}\n\n"
+    
+    # Sync generator is iterated in Starlette's threadpool, keeping the event loop free
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/query/batch")
+async def query_knowledge_base_batch(request: BatchQueryRequest):
+    """
+    Answer many questions in one request, streamed back as NDJSON.
+    
+    Each line is a query result with the `index` and `question` it answers,
+    written as soon as that answer completes (so lines are not in request order).
+    """
+    rag_sys = get_rag_system()
+    
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="At least one question is required")
+    if len(request.questions) > rag_sys.batch_query_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {rag_sys.batch_query_max_questions} questions can be sent in one batch"
+        )
+    
+    async def result_lines():
+        try:
+            if await rag_sys.run_in_executor(rag_sys.collection.count) == 0:
+                for index, question in enumerate(request.questions):
+                    yield json.dumps({
+                        "index": index,
+                        "question": question,
+                        "answer": "There are no documents to search. Please upload some documents first.",
+                        "sources": [],
+                        "context_used": 0,
+                        "context_tokens": 0,
+                        "efficiency_ratio": 0.0,
+                        "error": "No documents in knowledge base",
+                        "response_type": "error",
+                        "fallback_reason": "api_error"
+                    }) + "\n"
+                return
+            
+            async for result in rag_sys.rag_query_batch(request.questions, max_chunks=request.max_chunks,
+                                                        max_concurrency=request.max_concurrency,
+                                                        model_hint=request.model_hint):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            app_error = handle_error(e)
+            logger.error(f"Error processing batch query: {app_error.to_dict()}")
+            yield json.dumps({"error": app_error.error_code, "message": app_error.user_message}) + "\n"
+    
+    return StreamingResponse(
+        result_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Processing Status Endpoints
 
 @app.get("/processing/status")
@@ -624,48 +774,29 @@ async def list_documents():
     try:
         rag_sys = get_rag_system()
         
-        # Get all documents from ChromaDB
-        results = rag_sys.collection.get(include=["metadatas"])
+        # One catalog row per document, newest first
+        entries, total_count, _ = rag_sys.document_catalog.query()
         
-        # Process documents and group by doc_id
-        doc_groups = {}
-        for i, metadata in enumerate(results.get("metadatas", [])):
-            doc_id = str(metadata.get("doc_id", "unknown"))
-            
-            if doc_id not in doc_groups:
-                doc_groups[doc_id] = {
-                    "doc_id": str(doc_id),  # Ensure string type
-                    "title": str(metadata.get("title", "Unknown Document")),
-                    "file_type": str(metadata.get("file_type", "txt")),
-                    "upload_date": str(metadata.get("upload_timestamp", datetime.now().isoformat())),
-                    "chunk_count": 0,
-                    "file_size": 0,
-                    "status": "ready"
-                }
-            
-            doc_groups[doc_id]["chunk_count"] += 1
-            # Estimate file size from content preview length
-            preview_len = len(metadata.get("content_preview", ""))
-            if preview_len > 0:
-                doc_groups[doc_id]["file_size"] = max(doc_groups[doc_id]["file_size"], preview_len * 10)
-        
-        # Debug: Check doc_data before creating DocumentInfo
         documents = []
-        for doc_data in doc_groups.values():
+        for entry in entries:
             try:
-                # Ensure all fields are proper types
-                doc_data["doc_id"] = str(doc_data["doc_id"])
-                doc_data["chunk_count"] = int(doc_data["chunk_count"])
-                doc_data["file_size"] = int(doc_data["file_size"])
-                documents.append(DocumentInfo(**doc_data))
+                documents.append(DocumentInfo(
+                    doc_id=str(entry["doc_id"]),
+                    title=str(entry.get("title") or "Unknown Document"),
+                    file_type=str(entry.get("file_type") or "txt"),
+                    upload_date=str(entry.get("upload_timestamp") or ""),
+                    chunk_count=int(entry.get("chunk_count") or 0),
+                    file_size=int(entry.get("file_size") or 0),
+                    status=entry.get("status") or "ready",
+                    error_message=entry.get("error_message") or ""
+                ))
             except Exception as e:
-                logger.error(f"Error creating DocumentInfo for {doc_data}: {e}")
+                logger.error(f"Error creating DocumentInfo for {entry.get('doc_id')}: {e}")
                 continue
-        documents.sort(key=lambda x: x.upload_date, reverse=True)
         
         return DocumentListResponse(
             documents=documents,
-            total_count=len(documents)
+            total_count=total_count
         )
         
     except Exception as e:
@@ -678,34 +809,16 @@ async def delete_document(doc_id: str):
     try:
         rag_sys = get_rag_system()
         
-        # Get all chunks for this document (try both string and int versions)
-        results = rag_sys.collection.get(
-            where={"doc_id": doc_id},
-            include=["metadatas"]
-        )
-        
-        # If not found as string, try as integer
-        if not results.get("ids"):
-            try:
-                results = rag_sys.collection.get(
-                    where={"doc_id": int(doc_id)},
-                    include=["metadatas"]
-                )
-            except ValueError:
-                pass
-        
-        chunk_ids = results.get("ids", [])
-        if not chunk_ids:
+        # Delete all chunks for this document (shared chunks stay with other documents)
+        deleted_chunks = rag_sys.delete_document_chunks(doc_id)
+        if deleted_chunks is None:
             raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
         
-        # Delete all chunks for this document
-        rag_sys.collection.delete(ids=chunk_ids)
-        
-        logger.info(f"Deleted document {doc_id} with {len(chunk_ids)} chunks")
+        logger.info(f"Deleted document {doc_id} with {deleted_chunks} chunks")
         
         return DeleteResponse(
             message=f"Document {doc_id} deleted successfully",
-            deleted_chunks=len(chunk_ids)
+            deleted_chunks=deleted_chunks
         )
         
     except HTTPException:
@@ -731,11 +844,35 @@ async def clear_documents():
     try:
         rag_sys = get_rag_system()
         rag_sys.collection.delete(where={})
+        rag_sys.content_index.clear()
+        rag_sys.document_catalog.clear()
+        rag_sys.keyword_index.clear()
+        rag_sys.sentence_index.clear()
+        
+        # Every cached answer is stale once the collection is empty
+        rag_sys.invalidate_documents([])
+        rag_sys.rag_cache.clear()
+        rag_sys.semantic_cache.clear()
         return {"message": "All documents cleared"}
     except Exception as e:
         logger.error(f"Error clearing documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/sessions/{session_id}")
+async def get_conversation_session(session_id: str):
+    """Get a conversation session's recent turns and summary"""
+    session = get_rag_system().sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return session.to_dict()
+
+@app.delete("/sessions/{session_id}")
+async def delete_conversation_session(session_id: str):
+    """End a conversation session and forget its history"""
+    if not get_rag_system().sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return {"message": f"Session {session_id} deleted"}
+
 @app.get("/settings")
 async def get_settings():
     """Get current RAG system settings"""
@@ -744,7 +881,29 @@ async def get_settings():
         "similarity_threshold": rag_sys.similarity_threshold,
         "max_context_tokens": rag_sys.max_context_tokens,
         "chunk_size": rag_sys.chunk_size,
-        "chunk_overlap": rag_sys.chunk_overlap
+        "chunk_overlap": rag_sys.chunk_overlap,
+        "embedding_batch_size": rag_sys.embedding_batch_size,
+        "ingest_batch_size": rag_sys.ingest_batch_size,
+        "context_compression_enabled": rag_sys.context_compression_enabled,
+        "context_token_budget": rag_sys.context_compressor.token_budget,
+        "rag_cache_ttl": rag_sys.rag_cache_ttl,
+        "rag_cache_stale_grace": rag_sys.rag_cache.stale_grace,
+        "semantic_cache_enabled": rag_sys.semantic_cache_enabled,
+        "semantic_cache_max_distance": rag_sys.semantic_cache.max_distance,
+        "llm_default_concurrency": get_llm_scheduler().default_concurrency,
+        "llm_model_concurrency": dict(get_llm_scheduler().model_concurrency),
+        "llm_max_queue_depth": get_llm_scheduler().max_queue_depth,
+        "llm_backends": [backend.url for backend in rag_sys.llm_client.backends.backends],
+        "llm_hedge_enabled": rag_sys.llm_client.backends.hedge_enabled,
+        "llm_hedge_delay_ms": rag_sys.llm_client.backends.hedge_delay * 1000,
+        "extractive_answers_enabled": rag_sys.extractive_answers_enabled,
+        "extractive_min_score": rag_sys.extractive_min_score,
+        "extractive_min_overlap": rag_sys.extractive_min_overlap,
+        "extractive_refine_in_background": rag_sys.extractive_refine_in_background,
+        "session_max_history_tokens": rag_sys.sessions.max_history_tokens,
+        "session_keep_alive": rag_sys.sessions.keep_alive,
+        "model_routing_enabled": rag_sys.model_router.enabled,
+        "model_routes": {name: route.model for name, route in rag_sys.model_router.routes.items()}
     }
 
 class SettingsUpdate(BaseModel):
@@ -752,6 +911,26 @@ class SettingsUpdate(BaseModel):
     max_context_tokens: Optional[int] = None
     chunk_size: Optional[int] = None
     chunk_overlap: Optional[int] = None
+    embedding_batch_size: Optional[int] = None
+    ingest_batch_size: Optional[int] = None
+    context_compression_enabled: Optional[bool] = None
+    context_token_budget: Optional[int] = None
+    rag_cache_ttl: Optional[float] = None
+    rag_cache_stale_grace: Optional[float] = None
+    semantic_cache_enabled: Optional[bool] = None
+    semantic_cache_max_distance: Optional[float] = None
+    llm_model_concurrency: Optional[Dict[str, int]] = None
+    llm_max_queue_depth: Optional[int] = None
+    llm_hedge_enabled: Optional[bool] = None
+    llm_hedge_delay_ms: Optional[float] = None
+    extractive_answers_enabled: Optional[bool] = None
+    extractive_min_score: Optional[float] = None
+    extractive_min_overlap: Optional[float] = None
+    extractive_refine_in_background: Optional[bool] = None
+    session_max_history_tokens: Optional[int] = None
+    session_keep_alive: Optional[str] = None  # Ollama duration, e.g. "30m"
+    model_routing_enabled: Optional[bool] = None
+    model_routes: Optional[Dict[str, str]] = None  # Route name -> Ollama model
 
 @app.post("/settings")
 async def update_settings(settings: SettingsUpdate):
@@ -766,6 +945,48 @@ async def update_settings(settings: SettingsUpdate):
             rag_sys.chunk_size = settings.chunk_size
         if settings.chunk_overlap is not None:
             rag_sys.chunk_overlap = settings.chunk_overlap
+        if settings.embedding_batch_size is not None:
+            rag_sys.embedding_batch_size = max(1, settings.embedding_batch_size)
+        if settings.ingest_batch_size is not None:
+            rag_sys.ingest_batch_size = max(1, settings.ingest_batch_size)
+        if settings.context_compression_enabled is not None:
+            rag_sys.context_compression_enabled = settings.context_compression_enabled
+        if settings.context_token_budget is not None:
+            rag_sys.context_compressor.token_budget = max(50, settings.context_token_budget)
+        if settings.rag_cache_ttl is not None:
+            rag_sys.rag_cache_ttl = max(0.0, settings.rag_cache_ttl)
+        if settings.rag_cache_stale_grace is not None:
+            rag_sys.rag_cache.stale_grace = max(0.0, settings.rag_cache_stale_grace)
+        if settings.semantic_cache_enabled is not None:
+            rag_sys.semantic_cache_enabled = settings.semantic_cache_enabled
+        if settings.semantic_cache_max_distance is not None:
+            rag_sys.semantic_cache.max_distance = min(max(0.0, settings.semantic_cache_max_distance), 1.0)
+        if settings.llm_model_concurrency is not None:
+            for model, limit in settings.llm_model_concurrency.items():
+                get_llm_scheduler().set_concurrency(model, limit)
+        if settings.llm_max_queue_depth is not None:
+            get_llm_scheduler().max_queue_depth = max(0, settings.llm_max_queue_depth)
+        if settings.llm_hedge_enabled is not None:
+            rag_sys.llm_client.backends.hedge_enabled = settings.llm_hedge_enabled
+        if settings.llm_hedge_delay_ms is not None:
+            rag_sys.llm_client.backends.hedge_delay = max(0.0, settings.llm_hedge_delay_ms) / 1000
+        if settings.extractive_answers_enabled is not None:
+            rag_sys.extractive_answers_enabled = settings.extractive_answers_enabled
+        if settings.extractive_min_score is not None:
+            rag_sys.extractive_min_score = min(max(0.0, settings.extractive_min_score), 1.0)
+        if settings.extractive_min_overlap is not None:
+            rag_sys.extractive_min_overlap = min(max(0.0, settings.extractive_min_overlap), 1.0)
+        if settings.extractive_refine_in_background is not None:
+            rag_sys.extractive_refine_in_background = settings.extractive_refine_in_background
+        if settings.session_max_history_tokens is not None:
+            rag_sys.sessions.max_history_tokens = max(100, settings.session_max_history_tokens)
+        if settings.session_keep_alive is not None:
+            rag_sys.sessions.keep_alive = settings.session_keep_alive
+        if settings.model_routing_enabled is not None:
+            rag_sys.model_router.enabled = settings.model_routing_enabled
+        if settings.model_routes is not None:
+            for route, model in settings.model_routes.items():
+                rag_sys.model_router.set_route_model(route, model)
         
         return {"message": "Settings updated successfully"}
     except Exception as e:
@@ -780,9 +1001,12 @@ async def list_documents_v1(
     status: Optional[str] = Query(None, description="Filter by status"),
     title_contains: Optional[str] = Query(None, description="Filter by title content"),
     limit: Optional[int] = Query(None, ge=1, le=100, description="Limit results"),
-    offset: Optional[int] = Query(0, ge=0, description="Offset for pagination")
+    offset: Optional[int] = Query(0, ge=0, description="Offset for pagination"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from a previous page (takes precedence over offset)"),
+    sort_by: str = Query("upload_timestamp", description="Sort field: upload_timestamp, title, file_size, chunk_count, last_modified"),
+    sort_desc: bool = Query(True, description="Sort in descending order")
 ):
-    """Enhanced document listing with filtering and pagination."""
+    """Enhanced document listing with filtering and keyset pagination."""
     try:
         document_manager = get_document_manager()
         
@@ -792,10 +1016,21 @@ async def list_documents_v1(
             status=status,
             title_contains=title_contains,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor,
+            sort_by=sort_by,
+            sort_desc=sort_desc
         )
         
-        documents, total_count = await document_manager.list_documents(document_filter)
+        if sort_by not in SORTABLE_COLUMNS:
+            raise HTTPException(status_code=400, detail=f"Cannot sort documents by '{sort_by}'")
+        if cursor:
+            try:
+                DocumentCatalog.decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        
+        documents, total_count, next_cursor = await document_manager.list_documents_page(document_filter)
         
         # Convert to API response format
         document_infos = []
@@ -813,9 +1048,12 @@ async def list_documents_v1(
         
         return DocumentListResponse(
             documents=document_infos,
-            total_count=total_count
+            total_count=total_count,
+            next_cursor=next_cursor
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         app_error = handle_error(e)
         logger.error(f"Error listing documents: {app_error.to_dict()}")
@@ -1911,7 +2149,7 @@ async def get_documents_api(
             offset=offset
         )
         
-        documents = await document_manager.list_documents(filter_params)
+        documents, _ = await document_manager.list_documents(filter_params)
         
         return [DocumentInfo(
             doc_id=doc.doc_id,
@@ -0,0 +1,163 @@
+"""
+Embedding Model Registry
+
+Process-wide registry of loaded embedding models. Each model is loaded once
+per process and the same instance is handed to every component that asks for
+it (the RAG system, semantic tagger and multilingual embedding manager), so a
+worker holds one copy of all-MiniLM-L6-v2 instead of one per component. Models
+are Encoders (see encoder_backends), keyed by name and backend. With
+EMBEDDING_SERVER_SOCKET set, models the embedding server serves are used
+through it rather than loaded in process (see embedding_server). Load time and
+memory footprint are recorded per model for diagnostics.
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable, Tuple
+
+import psutil
+
+from .encoder_backends import load_encoder, default_backend
+from .embedding_server import connect_remote_encoder
+
+logger = logging.getLogger(__name__)
+
+def load_model(name: str, backend: str) -> Any:
+    """Use the embedding server for a model when one is configured and serves it, else load it."""
+    socket_path = os.getenv("EMBEDDING_SERVER_SOCKET")
+    if socket_path:
+        remote = connect_remote_encoder(socket_path, name)
+        if remote is not None:
+            return remote
+    return load_encoder(name, backend)
+
+def model_bytes(model: Any) -> int:
+    """Size an Encoder reports for its weights (0 for objects that do not)."""
+    try:
+        return int(model.model_bytes())
+    except Exception:
+        return 0
+
+@dataclass
+class LoadedModel:
+    """A loaded model and what loading it cost."""
+    name: str
+    backend: str
+    model: Any
+    load_time_ms: float
+    model_bytes: int
+    rss_delta_bytes: int
+    loaded_at: float
+    references: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "backend": str(getattr(self.model, "backend", self.backend)),
+            "load_time_ms": round(self.load_time_ms, 1),
+            "model_mb": round(self.model_bytes / (1024 * 1024), 1),
+            "rss_delta_mb": round(self.rss_delta_bytes / (1024 * 1024), 1),
+            "device": str(getattr(self.model, "device", "unknown")),
+            "references": self.references,
+            "loaded_at": self.loaded_at
+        }
+
+class EmbeddingModelRegistry:
+    """
+    Loads each embedding model once and shares it.
+
+    Loads are serialized so the RSS growth measured around each one is
+    attributable to that model; lookups of already loaded models do not wait
+    on a load in progress.
+    """
+
+    def __init__(self, loader: Optional[Callable[[str, str], Any]] = None):
+        """
+        Initialize model registry.
+
+        Args:
+            loader: Loads a model by name and backend (load_model by default)
+        """
+        self.loader = loader or load_model
+        self._models: Dict[Tuple[str, str], LoadedModel] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._process = psutil.Process(os.getpid())
+
+    def get(self, name: str, backend: Optional[str] = None) -> Any:
+        """
+        Get a model, loading it on first use. Load failures propagate to the caller.
+
+        backend defaults to EMBEDDING_BACKEND, so components that only name the
+        model share whatever backend the process was configured with.
+        """
+        key = (name, backend or default_backend())
+        with self._lock:
+            loaded = self._models.get(key)
+            if loaded is not None:
+                loaded.references += 1
+                return loaded.model
+
+        with self._load_lock:
+            with self._lock:
+                loaded = self._models.get(key)
+            if loaded is None:
+                loaded = self._load(*key)
+                with self._lock:
+                    self._models[key] = loaded
+
+        with self._lock:
+            loaded.references += 1
+        return loaded.model
+
+    def _load(self, name: str, backend: str) -> LoadedModel:
+        """Load a model and measure it. Caller holds the load lock."""
+        rss_before = self._process.memory_info().rss
+        start_time = time.time()
+        model = self.loader(name, backend)
+        load_time_ms = (time.time() - start_time) * 1000
+        rss_delta = max(0, self._process.memory_info().rss - rss_before)
+
+        loaded = LoadedModel(name=name, backend=backend, model=model, load_time_ms=load_time_ms,
+                             model_bytes=model_bytes(model), rss_delta_bytes=rss_delta,
+                             loaded_at=time.time())
+        stats = loaded.to_dict()
+        logger.info(f"Loaded embedding model {name} ({stats['backend']}) in {load_time_ms:.0f}ms "
+                    f"(~{stats['model_mb']}MB weights, +{stats['rss_delta_mb']}MB RSS)")
+        return loaded
+
+    def is_loaded(self, name: str, backend: Optional[str] = None) -> bool:
+        """Whether a model is already loaded."""
+        with self._lock:
+            return (name, backend or default_backend()) in self._models
+
+    def unload(self, name: str, backend: Optional[str] = None) -> bool:
+        """Drop the registry's reference to a model; holders keep theirs until released."""
+        with self._lock:
+            return self._models.pop((name, backend or default_backend()), None) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-model load time and memory, and the process's current RSS."""
+        with self._lock:
+            models = {f"{name}@{backend}": loaded.to_dict()
+                      for (name, backend), loaded in self._models.items()}
+        return {
+            "models": models,
+            "loaded_models": len(models),
+            "total_model_mb": round(sum(model["model_mb"] for model in models.values()), 1),
+            "process_rss_mb": round(self._process.memory_info().rss / (1024 * 1024), 1)
+        }
+
+# Global registry shared by every component in the process
+_model_registry: Optional[EmbeddingModelRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_model_registry() -> EmbeddingModelRegistry:
+    """Get the global embedding model registry."""
+    global _model_registry
+    with _registry_lock:
+        if _model_registry is None:
+            _model_registry = EmbeddingModelRegistry()
+        return _model_registry
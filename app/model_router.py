@@ -0,0 +1,160 @@
+"""
+Model Router
+
+Chooses which Ollama model answers a query. Simple lookups go to a small fast
+model; comparison and analysis questions, and answers over a lot of context,
+go to a larger one. Routing is rule based: rules are checked in order against
+the query's intent (from QueryProcessor), word count, complexity score and the
+size of the retrieved context, and a per-request hint naming a route wins over
+all of them.
+"""
+
+import logging
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional
+
+from .query_processor import QueryProcessor
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ModelRoute:
+    """A model and its generation budget."""
+    model: str
+    max_tokens: Optional[int] = None  # None keeps the caller's default
+
+@dataclass
+class RoutingRule:
+    """
+    Conditions under which a query is sent to a route.
+
+    Every condition that is set must hold for the rule to match.
+    """
+    name: str
+    route: str
+    intents: List[str] = field(default_factory=list)
+    max_words: Optional[int] = None
+    min_complexity: Optional[float] = None
+    max_complexity: Optional[float] = None
+    min_context_tokens: Optional[int] = None
+    max_context_tokens: Optional[int] = None
+
+    def matches(self, intent: str, words: int, complexity: float, context_tokens: int) -> bool:
+        return ((not self.intents or intent in self.intents)
+                and (self.max_words is None or words <= self.max_words)
+                and (self.min_complexity is None or complexity >= self.min_complexity)
+                and (self.max_complexity is None or complexity <= self.max_complexity)
+                and (self.min_context_tokens is None or context_tokens >= self.min_context_tokens)
+                and (self.max_context_tokens is None or context_tokens <= self.max_context_tokens))
+
+@dataclass
+class RouteDecision:
+    """The route chosen for a query and why."""
+    route: str
+    model: str
+    max_tokens: Optional[int]
+    reason: str
+    intent: Optional[str] = None
+    complexity: Optional[float] = None
+    context_tokens: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+DEFAULT_MODEL = "llama3.2:3b"
+
+def default_routes() -> Dict[str, ModelRoute]:
+    return {
+        "fast": ModelRoute(model="llama3.2:1b", max_tokens=300),
+        "default": ModelRoute(model=DEFAULT_MODEL),
+        "large": ModelRoute(model="llama3.1:8b", max_tokens=800)
+    }
+
+def default_rules() -> List[RoutingRule]:
+    return [
+        RoutingRule(name="analytical", route="large", intents=["comparison", "analysis", "summary"]),
+        RoutingRule(name="long_context", route="large", min_context_tokens=1500),
+        RoutingRule(name="simple_lookup", route="fast", intents=["question", "search"],
+                    max_words=12, max_context_tokens=800)
+    ]
+
+class ModelRouter:
+    """
+    Rule-based model selection.
+
+    When disabled every query uses the "default" route, so generation is
+    unchanged until routing is switched on.
+    """
+
+    def __init__(self,
+                 routes: Optional[Dict[str, ModelRoute]] = None,
+                 rules: Optional[List[RoutingRule]] = None,
+                 enabled: bool = False):
+        """
+        Initialize model router.
+
+        Args:
+            routes: Route name -> model; must include "default"
+            rules: Rules checked in order; the first match picks the route
+            enabled: Apply rules (otherwise always route to "default")
+        """
+        self.routes = routes or default_routes()
+        if "default" not in self.routes:
+            self.routes["default"] = ModelRoute(model=DEFAULT_MODEL)
+        self.rules = rules if rules is not None else default_rules()
+        self.enabled = enabled
+        self.query_processor = QueryProcessor()
+
+    def set_route_model(self, route: str, model: str):
+        """Point a route at a different model, creating the route if needed."""
+        if route in self.routes:
+            self.routes[route].model = model
+        else:
+            self.routes[route] = ModelRoute(model=model)
+
+    def _decision(self, route: str, reason: str, **details) -> RouteDecision:
+        model_route = self.routes.get(route) or self.routes["default"]
+        return RouteDecision(route=route if route in self.routes else "default",
+                             model=model_route.model, max_tokens=model_route.max_tokens,
+                             reason=reason, **details)
+
+    def route(self, question: str, context_tokens: int = 0, hint: Optional[str] = None) -> RouteDecision:
+        """
+        Choose the route for a query.
+
+        Args:
+            question: The user's question
+            context_tokens: Estimated tokens of retrieved context
+            hint: Route name requested by the caller (e.g. "fast", "large")
+
+        Returns:
+            The chosen route, model and the rule or hint that selected it
+        """
+        if hint:
+            if hint in self.routes:
+                return self._decision(hint, "hint", context_tokens=context_tokens)
+            logger.warning(f"Unknown model route hint '{hint}', routing by rules")
+
+        if not self.enabled:
+            return self._decision("default", "routing_disabled", context_tokens=context_tokens)
+
+        intent = self.query_processor.process_query(question)
+        words = len(question.split())
+
+        for rule in self.rules:
+            if rule.route in self.routes and rule.matches(intent.intent_type, words,
+                                                          intent.complexity_score, context_tokens):
+                return self._decision(rule.route, rule.name, intent=intent.intent_type,
+                                      complexity=round(intent.complexity_score, 3),
+                                      context_tokens=context_tokens)
+
+        return self._decision("default", "no_rule_matched", intent=intent.intent_type,
+                              complexity=round(intent.complexity_score, 3), context_tokens=context_tokens)
+
+    def get_config(self) -> Dict[str, Any]:
+        """Get routes and rules for settings and diagnostics."""
+        return {
+            "enabled": self.enabled,
+            "routes": {name: asdict(route) for name, route in self.routes.items()},
+            "rules": [asdict(rule) for rule in self.rules]
+        }
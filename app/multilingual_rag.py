@@ -9,7 +9,6 @@ Extends the existing RAG system with comprehensive multilingual support
 import logging
 from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, asdict
-from sentence_transformers import SentenceTransformer
 import chromadb
 from datetime import datetime
 import asyncio
@@ -20,6 +19,9 @@ from functools import lru_cache
 from .language_detection import get_language_detector, LanguageDetectionResult
 from .i18n_manager import get_i18n_manager, I18nManager
 from .rag_backend import get_rag_system, LocalRAGSystem
+from .embedding_service import EmbeddingBatcher
+from .model_registry import get_model_registry
+from .encoder_backends import Encoder
 
 logger = logging.getLogger(__name__)
 
@@ -79,6 +81,7 @@ class MultilingualEmbeddingManager:
     
     def __init__(self):
         self.models = {}
+        self.batchers: Dict[str, EmbeddingBatcher] = {}
         self.default_model = "all-MiniLM-L6-v2"  # Multilingual model
         self.language_specific_models = {
             # Language-specific models for better performance
@@ -93,19 +96,19 @@ class MultilingualEmbeddingManager:
     def _load_default_model(self):
         """Load the default multilingual model."""
         try:
-            self.models[self.default_model] = SentenceTransformer(self.default_model)
+            self.models[self.default_model] = get_model_registry().get(self.default_model)
             logger.info(f"Loaded default multilingual model: {self.default_model}")
         except Exception as e:
             logger.error(f"Failed to load default model {self.default_model}: {e}")
             raise
     
-    def get_model_for_language(self, language: str) -> SentenceTransformer:
+    def get_model_for_language(self, language: str) -> Encoder:
         """Get the best embedding model for a specific language."""
         model_name = self.language_specific_models.get(language, self.default_model)
         
         if model_name not in self.models:
             try:
-                self.models[model_name] = SentenceTransformer(model_name)
+                self.models[model_name] = get_model_registry().get(model_name)
                 logger.info(f"Loaded language-specific model {model_name} for {language}")
             except Exception as e:
                 logger.warning(f"Failed to load model {model_name} for {language}, using default: {e}")
@@ -113,6 +116,23 @@ class MultilingualEmbeddingManager:
         
         return self.models[model_name]
     
+    def get_batcher_for_language(self, language: str) -> EmbeddingBatcher:
+        """Get the micro-batching service wrapping the model for a language."""
+        model = self.get_model_for_language(language)
+        model_name = next(name for name, loaded in self.models.items() if loaded is model)
+        
+        if model_name not in self.batchers:
+            self.batchers[model_name] = EmbeddingBatcher(
+                encode_fn=lambda texts: model.encode(texts, show_progress_bar=False, convert_to_numpy=True),
+                name=f"multilingual_{model_name}"
+            )
+        return self.batchers[model_name]
+    
+    async def encode_text_async(self, text: str, language: str) -> np.ndarray:
+        """Encode text through the model's batcher so concurrent queries share encoder passes."""
+        embedding = await self.get_batcher_for_language(language).encode_async(text)
+        return np.asarray(embedding)
+    
     @lru_cache(maxsize=1000)
     def encode_text(self, text: str, language: str) -> np.ndarray:
         """Encode text using the appropriate model for the language."""
@@ -275,7 +295,7 @@ class MultilingualRAGSystem:
         """Perform multilingual document search."""
         try:
             # Use language-aware embedding for query
-            query_embedding = self.embedding_manager.encode_text(
+            query_embedding = await self.embedding_manager.encode_text_async(
                 query.original_text, query.detected_language
             )
             
@@ -407,7 +427,7 @@ class MultilingualRAGSystem:
                 context_used=len(search_results),
                 context_tokens=total_tokens,
                 efficiency_ratio=efficiency_ratio,
-                translation_performed=False
+                translation_performed=False,
                 language_mixing_detected=language_mixing_detected,
                 confidence_score=confidence_score
             )
@@ -454,16 +474,13 @@ Always cite your sources when possible.
     async def _call_llm_with_context(self, system_prompt: str, query: str, context: str) -> str:
         """Call the LLM with multilingual context."""
         try:
-            # Use the base RAG system's LLM client
-            full_prompt = f"{system_prompt}\n\nContext:\n{context}\n\nUser Question: {query}\n\nAnswer:"
-            
-            # Call the Ollama client
-            response = await asyncio.to_thread(
-                self.base_rag.llm_client.generate_response,
-                full_prompt
-            )
+            # Use the base RAG system's async LLM client (admitted by the LLM scheduler)
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Context:\n{context}\n\nUser Question: {query}\n\nAnswer:"}
+            ]
             
-            return response
+            return await self.base_rag.async_llm_client.chat(messages, temperature=0.3, max_tokens=600)
             
         except Exception as e:
             logger.error(f"LLM generation error: {e}")
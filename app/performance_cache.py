@@ -9,11 +9,14 @@ Provides Redis-like functionality using Python data structures for local-first a
 """
 
 import time
+import sys
+import heapq
+import itertools
 import threading
 import hashlib
 import json
 import logging
-from typing import Dict, Any, Optional, List, Tuple, Callable
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterable, Set
 from dataclasses import dataclass, field
 from enum import Enum
 import weakref
@@ -38,6 +41,7 @@ class CacheEntry:
     access_count: int = 0
     ttl: Optional[float] = None
     size_bytes: int = 0
+    tags: Tuple[str, ...] = ()
     
     def is_expired(self) -> bool:
         """Check if entry is expired."""
@@ -45,6 +49,17 @@ class CacheEntry:
             return False
         return time.time() - self.created_at > self.ttl
     
+    def is_past_grace(self, grace: float) -> bool:
+        """Check if entry is expired and also too old to be served stale."""
+        if self.ttl is None:
+            return False
+        return time.time() - self.created_at > self.ttl + grace
+    
+    @property
+    def expires_at(self) -> float:
+        """Absolute expiry time (infinity for entries without TTL)."""
+        return self.created_at + self.ttl if self.ttl is not None else float("inf")
+    
     def update_access(self):
         """Update access metadata."""
         self.last_accessed = time.time()
@@ -57,6 +72,9 @@ class CacheMetrics:
     misses: int = 0
     evictions: int = 0
     expired_entries: int = 0
+    invalidations: int = 0
+    stale_hits: int = 0
+    stale_refreshes: int = 0
     total_requests: int = 0
     avg_response_time_ms: float = 0.0
     memory_usage_bytes: int = 0
@@ -100,6 +118,16 @@ class PerformanceCache:
     """
     High-performance in-memory cache with TTL, LRU eviction, and metrics.
     Optimized for RAG system query caching with request coalescing.
+    
+    Memory usage is tracked incrementally, and eviction keeps removing victims
+    until both the entry-count and byte limits hold. LRU victims come from the
+    OrderedDict head; LFU and TTL_ONLY victims come from a min-heap keyed on
+    access count or expiry time, with stale heap records skipped lazily.
+    
+    With a stale_grace period, expired entries are kept that much longer and
+    get_or_compute serves them immediately while a background task
+    recomputes them (stale-while-revalidate), so a slow or unavailable
+    backend does not turn every expiry into a slow request.
     """
     
     def __init__(self, 
@@ -107,7 +135,8 @@ class PerformanceCache:
                  default_ttl: float = 300.0,  # 5 minutes
                  cleanup_interval: float = 60.0,  # 1 minute
                  strategy: CacheStrategy = CacheStrategy.LRU,
-                 max_memory_mb: int = 100):
+                 max_memory_mb: int = 100,
+                 stale_grace: float = 0.0):
         """
         Initialize performance cache.
         
@@ -117,9 +146,12 @@ class PerformanceCache:
             cleanup_interval: Cleanup interval in seconds
             strategy: Cache eviction strategy
             max_memory_mb: Maximum memory usage in MB
+            stale_grace: Seconds past expiry an entry may still be served by
+                get_or_compute while it is refreshed
         """
         self.max_size = max_size
         self.default_ttl = default_ttl
+        self.stale_grace = stale_grace
         self.strategy = strategy
         self.max_memory_bytes = max_memory_mb * 1024 * 1024
         
@@ -132,12 +164,25 @@ class PerformanceCache:
         # Thread safety
         self._lock = threading.RLock()
         
+        # Tag -> keys index for targeted invalidation
+        self._tag_index: Dict[str, Set[str]] = {}
+        
+        # Running total of entry sizes, maintained on insert and removal
+        self._memory_bytes = 0
+        
+        # Eviction heap for LFU / TTL_ONLY: (priority, sequence, key)
+        self._heap: List[Tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        
         # Metrics
         self.metrics = CacheMetrics()
         
         # Request coalescing
         self.coalescer = RequestCoalescer()
         
+        # Background refreshes of stale entries, one per key
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        
         # Cleanup thread
         self._cleanup_thread = None
         self._shutdown_event = threading.Event()
@@ -168,20 +213,52 @@ class PerformanceCache:
         key_hash = hashlib.md5(data_str.encode()).hexdigest()
         return f"{prefix}:{key_hash}"
     
-    def _estimate_size(self, value: Any) -> int:
-        """Estimate memory size of value."""
+    def _estimate_size(self, value: Any, depth: int = 0) -> int:
+        """
+        Estimate memory size of value without serializing it.
+        
+        Strings and bytes count their length; containers add the estimates of
+        their items, sampling long lists (embeddings, result lists) rather than
+        walking every element.
+        """
         try:
-            if isinstance(value, str):
-                return len(value.encode('utf-8'))
-            elif isinstance(value, (dict, list)):
-                return len(json.dumps(value).encode('utf-8'))
-            elif hasattr(value, '__sizeof__'):
-                return value.__sizeof__()
-            else:
-                return len(str(value).encode('utf-8'))
+            if isinstance(value, (str, bytes, bytearray)):
+                return len(value) + 49
+            if value is None or isinstance(value, (bool, int, float)):
+                return 24
+            if depth >= 4:
+                return sys.getsizeof(value)
+            if isinstance(value, dict):
+                return sys.getsizeof(value) + sum(
+                    self._estimate_size(k, depth + 1) + self._estimate_size(v, depth + 1)
+                    for k, v in value.items()
+                )
+            if isinstance(value, (list, tuple, set, frozenset)):
+                items = value if isinstance(value, (list, tuple)) else list(value)
+                if len(items) <= 16:
+                    return sys.getsizeof(value) + sum(self._estimate_size(item, depth + 1) for item in items)
+                sample = items[:8] + items[-8:]
+                per_item = sum(self._estimate_size(item, depth + 1) for item in sample) / len(sample)
+                return sys.getsizeof(value) + int(per_item * len(items))
+            if hasattr(value, '__dict__'):
+                return sys.getsizeof(value) + self._estimate_size(vars(value), depth + 1)
+            return sys.getsizeof(value)
         except Exception:
             return 1024  # Default estimate
     
+    def _remove_entry(self, key: str) -> Optional[CacheEntry]:
+        """Remove an entry and its tag index references. Caller holds the lock."""
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size_bytes
+            for tag in entry.tags:
+                keys = self._tag_index.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tag_index[tag]
+        return entry
+    
     def _cleanup_expired(self) -> int:
         """Clean up expired entries."""
         current_time = time.time()
@@ -189,11 +266,11 @@ class PerformanceCache:
         
         with self._lock:
             for key, entry in self._cache.items():
-                if entry.is_expired():
+                if entry.is_past_grace(self.stale_grace):
                     expired_keys.append(key)
             
             for key in expired_keys:
-                del self._cache[key]
+                self._remove_entry(key)
                 self.metrics.expired_entries += 1
         
         if expired_keys:
@@ -201,28 +278,72 @@ class PerformanceCache:
         
         return len(expired_keys)
     
-    def _evict_if_needed(self):
-        """Evict entries if cache is full."""
-        if len(self._cache) < self.max_size:
+    def _heap_priority(self, entry: CacheEntry) -> float:
+        """Eviction priority for heap-based strategies (lowest is evicted first)."""
+        if self.strategy == CacheStrategy.LFU:
+            return entry.access_count
+        return entry.expires_at
+    
+    def _push_heap(self, key: str, entry: CacheEntry):
+        """Record an entry's current priority. Caller holds the lock."""
+        if self.strategy == CacheStrategy.LRU:
             return
         
+        heapq.heappush(self._heap, (self._heap_priority(entry), next(self._sequence), key))
+        
+        # Superseded records are skipped lazily; compact when they dominate
+        if len(self._heap) > 4 * len(self._cache) + 64:
+            self._heap = [
+                (self._heap_priority(e), next(self._sequence), k) for k, e in self._cache.items()
+            ]
+            heapq.heapify(self._heap)
+    
+    def _pop_victim(self) -> Optional[str]:
+        """Choose the next key to evict. Caller holds the lock."""
+        if not self._cache:
+            return None
+        
+        if self.strategy == CacheStrategy.LRU:
+            # Oldest entry (OrderedDict maintains access order)
+            return next(iter(self._cache))
+        
+        while self._heap:
+            priority, _, key = heapq.heappop(self._heap)
+            entry = self._cache.get(key)
+            if entry is not None and priority == self._heap_priority(entry):
+                return key
+        
+        # Heap exhausted by stale records; fall back to any entry
+        return next(iter(self._cache))
+    
+    def _evict_if_needed(self, incoming_bytes: int = 0):
+        """Evict entries until a new entry of incoming_bytes fits both limits."""
         with self._lock:
-            if self.strategy == CacheStrategy.LRU:
-                # Remove oldest entry (OrderedDict maintains insertion order)
-                if self._cache:
-                    self._cache.popitem(last=False)
-                    self.metrics.evictions += 1
-            
-            elif self.strategy == CacheStrategy.LFU:
-                # Remove least frequently used
-                if self._cache:
-                    lfu_key = min(self._cache.keys(), 
-                                 key=lambda k: self._cache[k].access_count)
-                    del self._cache[lfu_key]
-                    self.metrics.evictions += 1
+            while self._cache and (
+                len(self._cache) >= self.max_size
+                or self._memory_bytes + incoming_bytes > self.max_memory_bytes
+            ):
+                victim = self._pop_victim()
+                if victim is None:
+                    break
+                self._remove_entry(victim)
+                self.metrics.evictions += 1
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
+        return self.lookup(key)[0]
+    
+    def lookup(self, key: str, allow_stale: bool = False) -> Tuple[Optional[Any], bool]:
+        """
+        Get value from cache along with whether it is stale.
+        
+        Args:
+            key: Cache key
+            allow_stale: Return expired entries still within the stale grace period
+        
+        Returns:
+            (value, stale) tuple; value is None on a miss
+        """
         start_time = time.time()
         
         with self._lock:
@@ -232,24 +353,30 @@ class PerformanceCache:
             if entry is None:
                 self.metrics.misses += 1
                 self.metrics.update_hit_rate()
-                return None
+                return None, False
             
-            # Check expiration
-            if entry.is_expired():
-                del self._cache[key]
-                self.metrics.misses += 1
+            # Check expiration; entries within the grace period are kept for stale reads
+            stale = entry.is_expired()
+            if stale and entry.is_past_grace(self.stale_grace):
+                self._remove_entry(key)
                 self.metrics.expired_entries += 1
+            if stale and not (allow_stale and key in self._cache):
+                self.metrics.misses += 1
                 self.metrics.update_hit_rate()
-                return None
+                return None, False
             
             # Update access metadata
             entry.update_access()
             
-            # Move to end for LRU
+            # Move to end for LRU; re-rank for LFU
             if self.strategy == CacheStrategy.LRU:
                 self._cache.move_to_end(key)
+            elif self.strategy == CacheStrategy.LFU:
+                self._push_heap(key, entry)
             
             self.metrics.hits += 1
+            if stale:
+                self.metrics.stale_hits += 1
             self.metrics.update_hit_rate()
             
             # Update response time
@@ -259,26 +386,33 @@ class PerformanceCache:
                 / self.metrics.total_requests
             )
             
-            return entry.value
+            return entry.value, stale
     
-    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
-        """Set value in cache."""
+    def set(self, key: str, value: Any, ttl: Optional[float] = None,
+            tags: Optional[Iterable[str]] = None) -> bool:
+        """
+        Set value in cache.
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time to live in seconds (default_ttl if None)
+            tags: Tags the entry can later be invalidated by (see invalidate_tags)
+        """
         if ttl is None:
             ttl = self.default_ttl
         
         size_bytes = self._estimate_size(value)
+        if size_bytes > self.max_memory_bytes:
+            logger.warning(f"Value of ~{size_bytes} bytes exceeds cache memory limit; not caching")
+            return False
         
         with self._lock:
-            # Check memory limit
-            current_memory = sum(entry.size_bytes for entry in self._cache.values())
-            if current_memory + size_bytes > self.max_memory_bytes:
-                logger.warning(f"Cache memory limit approached: {current_memory + size_bytes} bytes")
-                # Force cleanup
-                self._cleanup_expired()
-                self._evict_if_needed()
+            # Replacing an entry drops its old tags and size
+            self._remove_entry(key)
             
-            # Evict if needed
-            self._evict_if_needed()
+            # Evict until the new entry fits both the count and byte limits
+            self._evict_if_needed(size_bytes)
             
             # Create entry
             entry = CacheEntry(
@@ -286,30 +420,54 @@ class PerformanceCache:
                 created_at=time.time(),
                 last_accessed=time.time(),
                 ttl=ttl,
-                size_bytes=size_bytes
+                size_bytes=size_bytes,
+                tags=tuple(tags) if tags else ()
             )
             
             self._cache[key] = entry
+            self._memory_bytes += size_bytes
+            self._push_heap(key, entry)
+            for tag in entry.tags:
+                self._tag_index.setdefault(tag, set()).add(key)
             
             # Update memory usage
-            self.metrics.memory_usage_bytes = sum(
-                entry.size_bytes for entry in self._cache.values()
-            )
+            self.metrics.memory_usage_bytes = self._memory_bytes
             
             return True
     
     def delete(self, key: str) -> bool:
         """Delete entry from cache."""
         with self._lock:
-            if key in self._cache:
-                del self._cache[key]
-                return True
-            return False
+            return self._remove_entry(key) is not None
+    
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        Remove every entry carrying any of the given tags.
+        
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tag_index.get(tag, ()))
+            
+            for key in keys:
+                self._remove_entry(key)
+            
+            self.metrics.invalidations += len(keys)
+        
+        if keys:
+            logger.debug(f"Invalidated {len(keys)} cache entries by tag")
+        return len(keys)
     
     def clear(self):
         """Clear all cache entries."""
         with self._lock:
             self._cache.clear()
+            self._tag_index.clear()
+            self._heap.clear()
+            self._memory_bytes = 0
             self.metrics = CacheMetrics()
     
     def get_stats(self) -> Dict[str, Any]:
@@ -318,13 +476,18 @@ class PerformanceCache:
             return {
                 "cache_size": len(self._cache),
                 "max_size": self.max_size,
-                "memory_usage_mb": self.metrics.memory_usage_bytes / (1024 * 1024),
+                "memory_usage_mb": self._memory_bytes / (1024 * 1024),
                 "max_memory_mb": self.max_memory_bytes / (1024 * 1024),
                 "hit_rate": self.metrics.hit_rate,
                 "hits": self.metrics.hits,
                 "misses": self.metrics.misses,
                 "evictions": self.metrics.evictions,
                 "expired_entries": self.metrics.expired_entries,
+                "invalidations": self.metrics.invalidations,
+                "stale_hits": self.metrics.stale_hits,
+                "stale_refreshes": self.metrics.stale_refreshes,
+                "stale_grace": self.stale_grace,
+                "tags": len(self._tag_index),
                 "avg_response_time_ms": self.metrics.avg_response_time_ms,
                 "strategy": self.strategy.value
             }
@@ -333,26 +496,76 @@ class PerformanceCache:
                            key: str, 
                            compute_func: Callable, 
                            ttl: Optional[float] = None,
-                           use_coalescing: bool = True) -> Any:
+                           use_coalescing: bool = True,
+                           tags_func: Optional[Callable[[Any], Iterable[str]]] = None,
+                           should_cache: Optional[Callable[[Any], bool]] = None,
+                           mark_stale: Optional[Callable[[Any], Any]] = None,
+                           on_computed: Optional[Callable[[Any], None]] = None) -> Any:
         """
         Get value from cache or compute if not present.
         Supports request coalescing for duplicate queries.
+        
+        An expired entry still within stale_grace is returned immediately and
+        recomputed in the background; until the refresh stores a new value
+        (should_cache may reject it) the stale one keeps being served.
+        
+        Args:
+            tags_func: Derives invalidation tags from the computed value
+            should_cache: Returns False for computed values that must not be stored
+            mark_stale: Transforms a stale value before it is returned (e.g. flags it)
+            on_computed: Called with each computed value once the cache decision
+                is made, including values computed by background refreshes
         """
         # Try cache first
-        cached_value = self.get(key)
+        cached_value, stale = self.lookup(key, allow_stale=True)
         if cached_value is not None:
-            return cached_value
+            if not stale:
+                return cached_value
+            self._schedule_refresh(key, compute_func, ttl, tags_func, should_cache, on_computed)
+            return mark_stale(cached_value) if mark_stale else cached_value
         
-        # Compute value with optional coalescing
+        return await self._compute_and_store(key, compute_func, ttl, use_coalescing,
+                                             tags_func, should_cache, on_computed)
+    
+    async def _compute_and_store(self, key: str, compute_func: Callable, ttl: Optional[float],
+                                 use_coalescing: bool,
+                                 tags_func: Optional[Callable[[Any], Iterable[str]]],
+                                 should_cache: Optional[Callable[[Any], bool]],
+                                 on_computed: Optional[Callable[[Any], None]]) -> Any:
+        """Compute a value with optional coalescing and cache it if allowed."""
         if use_coalescing:
             value = await self.coalescer.coalesce_request(key, compute_func)
         else:
             value = await compute_func()
         
         # Cache the result
-        self.set(key, value, ttl)
+        if should_cache is None or should_cache(value):
+            self.set(key, value, ttl, tags=tags_func(value) if tags_func else None)
+        if on_computed is not None:
+            on_computed(value)
         return value
     
+    def _schedule_refresh(self, key: str, compute_func: Callable, ttl: Optional[float],
+                          tags_func: Optional[Callable[[Any], Iterable[str]]],
+                          should_cache: Optional[Callable[[Any], bool]],
+                          on_computed: Optional[Callable[[Any], None]]):
+        """Recompute a stale entry in the background unless a refresh is already running."""
+        if key in self._refreshing:
+            return
+        
+        async def refresh():
+            try:
+                # Coalesced so a request missing the entry after its grace joins this refresh
+                await self._compute_and_store(key, compute_func, ttl, True,
+                                              tags_func, should_cache, on_computed)
+                self.metrics.stale_refreshes += 1
+            except Exception as e:
+                logger.warning(f"Background refresh failed for key {key[:50]}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+        
+        self._refreshing[key] = asyncio.create_task(refresh())
+    
     def shutdown(self):
         """Shutdown cache and cleanup resources."""
         self._shutdown_event.set()
@@ -378,14 +591,16 @@ class CacheManager:
                   name: str,
                   max_size: int = 1000,
                   default_ttl: float = 300.0,
-                  strategy: CacheStrategy = CacheStrategy.LRU) -> PerformanceCache:
+                  strategy: CacheStrategy = CacheStrategy.LRU,
+                  stale_grace: float = 0.0) -> PerformanceCache:
         """Get or create named cache."""
         with self._lock:
             if name not in self._caches:
                 self._caches[name] = PerformanceCache(
                     max_size=max_size,
                     default_ttl=default_ttl,
-                    strategy=strategy
+                    strategy=strategy,
+                    stale_grace=stale_grace
                 )
                 logger.info(f"Created cache '{name}' with {max_size} max entries")
             
@@ -426,7 +641,8 @@ def get_rag_query_cache() -> PerformanceCache:
         name="rag_queries",
         max_size=500,
         default_ttl=300.0,  # 5 minutes
-        strategy=CacheStrategy.LRU
+        strategy=CacheStrategy.LRU,
+        stale_grace=600.0  # Serve expired answers for 10 minutes while refreshing
     )
 
 def get_document_cache() -> PerformanceCache:
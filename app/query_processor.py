@@ -0,0 +1,254 @@
+"""
+Query Processor
+
+Lightweight query understanding shared by search and generation: intent
+classification, keyword and entity extraction, complexity scoring, query
+expansion and filter extraction. Pattern based, with no model dependencies,
+so it can be used anywhere without loading the search engine.
+"""
+
+import re
+import logging
+from typing import List, Dict, Optional, Any
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class QueryIntent:
+    """Parsed query intent and metadata."""
+    original_query: str
+    normalized_query: str
+    intent_type: str  # question, search, comparison, analysis, summary
+    entities: List[str]
+    keywords: List[str]
+    semantic_concepts: List[str]
+    complexity_score: float
+    expanded_terms: List[str]
+    filters: Dict[str, Any]
+    confidence: float
+
+class QueryProcessor:
+    """Advanced query processing and understanding."""
+    
+    def __init__(self):
+        self.stop_words = {
+            'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
+            'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+            'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+            'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those'
+        }
+        
+        # Intent classification patterns, most specific first ("what is the
+        # difference between..." is a comparison, not a plain question)
+        self.intent_patterns = {
+            'comparison': [r'\b(vs|versus|compare|difference|between|better|worse)\b'],
+            'analysis': [r'\b(analyze|analysis|explain|understand|insight)\b'],
+            'summary': [r'\b(summary|summarize|overview|brief|main points)\b'],
+            'question': [r'\b(what|who|where|when|why|how|which)\b', r'\?'],
+            'search': [r'.*']  # default fallback
+        }
+        
+        # Domain-specific synonyms for query expansion
+        self.synonym_groups = {
+            'technology': ['tech', 'technology', 'digital', 'software', 'system'],
+            'business': ['business', 'company', 'organization', 'enterprise', 'firm'],
+            'analysis': ['analysis', 'analyze', 'examine', 'study', 'evaluate'],
+            'performance': ['performance', 'efficiency', 'speed', 'optimization'],
+            'security': ['security', 'safety', 'protection', 'privacy', 'secure']
+        }
+
+    def process_query(self, query: str, context: Optional[Dict] = None) -> QueryIntent:
+        """Process and understand user query intent."""
+        try:
+            # Normalize query
+            normalized = self._normalize_query(query)
+            
+            # Extract intent
+            intent_type = self._classify_intent(query)
+            
+            # Extract entities and keywords
+            entities = self._extract_entities(normalized)
+            keywords = self._extract_keywords(normalized)
+            
+            # Semantic concept extraction (simplified)
+            semantic_concepts = self._extract_semantic_concepts(normalized)
+            
+            # Calculate complexity
+            complexity = self._calculate_complexity(query, intent_type, keywords)
+            
+            # Query expansion
+            expanded_terms = self._expand_query(keywords, semantic_concepts)
+            
+            # Extract filters from query
+            filters = self._extract_filters(query, context or {})
+            
+            return QueryIntent(
+                original_query=query,
+                normalized_query=normalized,
+                intent_type=intent_type,
+                entities=entities,
+                keywords=keywords,
+                semantic_concepts=semantic_concepts,
+                complexity_score=complexity,
+                expanded_terms=expanded_terms,
+                filters=filters,
+                confidence=0.8  # Simplified confidence score
+            )
+            
+        except Exception as e:
+            logger.error(f"Query processing error: {e}")
+            # Return basic intent for fallback
+            return QueryIntent(
+                original_query=query,
+                normalized_query=query.lower().strip(),
+                intent_type='search',
+                entities=[],
+                keywords=query.lower().split(),
+                semantic_concepts=[],
+                complexity_score=0.5,
+                expanded_terms=[],
+                filters={},
+                confidence=0.3
+            )
+
+    def _normalize_query(self, query: str) -> str:
+        """Normalize query text."""
+        # Basic normalization
+        normalized = query.lower().strip()
+        
+        # Remove extra whitespace
+        normalized = re.sub(r'\s+', ' ', normalized)
+        
+        # Handle common contractions
+        contractions = {
+            "don't": "do not",
+            "won't": "will not",
+            "can't": "cannot",
+            "what's": "what is",
+            "how's": "how is"
+        }
+        
+        for contraction, expansion in contractions.items():
+            normalized = normalized.replace(contraction, expansion)
+        
+        return normalized
+
+    def _classify_intent(self, query: str) -> str:
+        """Classify query intent using pattern matching."""
+        query_lower = query.lower()
+        
+        # Check patterns in order of specificity
+        for intent, patterns in self.intent_patterns.items():
+            for pattern in patterns:
+                if re.search(pattern, query_lower, re.IGNORECASE):
+                    return intent
+        
+        return 'search'  # default
+
+    def _extract_entities(self, query: str) -> List[str]:
+        """Extract entities from query (simplified NER)."""
+        # This is a simplified version - in production, use spaCy or similar
+        entities = []
+        
+        # Look for capitalized words (potential proper nouns)
+        words = query.split()
+        for word in words:
+            if word and word[0].isupper() and len(word) > 2:
+                entities.append(word)
+        
+        return entities
+
+    def _extract_keywords(self, query: str) -> List[str]:
+        """Extract important keywords from query."""
+        words = query.split()
+        keywords = []
+        
+        for word in words:
+            # Remove punctuation and check length
+            clean_word = re.sub(r'[^\w]', '', word.lower())
+            if len(clean_word) > 2 and clean_word not in self.stop_words:
+                keywords.append(clean_word)
+        
+        return keywords
+
+    def _extract_semantic_concepts(self, query: str) -> List[str]:
+        """Extract semantic concepts from query."""
+        concepts = []
+        
+        # Map keywords to semantic domains
+        for concept, synonyms in self.synonym_groups.items():
+            if any(synonym in query for synonym in synonyms):
+                concepts.append(concept)
+        
+        return concepts
+
+    def _calculate_complexity(self, query: str, intent_type: str, keywords: List[str]) -> float:
+        """Calculate query complexity score (0-1)."""
+        base_score = 0.3
+        
+        # Word count factor
+        word_count = len(query.split())
+        word_factor = min(word_count / 20.0, 0.3)
+        
+        # Intent complexity
+        intent_weights = {
+            'search': 0.2,
+            'question': 0.4,
+            'comparison': 0.7,
+            'analysis': 0.8,
+            'summary': 0.6
+        }
+        intent_factor = intent_weights.get(intent_type, 0.3)
+        
+        # Keyword diversity
+        keyword_factor = min(len(set(keywords)) / 10.0, 0.2)
+        
+        return min(base_score + word_factor + intent_factor + keyword_factor, 1.0)
+
+    def _expand_query(self, keywords: List[str], concepts: List[str]) -> List[str]:
+        """Expand query with synonyms and related terms."""
+        expanded = set(keywords)
+        
+        # Add synonyms for concepts
+        for concept in concepts:
+            if concept in self.synonym_groups:
+                expanded.update(self.synonym_groups[concept])
+        
+        # Add common variations
+        variations = []
+        for keyword in keywords:
+            # Add plural/singular forms (simplified)
+            if keyword.endswith('s') and len(keyword) > 3:
+                variations.append(keyword[:-1])
+            else:
+                variations.append(keyword + 's')
+        
+        expanded.update(variations)
+        return list(expanded)
+
+    def _extract_filters(self, query: str, context: Dict) -> Dict[str, Any]:
+        """Extract filters from query and context."""
+        filters = {}
+        
+        # Time-based filters
+        time_patterns = {
+            'recent': {'days': 30},
+            'last week': {'days': 7},
+            'today': {'days': 1},
+            'this month': {'days': 30}
+        }
+        
+        for pattern, time_filter in time_patterns.items():
+            if pattern in query.lower():
+                filters['time_range'] = time_filter
+                break
+        
+        # File type filters
+        file_types = ['pdf', 'doc', 'txt', 'html', 'markdown']
+        for file_type in file_types:
+            if file_type in query.lower():
+                filters['file_type'] = file_type
+                break
+        
+        return filters
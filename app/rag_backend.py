@@ -1,24 +1,50 @@
 import os
 import requests
-from sentence_transformers import SentenceTransformer
+import httpx
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, AsyncIterator, Callable
 import logging
+import json
 from datetime import datetime
 import time
+import queue
 import random
-from functools import wraps
+import threading
+from functools import wraps, partial
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 # Performance optimizations
 from .performance_cache import get_rag_query_cache, get_embedding_cache, get_document_cache
 from .connection_pool import get_pool_manager
+from .embedding_service import EmbeddingBatcher
+from .embedding_store import PersistentEmbeddingStore, content_hash
+from .content_index import ContentHashIndex
+from .document_catalog import DocumentCatalog
+from .semantic_cache import SemanticQueryCache
+from .keyword_index import BM25Index, tokenize
+from .context_compression import SentenceIndex, TokenCounter, ContextCompressor, split_sentences
+from .conversation_sessions import ConversationSessionStore, ConversationSession
+from .llm_scheduler import get_llm_scheduler, LLMPriority, LLMQueueFullError
+from .llm_backends import LLMBackend, LLMBackendPool
+from .model_router import ModelRouter, RouteDecision
+from .model_registry import get_model_registry
+from .embedding_server import RemoteEncoder
+from .vector_store import NumpyVectorStore, VectorStore, copy_collection
 from .performance_monitor import get_performance_monitor, record_rag_query_time, record_cache_hit_rate, record_memory_usage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cache tag for answers that found no relevant context
+NO_CONTEXT_TAG = "rag:no_context"
+
+# Interrogatives a question has but its answer sentence does not
+QUESTION_WORDS = frozenset({'what', 'which', 'who', 'whom', 'whose', 'when', 'where', 'why', 'how'})
+
 # Retry and circuit breaker utilities
 def retry_with_exponential_backoff(max_retries=3, base_delay=1, max_delay=30, backoff_factor=2):
     """Decorator for retrying functions with exponential backoff."""
@@ -44,6 +70,29 @@ def retry_with_exponential_backoff(max_retries=3, base_delay=1, max_delay=30, ba
         return wrapper
     return decorator
 
+def async_retry_with_exponential_backoff(max_retries=3, base_delay=1, max_delay=30, backoff_factor=2):
+    """Decorator for retrying coroutines with exponential backoff without blocking the event loop."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            last_exception = None
+            
+            for attempt in range(max_retries + 1):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    last_exception = e
+                    if attempt < max_retries:
+                        delay = min(base_delay * (backoff_factor ** attempt) + random.uniform(0, 1), max_delay)
+                        logger.warning(f"Attempt {attempt + 1} failed for {func.__name__}: {e}. Retrying in {delay:.2f}s...")
+                        await asyncio.sleep(delay)
+                    else:
+                        logger.error(f"All {max_retries + 1} attempts failed for {func.__name__}: {e}")
+            
+            raise last_exception
+        return wrapper
+    return decorator
+
 class CircuitBreaker:
     """Simple circuit breaker implementation for external service calls."""
     
@@ -85,12 +134,45 @@ class CircuitBreaker:
             self.state = 'OPEN'
             logger.warning("Circuit breaker returned to OPEN state after failure in HALF_OPEN")
 
+class LLMFailureAnswer(str):
+    """
+    Message an LLM client returns in place of an answer when generation fails.
+    
+    It reads as the user-facing text; callers test isinstance() rather than
+    the wording to keep it out of the answer cache, refinements and sessions.
+    """
+
+LLM_UNAVAILABLE_ANSWER = LLMFailureAnswer(
+    "Sorry, the language model is temporarily unavailable. Please try again later.")
+LLM_BUSY_ANSWER = LLMFailureAnswer("Sorry, the language model is busy right now. Please try again in a moment.")
+LLM_FAILED_ANSWER = LLMFailureAnswer("Sorry, the language model is not available right now.")
+
+def _chat_payload(model, messages, temperature, max_tokens, stream: bool,
+                  keep_alive: Optional[str] = None) -> Dict:
+    """Body of an Ollama /api/chat request; keep_alive is only sent when set."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "stream": stream,
+        "options": {
+            "temperature": temperature,
+            "num_predict": max_tokens
+        }
+    }
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    return payload
+
 class LocalLLMClient:
-    def __init__(self, base_url=None):
+    def __init__(self, base_url=None, scheduler=None, backend_urls=None):
+        # Several Ollama servers can be listed in OLLAMA_HOSTS (comma separated)
+        if backend_urls is None and base_url is None:
+            ollama_hosts = os.environ.get('OLLAMA_HOSTS')
+            if ollama_hosts:
+                backend_urls = [host for host in ollama_hosts.split(',') if host.strip()]
+        
         # Auto-detect if running in container vs local
-        if base_url is None:
-            import os
-            
+        if not backend_urls and base_url is None:
             # Check for environment variable first (for container configs)
             ollama_host = os.environ.get('OLLAMA_HOST')
             if ollama_host:
@@ -122,104 +204,324 @@ class LocalLLMClient:
                 # Running locally - use localhost
                 base_url = "http://localhost:11434"
         
-        self.base_url = base_url
-        self.circuit_breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
-        self.last_successful_health_check = None
-        
-        # Initialize connection pool for HTTP requests
+        # One circuit breaker and connection pool per backend; requests go to
+        # the available backend with the fewest requests in flight
         self.pool_manager = get_pool_manager()
-        self.http_pool = self.pool_manager.create_ollama_pool(
-            name="ollama_main",
-            base_url=base_url,
-            min_connections=2,
-            max_connections=6
+        self.backends = LLMBackendPool.from_urls(
+            backend_urls or [base_url],
+            breaker_factory=lambda: CircuitBreaker(failure_threshold=3, recovery_timeout=30),
+            pool_factory=lambda url, index: self.pool_manager.create_ollama_pool(
+                name="ollama_main" if index == 0 else f"ollama_{index}",
+                base_url=url,
+                min_connections=2,
+                max_connections=6
+            )
         )
         
-        logger.info(f"Initializing LLM client with URL: {base_url} (with connection pooling)")
+        # Generations are admitted by priority under per-model concurrency limits
+        self.scheduler = scheduler or get_llm_scheduler()
+        
+        logger.info(f"Initializing LLM client with URLs: {[backend.url for backend in self.backends.backends]} "
+                    f"(with connection pooling)")
+    
+    # The primary (first) backend's state, for single-server callers
+    @property
+    def base_url(self):
+        return self.backends.primary.url
     
-    def chat(self, messages, model="llama3.2:3b", temperature=0.7, max_tokens=1000):
-        """Chat with local Ollama LLM with circuit breaker and retry logic."""
-        # Check circuit breaker first
-        if not self.circuit_breaker.can_attempt():
-            logger.warning("Circuit breaker is OPEN, skipping LLM call")
-            return "Sorry, the language model is temporarily unavailable. Please try again later."
+    @property
+    def circuit_breaker(self):
+        return self.backends.primary.circuit_breaker
+    
+    @property
+    def http_pool(self):
+        return self.backends.primary.http_pool
+    
+    @http_pool.setter
+    def http_pool(self, pool):
+        self.backends.primary.http_pool = pool
+    
+    @property
+    def last_successful_health_check(self):
+        return self.backends.primary.last_successful_health_check
+    
+    def chat(self, messages, model="llama3.2:3b", temperature=0.7, max_tokens=1000,
+             priority: LLMPriority = LLMPriority.INTERACTIVE, affinity: Optional[str] = None,
+             keep_alive: Optional[str] = None):
+        """
+        Chat with local Ollama LLM with circuit breaker and retry logic.
+        
+        Requests sharing an affinity key (a conversation session) go to the same
+        backend so its prompt cache is reused; keep_alive keeps the model loaded.
+        """
+        # Check circuit breakers first
+        if not self.backends.any_available():
+            logger.warning("Circuit breaker is OPEN on every LLM backend, skipping LLM call")
+            return LLM_UNAVAILABLE_ANSWER
         
         try:
-            return self._chat_with_retry(messages, model, temperature, max_tokens)
+            with self.scheduler.slot(model, priority):
+                return self._chat_with_retry(messages, model, temperature, max_tokens, set(),
+                                             affinity, keep_alive)
+        except LLMQueueFullError as e:
+            # Load shedding, not a backend failure: leave the circuit breakers alone
+            logger.warning(f"LLM request rejected by scheduler: {e}")
+            return LLM_BUSY_ANSWER
         except Exception as e:
-            self.circuit_breaker.record_failure()
             logger.error(f"LLM chat failed after retries: {e}")
-            return "Sorry, the language model is not available right now."
+            return LLM_FAILED_ANSWER
     
     @retry_with_exponential_backoff(max_retries=2, base_delay=1, max_delay=10)
-    def _chat_with_retry(self, messages, model, temperature, max_tokens):
-        """Internal chat method with retry logic and connection pooling."""
+    def _chat_with_retry(self, messages, model, temperature, max_tokens, failed,
+                         affinity=None, keep_alive=None):
+        """
+        Internal chat method with retry logic and connection pooling.
+        
+        Each attempt prefers a backend that has not already failed this
+        request; failed collects those backends across attempts.
+        """
+        if self.backends.should_hedge(affinity):
+            return "".join(self._hedged_stream(messages, model, temperature, max_tokens, failed))
+        
+        backend = self.backends.choose(exclude=failed, affinity=affinity)
+        if backend is None:
+            raise Exception("No language model backend available")
+        
+        with self.backends.track(backend):
+            try:
+                return self._post_chat(backend, messages, model, temperature, max_tokens, keep_alive)
+            except Exception:
+                if backend not in failed:
+                    failed.add(backend)
+                    self.backends.record_failure(backend)
+                raise
+    
+    def _post_chat(self, backend, messages, model, temperature, max_tokens, keep_alive=None):
+        """Send one non-streaming chat request to a backend."""
         # Get pooled connection
-        pooled_conn = self.http_pool.get_connection()
+        pooled_conn = backend.http_pool.get_connection()
         if not pooled_conn:
             raise Exception("Failed to get HTTP connection from pool")
         
         try:
             session = pooled_conn.connection
+            started = time.time()
             
             response = session.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": model,
-                    "messages": messages,
-                    "stream": False,
-                    "options": {
-                        "temperature": temperature,
-                        "num_predict": max_tokens
-                    }
-                },
+                f"{backend.url}/api/chat",
+                json=_chat_payload(model, messages, temperature, max_tokens, stream=False, keep_alive=keep_alive),
                 timeout=(5.0, 120.0)  # (connect, read) timeout
             )
             
             if response.status_code == 200:
-                self.circuit_breaker.record_success()
+                backend.circuit_breaker.record_success()
+                backend.record_ttft(time.time() - started)
                 result = response.json()["message"]["content"]
-                logger.debug(f"LLM response received: {len(result)} characters")
+                logger.debug(f"LLM response received from {backend.name}: {len(result)} characters")
                 
                 # Return connection to pool
-                self.http_pool.return_connection(pooled_conn, error_occurred=False)
+                backend.http_pool.return_connection(pooled_conn, error_occurred=False)
                 return result
             else:
                 error_msg = f"LLM API error: {response.status_code} - {response.text}"
                 logger.error(error_msg)
-                self.http_pool.return_connection(pooled_conn, error_occurred=True)
+                backend.http_pool.return_connection(pooled_conn, error_occurred=True)
                 raise Exception(error_msg)
                 
         except Exception as e:
             # Return connection to pool with error flag
-            self.http_pool.return_connection(pooled_conn, error_occurred=True)
+            backend.http_pool.return_connection(pooled_conn, error_occurred=True)
             raise
     
-    def health_check(self, use_cache=True, cache_ttl=30):
-        """Check if Ollama is running with caching to avoid excessive requests."""
-        # Use cached result if available and recent
-        if use_cache and self.last_successful_health_check:
-            if time.time() - self.last_successful_health_check < cache_ttl:
-                return True
+    def chat_stream(self, messages, model="llama3.2:3b", temperature=0.7, max_tokens=1000,
+                    priority: LLMPriority = LLMPriority.INTERACTIVE) -> Iterator[str]:
+        """
+        Stream a chat completion from Ollama, yielding content tokens as they arrive.
+        
+        Unlike chat(), failures (including scheduler rejection) are raised rather
+        than returned as text so callers can tell a partial or failed answer apart
+        from a real one. The scheduler slot is held until the stream ends.
+        """
+        with self.scheduler.slot(model, priority):
+            if self.backends.should_hedge():
+                yield from self._hedged_stream(messages, model, temperature, max_tokens)
+                return
+            
+            backend = self.backends.choose()
+            if backend is None:
+                logger.warning("Circuit breaker is OPEN on every LLM backend, skipping streaming LLM call")
+                raise Exception("Language model circuit breaker is OPEN")
+            
+            with self.backends.track(backend):
+                yield from self._stream_chat(backend, messages, model, temperature, max_tokens)
+    
+    def _stream_chat(self, backend, messages, model, temperature, max_tokens,
+                     cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        """Stream tokens from one backend with circuit breaker and pooled connection handling."""
+        pooled_conn = backend.http_pool.get_connection()
+        if not pooled_conn:
+            self.backends.record_failure(backend)
+            raise Exception("Failed to get HTTP connection from pool")
         
+        error_occurred = True
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            is_healthy = response.status_code == 200
-            
-            if is_healthy:
-                self.last_successful_health_check = time.time()
-                # Reset circuit breaker on successful health check
-                if self.circuit_breaker.state != 'CLOSED':
-                    self.circuit_breaker.record_success()
-                logger.debug("Ollama health check passed")
-            else:
-                logger.warning(f"Ollama health check failed: HTTP {response.status_code}")
+            session = pooled_conn.connection
+            started = time.time()
+            first_token = True
+            response = session.post(
+                f"{backend.url}/api/chat",
+                json=_chat_payload(model, messages, temperature, max_tokens, stream=True),
+                stream=True,
+                timeout=(5.0, 120.0)  # (connect, read between tokens) timeout
+            )
+            
+            try:
+                if response.status_code != 200:
+                    raise Exception(f"LLM API error: {response.status_code} - {response.text}")
+                
+                for line in response.iter_lines():
+                    if cancel is not None and cancel.is_set():
+                        # Lost a hedged race; closing the response aborts the generation
+                        error_occurred = False
+                        return
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise Exception(f"LLM stream error: {chunk['error']}")
+                    
+                    token = chunk.get("message", {}).get("content", "")
+                    if token:
+                        if first_token:
+                            backend.record_ttft(time.time() - started)
+                            first_token = False
+                        yield token
+                    if chunk.get("done"):
+                        break
+            finally:
+                response.close()
             
-            return is_healthy
+            backend.circuit_breaker.record_success()
+            error_occurred = False
             
+        except GeneratorExit:
+            # Client went away mid-stream; the connection itself is still healthy
+            error_occurred = False
+            raise
         except Exception as e:
-            logger.warning(f"Ollama health check failed: {e}")
-            return False
+            self.backends.record_failure(backend)
+            logger.error(f"LLM streaming chat failed on {backend.name}: {e}")
+            raise
+        finally:
+            backend.http_pool.return_connection(pooled_conn, error_occurred=error_occurred)
+    
+    def _hedged_stream(self, messages, model, temperature, max_tokens, failed=None) -> Iterator[str]:
+        """
+        Stream from the least-loaded backend, hedging on a second one if slow to start.
+        
+        If no token has arrived after the pool's hedge_delay (or the first
+        backend fails before producing one), the same request is started on
+        another backend. The first to produce a token wins; the loser is
+        abandoned at its next token. Each stream runs on its own thread and
+        hands tokens back through a queue.
+        """
+        failed = failed if failed is not None else set()
+        events = queue.Queue()
+        launched: Dict[object, threading.Event] = {}
+        
+        def run(backend, cancel):
+            try:
+                with self.backends.track(backend):
+                    for token in self._stream_chat(backend, messages, model, temperature, max_tokens, cancel):
+                        events.put((backend, token, None))
+                events.put((backend, None, None))
+            except Exception as e:
+                events.put((backend, None, e))
+        
+        def launch() -> bool:
+            backend = self.backends.choose(exclude=failed | set(launched))
+            if backend is None or backend in launched:
+                return False
+            launched[backend] = threading.Event()
+            threading.Thread(target=run, args=(backend, launched[backend]),
+                             name=f"llm_hedge_{backend.name}", daemon=True).start()
+            return True
+        
+        if not launch():
+            raise Exception("No language model backend available")
+        primary = next(iter(launched))
+        
+        hedged = False
+        winner = None
+        deadline = time.time() + self.backends.hedge_delay
+        try:
+            while True:
+                timeout = None if winner is not None or hedged else max(0.0, deadline - time.time())
+                try:
+                    backend, token, error = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedged = True
+                    if launch():
+                        self.backends.record_hedge()
+                    continue
+                
+                if winner is None:
+                    if error is not None:
+                        failed.add(backend)
+                        if all(other in failed for other in launched):
+                            # Fail over immediately unless a second backend was already tried
+                            if hedged or not launch():
+                                raise error
+                            hedged = True
+                        continue
+                    
+                    winner = backend
+                    if backend is not primary:
+                        self.backends.record_hedge(winner=backend)
+                    for other, cancel in launched.items():
+                        if other is not winner:
+                            cancel.set()
+                
+                if backend is not winner:
+                    continue
+                if error is not None:
+                    raise error
+                if token is None:
+                    return
+                yield token
+        finally:
+            for cancel in launched.values():
+                cancel.set()
+    
+    def health_check(self, use_cache=True, cache_ttl=30):
+        """Check if any Ollama backend is running, caching results to avoid excessive requests."""
+        # Use cached result if available and recent
+        if use_cache:
+            for backend in self.backends.backends:
+                if backend.last_successful_health_check and \
+                        time.time() - backend.last_successful_health_check < cache_ttl:
+                    return True
+        
+        healthy = False
+        for backend in self.backends.backends:
+            try:
+                response = requests.get(f"{backend.url}/api/tags", timeout=5)
+                is_healthy = response.status_code == 200
+                
+                if is_healthy:
+                    backend.last_successful_health_check = time.time()
+                    # Reset circuit breaker on successful health check
+                    if backend.circuit_breaker.state != 'CLOSED':
+                        backend.circuit_breaker.record_success()
+                    logger.debug(f"Ollama health check passed for {backend.name}")
+                    healthy = True
+                else:
+                    logger.warning(f"Ollama health check failed for {backend.name}: HTTP {response.status_code}")
+                
+            except Exception as e:
+                logger.warning(f"Ollama health check failed for {backend.name}: {e}")
+        
+        return healthy
     
     def get_connection_info(self):
         """Get connection status information for debugging."""
@@ -228,16 +530,278 @@ class LocalLLMClient:
             "circuit_breaker_state": self.circuit_breaker.state,
             "failure_count": self.circuit_breaker.failure_count,
             "last_successful_health_check": self.last_successful_health_check,
-            "health_status": self.health_check(use_cache=False)
+            "health_status": self.health_check(use_cache=False),
+            "backends": self.backends.get_stats()
         }
 
+class AsyncLocalLLMClient:
+    """
+    Non-blocking Ollama client built on httpx.AsyncClient.
+    
+    Mirrors LocalLLMClient.chat but awaits network I/O and retry delays, so a
+    slow generation never stalls other requests on the same event loop. Pass
+    the sync client's backend pool so both paths share routing and health.
+    """
+    
+    def __init__(self, base_url="http://localhost:11434", circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_connections: int = 6, scheduler=None, backends: Optional[LLMBackendPool] = None):
+        if backends is None:
+            backends = LLMBackendPool([LLMBackend(
+                base_url, circuit_breaker or CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+            )])
+        self.backends = backends
+        self.max_connections = max_connections
+        self.scheduler = scheduler or get_llm_scheduler()
+        
+        logger.info(f"Initializing async LLM client with URLs: {[backend.url for backend in backends.backends]}")
+    
+    # The primary (first) backend's state, for single-server callers
+    @property
+    def base_url(self):
+        return self.backends.primary.url
+    
+    @property
+    def circuit_breaker(self):
+        return self.backends.primary.circuit_breaker
+    
+    @property
+    def _client(self) -> Optional[httpx.AsyncClient]:
+        return self.backends.primary.async_client
+    
+    @_client.setter
+    def _client(self, client):
+        self.backends.primary.async_client = client
+    
+    @property
+    def _client_loop(self):
+        return self.backends.primary.async_client_loop
+    
+    @_client_loop.setter
+    def _client_loop(self, loop):
+        self.backends.primary.async_client_loop = loop
+    
+    def _get_client(self, backend=None) -> httpx.AsyncClient:
+        """Get a backend's HTTP client bound to the running event loop, creating it on first use."""
+        backend = backend or self.backends.primary
+        loop = asyncio.get_running_loop()
+        client = backend.async_client
+        if client is None or client.is_closed or backend.async_client_loop is not loop:
+            backend.async_client = httpx.AsyncClient(
+                base_url=backend.url,
+                timeout=httpx.Timeout(120.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+            backend.async_client_loop = loop
+        return backend.async_client
+    
+    async def chat(self, messages, model="llama3.2:3b", temperature=0.7, max_tokens=1000,
+                   priority: LLMPriority = LLMPriority.INTERACTIVE, affinity: Optional[str] = None,
+                   keep_alive: Optional[str] = None):
+        """Chat with local Ollama LLM with circuit breaker and async retry logic (see LocalLLMClient.chat)."""
+        if not self.backends.any_available():
+            logger.warning("Circuit breaker is OPEN on every LLM backend, skipping LLM call")
+            return LLM_UNAVAILABLE_ANSWER
+        
+        try:
+            async with self.scheduler.async_slot(model, priority):
+                return await self._chat_with_retry(messages, model, temperature, max_tokens, set(),
+                                                   affinity, keep_alive)
+        except LLMQueueFullError as e:
+            logger.warning(f"LLM request rejected by scheduler: {e}")
+            return LLM_BUSY_ANSWER
+        except Exception as e:
+            logger.error(f"Async LLM chat failed after retries: {e}")
+            return LLM_FAILED_ANSWER
+    
+    @async_retry_with_exponential_backoff(max_retries=2, base_delay=1, max_delay=10)
+    async def _chat_with_retry(self, messages, model, temperature, max_tokens, failed,
+                               affinity=None, keep_alive=None):
+        """Internal async chat method with retry logic, preferring backends that have not failed."""
+        if self.backends.should_hedge(affinity):
+            return await self._hedged_chat(messages, model, temperature, max_tokens, failed)
+        
+        backend = self.backends.choose(exclude=failed, affinity=affinity)
+        if backend is None:
+            raise Exception("No language model backend available")
+        
+        with self.backends.track(backend):
+            try:
+                started = time.time()
+                response = await self._get_client(backend).post(
+                    "/api/chat",
+                    json=_chat_payload(model, messages, temperature, max_tokens, stream=False,
+                                       keep_alive=keep_alive)
+                )
+                
+                if response.status_code != 200:
+                    error_msg = f"LLM API error: {response.status_code} - {response.text}"
+                    logger.error(error_msg)
+                    raise Exception(error_msg)
+            except Exception:
+                if backend not in failed:
+                    failed.add(backend)
+                    self.backends.record_failure(backend)
+                raise
+        
+        backend.circuit_breaker.record_success()
+        backend.record_ttft(time.time() - started)
+        result = response.json()["message"]["content"]
+        logger.debug(f"LLM response received from {backend.name}: {len(result)} characters")
+        return result
+    
+    async def _stream_collect(self, backend, messages, model, temperature, max_tokens,
+                              first_tokens: asyncio.Queue) -> str:
+        """Stream a chat from one backend, announcing its first token, and return the full text."""
+        parts = []
+        with self.backends.track(backend):
+            try:
+                started = time.time()
+                async with self._get_client(backend).stream(
+                    "POST",
+                    "/api/chat",
+                    json=_chat_payload(model, messages, temperature, max_tokens, stream=True)
+                ) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode(errors="replace")
+                        raise Exception(f"LLM API error: {response.status_code} - {body}")
+                    
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise Exception(f"LLM stream error: {chunk['error']}")
+                        
+                        token = chunk.get("message", {}).get("content", "")
+                        if token:
+                            if not parts:
+                                backend.record_ttft(time.time() - started)
+                                first_tokens.put_nowait(backend)
+                            parts.append(token)
+                        if chunk.get("done"):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.backends.record_failure(backend)
+                logger.error(f"Async LLM stream failed on {backend.name}: {e}")
+                raise
+        
+        backend.circuit_breaker.record_success()
+        return "".join(parts)
+    
+    async def _hedged_chat(self, messages, model, temperature, max_tokens, failed) -> str:
+        """
+        Chat via the least-loaded backend, hedging on a second one if slow to start.
+        
+        Same policy as LocalLLMClient._hedged_stream: after hedge_delay without
+        a first token (or on an early failure) the request is duplicated on
+        another backend, and the first to produce a token is awaited while the
+        other is cancelled, which closes its connection.
+        """
+        first_tokens: asyncio.Queue = asyncio.Queue()
+        tasks: Dict[asyncio.Task, object] = {}
+        
+        def launch() -> bool:
+            backend = self.backends.choose(exclude=failed | set(tasks.values()))
+            if backend is None or backend in tasks.values():
+                return False
+            task = asyncio.create_task(
+                self._stream_collect(backend, messages, model, temperature, max_tokens, first_tokens)
+            )
+            tasks[task] = backend
+            return True
+        
+        if not launch():
+            raise Exception("No language model backend available")
+        primary = next(iter(tasks.values()))
+        
+        hedged = False
+        deadline = time.time() + self.backends.hedge_delay
+        first_token = asyncio.create_task(first_tokens.get())
+        try:
+            while True:
+                running = [task for task in tasks if not task.done()]
+                timeout = None if hedged else max(0.0, deadline - time.time())
+                done, _ = await asyncio.wait([first_token, *running], timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                
+                if not done:
+                    hedged = True
+                    if launch():
+                        self.backends.record_hedge()
+                    continue
+                
+                if first_token in done:
+                    winner = first_token.result()
+                    if winner is not primary:
+                        self.backends.record_hedge(winner=winner)
+                    winner_task = next(task for task, backend in tasks.items() if backend is winner)
+                    for task in tasks:
+                        if task is not winner_task:
+                            task.cancel()
+                    return await winner_task
+                
+                for task in done:
+                    if task.exception() is None:
+                        # Finished without producing a token: an empty answer
+                        return task.result()
+                    failed.add(tasks[task])
+                
+                if all(task.done() for task in tasks):
+                    if hedged or not launch():
+                        raise next(task.exception() for task in done)
+                    hedged = True
+        finally:
+            first_token.cancel()
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            # Let cancelled streams close their connections and release their counts
+            await asyncio.gather(*losers, return_exceptions=True)
+    
+    async def aclose(self):
+        """Close the underlying HTTP clients."""
+        for backend in self.backends.backends:
+            if backend.async_client is not None and not backend.async_client.is_closed:
+                await backend.async_client.aclose()
+
 class LocalRAGSystem:
-    def __init__(self, llm_client=None, data_path="./data"):
+    def __init__(self, llm_client=None, data_path="./data", async_llm_client=None):
         self.data_path = data_path
         
-        # Initialize local embedding model
+        # Initialize local embedding model (shared with other components in this process)
+        # with the EMBEDDING_BACKEND inference backend (torch, onnx or onnx-int8), or
+        # the shared embedding server's when EMBEDDING_SERVER_SOCKET is set
         logger.info("Loading embedding model...")
-        self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model_name = 'all-MiniLM-L6-v2'
+        self.encoder = get_model_registry().get(self.embedding_model_name)
+        # Stored chunk and sentence vectors are keyed by model and, for int8, backend
+        self.embedding_key = self.encoder.cache_key
+        
+        # Persistent L2 embedding cache so restarts and re-ingestion skip the encoder
+        self.embedding_store = PersistentEmbeddingStore(os.path.join(data_path, "embeddings.db"))
+        
+        # File and chunk content hashes for idempotent, deduplicated ingestion
+        self.content_index = ContentHashIndex(os.path.join(data_path, "content_index.db"))
+        
+        # One row per document so listings never scan every chunk
+        self.document_catalog = DocumentCatalog(os.path.join(data_path, "document_catalog.db"))
+        
+        # Chunk-level BM25 index for the keyword side of hybrid search
+        self.keyword_index = BM25Index(os.path.join(data_path, "keyword_index.db"))
+        
+        # Sentence offsets and embeddings of every chunk, for context compression
+        self.sentence_index = SentenceIndex(os.path.join(data_path, "sentence_index.db"))
+        
+        # Prompt token counts with the LLM's tokenizer (LLM_TOKENIZER: Hugging Face
+        # name or local path), else the embedding model's subword tokenizer
+        self.token_counter = TokenCounter.load(os.getenv("LLM_TOKENIZER"),
+                                               fallback=getattr(self.encoder, "tokenizer", None),
+                                               fallback_name=self.embedding_model_name)
         
         # Initialize ChromaDB with connection pooling
         chroma_path = os.path.join(data_path, "chroma_db")
@@ -258,16 +822,78 @@ class LocalRAGSystem:
             path=chroma_path,
             settings=Settings(anonymized_telemetry=False)
         )
-        self.collection = self.chroma_client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
+        # Chunk vectors live in ChromaDB, or with VECTOR_STORE_BACKEND=numpy in a
+        # memory-mapped matrix shared by every worker process on the host
+        self.vector_store_backend = os.getenv("VECTOR_STORE_BACKEND", "chroma").strip().lower()
+        self.collection: VectorStore
+        if self.vector_store_backend == "numpy":
+            self.collection = NumpyVectorStore(
+                os.path.join(data_path, "vector_store"),
+                dtype=os.getenv("VECTOR_STORE_DTYPE", "float32"),
+                ivf_min_rows=int(os.getenv("VECTOR_STORE_IVF_MIN_ROWS", "200000")),
+                ivf_nprobe=int(os.getenv("VECTOR_STORE_IVF_NPROBE", "16")),
+                # Unset keeps the store's mode; switching an existing store takes build_codes
+                quantization=os.getenv("VECTOR_STORE_QUANTIZATION", "").strip().lower() or None,
+                rescore_candidates=int(os.getenv("VECTOR_STORE_RESCORE_CANDIDATES", "256"))
+            )
+            self._migrate_chroma_collection()
+        else:
+            self.vector_store_backend = "chroma"
+            self.collection = self.chroma_client.get_or_create_collection(
+                name="documents",
+                metadata={"hnsw:space": "cosine"}
+            )
         
-        # Initialize LLM client
+        # Initialize LLM clients (sync for legacy callers, async for the request path)
         self.llm_client = llm_client or LocalLLMClient()
+        # The async client shares the sync client's backends, so both paths see
+        # the same routing, outstanding request counts and circuit breakers
+        shared_backends = getattr(self.llm_client, "backends", None)
+        self.async_llm_client = async_llm_client or AsyncLocalLLMClient(
+            backends=shared_backends if isinstance(shared_backends, LLMBackendPool) else None
+        )
+        
+        # Extractive fast path: when the top chunk is a strong match and one of its
+        # sentences covers most of the question's terms, answer with those
+        # sentences instead of calling the LLM, optionally replacing the cached
+        # answer with an LLM-generated one in the background
+        self.extractive_answers_enabled = False
+        self.extractive_min_score = 0.75
+        self.extractive_min_overlap = 0.6
+        self.extractive_max_sentences = 2
+        self.extractive_refine_in_background = False
+        self._pending_refinements: Dict[str, tuple] = {}
+        self._background_tasks = set()
+        
+        # Picks the model per query (fast model for simple lookups, larger one for
+        # comparison/analysis or long context); disabled routes everything to "default"
+        self.model_router = ModelRouter()
+        
+        # Multi-turn conversations: recent turns plus a rolling summary, sent as a
+        # stable prompt prefix to one backend per session so Ollama reuses its cache
+        self.sessions = ConversationSessionStore(self.token_counter)
+        
+        # Bounded executor for blocking encoder and ChromaDB calls made from async code
+        self.max_blocking_workers = 4
+        self._executor = ThreadPoolExecutor(max_workers=self.max_blocking_workers,
+                                            thread_name_prefix="rag_blocking")
         
         # Initialize caching systems
         self.rag_cache = get_rag_query_cache()
+        
+        # Answers are tagged with the doc_ids they drew context from and evicted
+        # when those documents change, so they can live much longer than a
+        # blind TTL would allow. The generation counter increments on every
+        # mutation so answers computed across one are not stored.
+        self.rag_cache_ttl = 3600.0
+        self.collection_generation = 0
+        
+        # Optional paraphrase-tolerant layer behind the exact-match cache: a
+        # query within semantic_cache_max_distance (cosine) of a previously
+        # answered one in the same collection generation reuses its answer
+        self.semantic_cache_enabled = False
+        self.semantic_cache = SemanticQueryCache(max_entries=1000, max_distance=0.05,
+                                                 ttl=self.rag_cache_ttl)
         self.embedding_cache = get_embedding_cache()
         self.document_cache = get_document_cache()
         
@@ -280,8 +906,63 @@ class LocalRAGSystem:
         self.chunk_size = 400  # Optimal chunk size for most LLMs
         self.chunk_overlap = 50  # Overlap between chunks
         
+        # Ingestion batching: encoder mini-batch size (CPU sweet spot for MiniLM is
+        # 32-64) and the number of chunks encoded and written to ChromaDB per step
+        self.embedding_batch_size = 32
+        self.ingest_batch_size = 256
+        
+        # Prompts carry only the retrieved chunks' sentences most similar to the
+        # question, up to context_compressor.token_budget tokens
+        self.context_compression_enabled = True
+        self.context_compressor = ContextCompressor(self.sentence_index, self.token_counter,
+                                                    self._encode_batch, self.embedding_key)
+        
+        # Query-time embeddings from concurrent requests are coalesced into one
+        # encoder call (up to query_batch_max_size texts, waiting at most
+        # query_batch_max_wait_ms for a batch to fill). They bypass the
+        # persistent store, which holds only ingested content.
+        self.query_batch_max_size = 32
+        self.query_batch_max_wait_ms = 5.0
+        
+        # rag_query_batch: maximum questions per call and LLM generations in flight
+        self.batch_query_max_questions = 500
+        self.batch_query_concurrency = 4
+        self.embedding_service = EmbeddingBatcher(
+            encode_fn=lambda texts: self._encode_batch(texts),
+            name="rag_query",
+            max_batch_size=self.query_batch_max_size,
+            max_wait_ms=self.query_batch_max_wait_ms,
+            monitor=self.performance_monitor
+        )
+        
+        if self.document_catalog.count() == 0 and self.collection.count() > 0:
+            self.rebuild_document_catalog()
+        if len(self.keyword_index) == 0 and self.collection.count() > 0:
+            self.rebuild_keyword_index()
+        
         logger.info(f"RAG system initialized with {self.collection.count()} documents (with caching and pooling)")
     
+    def _migrate_chroma_collection(self):
+        """
+        Copy the ChromaDB collection into an empty NumPy vector store.
+        
+        Switching VECTOR_STORE_BACKEND to numpy on an existing deployment would
+        otherwise start with no vectors while the document catalog and the
+        keyword and sentence indexes still list every document.
+        """
+        if self.collection.count() > 0:
+            return
+        try:
+            source = self.chroma_client.get_collection("documents")
+        except Exception:
+            return  # No ChromaDB collection was ever created
+        total = source.count()
+        if total == 0:
+            return
+        logger.info(f"Copying {total} chunks from ChromaDB into the NumPy vector store")
+        copied = copy_collection(source, self.collection)
+        logger.info(f"Copied {copied} chunks into the NumPy vector store")
+    
     def smart_chunking(self, text: str) -> List[str]:
         """Intelligent text chunking for optimal RAG performance"""
         # Handle empty or very short text
@@ -385,19 +1066,106 @@ class LocalRAGSystem:
         
         return chunks
     
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Encode texts in encoder mini-batches of embedding_batch_size."""
+        if not texts:
+            return []
+        
+        embeddings = self.encoder.encode(
+            texts,
+            batch_size=self.embedding_batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        return embeddings.tolist() if hasattr(embeddings, "tolist") else [list(e) for e in embeddings]
+    
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, reading from the persistent embedding store first.
+        
+        Only texts missing from the store are encoded; their vectors are written
+        back so unchanged content is never re-encoded across restarts.
+        """
+        if not texts:
+            return []
+        
+        embeddings = self.embedding_store.get_many(self.embedding_key, texts)
+        missing_texts = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        
+        if missing_texts:
+            encoded = dict(zip(missing_texts, self._encode_batch(missing_texts)))
+            self.embedding_store.put_many(self.embedding_key, missing_texts,
+                                          [encoded[text] for text in missing_texts])
+            embeddings = [embedding if embedding is not None else encoded[text]
+                          for text, embedding in zip(texts, embeddings)]
+        
+        return embeddings
+    
+    def _document_metadata(self, doc: Dict, doc_id: str, total_chunks: int) -> dict:
+        """Build the metadata shared by every chunk of a document."""
+        return {
+            "title": doc["title"],
+            "source": doc.get("source", "unknown"),
+            "total_chunks": total_chunks,
+            "doc_id": str(doc_id),
+            "file_type": doc.get("file_type", "txt"),
+            "upload_timestamp": doc.get("upload_timestamp", 
+                datetime.now().isoformat()),
+            "original_filename": doc.get("original_filename", doc["title"]),
+            "file_size": len(doc.get("content", "")),
+            # Document intelligence metadata
+            "document_type": doc.get("document_type", "plain_text"),
+            "content_structure": doc.get("content_structure", "unstructured"),
+            "intelligence_confidence": doc.get("intelligence_confidence", 0.5),
+            "suggested_chunk_size": doc.get("suggested_chunk_size", 400),
+            "suggested_overlap": doc.get("suggested_overlap", 50),
+            "processing_notes": "; ".join(doc.get("processing_notes", [])) if doc.get("processing_notes") else "",
+            # PDF-specific metadata (if available)
+            "extraction_method": doc.get("extraction_method"),
+            "quality_score": doc.get("quality_score"),
+            "page_count": doc.get("page_count")
+        }
+    
     def add_documents(self, documents: List[Dict[str, str]], chunk_size: int = None, chunk_overlap: int = None):
-        """Add documents with smart chunking and optional custom parameters"""
+        """
+        Add documents with smart chunking and optional custom parameters.
+        
+        Chunks from all submitted documents are collected first, then encoded
+        and written to ChromaDB in bounded batches of ingest_batch_size so a
+        large upload never holds every embedding in memory at once.
+        
+        Ingestion is idempotent on content: a document whose file_hash was
+        already ingested is skipped, and a chunk whose text is already stored
+        is referenced instead of being embedded and stored again.
+        """
         if not documents:
             return "No documents provided"
         
         try:
             all_chunks = []
+            doc_refs = {}
+            catalog_entries = []
+            total_chunks = 0
+            reused_chunks = 0
+            skipped_files = 0
+            added_docs = 0
             current_count = self.collection.count()
             doc_id = current_count
             
+            # Chunk everything first so stored chunks can be resolved in one lookup
+            chunked_docs = []
             for doc in documents:
                 # Use provided doc_id if available, otherwise use incrementing counter
                 current_doc_id = doc.get("doc_id", str(doc_id))
+                doc_id += 1
+                
+                file_hash = doc.get("file_hash")
+                if file_hash:
+                    existing_doc_id = self.content_index.find_file(file_hash)
+                    if existing_doc_id is not None:
+                        logger.info(f"Skipping '{doc.get('title')}': identical file already indexed as {existing_doc_id}")
+                        skipped_files += 1
+                        continue
                 
                 # Use custom chunking parameters if provided, otherwise use smart chunking
                 if chunk_size is not None and chunk_overlap is not None:
@@ -405,66 +1173,267 @@ class LocalRAGSystem:
                 else:
                     chunks = self.smart_chunking(doc['content'])
                 
-                for i, chunk in enumerate(chunks):
-                    embedding = self.encoder.encode(chunk).tolist()
+                chunked_docs.append((doc, current_doc_id, chunks, [content_hash(chunk) for chunk in chunks]))
+            
+            stored_chunk_ids = self.content_index.lookup_chunks(
+                [chunk_hash for _, _, _, hashes in chunked_docs for chunk_hash in hashes]
+            )
+            
+            for doc, current_doc_id, chunks, hashes in chunked_docs:
+                base_metadata = self._document_metadata(doc, current_doc_id, len(chunks))
+                refs = []
+                new_chunks = []
+                
+                for i, (chunk, chunk_hash) in enumerate(zip(chunks, hashes)):
+                    chunk_id = f"doc_{current_doc_id}_chunk_{i}"
+                    
+                    if chunk_hash in stored_chunk_ids:
+                        refs.append((i, chunk_hash, stored_chunk_ids[chunk_hash]))
+                        continue
                     
-                    all_chunks.append({
-                        "id": f"doc_{current_doc_id}_chunk_{i}",
-                        "embedding": embedding,
-                        "text": chunk,
-                        "metadata": self._clean_metadata({
-                            "title": doc["title"],
-                            "source": doc.get("source", "unknown"),
-                            "chunk_index": i,
-                            "total_chunks": len(chunks),
-                            "doc_id": str(current_doc_id),
-                            "content_preview": chunk[:150] + "..." if len(chunk) > 150 else chunk,
-                            "file_type": doc.get("file_type", "txt"),
-                            "upload_timestamp": doc.get("upload_timestamp", 
-                                datetime.now().isoformat()),
-                            "original_filename": doc.get("original_filename", doc["title"]),
-                            "file_size": len(doc.get("content", "")),
-                            # Document intelligence metadata
-                            "document_type": doc.get("document_type", "plain_text"),
-                            "content_structure": doc.get("content_structure", "unstructured"),
-                            "intelligence_confidence": doc.get("intelligence_confidence", 0.5),
-                            "suggested_chunk_size": doc.get("suggested_chunk_size", 400),
-                            "suggested_overlap": doc.get("suggested_overlap", 50),
-                            "processing_notes": "; ".join(doc.get("processing_notes", [])) if doc.get("processing_notes") else "",
-                            # PDF-specific metadata (if available)
-                            "extraction_method": doc.get("extraction_method"),
-                            "quality_score": doc.get("quality_score"),
-                            "page_count": doc.get("page_count")
-                        })
-                    })
+                    stored_chunk_ids[chunk_hash] = chunk_id
+                    new_chunks.append((chunk_hash, chunk_id))
+                    refs.append((i, chunk_hash, chunk_id))
+                    all_chunks.append(self._chunk_record(chunk_id, chunk, i, chunk_hash, base_metadata))
                 
-                doc_id += 1
+                # A document always stores at least one chunk of its own so it stays
+                # addressable by doc_id; this private copy is never shared
+                if chunks and not new_chunks:
+                    chunk_id = f"doc_{current_doc_id}_chunk_0"
+                    refs[0] = (0, hashes[0], chunk_id)
+                    all_chunks.append(self._chunk_record(chunk_id, chunks[0], 0, hashes[0], base_metadata))
+                
+                doc_refs[current_doc_id] = (refs, new_chunks, doc.get("file_hash"))
+                catalog_entries.append(self._catalog_entry(doc, base_metadata, len(chunks)))
+                total_chunks += len(chunks)
+                reused_chunks += len(chunks) - len(new_chunks)
+                added_docs += 1
             
-            # Batch insert for efficiency
-            if all_chunks:
+            # Encode and insert in bounded batches for throughput and flat memory
+            start_time = time.time()
+            for start in range(0, len(all_chunks), self.ingest_batch_size):
+                batch = all_chunks[start:start + self.ingest_batch_size]
+                
+                with self.performance_monitor.timer("embedding_generation", {"mode": "ingest"}):
+                    embeddings = self._embed_texts([chunk["text"] for chunk in batch])
+                
                 self.collection.add(
-                    embeddings=[chunk["embedding"] for chunk in all_chunks],
-                    documents=[chunk["text"] for chunk in all_chunks],
-                    metadatas=[chunk["metadata"] for chunk in all_chunks],
-                    ids=[chunk["id"] for chunk in all_chunks]
+                    embeddings=embeddings,
+                    documents=[chunk["text"] for chunk in batch],
+                    metadatas=[chunk["metadata"] for chunk in batch],
+                    ids=[chunk["id"] for chunk in batch]
                 )
+                self.keyword_index.add_chunks(
+                    (chunk["id"], chunk["metadata"]["doc_id"], chunk["text"]) for chunk in batch
+                )
+                self._index_sentences(batch)
+            
+            if all_chunks:
+                elapsed = max(time.time() - start_time, 1e-6)
+                logger.debug(f"Embedded and stored {len(all_chunks)} chunks at {len(all_chunks) / elapsed:.1f} chunks/s "
+                             f"(encode batch={self.embedding_batch_size}, write batch={self.ingest_batch_size})")
+            
+            # Record hashes only once the chunks are in ChromaDB
+            for current_doc_id, (refs, new_chunks, file_hash) in doc_refs.items():
+                self.content_index.add_document_refs(current_doc_id, refs, new_chunks)
+                if file_hash:
+                    self.content_index.register_file(file_hash, current_doc_id)
+            self.document_catalog.upsert_documents(catalog_entries)
+            if doc_refs:
+                self.invalidate_documents(list(doc_refs), documents_added=True)
             
-            logger.info(f"Added {len(documents)} documents ({len(all_chunks)} chunks) to vector database")
-            return f"Successfully added {len(documents)} documents ({len(all_chunks)} chunks)"
+            logger.info(f"Added {added_docs} documents ({total_chunks} chunks, {len(all_chunks)} stored, "
+                        f"{reused_chunks} reused, {skipped_files} duplicate files skipped) to vector database")
+            result = f"Successfully added {added_docs} documents ({total_chunks} chunks)"
+            if reused_chunks or skipped_files:
+                result += f"; {reused_chunks} chunks reused, {skipped_files} duplicate files skipped"
+            return result
         
         except Exception as e:
             logger.error(f"Error adding documents: {e}")
             return f"Error adding documents: {str(e)}"
     
+    def _index_sentences(self, batch: List[dict]):
+        """Store sentence offsets and embeddings of new chunks; missing ones are backfilled at query time."""
+        try:
+            with self.performance_monitor.timer("embedding_generation", {"mode": "sentences"}):
+                self.context_compressor.index_chunks((chunk["id"], chunk["text"]) for chunk in batch)
+        except Exception as e:
+            logger.warning(f"Sentence indexing failed for {len(batch)} chunks: {e}")
+    
+    def _chunk_record(self, chunk_id: str, chunk: str, chunk_index: int, chunk_hash: str, base_metadata: dict) -> dict:
+        """Build the id, text and metadata of a chunk to store."""
+        return {
+            "id": chunk_id,
+            "text": chunk,
+            "metadata": self._clean_metadata({
+                **base_metadata,
+                "chunk_index": chunk_index,
+                "chunk_hash": chunk_hash,
+                "content_preview": chunk[:150] + "..." if len(chunk) > 150 else chunk
+            })
+        }
+    
+    def _catalog_entry(self, doc: Dict, base_metadata: dict, chunk_count: int) -> dict:
+        """Build the document catalog row for an ingested document."""
+        content = doc.get("content") or ""
+        entry = {key: value for key, value in doc.items() if key not in ("content", "raw_content")}
+        entry.update(base_metadata)
+        entry.pop("total_chunks", None)
+        entry.update({
+            "chunk_count": chunk_count,
+            "status": "ready",
+            "content_preview": content[:150] + "..." if len(content) > 150 else content,
+            "last_modified": doc.get("last_modified") or base_metadata["upload_timestamp"]
+        })
+        return entry
+    
+    def rebuild_document_catalog(self, page_size: int = 5000) -> int:
+        """
+        Rebuild the document catalog from chunk metadata in ChromaDB.
+        
+        Used once to backfill a catalog for a collection ingested before it
+        existed; pages through the collection so memory stays bounded.
+        
+        Returns:
+            Number of documents cataloged
+        """
+        documents = {}
+        offset = 0
+        
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            metadatas = page.get("metadatas") or []
+            if not metadatas:
+                break
+            
+            for metadata in metadatas:
+                doc_id = str(metadata.get("doc_id", "unknown"))
+                if doc_id not in documents:
+                    entry = {key: value for key, value in metadata.items()
+                             if key not in ("chunk_index", "chunk_hash", "total_chunks")}
+                    entry.update({"doc_id": doc_id, "chunk_count": 0, "total_chunks": metadata.get("total_chunks")})
+                    documents[doc_id] = entry
+                documents[doc_id]["chunk_count"] += 1
+            
+            offset += len(metadatas)
+        
+        for entry in documents.values():
+            total_chunks = entry.pop("total_chunks")
+            if total_chunks:
+                entry["chunk_count"] = max(entry["chunk_count"], int(total_chunks))
+        
+        self.document_catalog.clear()
+        self.document_catalog.upsert_documents(list(documents.values()))
+        logger.info(f"Rebuilt document catalog with {len(documents)} documents from {offset} chunks")
+        return len(documents)
+    
+    def rebuild_keyword_index(self, page_size: int = 5000) -> int:
+        """
+        Rebuild the BM25 keyword index from the chunks stored in ChromaDB.
+        
+        Used once to backfill the index for a collection ingested before it
+        existed; pages through the collection so memory stays bounded.
+        
+        Returns:
+            Number of chunks indexed
+        """
+        self.keyword_index.clear()
+        offset = 0
+        
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            
+            self.keyword_index.add_chunks(
+                (chunk_id, str((metadata or {}).get("doc_id", "unknown")), text or "")
+                for chunk_id, text, metadata in zip(ids, page.get("documents") or [], page.get("metadatas") or [])
+            )
+            offset += len(ids)
+        
+        logger.info(f"Rebuilt keyword index from {offset} chunks")
+        return offset
+    
+    def find_document_by_file_hash(self, file_hash: str) -> Optional[str]:
+        """Return the doc_id of an already ingested file with identical bytes, if any."""
+        return self.content_index.find_file(file_hash)
+    
+    def delete_document_chunks(self, doc_id: str) -> Optional[int]:
+        """
+        Delete a document's chunks from ChromaDB.
+        
+        Chunks the document shares with other documents are kept and handed
+        over to one of them; everything else stored under the doc_id is removed.
+        
+        Returns:
+            Number of chunks the document held, or None if it was not found
+        """
+        results = self.collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+        
+        # Try integer conversion if string search fails
+        if not results.get("ids"):
+            try:
+                results = self.collection.get(where={"doc_id": int(doc_id)}, include=["metadatas"])
+            except (ValueError, TypeError):
+                pass
+        
+        chunk_ids = results.get("ids", [])
+        if not chunk_ids:
+            return None
+        
+        chunk_count = max(self.content_index.document_chunk_count(doc_id), len(chunk_ids))
+        reassigned = self.content_index.release_document(doc_id)
+        self.document_catalog.delete(doc_id)
+        
+        if reassigned:
+            self._reassign_chunks(reassigned, dict(zip(chunk_ids, results.get("metadatas", []))))
+            self.keyword_index.reassign_chunks({chunk_id: owner for chunk_id, (owner, _) in reassigned.items()})
+        
+        delete_ids = [chunk_id for chunk_id in chunk_ids if chunk_id not in reassigned]
+        if delete_ids:
+            self.collection.delete(ids=delete_ids)
+            self.keyword_index.remove_chunks(delete_ids)
+            self.sentence_index.remove_chunks(delete_ids)
+        
+        # Answers citing this document, or whose shared chunks now belong to another, are stale
+        self.invalidate_documents([str(doc_id)] + sorted({owner for owner, _ in reassigned.values()}))
+        
+        logger.info(f"Deleted document {doc_id}: {len(delete_ids)} chunks removed, {len(reassigned)} shared chunks reassigned")
+        return chunk_count
+    
+    def _reassign_chunks(self, reassigned: Dict[str, tuple], metadatas: Dict[str, dict]):
+        """Move shared chunks to their new owning documents' metadata."""
+        owner_metadata = {}
+        ids, updated = [], []
+        
+        for chunk_id, (new_owner, chunk_index) in reassigned.items():
+            if new_owner not in owner_metadata:
+                owner = self.collection.get(where={"doc_id": new_owner}, limit=1, include=["metadatas"])
+                owner_metadata[new_owner] = owner["metadatas"][0] if owner.get("metadatas") else {"doc_id": new_owner}
+            
+            chunk_metadata = metadatas.get(chunk_id, {})
+            ids.append(chunk_id)
+            updated.append({
+                **owner_metadata[new_owner],
+                "chunk_index": chunk_index,
+                "chunk_hash": chunk_metadata.get("chunk_hash", ""),
+                "content_preview": chunk_metadata.get("content_preview", "")
+            })
+        
+        self.collection.update(ids=ids, metadatas=updated)
+    
     def _get_cached_embedding(self, text: str) -> Optional[List[float]]:
         """Get cached embedding for text."""
         cache_key = self.embedding_cache._generate_key("embed", text)
-        return self.embedding_cache.get(cache_key)
+        cached = self.embedding_cache.get(cache_key)
+        return cached.tolist() if isinstance(cached, np.ndarray) else cached
     
     def _cache_embedding(self, text: str, embedding: List[float], ttl: float = 1800.0):
-        """Cache embedding for text."""
+        """Cache embedding for text (as float32, a sixth of the memory of a list of floats)."""
         cache_key = self.embedding_cache._generate_key("embed", text)
-        self.embedding_cache.set(cache_key, embedding, ttl)
+        self.embedding_cache.set(cache_key, np.asarray(embedding, dtype=np.float32), ttl)
     
     def _generate_embedding_with_cache(self, text: str) -> List[float]:
         """Generate embedding with caching and performance monitoring."""
@@ -474,10 +1443,10 @@ class LocalRAGSystem:
             logger.debug(f"Using cached embedding for text: '{text[:50]}...'")
             return cached_embedding
         
-        # Generate new embedding with timing
+        # Generate new embedding through the micro-batching service
         with self.performance_monitor.timer("embedding_generation"):
             start_time = time.time()
-            embedding = self.encoder.encode(text).tolist()
+            embedding = self.embedding_service.encode(text)
             embedding_time = (time.time() - start_time) * 1000
         
         # Cache the result
@@ -486,6 +1455,23 @@ class LocalRAGSystem:
         logger.debug(f"Generated new embedding in {embedding_time:.1f}ms for text: '{text[:50]}...'")
         return embedding
     
+    async def _generate_embedding_with_cache_async(self, text: str) -> List[float]:
+        """Async variant of _generate_embedding_with_cache; waits on the batcher without blocking the loop."""
+        cached_embedding = self._get_cached_embedding(text)
+        if cached_embedding is not None:
+            logger.debug(f"Using cached embedding for text: '{text[:50]}...'")
+            return cached_embedding
+        
+        start_time = time.time()
+        embedding = await self.embedding_service.encode_async(text)
+        embedding_time = (time.time() - start_time) * 1000
+        self.performance_monitor.record_timer("embedding_generation", embedding_time)
+        
+        self._cache_embedding(text, embedding)
+        
+        logger.debug(f"Generated new embedding in {embedding_time:.1f}ms for text: '{text[:50]}...'")
+        return embedding
+    
     @retry_with_exponential_backoff(max_retries=2, base_delay=0.5, max_delay=5)
     def adaptive_retrieval(self, query: str, max_chunks: int = 5) -> List[Dict]:
         """Efficient retrieval with relevance filtering and token management"""
@@ -500,93 +1486,178 @@ class LocalRAGSystem:
             query_embedding = self._generate_embedding_with_cache(query)
             logger.debug(f"Generated query embedding with {len(query_embedding)} dimensions")
             
-            # Check document count
-            doc_count = self.collection.count()
-            if doc_count == 0:
-                logger.warning("No documents in ChromaDB collection")
-                return []
-            
-            # Retrieve more candidates than needed for filtering
-            candidate_count = min(max_chunks * 3, doc_count)
-            logger.debug(f"Querying ChromaDB for {candidate_count} candidates from {doc_count} total documents")
-            
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=candidate_count,
-                include=["metadatas", "documents", "distances"]
-            )
-            
-            if not results['ids'] or not results['ids'][0]:
-                logger.warning("ChromaDB query returned no results")
-                return []
-            
-            logger.debug(f"ChromaDB returned {len(results['ids'][0])} results")
-            
-            # Filter by similarity threshold and manage tokens
-            filtered_docs = []
-            total_tokens = 0
-            filtered_count = 0
-            token_limited_count = 0
-            
-            for i in range(len(results['ids'][0])):
-                similarity_score = 1 - results['distances'][0][i]
-                
-                # Only include chunks above similarity threshold
-                if similarity_score < self.similarity_threshold:
-                    filtered_count += 1
-                    continue
-                
-                chunk_text = results['documents'][0][i]
-                chunk_tokens = len(chunk_text.split()) * 1.3  # Rough token estimate
-                
-                # Check if adding this chunk would exceed context limit
-                if total_tokens + chunk_tokens > self.max_context_tokens:
-                    token_limited_count += 1
-                    logger.debug(f"Token limit reached: {total_tokens:.1f} + {chunk_tokens:.1f} > {self.max_context_tokens}")
-                    break
-                
-                filtered_docs.append({
-                    "title": results['metadatas'][0][i]['title'],
-                    "content": chunk_text,
-                    "source": results['metadatas'][0][i]['source'],
-                    "score": similarity_score,
-                    "chunk_index": results['metadatas'][0][i].get('chunk_index', 0),
-                    "doc_id": results['metadatas'][0][i].get('doc_id', 'unknown')
-                })
-                
-                total_tokens += chunk_tokens
-                
-                # Stop if we have enough high-quality chunks
-                if len(filtered_docs) >= max_chunks:
-                    logger.debug(f"Max chunks limit reached: {max_chunks}")
-                    break
-            
-            # Sort by relevance score (highest first)
-            filtered_docs.sort(key=lambda x: x['score'], reverse=True)
-            
-            # Enhanced logging
-            retrieval_stats = {
-                "candidates_searched": len(results['ids'][0]),
-                "filtered_by_similarity": filtered_count,
-                "filtered_by_tokens": token_limited_count,
-                "final_count": len(filtered_docs),
-                "total_tokens": int(total_tokens),
-                "similarity_threshold": self.similarity_threshold,
-                "max_context_tokens": self.max_context_tokens
-            }
-            
-            logger.info(f"Retrieved {len(filtered_docs)} chunks ({total_tokens:.0f} tokens) for query - Stats: {retrieval_stats}")
-            
-            if len(filtered_docs) == 0:
-                logger.warning(f"No documents passed similarity threshold of {self.similarity_threshold}. "
-                             f"Consider lowering threshold or checking document quality.")
-            
-            return filtered_docs
+            return self._retrieve_with_embedding(query, query_embedding, max_chunks)
         
         except Exception as e:
             logger.error(f"Error in adaptive retrieval for query '{query[:50]}...': {e}", exc_info=True)
             raise  # Re-raise to trigger retry mechanism
     
+    @async_retry_with_exponential_backoff(max_retries=2, base_delay=0.5, max_delay=5)
+    async def adaptive_retrieval_async(self, query: str, max_chunks: int = 5) -> List[Dict]:
+        """
+        Async adaptive retrieval.
+        
+        The query embedding is awaited from the micro-batching service so concurrent
+        requests share encoder passes; the ChromaDB query runs on the bounded executor.
+        """
+        if not query or not query.strip():
+            logger.warning("Empty query provided to adaptive_retrieval_async")
+            return []
+        
+        try:
+            query_embedding = await self._generate_embedding_with_cache_async(query)
+            return await self.run_in_executor(self._retrieve_with_embedding, query, query_embedding, max_chunks)
+        
+        except Exception as e:
+            logger.error(f"Error in async adaptive retrieval for query '{query[:50]}...': {e}", exc_info=True)
+            raise  # Re-raise to trigger retry mechanism
+    
+    def _retrieve_with_embedding(self, query: str, query_embedding: List[float], max_chunks: int) -> List[Dict]:
+        """Query ChromaDB with a precomputed embedding and apply relevance and token filtering."""
+        # Check document count
+        doc_count = self.collection.count()
+        if doc_count == 0:
+            logger.warning("No documents in ChromaDB collection")
+            return []
+        
+        # Retrieve more candidates than needed for filtering
+        candidate_count = min(max_chunks * 3, doc_count)
+        logger.debug(f"Querying ChromaDB for {candidate_count} candidates from {doc_count} total documents")
+        
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=candidate_count,
+            include=["metadatas", "documents", "distances"]
+        )
+        
+        return self._filter_candidates(results, 0, max_chunks)
+    
+    def _retrieve_batch(self, query_embeddings: List[List[float]], max_chunks_list: List[int]) -> List[List[Dict]]:
+        """Retrieve context for several queries with a single ChromaDB query."""
+        doc_count = self.collection.count()
+        if doc_count == 0:
+            logger.warning("No documents in ChromaDB collection")
+            return [[] for _ in query_embeddings]
+        
+        candidate_count = min(max(max_chunks_list) * 3, doc_count)
+        results = self.collection.query(
+            query_embeddings=list(query_embeddings),
+            n_results=candidate_count,
+            include=["metadatas", "documents", "distances"]
+        )
+        
+        return [self._filter_candidates(results, row, max_chunks)
+                for row, max_chunks in enumerate(max_chunks_list)]
+    
+    def _filter_candidates(self, results: Dict, row: int, max_chunks: int) -> List[Dict]:
+        """Apply relevance and token filtering to one query row of a ChromaDB result."""
+        if not results['ids'] or not results['ids'][row]:
+            logger.warning("ChromaDB query returned no results")
+            return []
+        
+        logger.debug(f"ChromaDB returned {len(results['ids'][row])} results")
+        
+        # Filter by similarity threshold and manage tokens
+        filtered_docs = []
+        total_tokens = 0
+        filtered_count = 0
+        token_limited_count = 0
+        
+        for i in range(len(results['ids'][row])):
+            similarity_score = 1 - results['distances'][row][i]
+            
+            # Only include chunks above similarity threshold
+            if similarity_score < self.similarity_threshold:
+                filtered_count += 1
+                continue
+            
+            chunk_text = results['documents'][row][i]
+            chunk_tokens = len(chunk_text.split()) * 1.3  # Rough token estimate
+            
+            # Check if adding this chunk would exceed context limit
+            if total_tokens + chunk_tokens > self.max_context_tokens:
+                token_limited_count += 1
+                logger.debug(f"Token limit reached: {total_tokens:.1f} + {chunk_tokens:.1f} > {self.max_context_tokens}")
+                break
+            
+            filtered_docs.append({
+                "title": results['metadatas'][row][i]['title'],
+                "content": chunk_text,
+                "source": results['metadatas'][row][i]['source'],
+                "score": similarity_score,
+                "chunk_index": results['metadatas'][row][i].get('chunk_index', 0),
+                "doc_id": results['metadatas'][row][i].get('doc_id', 'unknown'),
+                "chunk_id": results['ids'][row][i]
+            })
+            
+            total_tokens += chunk_tokens
+            
+            # Stop if we have enough high-quality chunks
+            if len(filtered_docs) >= max_chunks:
+                logger.debug(f"Max chunks limit reached: {max_chunks}")
+                break
+        
+        # Sort by relevance score (highest first)
+        filtered_docs.sort(key=lambda x: x['score'], reverse=True)
+        
+        # Enhanced logging
+        retrieval_stats = {
+            "candidates_searched": len(results['ids'][row]),
+            "filtered_by_similarity": filtered_count,
+            "filtered_by_tokens": token_limited_count,
+            "final_count": len(filtered_docs),
+            "total_tokens": int(total_tokens),
+            "similarity_threshold": self.similarity_threshold,
+            "max_context_tokens": self.max_context_tokens
+        }
+        
+        logger.info(f"Retrieved {len(filtered_docs)} chunks ({total_tokens:.0f} tokens) for query - Stats: {retrieval_stats}")
+        
+        if len(filtered_docs) == 0:
+            logger.warning(f"No documents passed similarity threshold of {self.similarity_threshold}. "
+                         f"Consider lowering threshold or checking document quality.")
+        
+        return filtered_docs
+    
+    def keyword_search(self, query: str, top_k: int = 10) -> List[Dict]:
+        """
+        BM25 keyword retrieval over chunks.
+        
+        Returns chunks in the same shape as adaptive_retrieval, with the raw
+        BM25 score in "score" and the chunk id in "chunk_id".
+        """
+        hits = self.keyword_index.search(query, top_k=top_k)
+        if not hits:
+            return []
+        
+        results = self.collection.get(ids=[chunk_id for chunk_id, _, _ in hits],
+                                      include=["documents", "metadatas"])
+        stored = {
+            chunk_id: (text, metadata or {})
+            for chunk_id, text, metadata in zip(results.get("ids", []), results.get("documents", []),
+                                                results.get("metadatas", []))
+        }
+        
+        docs = []
+        for chunk_id, doc_id, score in hits:
+            if chunk_id not in stored:
+                continue
+            text, metadata = stored[chunk_id]
+            docs.append({
+                "title": metadata.get("title", ""),
+                "content": text,
+                "source": metadata.get("source", ""),
+                "score": score,
+                "chunk_index": metadata.get("chunk_index", 0),
+                "doc_id": metadata.get("doc_id", doc_id),
+                "chunk_id": chunk_id
+            })
+        return docs
+    
+    async def keyword_search_async(self, query: str, top_k: int = 10) -> List[Dict]:
+        """Async keyword_search; the ChromaDB lookup runs on the bounded executor."""
+        return await self.run_in_executor(self.keyword_search, query, top_k)
+    
     def search_documents(self, query: str, top_k: int = 3) -> List[Dict]:
         """Legacy method for backward compatibility"""
         return self.adaptive_retrieval(query, max_chunks=top_k)
@@ -635,109 +1706,383 @@ class LocalRAGSystem:
         
         return "\n".join(context_parts)
     
-    def extract_key_sentences(self, text: str, query: str, max_sentences: int = 2) -> str:
-        """Extract most relevant sentences from a chunk"""
-        sentences = text.split('. ')
-        if len(sentences) <= max_sentences:
+    def _score_sentences(self, text: str, query: str) -> List[tuple]:
+        """Split text into sentences, scoring each by the share of the query's terms it contains."""
+        query_terms = set(tokenize(query)) - QUESTION_WORDS
+        scored = []
+        for position, (start, end) in enumerate(split_sentences(text)):
+            sentence = text[start:end]
+            overlap = len(query_terms.intersection(tokenize(sentence))) / len(query_terms) if query_terms else 0.0
+            scored.append((position, sentence, overlap))
+        return scored
+    
+    def extract_key_sentences(self, text: str, query: str, max_sentences: int = 2,
+                              min_overlap: float = 0.0) -> str:
+        """
+        Extract most relevant sentences from a chunk.
+        
+        Sentences are ranked by query-term overlap (earlier sentences win ties,
+        as they often carry the main point) and returned in their original
+        order. Sentences covering less than min_overlap of the query's terms
+        are dropped, so the result may be empty.
+        """
+        scored = self._score_sentences(text, query)
+        if len(scored) <= max_sentences and min_overlap <= 0.0:
             return text
         
-        query_words = set(query.lower().split())
-        scored_sentences = []
+        candidates = [item for item in scored if item[2] >= min_overlap] if min_overlap > 0.0 else scored
+        ranked = sorted(candidates, key=lambda item: (-item[2], item[0]))
+        top_sentences = sorted(ranked[:max_sentences])
         
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-            
-            sentence_words = set(sentence.lower().split())
-            # Simple relevance scoring based on word overlap
-            overlap_score = len(query_words.intersection(sentence_words))
-            # Bonus for position (earlier sentences often more important)
-            position_bonus = (len(sentences) - sentences.index(sentence)) / len(sentences)
-            total_score = overlap_score + position_bonus
-            
-            scored_sentences.append((sentence, total_score))
+        result = ' '.join(sentence for _, sentence, _ in top_sentences)
+        if result and result[-1] not in '.!?':
+            result += '.'
         
-        # Return top sentences
-        scored_sentences.sort(key=lambda x: x[1], reverse=True)
-        top_sentences = [s[0] for s in scored_sentences[:max_sentences]]
+        return result
+    
+    def _extractive_answer(self, question: str, docs: List[Dict], start_time: float) -> Optional[Dict]:
+        """
+        Answer straight from the best chunk when retrieval is conclusive.
         
-        result = '. '.join(top_sentences)
-        if not result.endswith('.'):
-            result += '.'
+        Applies when the top chunk's similarity is at least extractive_min_score
+        and at least one of its sentences contains extractive_min_overlap of the
+        question's terms. Returns None when the LLM should answer instead.
+        """
+        if not self.extractive_answers_enabled or not docs:
+            return None
+        
+        top = max(docs, key=lambda doc: doc['score'])
+        if top['score'] < self.extractive_min_score:
+            return None
         
+        sentences = self.extract_key_sentences(top['content'], question, self.extractive_max_sentences,
+                                               min_overlap=self.extractive_min_overlap)
+        if not sentences:
+            return None
+        
+        self.performance_monitor.record_counter("rag_extractive_answers", 1.0)
+        logger.info(f"Answering extractively from '{top['title']}' (score {top['score']:.2f})")
+        result = self._rag_answer_result(f"{sentences}\n\nSource: {top['title']}", [top], start_time)
+        result["response_type"] = "extractive"
         return result
     
-    def generate_answer(self, question: str, context_docs: List[Dict]) -> str:
-        """Generate answer using retrieved context with efficient prompting"""
-        if not context_docs:
-            return "I couldn't find any relevant documents to answer your question."
+    @staticmethod
+    def _is_llm_failure_answer(answer: str) -> bool:
+        """Whether an answer is an LLM client's failure message rather than a generated answer."""
+        return isinstance(answer, LLMFailureAnswer)
+    
+    def _is_cacheable_result(self, result: Dict) -> bool:
+        """Whether a result may be cached; errors and LLM unavailable/busy answers never are."""
+        return not (result.get("error") or result.get("response_type") == "error"
+                    or result.get("fallback_reason") == "generation_failed"
+                    or self._is_llm_failure_answer(result.get("answer", "")))
+    
+    def _schedule_refinement(self, question: str, docs: List[Dict], cache_key: Optional[str],
+                             model_hint: Optional[str] = None):
+        """
+        Queue an LLM regeneration of an extractive answer.
+        
+        The refinement starts from _start_refinement once the caller has cached
+        the extractive answer, so the LLM answer always replaces it (unless the
+        collection changed meanwhile) and later identical queries get it.
+        """
+        if self.extractive_refine_in_background and cache_key is not None:
+            self._pending_refinements[cache_key] = (question, docs, model_hint, self.collection_generation)
+    
+    def _start_refinement(self, cache_key: str):
+        """Start the refinement queued for cache_key, if any, in the background."""
+        pending = self._pending_refinements.pop(cache_key, None)
+        if pending is None:
+            return
+        
+        question, docs, model_hint, generation = pending
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            threading.Thread(target=self._refine_extractive,
+                             args=(question, docs, cache_key, generation, model_hint),
+                             name="rag_refine", daemon=True).start()
+            return
+        
+        task = loop.create_task(self._refine_extractive_async(question, docs, cache_key, generation, model_hint))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    def _refine_extractive(self, question: str, docs: List[Dict], cache_key: str, generation: int,
+                           model_hint: Optional[str]):
+        """Blocking background refinement of an extractive answer."""
+        start_time = time.time()
+        try:
+            route = self._route_model(question, docs, model_hint)
+            answer = self.generate_answer(question, docs, route, priority=LLMPriority.BACKGROUND)
+        except Exception as e:
+            logger.warning(f"Background refinement failed: {e}")
+            return
+        self._store_refined_answer(answer, docs, start_time, route, cache_key, generation)
+    
+    async def _refine_extractive_async(self, question: str, docs: List[Dict], cache_key: str, generation: int,
+                                       model_hint: Optional[str]):
+        """Async background refinement of an extractive answer."""
+        start_time = time.time()
+        try:
+            route = self._route_model(question, docs, model_hint)
+            answer = await self.generate_answer_async(question, docs, LLMPriority.BACKGROUND, route)
+        except Exception as e:
+            logger.warning(f"Background refinement failed: {e}")
+            return
+        self._store_refined_answer(answer, docs, start_time, route, cache_key, generation)
+    
+    def _store_refined_answer(self, answer: str, docs: List[Dict], start_time: float,
+                              route: RouteDecision, cache_key: str, generation: int):
+        """Replace a cached extractive answer with its LLM refinement."""
+        if self._is_llm_failure_answer(answer):
+            logger.debug("Background refinement got no LLM answer; keeping extractive answer")
+            return
+        self._cache_rag_result(cache_key, self._rag_answer_result(answer, docs, start_time, route), generation)
+        logger.debug(f"Refined extractive answer cached ({len(answer)} chars)")
+    
+    def _count_tokens(self, text: str) -> int:
+        """Count tokens with the LLM's tokenizer (or the closest available one)."""
+        return self.token_counter.count(text)
+    
+    def build_compressed_context(self, question: str, chunks: List[Dict],
+                                 query_embedding: Optional[List[float]] = None) -> Optional[str]:
+        """
+        Build context from the chunks' sentences most similar to the question.
+        
+        Blocking (sentence index reads and writes, encoding of unindexed
+        sentences, tokenization); async callers go through the executor.
+        query_embedding, when given, saves embedding the question again.
         
-        # Build efficient context
-        context = self.build_efficient_context(context_docs)
+        Returns:
+            The context, or None if compression is disabled or failed (callers
+            then use build_efficient_context)
+        """
+        if not self.context_compression_enabled or not chunks:
+            return None
+        
+        try:
+            if query_embedding is None:
+                query_embedding = self._generate_embedding_with_cache(question)
+            context, stats = self.context_compressor.compress(query_embedding, chunks)
+        except Exception as e:
+            logger.warning(f"Context compression failed, using full chunks: {e}")
+            return None
+        
+        if not stats["sentences_selected"]:
+            return None
+        self.performance_monitor.record_histogram("context_compression_tokens", stats["context_tokens"])
+        logger.debug(f"Compressed context: {stats['sentences_selected']}/{stats['sentences_available']} sentences, "
+                     f"{stats['context_tokens']}/{stats['token_budget']} tokens ({stats['tokenizer']})")
+        return context
+    
+    def _build_answer_messages(self, question: str, context_docs: List[Dict],
+                               query_embedding: Optional[List[float]] = None) -> List[Dict[str, str]]:
+        """Build the chat messages for a context-grounded answer."""
+        # Keep only the sentences relevant to the question, falling back to whole chunks
+        context = (self.build_compressed_context(question, context_docs, query_embedding)
+                   or self.build_efficient_context(context_docs))
         
         # Count tokens for monitoring
-        estimated_tokens = len(context.split()) * 1.3
-        logger.info(f"Using {estimated_tokens:.0f} tokens for context")
+        logger.info(f"Using {self._count_tokens(context)} tokens for context")
         
         # Efficient system prompt
         system_prompt = """Answer questions using only the provided context. Be concise but complete. If the answer isn't in the context, say so clearly."""
         
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {
                 "role": "user", 
                 "content": f"Context:\n{context}\n\nQuestion: {question}"
             }
         ]
-        
-        return self.llm_client.chat(messages, temperature=0.3, max_tokens=500)
     
-    def generate_general_answer(self, question: str) -> str:
-        """Generate answer using general knowledge without document context."""
+    async def _compression_embedding_async(self, question: str, context_docs: List[Dict]) -> Optional[List[float]]:
+        """Embed the question for context compression through the async batcher, if compression will run."""
+        if not self.context_compression_enabled or not context_docs:
+            return None
+        try:
+            return await self._generate_embedding_with_cache_async(question)
+        except Exception as e:
+            logger.warning(f"Question embedding for context compression failed: {e}")
+            return None
+    
+    async def _build_answer_messages_async(self, question: str, context_docs: List[Dict]) -> List[Dict[str, str]]:
+        """_build_answer_messages without blocking the event loop."""
+        query_embedding = await self._compression_embedding_async(question, context_docs)
+        return await self.run_in_executor(self._build_answer_messages, question, context_docs, query_embedding)
+    
+    def _build_general_messages(self, question: str) -> List[Dict[str, str]]:
+        """Build the chat messages for a general knowledge answer."""
         # General-purpose system prompt for fallback responses
         system_prompt = """You are a helpful AI assistant. Answer questions accurately and helpfully using your general knowledge. 
 Be concise but informative. If you're uncertain about something, acknowledge the uncertainty. 
 Provide practical and useful information when possible."""
         
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": question}
         ]
+    
+    def _route_model(self, question: str, context_docs: List[Dict],
+                     model_hint: Optional[str] = None) -> RouteDecision:
+        """Choose the model for a query from its intent, complexity and retrieved context size."""
+        context_tokens = int(sum(len(doc['content'].split()) * 1.3 for doc in context_docs))
+        decision = self.model_router.route(question, context_tokens, model_hint)
+        logger.debug(f"Routing query to {decision.model} ({decision.route}: {decision.reason})")
+        return decision
+    
+    def _record_route_latency(self, route: RouteDecision, start_time: float):
+        """Record generation latency for a route."""
+        self.performance_monitor.record_timer("llm_route_latency", (time.time() - start_time) * 1000,
+                                              {"route": route.route, "model": route.model})
+    
+    def generate_answer(self, question: str, context_docs: List[Dict],
+                        route: Optional[RouteDecision] = None,
+                        priority: LLMPriority = LLMPriority.INTERACTIVE) -> str:
+        """Generate answer using retrieved context with efficient prompting"""
+        if not context_docs:
+            return "I couldn't find any relevant documents to answer your question."
+        
+        route = route or self._route_model(question, context_docs)
+        messages = self._build_answer_messages(question, context_docs)
+        start_time = time.time()
+        answer = self.llm_client.chat(messages, model=route.model, temperature=0.3,
+                                      max_tokens=route.max_tokens or 500, priority=priority)
+        self._record_route_latency(route, start_time)
+        return answer
+    
+    def generate_general_answer(self, question: str, route: Optional[RouteDecision] = None) -> str:
+        """Generate answer using general knowledge without document context."""
+        route = route or self._route_model(question, [])
+        messages = self._build_general_messages(question)
+        
+        try:
+            start_time = time.time()
+            answer = self.llm_client.chat(messages, model=route.model, temperature=0.4,
+                                          max_tokens=route.max_tokens or 600)
+            self._record_route_latency(route, start_time)
+            logger.info(f"Generated general knowledge response ({len(answer)} chars)")
+            return answer
+        except Exception as e:
+            logger.error(f"Failed to generate general answer: {e}")
+            return LLMFailureAnswer("I apologize, but I'm currently unable to provide an answer to your question. "
+                                    "This could be due to a temporary service issue. Please try again later.")
+    
+    async def generate_answer_async(self, question: str, context_docs: List[Dict],
+                                    priority: LLMPriority = LLMPriority.INTERACTIVE,
+                                    route: Optional[RouteDecision] = None) -> str:
+        """Async variant of generate_answer using the non-blocking LLM client."""
+        if not context_docs:
+            return "I couldn't find any relevant documents to answer your question."
+        
+        route = route or self._route_model(question, context_docs)
+        messages = await self._build_answer_messages_async(question, context_docs)
+        start_time = time.time()
+        answer = await self.async_llm_client.chat(messages, model=route.model, temperature=0.3,
+                                                  max_tokens=route.max_tokens or 500, priority=priority)
+        self._record_route_latency(route, start_time)
+        return answer
+    
+    async def generate_general_answer_async(self, question: str,
+                                            priority: LLMPriority = LLMPriority.INTERACTIVE,
+                                            route: Optional[RouteDecision] = None) -> str:
+        """Async variant of generate_general_answer using the non-blocking LLM client."""
+        route = route or self._route_model(question, [])
+        messages = self._build_general_messages(question)
         
         try:
-            answer = self.llm_client.chat(messages, temperature=0.4, max_tokens=600)
+            start_time = time.time()
+            answer = await self.async_llm_client.chat(messages, model=route.model, temperature=0.4,
+                                                      max_tokens=route.max_tokens or 600, priority=priority)
+            self._record_route_latency(route, start_time)
             logger.info(f"Generated general knowledge response ({len(answer)} chars)")
             return answer
         except Exception as e:
             logger.error(f"Failed to generate general answer: {e}")
-            return ("I apologize, but I'm currently unable to provide an answer to your question. "
-                   "This could be due to a temporary service issue. Please try again later.")
+            return LLMFailureAnswer("I apologize, but I'm currently unable to provide an answer to your question. "
+                                    "This could be due to a temporary service issue. Please try again later.")
     
-    async def rag_query_async(self, question: str, max_chunks: int = None) -> Dict:
-        """Async RAG query with caching and request coalescing."""
+    async def run_in_executor(self, func: Callable, *args, **kwargs):
+        """Run a blocking call (ChromaDB, encoder) on the bounded executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+    
+    def _empty_question_result(self) -> Dict:
+        """Result returned for an empty question."""
+        return {
+            "answer": "Please provide a question to search for.",
+            "sources": [],
+            "context_used": 0,
+            "context_tokens": 0,
+            "efficiency_ratio": 0.0,
+            "error": "Empty query",
+            "cache_hit": False
+        }
+    
+    def _record_query_metrics(self, result: Dict, start_time: float, cache_hit: bool) -> Dict:
+        """Add cache metadata to a copy of a query result and record performance metrics."""
+        query_time = time.time() - start_time
+        # Copy so the entry stored in the cache is never mutated per request
+        result = {**result, "query_time": round(query_time, 3), "cache_hit": cache_hit}
+        
+        # Record performance metrics
+        record_rag_query_time(query_time * 1000, cache_hit)  # Convert to milliseconds
+        
+        # Update cache hit rates
+        for cache_name, cache in [("rag", self.rag_cache), ("embedding", self.embedding_cache),
+                                  ("semantic", self.semantic_cache)]:
+            cache_stats = cache.get_stats()
+            if cache_stats.get("hit_rate", 0) > 0:
+                record_cache_hit_rate(cache_stats["hit_rate"], cache_name)
+        
+        logger.info(f"RAG query completed in {query_time:.3f}s: "
+                   f"cache_hit={cache_hit}")
+        
+        return result
+    
+    async def rag_query_async(self, question: str, max_chunks: int = None,
+                              model_hint: Optional[str] = None,
+                              session_id: Optional[str] = None) -> Dict:
+        """
+        Async RAG query with caching and request coalescing.
+        
+        A cached answer past its TTL but within the cache's stale grace period
+        is returned at once with "stale": True while it is recomputed in the
+        background; error answers are never cached.
+        
+        model_hint names a model route ("fast", "default", "large") to use
+        instead of the router's rules. With a session_id the question is
+        answered as the next turn of that conversation (see _session_query_async).
+        """
         if not question or not question.strip():
             logger.warning("Empty question provided to rag_query")
-            return {
-                "answer": "Please provide a question to search for.",
-                "sources": [],
-                "context_used": 0,
-                "context_tokens": 0,
-                "efficiency_ratio": 0.0,
-                "error": "Empty query",
-                "cache_hit": False
-            }
+            return self._empty_question_result()
         
-        # Create cache key based on question and parameters
-        cache_key = self.rag_cache._generate_key("rag_query", {
-            "question": question,
-            "max_chunks": max_chunks,
-            "similarity_threshold": self.similarity_threshold
-        })
+        if session_id is not None:
+            return await self._session_query_async(question, session_id, max_chunks, model_hint)
+        
+        cache_key = self._rag_cache_key(question, max_chunks, model_hint)
+        generation = self.collection_generation
+        
+        computed = False
+        
+        scope = self._semantic_scope(max_chunks, model_hint)
         
         # Try to get cached result with request coalescing
         async def compute_rag_result():
-            return self._compute_rag_query(question, max_chunks)
+            nonlocal computed
+            query_embedding = None
+            if self.semantic_cache_enabled:
+                query_embedding = await self._semantic_query_embedding_async(question)
+                similar = self._semantic_lookup(query_embedding, scope, generation)
+                if similar is not None:
+                    return similar
+            
+            computed = True
+            result = await self._compute_rag_query_async(question, max_chunks, model_hint, refine_key=cache_key)
+            self._semantic_store(question, query_embedding, result, scope, generation)
+            return result
         
         start_time = time.time()
         logger.info(f"Starting RAG query: '{question[:100]}...' (max_chunks={max_chunks})")
@@ -746,61 +2091,220 @@ Provide practical and useful information when possible."""
         result = await self.rag_cache.get_or_compute(
             key=cache_key,
             compute_func=compute_rag_result,
-            ttl=300.0,  # 5 minutes
-            use_coalescing=True
+            ttl=self.rag_cache_ttl,
+            use_coalescing=True,
+            tags_func=self._rag_cache_tags,
+            should_cache=lambda value: (generation == self.collection_generation
+                                        and self._is_cacheable_result(value)),
+            mark_stale=lambda value: {**value, "stale": True},
+            on_computed=lambda _: self._start_refinement(cache_key)
         )
         
-        # Add cache metadata and record performance metrics
-        query_time = time.time() - start_time
-        result["query_time"] = round(query_time, 3)
-        cache_hit = result.get("cache_hit", True)  # Default to True if from cache
-        result["cache_hit"] = cache_hit
+        return self._record_query_metrics(result, start_time, cache_hit=not computed)
+    
+    def _rag_cache_tags(self, result: Dict) -> List[str]:
+        """Invalidation tags for a cached answer: its source documents, or no_context."""
+        doc_ids = {source.get("doc_id") for source in result.get("sources", []) if source.get("doc_id")}
+        if not doc_ids:
+            return [NO_CONTEXT_TAG]
+        return [f"doc:{doc_id}" for doc_id in sorted(doc_ids)]
+    
+    def _cache_rag_result(self, cache_key: str, result: Dict, generation: int):
+        """Store an answer unless it is an error or the collection changed while it was being computed."""
+        if generation != self.collection_generation:
+            logger.debug("Collection changed during query; not caching answer")
+            return
+        if not self._is_cacheable_result(result):
+            logger.debug("Not caching error answer")
+            return
+        self.rag_cache.set(cache_key, result, ttl=self.rag_cache_ttl, tags=self._rag_cache_tags(result))
+    
+    def _semantic_scope(self, max_chunks: Optional[int], model_hint: Optional[str] = None) -> tuple:
+        """Retrieval and routing parameters a semantically cached answer must share with the query."""
+        return (max_chunks, self.similarity_threshold, model_hint)
+    
+    def _semantic_query_embedding(self, question: str) -> Optional[List[float]]:
+        """Query embedding for the semantic cache; None if encoding fails (retrieval reports it)."""
+        try:
+            return self._generate_embedding_with_cache(question)
+        except Exception as e:
+            logger.warning(f"Semantic cache skipped, could not embed query: {e}")
+            return None
+    
+    async def _semantic_query_embedding_async(self, question: str) -> Optional[List[float]]:
+        """Async variant of _semantic_query_embedding."""
+        try:
+            return await self._generate_embedding_with_cache_async(question)
+        except Exception as e:
+            logger.warning(f"Semantic cache skipped, could not embed query: {e}")
+            return None
+    
+    def _semantic_lookup(self, query_embedding: Optional[List[float]], scope: tuple,
+                         generation: int) -> Optional[Dict]:
+        """Answer cached for a paraphrase of the query, if any."""
+        if query_embedding is None:
+            return None
+        return self.semantic_cache.lookup(query_embedding, generation, scope)
+    
+    def _semantic_store(self, question: str, query_embedding: Optional[List[float]], result: Dict,
+                        scope: tuple, generation: int):
+        """Index a computed answer for paraphrase lookups (errors and stale answers excluded)."""
+        if (not self.semantic_cache_enabled or query_embedding is None
+                or generation != self.collection_generation
+                or not self._is_cacheable_result(result)):
+            return
+        self.semantic_cache.ttl = self.rag_cache_ttl
+        self.semantic_cache.store(question, query_embedding, result, generation, scope)
+    
+    def invalidate_documents(self, doc_ids: List[str], documents_added: bool = False) -> int:
+        """
+        Record a collection mutation and evict the answers it affects.
         
-        # Record performance metrics
-        record_rag_query_time(query_time * 1000, cache_hit)  # Convert to milliseconds
+        Answers citing any of doc_ids are evicted. When documents were added,
+        answers that found no relevant context are evicted too, since the new
+        content may now answer them.
         
-        # Update cache hit rates
-        for cache_name, cache in [("rag", self.rag_cache), ("embedding", self.embedding_cache)]:
-            cache_stats = cache.get_stats()
-            if cache_stats.get("hit_rate", 0) > 0:
-                record_cache_hit_rate(cache_stats["hit_rate"], cache_name)
+        Returns:
+            Number of cached answers evicted
+        """
+        self.collection_generation += 1
         
-        logger.info(f"RAG query completed in {query_time:.3f}s: "
-                   f"cache_hit={cache_hit}")
+        tags = [f"doc:{doc_id}" for doc_id in doc_ids]
+        if documents_added:
+            tags.append(NO_CONTEXT_TAG)
         
-        return result
+        evicted = self.rag_cache.invalidate_tags(tags)
+        logger.debug(f"Collection generation {self.collection_generation}: "
+                     f"evicted {evicted} cached answers for {len(doc_ids)} documents")
+        return evicted
+    
+    def _rag_cache_key(self, question: str, max_chunks: Optional[int], model_hint: Optional[str] = None) -> str:
+        """Create the RAG cache key based on question and parameters."""
+        params = {
+            "question": question,
+            "max_chunks": max_chunks,
+            "similarity_threshold": self.similarity_threshold
+        }
+        if model_hint:
+            params["model_hint"] = model_hint
+        return self.rag_cache._generate_key("rag_query", params)
+    
+    def _select_max_chunks(self, question: str) -> int:
+        """Adaptive chunk selection based on query complexity."""
+        query_words = len(question.split())
+        if query_words < 10:
+            max_chunks = 2  # Simple query
+        elif any(word in question.lower() for word in ['compare', 'difference', 'versus', 'analyze']):
+            max_chunks = 5  # Complex comparison query
+        else:
+            max_chunks = 3  # Default
+        
+        logger.debug(f"Auto-selected max_chunks={max_chunks} based on query complexity ({query_words} words)")
+        return max_chunks
+    
+    def _format_sources(self, docs: List[Dict]) -> List[Dict[str, str]]:
+        """Format retrieved chunks as API source entries."""
+        return [{"title": doc["title"], "score": f"{doc['score']:.2f}", "doc_id": str(doc.get("doc_id", "unknown"))}
+                for doc in docs]
+    
+    def _retrieval_error_result(self, error: Exception) -> Dict:
+        """Result returned when document retrieval fails."""
+        return {
+            "answer": "I'm sorry, I encountered an error while searching for relevant documents. Please try again.",
+            "sources": [],
+            "context_used": 0,
+            "context_tokens": 0,
+            "efficiency_ratio": 0.0,
+            "error": f"Retrieval error: {str(error)}",
+            "cache_hit": False
+        }
+    
+    def _general_answer_result(self, fallback_answer: str, response_type: str,
+                               fallback_reason: str, total_documents: int,
+                               route: Optional[RouteDecision] = None) -> Dict:
+        """Result returned when no relevant documents were found."""
+        return {
+            "answer": fallback_answer,
+            "sources": [],
+            "context_used": 0,
+            "context_tokens": 0,
+            "efficiency_ratio": 0.0,
+            "cache_hit": False,
+            "response_type": response_type,
+            "fallback_reason": fallback_reason,
+            "query_stats": {
+                "similarity_threshold": self.similarity_threshold,
+                "total_documents": total_documents
+            },
+            "model_route": route.to_dict() if route else None
+        }
+    
+    def _context_fallback_answer(self, docs: List[Dict]) -> str:
+        """Answer built from retrieved context when generation fails."""
+        context_preview = " | ".join([doc['content'][:100] + "..." for doc in docs[:2]])
+        return (f"I found relevant information but encountered an error generating a response. "
+                f"Here's what I found: {context_preview}")
+    
+    def _rag_answer_result(self, answer: str, docs: List[Dict], start_time: float,
+                           route: Optional[RouteDecision] = None,
+                           fallback_reason: Optional[str] = None) -> Dict:
+        """Result returned for an answer grounded in retrieved documents."""
+        # Calculate efficiency metrics
+        total_context_tokens = sum(len(doc['content'].split()) * 1.3 for doc in docs)
+        query_time = time.time() - start_time
+        
+        logger.info(f"RAG query computed in {query_time:.3f}s: {len(docs)} docs, {int(total_context_tokens)} tokens")
+        return {
+            "answer": answer,
+            "sources": self._format_sources(docs),
+            "context_used": len(docs),
+            "context_tokens": int(total_context_tokens),
+            "efficiency_ratio": len(docs) / max(total_context_tokens, 1) * 1000,  # chunks per 1000 tokens
+            "query_time": round(query_time, 3),
+            "cache_hit": False,
+            "response_type": "rag",
+            "fallback_reason": fallback_reason,
+            "model_route": route.to_dict() if route else None
+        }
+    
+    def _pipeline_error_result(self, error: Exception, start_time: float) -> Dict:
+        """Result returned when the RAG pipeline fails unexpectedly."""
+        query_time = time.time() - start_time
+        logger.error(f"RAG query failed after {query_time:.3f}s: {error}", exc_info=True)
+        
+        return {
+            "answer": "I'm sorry, I encountered an unexpected error while processing your question. Please try again.",
+            "sources": [],
+            "context_used": 0,
+            "context_tokens": 0,
+            "efficiency_ratio": 0.0,
+            "error": f"Pipeline error: {str(error)}",
+            "query_time": round(query_time, 3),
+            "cache_hit": False,
+            "response_type": "error",
+            "fallback_reason": "pipeline_error"
+        }
     
-    def _compute_rag_query(self, question: str, max_chunks: int = None) -> Dict:
-        """Compute RAG query result (non-cached)."""
+    def _compute_rag_query(self, question: str, max_chunks: int = None, model_hint: Optional[str] = None,
+                           refine_key: Optional[str] = None) -> Dict:
+        """
+        Compute RAG query result (non-cached).
+        
+        refine_key is the cache key under which a background LLM refinement of
+        an extractive answer is stored.
+        """
         start_time = time.time()
         
         try:
-            # Adaptive chunk selection based on query complexity
             if max_chunks is None:
-                query_words = len(question.split())
-                if query_words < 10:
-                    max_chunks = 2  # Simple query
-                elif any(word in question.lower() for word in ['compare', 'difference', 'versus', 'analyze']):
-                    max_chunks = 5  # Complex comparison query
-                else:
-                    max_chunks = 3  # Default
-                
-                logger.debug(f"Auto-selected max_chunks={max_chunks} based on query complexity ({query_words} words)")
+                max_chunks = self._select_max_chunks(question)
             
             # Retrieve with efficiency optimizations
             try:
                 docs = self.adaptive_retrieval(question, max_chunks=max_chunks)
             except Exception as e:
                 logger.error(f"Document retrieval failed: {e}")
-                return {
-                    "answer": "I'm sorry, I encountered an error while searching for relevant documents. Please try again.",
-                    "sources": [],
-                    "context_used": 0,
-                    "context_tokens": 0,
-                    "efficiency_ratio": 0.0,
-                    "error": f"Retrieval error: {str(e)}",
-                    "cache_hit": False
-                }
+                return self._retrieval_error_result(e)
             
             # Check if we found any documents
             if not docs:
@@ -808,8 +2312,9 @@ Provide practical and useful information when possible."""
                 logger.info("Falling back to general knowledge response")
                 
                 # Try to generate a general knowledge response
+                route = self._route_model(question, [], model_hint)
                 try:
-                    fallback_answer = self.generate_general_answer(question)
+                    fallback_answer = self.generate_general_answer(question, route)
                     response_type = "general"
                     fallback_reason = "no_relevant_documents"
                 except Exception as e:
@@ -820,89 +2325,453 @@ Provide practical and useful information when possible."""
                     response_type = "error"
                     fallback_reason = "llm_unavailable"
                 
-                return {
-                    "answer": fallback_answer,
-                    "sources": [],
-                    "context_used": 0,
-                    "context_tokens": 0,
-                    "efficiency_ratio": 0.0,
-                    "cache_hit": False,
-                    "response_type": response_type,
-                    "fallback_reason": fallback_reason,
-                    "query_stats": {
-                        "similarity_threshold": self.similarity_threshold,
-                        "total_documents": self.collection.count()
-                    }
-                }
+                return self._general_answer_result(fallback_answer, response_type, fallback_reason,
+                                                   self.collection.count(), route)
+            
+            extractive = self._extractive_answer(question, docs, start_time)
+            if extractive is not None:
+                self._schedule_refinement(question, docs, refine_key, model_hint)
+                return extractive
             
             # Generate answer with error handling
+            route = self._route_model(question, docs, model_hint)
             try:
-                answer = self.generate_answer(question, docs)
+                answer = self.generate_answer(question, docs, route)
             except Exception as e:
                 logger.error(f"Answer generation failed: {e}")
                 # Provide fallback response with retrieved context
-                context_preview = " | ".join([doc['content'][:100] + "..." for doc in docs[:2]])
-                answer = (f"I found relevant information but encountered an error generating a response. "
-                         f"Here's what I found: {context_preview}")
+                return self._rag_answer_result(self._context_fallback_answer(docs), docs, start_time,
+                                               route, fallback_reason="generation_failed")
             
-            # Calculate efficiency metrics
-            total_context_tokens = sum(len(doc['content'].split()) * 1.3 for doc in docs)
-            query_time = time.time() - start_time
+            return self._rag_answer_result(answer, docs, start_time, route)
             
-            result = {
-                "answer": answer,
-                "sources": [{"title": doc["title"], "score": f"{doc['score']:.2f}"} for doc in docs],
-                "context_used": len(docs),
-                "context_tokens": int(total_context_tokens),
-                "efficiency_ratio": len(docs) / max(total_context_tokens, 1) * 1000,  # chunks per 1000 tokens
-                "query_time": round(query_time, 3),
-                "cache_hit": False,
-                "response_type": "rag",
-                "fallback_reason": None
-            }
+        except Exception as e:
+            return self._pipeline_error_result(e, start_time)
+    
+    async def _compute_rag_query_async(self, question: str, max_chunks: int = None,
+                                       model_hint: Optional[str] = None,
+                                       refine_key: Optional[str] = None) -> Dict:
+        """
+        Compute RAG query result (non-cached) without blocking the event loop.
+        
+        Retrieval (encoder + ChromaDB) runs on the bounded executor and generation
+        goes through the httpx-based async LLM client.
+        """
+        start_time = time.time()
+        
+        try:
+            if max_chunks is None:
+                max_chunks = self._select_max_chunks(question)
             
-            logger.info(f"RAG query computed in {query_time:.3f}s: {len(docs)} docs, {int(total_context_tokens)} tokens")
-            return result
+            try:
+                docs = await self.adaptive_retrieval_async(question, max_chunks=max_chunks)
+            except Exception as e:
+                logger.error(f"Document retrieval failed: {e}")
+                return self._retrieval_error_result(e)
+            
+            return await self._answer_with_docs_async(question, docs, start_time, model_hint=model_hint,
+                                                      refine_key=refine_key)
             
         except Exception as e:
-            query_time = time.time() - start_time
-            logger.error(f"RAG query failed after {query_time:.3f}s: {e}", exc_info=True)
+            return self._pipeline_error_result(e, start_time)
+    
+    async def _answer_with_docs_async(self, question: str, docs: List[Dict], start_time: float,
+                                      priority: LLMPriority = LLMPriority.INTERACTIVE,
+                                      model_hint: Optional[str] = None,
+                                      refine_key: Optional[str] = None) -> Dict:
+        """Generate the answer for retrieved context, or a general answer when there is none."""
+        extractive = self._extractive_answer(question, docs, start_time)
+        if extractive is not None:
+            self._schedule_refinement(question, docs, refine_key, model_hint)
+            return extractive
+        
+        route = self._route_model(question, docs, model_hint)
+        if not docs:
+            logger.warning(f"No relevant documents found for query: '{question[:50]}...'")
+            logger.info("Falling back to general knowledge response")
             
-            return {
-                "answer": "I'm sorry, I encountered an unexpected error while processing your question. Please try again.",
-                "sources": [],
-                "context_used": 0,
-                "context_tokens": 0,
-                "efficiency_ratio": 0.0,
-                "error": f"Pipeline error: {str(e)}",
+            try:
+                fallback_answer = await self.generate_general_answer_async(question, priority, route)
+                response_type = "general"
+                fallback_reason = "no_relevant_documents"
+            except Exception as e:
+                logger.error(f"General knowledge fallback failed: {e}")
+                fallback_answer = ("I couldn't find any relevant documents to answer your question, "
+                                 "and I'm currently unable to provide a general response. "
+                                 "Please try rephrasing your question or check back later.")
+                response_type = "error"
+                fallback_reason = "llm_unavailable"
+            
+            total_documents = await self.run_in_executor(self.collection.count)
+            return self._general_answer_result(fallback_answer, response_type, fallback_reason,
+                                               total_documents, route)
+        
+        try:
+            answer = await self.generate_answer_async(question, docs, priority, route)
+        except Exception as e:
+            logger.error(f"Answer generation failed: {e}")
+            return self._rag_answer_result(self._context_fallback_answer(docs), docs, start_time,
+                                           route, fallback_reason="generation_failed")
+        
+        return self._rag_answer_result(answer, docs, start_time, route)
+    
+    def _session_retrieval_query(self, session: ConversationSession, question: str) -> str:
+        """Retrieval query for a turn; follow-ups include the previous question so references resolve."""
+        if session.turns:
+            return f"{session.turns[-1].question} {question}"
+        return question
+    
+    def _build_session_messages(self, session: ConversationSession, question: str,
+                                context_docs: List[Dict],
+                                query_embedding: Optional[List[float]] = None) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for a conversation turn.
+        
+        The system prompt, summary and earlier turns are identical from one turn
+        to the next, so the backend can reuse its cached prompt state for them.
+        Retrieved context goes into the new user message, which is recorded
+        as sent so the next turn's prompt repeats it unchanged.
+        """
+        system_prompt = """Answer questions using the provided context when there is any, and the earlier conversation to understand follow-up questions. Be concise but complete. If the context does not contain the answer, say so clearly."""
+        
+        if context_docs:
+            context = (self.build_compressed_context(question, context_docs, query_embedding)
+                       or self.build_efficient_context(context_docs))
+            content = f"Context:\n{context}\n\nQuestion: {question}"
+        else:
+            content = question
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            *session.history_messages(),
+            {"role": "user", "content": content}
+        ]
+    
+    async def _session_query_async(self, question: str, session_id: str, max_chunks: int = None,
+                                   model_hint: Optional[str] = None) -> Dict:
+        """
+        Answer one turn of a conversation session.
+        
+        Turns bypass the answer caches, since an answer depends on the
+        conversation so far. Every turn of a session is sent to the same LLM
+        backend with keep_alive set, and answered turns are added to the
+        session's history.
+        """
+        start_time = time.time()
+        session = self.sessions.get_or_create(session_id)
+        
+        try:
+            if max_chunks is None:
+                max_chunks = self._select_max_chunks(question)
+            
+            try:
+                docs = await self.adaptive_retrieval_async(self._session_retrieval_query(session, question),
+                                                           max_chunks=max_chunks)
+            except Exception as e:
+                logger.error(f"Document retrieval failed: {e}")
+                result = self._retrieval_error_result(e)
+                return self._record_query_metrics({**result, "session_id": session.session_id},
+                                                  start_time, cache_hit=False)
+            
+            route = self._route_model(question, docs, model_hint)
+            query_embedding = await self._compression_embedding_async(question, docs)
+            messages = await self.run_in_executor(self._build_session_messages, session, question, docs,
+                                                  query_embedding)
+            generation_start = time.time()
+            answer = await self.async_llm_client.chat(
+                messages, model=route.model,
+                temperature=0.3 if docs else 0.4,
+                max_tokens=route.max_tokens or (500 if docs else 600),
+                affinity=session.session_id,
+                keep_alive=self.sessions.keep_alive
+            )
+            self._record_route_latency(route, generation_start)
+            
+            if docs:
+                result = self._rag_answer_result(answer, docs, start_time, route)
+            else:
+                total_documents = await self.run_in_executor(self.collection.count)
+                result = self._general_answer_result(answer, "general", "no_relevant_documents",
+                                                     total_documents, route)
+            
+            if not self._is_llm_failure_answer(answer):
+                self.sessions.record_turn(session, question, answer, message=messages[-1]["content"])
+        
+        except Exception as e:
+            result = self._pipeline_error_result(e, start_time)
+        
+        result["session_id"] = session.session_id
+        return self._record_query_metrics(result, start_time, cache_hit=False)
+    
+    async def rag_query_batch(self, questions: List[str], max_chunks: int = None,
+                              max_concurrency: int = None,
+                              model_hint: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Answer many questions, yielding each result as soon as it is ready.
+        
+        Identical questions are answered once and cached answers are yielded
+        immediately. The remaining questions are embedded in one encoder batch
+        and retrieved with a single multi-embedding ChromaDB query, then LLM
+        generation runs with at most max_concurrency (default
+        batch_query_concurrency) requests in flight. Every result carries the
+        "index" and "question" it answers; results arrive in completion order.
+        """
+        start_time = time.time()
+        generation = self.collection_generation
+        scope = self._semantic_scope(max_chunks, model_hint)
+        
+        positions: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            if not question or not question.strip():
+                yield {"index": index, "question": question, **self._empty_question_result()}
+            else:
+                positions.setdefault(question, []).append(index)
+        
+        def emit(question: str, result: Dict, cache_hit: bool) -> List[Dict]:
+            result = self._record_query_metrics(result, start_time, cache_hit=cache_hit)
+            return [{"index": index, "question": question, **result} for index in positions[question]]
+        
+        pending = []
+        for question in positions:
+            cached = self.rag_cache.get(self._rag_cache_key(question, max_chunks, model_hint))
+            if cached is not None:
+                for item in emit(question, cached, True):
+                    yield item
+            else:
+                pending.append(question)
+        
+        if not pending:
+            return
+        
+        logger.info(f"Batch query: {len(questions)} questions, {len(positions)} unique, {len(pending)} to compute")
+        
+        try:
+            embeddings = await self.run_in_executor(self._encode_batch, pending)
+        except Exception as e:
+            logger.error(f"Batch query embedding failed: {e}")
+            for question in pending:
+                for item in emit(question, self._retrieval_error_result(e), False):
+                    yield item
+            return
+        
+        to_retrieve = []
+        for question, embedding in zip(pending, embeddings):
+            # Context compression reuses the question's embedding
+            self._cache_embedding(question, embedding)
+            similar = self._semantic_lookup(embedding, scope, generation) if self.semantic_cache_enabled else None
+            if similar is not None:
+                for item in emit(question, similar, True):
+                    yield item
+            else:
+                to_retrieve.append((question, embedding))
+        
+        if not to_retrieve:
+            return
+        
+        chunk_limits = [max_chunks if max_chunks is not None else self._select_max_chunks(question)
+                        for question, _ in to_retrieve]
+        try:
+            retrieved = await self.run_in_executor(
+                self._retrieve_batch, [embedding for _, embedding in to_retrieve], chunk_limits
+            )
+        except Exception as e:
+            logger.error(f"Batch document retrieval failed: {e}")
+            for question, _ in to_retrieve:
+                for item in emit(question, self._retrieval_error_result(e), False):
+                    yield item
+            return
+        
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.batch_query_concurrency))
+        
+        async def answer(question: str, embedding: List[float], docs: List[Dict]):
+            cache_key = self._rag_cache_key(question, max_chunks, model_hint)
+            async with semaphore:
+                answer_start = time.time()
+                try:
+                    result = await self._answer_with_docs_async(question, docs, answer_start,
+                                                                 priority=LLMPriority.BATCH,
+                                                                 model_hint=model_hint,
+                                                                 refine_key=cache_key)
+                except Exception as e:
+                    result = self._pipeline_error_result(e, answer_start)
+            self._cache_rag_result(cache_key, result, generation)
+            self._start_refinement(cache_key)
+            self._semantic_store(question, embedding, result, scope, generation)
+            return question, result
+        
+        tasks = [asyncio.ensure_future(answer(question, embedding, docs))
+                 for (question, embedding), docs in zip(to_retrieve, retrieved)]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                question, result = await completed
+                for item in emit(question, result, False):
+                    yield item
+        finally:
+            # Stop outstanding generations if the consumer goes away
+            for task in tasks:
+                task.cancel()
+    
+    def rag_query(self, question: str, max_chunks: int = None, model_hint: Optional[str] = None) -> Dict:
+        """
+        Synchronous RAG query (backwards compatibility).
+        
+        Shares the cache with rag_query_async but runs the blocking pipeline
+        directly instead of spinning up an event loop per call.
+        """
+        if not question or not question.strip():
+            logger.warning("Empty question provided to rag_query")
+            return self._empty_question_result()
+        
+        cache_key = self._rag_cache_key(question, max_chunks, model_hint)
+        start_time = time.time()
+        logger.info(f"Starting RAG query: '{question[:100]}...' (max_chunks={max_chunks})")
+        
+        generation = self.collection_generation
+        scope = self._semantic_scope(max_chunks, model_hint)
+        query_embedding = None
+        
+        result = self.rag_cache.get(cache_key)
+        cache_hit = result is not None
+        if not cache_hit:
+            if self.semantic_cache_enabled:
+                query_embedding = self._semantic_query_embedding(question)
+                result = self._semantic_lookup(query_embedding, scope, generation)
+                cache_hit = result is not None
+            if not cache_hit:
+                result = self._compute_rag_query(question, max_chunks, model_hint, refine_key=cache_key)
+                self._semantic_store(question, query_embedding, result, scope, generation)
+            self._cache_rag_result(cache_key, result, generation)
+            self._start_refinement(cache_key)
+        
+        return self._record_query_metrics(result, start_time, cache_hit=cache_hit)
+    
+    def rag_query_stream(self, question: str, max_chunks: int = None,
+                         model_hint: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Streaming RAG query.
+        
+        Yields event dictionaries in order: one "sources" event with the retrieved
+        context, "token" events as the LLM produces them, and a final "done" event
+        carrying the response metadata. Failures are reported as an "error" event.
+        Completed answers are stored in the RAG cache under the same key as
+        rag_query_async, and cache hits are replayed as a single token.
+        """
+        if not question or not question.strip():
+            logger.warning("Empty question provided to rag_query_stream")
+            yield {"type": "error", "error": "Empty query",
+                   "message": "Please provide a question to search for."}
+            return
+        
+        start_time = time.time()
+        cache_key = self._rag_cache_key(question, max_chunks, model_hint)
+        generation = self.collection_generation
+        scope = self._semantic_scope(max_chunks, model_hint)
+        query_embedding = None
+        
+        cached = self.rag_cache.get(cache_key)
+        if cached is None and self.semantic_cache_enabled:
+            query_embedding = self._semantic_query_embedding(question)
+            cached = self._semantic_lookup(query_embedding, scope, generation)
+        if cached is not None:
+            yield {"type": "sources", "sources": cached.get("sources", []),
+                   "context_used": cached.get("context_used", 0)}
+            yield {"type": "token", "content": cached.get("answer", "")}
+            query_time = time.time() - start_time
+            record_rag_query_time(query_time * 1000, cache_hit=True)
+            yield {
+                "type": "done",
+                "context_used": cached.get("context_used", 0),
+                "context_tokens": cached.get("context_tokens", 0),
+                "efficiency_ratio": cached.get("efficiency_ratio", 0.0),
+                "response_type": cached.get("response_type", "rag"),
+                "fallback_reason": cached.get("fallback_reason"),
                 "query_time": round(query_time, 3),
-                "cache_hit": False,
-                "response_type": "error",
-                "fallback_reason": "pipeline_error"
+                "cache_hit": True
             }
-    
-    def rag_query(self, question: str, max_chunks: int = None) -> Dict:
-        """Synchronous wrapper for RAG query (backwards compatibility)."""
-        import asyncio
+            return
+        
+        if max_chunks is None:
+            max_chunks = self._select_max_chunks(question)
         
-        # Get or create event loop
         try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        # Run async query
-        if loop.is_running():
-            # If loop is already running, use run_in_executor
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(
-                    lambda: asyncio.run(self.rag_query_async(question, max_chunks))
-                )
-                return future.result()
+            docs = self.adaptive_retrieval(question, max_chunks=max_chunks)
+        except Exception as e:
+            logger.error(f"Document retrieval failed during streaming query: {e}")
+            yield {"type": "error", "error": f"Retrieval error: {str(e)}",
+                   "message": "I'm sorry, I encountered an error while searching for relevant documents. Please try again."}
+            return
+        
+        extractive = self._extractive_answer(question, docs, start_time)
+        if extractive is not None:
+            yield {"type": "sources", "sources": extractive["sources"], "context_used": extractive["context_used"]}
+            yield {"type": "token", "content": extractive["answer"]}
+            self._cache_rag_result(cache_key, extractive, generation)
+            self._semantic_store(question, query_embedding, extractive, scope, generation)
+            self._schedule_refinement(question, docs, cache_key, model_hint)
+            self._start_refinement(cache_key)
+            record_rag_query_time((time.time() - start_time) * 1000, cache_hit=False)
+            yield {
+                "type": "done",
+                **{k: v for k, v in extractive.items() if k not in ("answer", "sources")}
+            }
+            return
+        
+        yield {"type": "sources", "sources": self._format_sources(docs), "context_used": len(docs)}
+        
+        if docs:
+            messages = self._build_answer_messages(question, docs)
+            temperature, max_tokens = 0.3, 500
+            response_type, fallback_reason = "rag", None
         else:
-            return loop.run_until_complete(self.rag_query_async(question, max_chunks))
+            logger.info("No relevant documents found, streaming general knowledge response")
+            messages = self._build_general_messages(question)
+            temperature, max_tokens = 0.4, 600
+            response_type, fallback_reason = "general", "no_relevant_documents"
+        route = self._route_model(question, docs, model_hint)
+        
+        answer_parts = []
+        try:
+            generation_start = time.time()
+            for token in self.llm_client.chat_stream(messages, model=route.model, temperature=temperature,
+                                                     max_tokens=route.max_tokens or max_tokens):
+                if not answer_parts:
+                    ttft_ms = (time.time() - start_time) * 1000
+                    self.performance_monitor.record_timer("llm_time_to_first_token", ttft_ms)
+                    logger.debug(f"First token streamed after {ttft_ms:.0f}ms")
+                answer_parts.append(token)
+                yield {"type": "token", "content": token}
+        except Exception as e:
+            logger.error(f"Streaming answer generation failed: {e}")
+            yield {"type": "error", "error": f"Generation error: {str(e)}",
+                   "message": str(LLM_FAILED_ANSWER)}
+            return
+        self._record_route_latency(route, generation_start)
+        
+        total_context_tokens = sum(len(doc['content'].split()) * 1.3 for doc in docs)
+        query_time = time.time() - start_time
+        result = {
+            "answer": "".join(answer_parts),
+            "sources": self._format_sources(docs),
+            "context_used": len(docs),
+            "context_tokens": int(total_context_tokens),
+            "efficiency_ratio": len(docs) / max(total_context_tokens, 1) * 1000 if docs else 0.0,
+            "query_time": round(query_time, 3),
+            "cache_hit": False,
+            "response_type": response_type,
+            "fallback_reason": fallback_reason,
+            "model_route": route.to_dict()
+        }
+        
+        # Completed streams populate the same cache entry as non-streaming queries
+        self._cache_rag_result(cache_key, result, generation)
+        self._semantic_store(question, query_embedding, result, scope, generation)
+        record_rag_query_time(query_time * 1000, cache_hit=False)
+        
+        logger.info(f"Streaming RAG query completed in {query_time:.3f}s: {len(docs)} docs")
+        yield {
+            "type": "done",
+            **{k: v for k, v in result.items() if k not in ("answer", "sources")}
+        }
     
     def get_system_diagnostics(self) -> Dict:
         """Get comprehensive system diagnostics including performance metrics."""
@@ -914,7 +2783,8 @@ Provide practical and useful information when possible."""
             cache_stats = {
                 "rag_cache": self.rag_cache.get_stats(),
                 "embedding_cache": self.embedding_cache.get_stats(),
-                "document_cache": self.document_cache.get_stats()
+                "document_cache": self.document_cache.get_stats(),
+                "semantic_cache": self.semantic_cache.get_stats()
             }
             
             pool_stats = self.pool_manager.get_all_stats()
@@ -926,16 +2796,43 @@ Provide practical and useful information when possible."""
                 "status": "healthy",
                 "document_count": doc_count,
                 "embedding_model": str(self.encoder),
+                "embedding_backend": getattr(self.encoder, "backend", "torch"),
                 "rag_settings": {
                     "similarity_threshold": self.similarity_threshold,
                     "max_context_tokens": self.max_context_tokens,
                     "chunk_size": self.chunk_size,
-                    "chunk_overlap": self.chunk_overlap
+                    "chunk_overlap": self.chunk_overlap,
+                    "embedding_batch_size": self.embedding_batch_size,
+                    "ingest_batch_size": self.ingest_batch_size,
+                    "rag_cache_ttl": self.rag_cache_ttl,
+                    "rag_cache_stale_grace": self.rag_cache.stale_grace,
+                    "collection_generation": self.collection_generation,
+                    "semantic_cache_enabled": self.semantic_cache_enabled,
+                    "semantic_cache_max_distance": self.semantic_cache.max_distance,
+                    "extractive_answers_enabled": self.extractive_answers_enabled,
+                    "extractive_min_score": self.extractive_min_score,
+                    "extractive_min_overlap": self.extractive_min_overlap,
+                    "extractive_refine_in_background": self.extractive_refine_in_background,
+                    "context_compression_enabled": self.context_compression_enabled,
+                    "context_token_budget": self.context_compressor.token_budget,
+                    "tokenizer": self.token_counter.name
                 },
                 "llm_connection": self.llm_client.get_connection_info(),
                 "performance_metrics": {
                     "cache_stats": cache_stats,
                     "connection_pool_stats": pool_stats,
+                    "embedding_service_stats": self.embedding_service.get_stats(),
+                    "embedding_store_stats": self.embedding_store.get_stats(),
+                    "deduplication_stats": self.content_index.get_stats(),
+                    "document_catalog_stats": self.document_catalog.get_stats(),
+                    "keyword_index_stats": self.keyword_index.get_stats(),
+                    "sentence_index_stats": self.sentence_index.get_stats(),
+                    "session_stats": self.sessions.get_stats(),
+                    "embedding_model_stats": get_model_registry().get_stats(),
+                    "embedding_server_stats": (self.encoder.get_stats()
+                                               if isinstance(self.encoder, RemoteEncoder) else None),
+                    "llm_scheduler_stats": get_llm_scheduler().get_stats(),
+                    "model_routing": self.model_router.get_config(),
                     "monitoring_dashboard": dashboard_data,
                     "total_cache_hit_rate": sum(
                         stats.get("hit_rate", 0) for stats in cache_stats.values()
@@ -953,6 +2850,10 @@ Provide practical and useful information when possible."""
                 "chroma_config": {
                     "path": self.data_path,
                     "collection_name": self.collection.name if hasattr(self.collection, 'name') else 'documents'
+                },
+                "vector_store": {
+                    "backend": self.vector_store_backend,
+                    **(self.collection.get_stats() if isinstance(self.collection, NumpyVectorStore) else {})
                 }
             }
         except Exception as e:
@@ -3,12 +3,16 @@
 import reflex as rx
 import httpx
 import asyncio
+import uuid
 
 class MinimalChatState(rx.State):
     """Enhanced minimal chat state with system status and document features."""
     messages: list[dict] = []
     current_input: str = ""
     
+    # Conversation session, so follow-up questions are answered in context
+    session_id: str = ""
+    
     # System status features
     show_system_panel: bool = False
     llm_healthy: bool = True
@@ -34,12 +38,15 @@ class MinimalChatState(rx.State):
             # Clear input immediately
             self.current_input = ""
             
+            if not self.session_id:
+                self.session_id = uuid.uuid4().hex
+            
             try:
                 # Make API call to RAG backend
                 async with httpx.AsyncClient(timeout=30.0) as client:
                     response = await client.post(
                         "http://localhost:8000/query",
-                        json={"question": user_question}
+                        json={"question": user_question, "session_id": self.session_id}
                     )
                     response.raise_for_status()
                     data = response.json()
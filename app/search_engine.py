@@ -23,30 +23,15 @@ from functools import wraps
 
 import numpy as np
 from sentence_transformers import SentenceTransformer, util
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 from .rag_backend import get_rag_system
 from .document_manager import DocumentManager
 from .performance_cache import get_rag_query_cache
+from .query_processor import QueryIntent, QueryProcessor
 from .error_handlers import handle_error, ApplicationError, ErrorCategory, ErrorSeverity
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class QueryIntent:
-    """Parsed query intent and metadata."""
-    original_query: str
-    normalized_query: str
-    intent_type: str  # question, search, comparison, analysis, summary
-    entities: List[str]
-    keywords: List[str]
-    semantic_concepts: List[str]
-    complexity_score: float
-    expanded_terms: List[str]
-    filters: Dict[str, Any]
-    confidence: float
-
 @dataclass
 class SearchResult:
     """Enhanced search result with relevance scoring."""
@@ -75,230 +60,6 @@ class SearchAnalytics:
     user_satisfaction: Optional[float] = None
     session_id: Optional[str] = None
 
-class QueryProcessor:
-    """Advanced query processing and understanding."""
-    
-    def __init__(self):
-        self.stop_words = {
-            'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-            'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-            'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-            'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those'
-        }
-        
-        # Intent classification patterns
-        self.intent_patterns = {
-            'question': [r'\b(what|who|where|when|why|how|which)\b', r'\?'],
-            'comparison': [r'\b(vs|versus|compare|difference|between|better|worse)\b'],
-            'analysis': [r'\b(analyze|analysis|explain|understand|insight)\b'],
-            'summary': [r'\b(summary|summarize|overview|brief|main points)\b'],
-            'search': [r'.*']  # default fallback
-        }
-        
-        # Domain-specific synonyms for query expansion
-        self.synonym_groups = {
-            'technology': ['tech', 'technology', 'digital', 'software', 'system'],
-            'business': ['business', 'company', 'organization', 'enterprise', 'firm'],
-            'analysis': ['analysis', 'analyze', 'examine', 'study', 'evaluate'],
-            'performance': ['performance', 'efficiency', 'speed', 'optimization'],
-            'security': ['security', 'safety', 'protection', 'privacy', 'secure']
-        }
-
-    def process_query(self, query: str, context: Optional[Dict] = None) -> QueryIntent:
-        """Process and understand user query intent."""
-        try:
-            # Normalize query
-            normalized = self._normalize_query(query)
-            
-            # Extract intent
-            intent_type = self._classify_intent(query)
-            
-            # Extract entities and keywords
-            entities = self._extract_entities(normalized)
-            keywords = self._extract_keywords(normalized)
-            
-            # Semantic concept extraction (simplified)
-            semantic_concepts = self._extract_semantic_concepts(normalized)
-            
-            # Calculate complexity
-            complexity = self._calculate_complexity(query, intent_type, keywords)
-            
-            # Query expansion
-            expanded_terms = self._expand_query(keywords, semantic_concepts)
-            
-            # Extract filters from query
-            filters = self._extract_filters(query, context or {})
-            
-            return QueryIntent(
-                original_query=query,
-                normalized_query=normalized,
-                intent_type=intent_type,
-                entities=entities,
-                keywords=keywords,
-                semantic_concepts=semantic_concepts,
-                complexity_score=complexity,
-                expanded_terms=expanded_terms,
-                filters=filters,
-                confidence=0.8  # Simplified confidence score
-            )
-            
-        except Exception as e:
-            logger.error(f"Query processing error: {e}")
-            # Return basic intent for fallback
-            return QueryIntent(
-                original_query=query,
-                normalized_query=query.lower().strip(),
-                intent_type='search',
-                entities=[],
-                keywords=query.lower().split(),
-                semantic_concepts=[],
-                complexity_score=0.5,
-                expanded_terms=[],
-                filters={},
-                confidence=0.3
-            )
-
-    def _normalize_query(self, query: str) -> str:
-        """Normalize query text."""
-        # Basic normalization
-        normalized = query.lower().strip()
-        
-        # Remove extra whitespace
-        normalized = re.sub(r'\s+', ' ', normalized)
-        
-        # Handle common contractions
-        contractions = {
-            "don't": "do not",
-            "won't": "will not",
-            "can't": "cannot",
-            "what's": "what is",
-            "how's": "how is"
-        }
-        
-        for contraction, expansion in contractions.items():
-            normalized = normalized.replace(contraction, expansion)
-        
-        return normalized
-
-    def _classify_intent(self, query: str) -> str:
-        """Classify query intent using pattern matching."""
-        query_lower = query.lower()
-        
-        # Check patterns in order of specificity
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, query_lower, re.IGNORECASE):
-                    return intent
-        
-        return 'search'  # default
-
-    def _extract_entities(self, query: str) -> List[str]:
-        """Extract entities from query (simplified NER)."""
-        # This is a simplified version - in production, use spaCy or similar
-        entities = []
-        
-        # Look for capitalized words (potential proper nouns)
-        words = query.split()
-        for word in words:
-            if word and word[0].isupper() and len(word) > 2:
-                entities.append(word)
-        
-        return entities
-
-    def _extract_keywords(self, query: str) -> List[str]:
-        """Extract important keywords from query."""
-        words = query.split()
-        keywords = []
-        
-        for word in words:
-            # Remove punctuation and check length
-            clean_word = re.sub(r'[^\w]', '', word.lower())
-            if len(clean_word) > 2 and clean_word not in self.stop_words:
-                keywords.append(clean_word)
-        
-        return keywords
-
-    def _extract_semantic_concepts(self, query: str) -> List[str]:
-        """Extract semantic concepts from query."""
-        concepts = []
-        
-        # Map keywords to semantic domains
-        for concept, synonyms in self.synonym_groups.items():
-            if any(synonym in query for synonym in synonyms):
-                concepts.append(concept)
-        
-        return concepts
-
-    def _calculate_complexity(self, query: str, intent_type: str, keywords: List[str]) -> float:
-        """Calculate query complexity score (0-1)."""
-        base_score = 0.3
-        
-        # Word count factor
-        word_count = len(query.split())
-        word_factor = min(word_count / 20.0, 0.3)
-        
-        # Intent complexity
-        intent_weights = {
-            'search': 0.2,
-            'question': 0.4,
-            'comparison': 0.7,
-            'analysis': 0.8,
-            'summary': 0.6
-        }
-        intent_factor = intent_weights.get(intent_type, 0.3)
-        
-        # Keyword diversity
-        keyword_factor = min(len(set(keywords)) / 10.0, 0.2)
-        
-        return min(base_score + word_factor + intent_factor + keyword_factor, 1.0)
-
-    def _expand_query(self, keywords: List[str], concepts: List[str]) -> List[str]:
-        """Expand query with synonyms and related terms."""
-        expanded = set(keywords)
-        
-        # Add synonyms for concepts
-        for concept in concepts:
-            if concept in self.synonym_groups:
-                expanded.update(self.synonym_groups[concept])
-        
-        # Add common variations
-        variations = []
-        for keyword in keywords:
-            # Add plural/singular forms (simplified)
-            if keyword.endswith('s') and len(keyword) > 3:
-                variations.append(keyword[:-1])
-            else:
-                variations.append(keyword + 's')
-        
-        expanded.update(variations)
-        return list(expanded)
-
-    def _extract_filters(self, query: str, context: Dict) -> Dict[str, Any]:
-        """Extract filters from query and context."""
-        filters = {}
-        
-        # Time-based filters
-        time_patterns = {
-            'recent': {'days': 30},
-            'last week': {'days': 7},
-            'today': {'days': 1},
-            'this month': {'days': 30}
-        }
-        
-        for pattern, time_filter in time_patterns.items():
-            if pattern in query.lower():
-                filters['time_range'] = time_filter
-                break
-        
-        # File type filters
-        file_types = ['pdf', 'doc', 'txt', 'html', 'markdown']
-        for file_type in file_types:
-            if file_type in query.lower():
-                filters['file_type'] = file_type
-                break
-        
-        return filters
-
 class SemanticSearchEngine:
     """Enhanced semantic search engine with intelligent ranking."""
     
@@ -308,58 +69,13 @@ class SemanticSearchEngine:
         self.query_processor = QueryProcessor()
         self.cache = get_rag_query_cache()
         
-        # Initialize TF-IDF for keyword scoring
-        self.tfidf_vectorizer = None
-        self.document_texts = {}
-        self._build_tfidf_index()
+        # Keyword scoring uses the RAG system's chunk-level BM25 index, which
+        # is maintained incrementally on ingest and delete
         
         # Search analytics storage
         self.analytics = []
         self.analytics_lock = asyncio.Lock()
 
-    def _build_tfidf_index(self):
-        """Build TF-IDF index for keyword-based scoring."""
-        try:
-            # Get all documents
-            documents = self.doc_manager.list_documents()
-            if not documents:
-                logger.info("No documents found for TF-IDF indexing")
-                return
-            
-            # Collect document texts
-            texts = []
-            doc_ids = []
-            
-            for doc in documents:
-                doc_id = doc.get('doc_id')
-                if doc_id:
-                    # Get document chunks from ChromaDB
-                    try:
-                        results = self.rag_system.collection.get(
-                            where={"doc_id": doc_id},
-                            include=["documents"]
-                        )
-                        if results and results['documents']:
-                            doc_text = ' '.join(results['documents'])
-                            texts.append(doc_text)
-                            doc_ids.append(doc_id)
-                            self.document_texts[doc_id] = doc_text
-                    except Exception as e:
-                        logger.warning(f"Could not get text for document {doc_id}: {e}")
-            
-            if texts:
-                self.tfidf_vectorizer = TfidfVectorizer(
-                    max_features=5000,
-                    stop_words='english',
-                    ngram_range=(1, 2)
-                )
-                self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(texts)
-                self.doc_id_to_index = {doc_id: i for i, doc_id in enumerate(doc_ids)}
-                logger.info(f"Built TF-IDF index for {len(texts)} documents")
-            
-        except Exception as e:
-            logger.error(f"Error building TF-IDF index: {e}")
-
     async def search(self, query: str, max_results: int = 10, 
                     filters: Optional[Dict] = None,
                     user_context: Optional[Dict] = None) -> List[SearchResult]:
@@ -398,31 +114,49 @@ class SemanticSearchEngine:
     async def _multi_modal_search(self, query_intent: QueryIntent, 
                                 max_results: int, filters: Optional[Dict]) -> List[Dict]:
         """Perform multi-modal search combining semantic and keyword approaches."""
-        all_results = []
-        
         # 1. Semantic search using existing RAG system
-        semantic_results = await self._semantic_search(query_intent, max_results * 2)
-        all_results.extend(semantic_results)
+        # 2. Keyword search using the BM25 index
+        semantic_results, keyword_results = await asyncio.gather(
+            self._semantic_search(query_intent, max_results * 2),
+            self._keyword_search(query_intent, max_results * 2)
+        )
         
-        # 2. Keyword search using TF-IDF
-        if self.tfidf_vectorizer:
-            keyword_results = await self._keyword_search(query_intent, max_results)
-            all_results.extend(keyword_results)
+        # 3. Fuse both result lists into one entry per document
+        all_results = self._fuse_results(semantic_results, keyword_results)
         
-        # 3. Apply filters
+        # 4. Apply filters
         if filters:
             all_results = self._apply_filters(all_results, filters)
         
-        # Remove duplicates by doc_id
-        seen_docs = set()
-        unique_results = []
-        for result in all_results:
+        return all_results
+    
+    def _fuse_results(self, semantic_results: List[Dict], keyword_results: List[Dict]) -> List[Dict]:
+        """
+        Merge semantic and keyword hits by doc_id.
+        
+        Each document keeps its best semantic and best keyword score, so one
+        matched by both retrievers is ranked on both signals.
+        """
+        fused = {}
+        
+        for result in semantic_results + keyword_results:
             doc_id = result.get('doc_id')
-            if doc_id and doc_id not in seen_docs:
-                seen_docs.add(doc_id)
-                unique_results.append(result)
+            if not doc_id:
+                continue
+            
+            if doc_id not in fused:
+                fused[doc_id] = {**result, 'semantic_score': 0.0, 'keyword_score': 0.0}
+            entry = fused[doc_id]
+            
+            for score_key in ('semantic_score', 'keyword_score'):
+                score = result.get(score_key, 0.0)
+                if score > entry[score_key]:
+                    entry[score_key] = score
+            
+            if entry['search_type'] != result.get('search_type'):
+                entry['search_type'] = 'hybrid'
         
-        return unique_results
+        return list(fused.values())
 
     async def _semantic_search(self, query_intent: QueryIntent, max_results: int) -> List[Dict]:
         """Perform semantic search using the existing RAG system."""
@@ -431,7 +165,7 @@ class SemanticSearchEngine:
             search_query = ' '.join([query_intent.original_query] + query_intent.expanded_terms[:3])
             
             # Get semantic results from RAG system
-            docs = self.rag_system.adaptive_retrieval(search_query, max_chunks=max_results)
+            docs = await self.rag_system.adaptive_retrieval_async(search_query, max_chunks=max_results)
             
             results = []
             for doc in docs:
@@ -453,41 +187,35 @@ class SemanticSearchEngine:
             return []
 
     async def _keyword_search(self, query_intent: QueryIntent, max_results: int) -> List[Dict]:
-        """Perform keyword-based search using TF-IDF."""
+        """Perform keyword-based search using the chunk-level BM25 index."""
         try:
-            if not self.tfidf_vectorizer:
-                return []
-            
-            # Create query vector
             query_text = ' '.join(query_intent.keywords + query_intent.expanded_terms)
-            query_vector = self.tfidf_vectorizer.transform([query_text])
+            chunks = await self.rag_system.keyword_search_async(query_text, top_k=max_results)
+            if not chunks:
+                return []
             
-            # Calculate similarities
-            similarities = cosine_similarity(query_vector, self.tfidf_matrix).flatten()
+            # BM25 scores are unbounded; scale to 0-1 against the best hit
+            top_score = max(chunk['score'] for chunk in chunks) or 1.0
             
-            # Get top results
-            top_indices = similarities.argsort()[-max_results:][::-1]
+            # One batched metadata lookup for every document hit
+            doc_infos = await self.doc_manager.get_documents([chunk.get('doc_id', '') for chunk in chunks])
             
             results = []
-            for idx in top_indices:
-                if similarities[idx] > 0.1:  # Minimum relevance threshold
-                    doc_id = list(self.doc_id_to_index.keys())[
-                        list(self.doc_id_to_index.values()).index(idx)
-                    ]
-                    
-                    # Get document metadata
-                    doc_info = self.doc_manager.get_document(doc_id)
-                    if doc_info:
-                        result = {
-                            'doc_id': doc_id,
-                            'content': self.document_texts.get(doc_id, ''),
-                            'title': doc_info.title,
-                            'source': doc_info.source,
-                            'keyword_score': float(similarities[idx]),
-                            'search_type': 'keyword',
-                            'metadata': doc_info.to_dict()
-                        }
-                        results.append(result)
+            for chunk in chunks:
+                doc_id = str(chunk.get('doc_id', ''))
+                doc_info = doc_infos.get(doc_id)
+                if not doc_info:
+                    continue
+                
+                results.append({
+                    'doc_id': doc_id,
+                    'content': chunk.get('content', ''),
+                    'title': doc_info.title,
+                    'source': doc_info.source,
+                    'keyword_score': chunk['score'] / top_score,
+                    'search_type': 'keyword',
+                    'metadata': doc_info.to_dict()
+                })
             
             return results
             
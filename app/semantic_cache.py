@@ -0,0 +1,189 @@
+"""
+Semantic Query Cache
+
+Answer cache keyed by query embedding rather than the exact question string, so
+paraphrases of a question already answered ("how do I reset my password" /
+"how can I reset my password?") are served without retrieval or generation.
+A new query hits when its cosine similarity to a cached query is at least
+1 - max_distance and the collection has not changed since that answer was built.
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Hashable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SemanticCacheEntry:
+    """Cached answer and the conditions under which it may be reused."""
+    question: str
+    result: Dict[str, Any]
+    generation: int
+    scope: Hashable
+    created_at: float
+    last_used: float
+
+class SemanticQueryCache:
+    """
+    Small in-memory vector index of recent query embeddings and their answers.
+
+    Embeddings are L2-normalized into a preallocated float32 matrix, so a lookup
+    is one matrix-vector product over at most max_entries rows. When full, the
+    least recently used slot is overwritten. Entries also carry a scope (the
+    retrieval parameters that shaped the answer) which must match exactly.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1000,
+                 max_distance: float = 0.05,
+                 ttl: float = 3600.0):
+        """
+        Initialize semantic query cache.
+
+        Args:
+            max_entries: Maximum number of cached queries
+            max_distance: Maximum cosine distance (1 - cosine similarity) for a hit
+            ttl: Entry lifetime in seconds
+        """
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[SemanticCacheEntry]] = [None] * max_entries
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        """Return the embedding as a unit-length float32 vector (None if degenerate)."""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0 or not np.isfinite(norm):
+            return None
+        return vector / norm
+
+    def _is_live(self, entry: Optional[SemanticCacheEntry], generation: int, now: float) -> bool:
+        """Whether an entry may still be served for the current generation."""
+        return (entry is not None
+                and entry.generation == generation
+                and now - entry.created_at <= self.ttl)
+
+    def lookup(self, embedding, generation: int, scope: Hashable = None) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a semantically equivalent query.
+
+        Args:
+            embedding: Query embedding
+            generation: Current collection generation
+            scope: Retrieval parameters the answer must have been built with
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        vector = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            if vector is None or self._vectors is None or self._size == 0 \
+                    or vector.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors[:self._size] @ vector
+            min_similarity = 1.0 - self.max_distance
+
+            # Best candidates first; stale or out-of-scope ones are skipped
+            for slot in np.argsort(-similarities):
+                if similarities[slot] < min_similarity:
+                    break
+                entry = self._entries[slot]
+                if entry.scope == scope and self._is_live(entry, generation, now):
+                    entry.last_used = now
+                    self.hits += 1
+                    logger.debug(f"Semantic cache hit (similarity {similarities[slot]:.3f}) "
+                                 f"for cached question '{entry.question[:80]}'")
+                    return entry.result
+
+            self.misses += 1
+            return None
+
+    def store(self, question: str, embedding, result: Dict[str, Any],
+              generation: int, scope: Hashable = None) -> bool:
+        """
+        Cache an answer under its query embedding.
+
+        Returns:
+            False if the embedding could not be indexed
+        """
+        vector = self._normalize(embedding)
+        if vector is None:
+            return False
+
+        now = time.time()
+        entry = SemanticCacheEntry(
+            question=question,
+            result=result,
+            generation=generation,
+            scope=scope,
+            created_at=now,
+            last_used=now
+        )
+
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # First entry (or a new encoder dimension) sizes the index
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.max_entries
+                self._size = 0
+
+            slot = self._free_slot(generation, now)
+            self._vectors[slot] = vector
+            self._entries[slot] = entry
+            self.stores += 1
+
+        return True
+
+    def _free_slot(self, generation: int, now: float) -> int:
+        """Pick a slot for a new entry: append, reuse a stale one, or evict LRU. Caller holds the lock."""
+        if self._size < self.max_entries:
+            self._size += 1
+            return self._size - 1
+
+        lru_slot, lru_time = 0, float("inf")
+        for slot, entry in enumerate(self._entries):
+            if not self._is_live(entry, generation, now):
+                return slot
+            if entry.last_used < lru_time:
+                lru_slot, lru_time = slot, entry.last_used
+        return lru_slot
+
+    def clear(self):
+        """Remove every cached query."""
+        with self._lock:
+            self._vectors = None
+            self._entries = [None] * self.max_entries
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": self.hits / total if total > 0 else 0.0
+            }
@@ -427,6 +427,16 @@ class UploadHandler:
             content = await file.read()
             task.file_size = len(content)
             
+            # Identical bytes were already ingested: skip extraction and indexing
+            file_hash = hashlib.sha256(content).hexdigest()
+            existing_doc_id = self.document_manager.rag_system.find_document_by_file_hash(file_hash)
+            if existing_doc_id:
+                task.doc_id = existing_doc_id
+                task.update_status(UploadStatus.COMPLETED, 100.0)
+                await self._send_progress_update(task, f"Identical file already indexed as {existing_doc_id}")
+                logger.info(f"Skipped duplicate file {task.filename} (already indexed as {existing_doc_id})")
+                return task
+            
             # Process based on file type
             processed_content = ""
             additional_metadata = {}
@@ -451,6 +461,7 @@ class UploadHandler:
                 "file_type": task.file_type.split("/")[-1],  # Extract just the type part
                 "original_filename": task.filename,
                 "source": "file_upload",
+                "file_hash": file_hash,
                 **additional_metadata
             }
             
@@ -0,0 +1,862 @@
+"""
+Vector Store
+
+Backends for LocalRAGSystem.collection. VectorStore is a Protocol for the part
+of ChromaDB's Collection API the application uses (add, upsert, query, get,
+update, delete, count), so a ChromaDB collection serves as a backend as is.
+
+NumpyVectorStore keeps normalized embeddings in a flat float32 (or float16)
+file that is memory-mapped read-only, so every worker process on a host shares
+one copy through the page cache. Queries are exact: blocked matrix products
+with argpartition top-k. Above ivf_min_rows an IVF partitioning (spherical
+k-means centroids, nearest-centroid inverted lists) limits each query to the
+ivf_nprobe closest lists. Ids, documents and metadata live in a SQLite sidecar
+that also holds the row count and a version number readers poll to pick up
+other processes' writes.
+
+With quantization set to int8 or binary, a compact copy of each vector (see
+embedding_quantization) is scanned instead, and only the best
+rescore_candidates rows per query are read back from the float matrix and
+rescored exactly. The codes are the only part of the corpus every query
+touches, so they are what has to stay resident: 1 byte per dimension for
+int8, 1 bit for binary, against 2 (float16) or 4 (float32).
+
+float32 is the default because the exact scan multiplies the mapped blocks
+directly. float16 halves the matrix, but NumPy has no fast half-precision
+matrix product, so every block is converted to float32 on every query
+(several times slower on a full scan). It pays off with quantization, where
+the codes are scanned and only the rescored shortlist is read from the
+float matrix.
+
+VECTOR_STORE_BACKEND selects chroma (default) or numpy.
+"""
+
+import os
+import json
+import fcntl
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Protocol, Tuple, Iterable
+
+import numpy as np
+
+from .embedding_quantization import create_quantizer, save_quantizer
+
+logger = logging.getLogger(__name__)
+
+WHERE_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def where_to_sql(where: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """Translate a ChromaDB metadata filter into a SQL condition on the JSON metadata column."""
+    if not where:
+        return "1", []
+
+    clauses, params = [], []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(item) for item in value]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+
+        path = json.dumps(key)
+        column = "json_extract(metadata, ?)"
+        operations = value.items() if isinstance(value, dict) else [("$eq", value)]
+        for operator, operand in operations:
+            if operator in ("$in", "$nin"):
+                if not operand:
+                    clauses.append("0" if operator == "$in" else "1")
+                    continue
+                placeholders = ",".join("?" * len(operand))
+                clauses.append(f"{column} {'IN' if operator == '$in' else 'NOT IN'} ({placeholders})")
+                params.extend([f"$.{path}", *operand])
+            elif operator in WHERE_OPERATORS:
+                clauses.append(f"{column} {WHERE_OPERATORS[operator]} ?")
+                params.extend([f"$.{path}", operand])
+            else:
+                raise ValueError(f"Unsupported where operator '{operator}'")
+    return " AND ".join(clauses), params
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (zero rows stay zero)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Unit-length centroids of k clusters of unit vectors under dot-product assignment."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=k)
+        nonempty = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+        centroids[nonempty] = normalize_rows(sums)
+        # Reseed clusters that lost every member
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), size=len(empty), replace=False)]
+    return centroids
+
+class VectorStore(Protocol):
+    """
+    Interface of a vector store backend, the part of ChromaDB's Collection API
+    the application uses (a ChromaDB collection satisfies it as is).
+
+    query returns one list per query embedding under "ids", "distances"
+    (cosine distance), "documents" and "metadatas"; get returns flat lists.
+    """
+
+    name: str
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None): ...
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None): ...
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Iterable[str] = ("metadatas", "documents", "distances")) -> Dict[str, Any]: ...
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Iterable[str] = ("metadatas", "documents")) -> Dict[str, Any]: ...
+
+    def update(self, ids: List[str], embeddings: Optional[List[List[float]]] = None,
+               documents: Optional[List[str]] = None, metadatas: Optional[List[Dict[str, Any]]] = None): ...
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None): ...
+
+    def count(self) -> int: ...
+
+@dataclass(frozen=True)
+class StoreMaps:
+    """
+    One consistent set of a store's memory maps.
+
+    A query searches a single StoreMaps from start to finish, so writes that
+    reopen the maps meanwhile cannot mix two versions of the matrix into one
+    search. Only a compaction renumbers rows; its count tells a query whether
+    the rows it found still name the same chunks.
+    """
+    rows: int = 0
+    dim: Optional[int] = None
+    compactions: int = 0
+    vectors: Optional[np.ndarray] = None
+    live: Optional[np.ndarray] = None
+    codes: Optional[np.ndarray] = None
+    quantizer: Any = None
+    centroids: Optional[np.ndarray] = None
+    list_order: Optional[np.ndarray] = None
+    list_offsets: Optional[np.ndarray] = None
+
+class NumpyVectorStore:
+    """
+    Memory-mapped embedding matrix with exact (or IVF) NumPy search.
+
+    Rows are append-only; deletes clear the row's live flag and the matrix is
+    compacted once dead rows outnumber live ones. Writes hold an exclusive
+    file lock so several processes can share one store; each write bumps the
+    version, and readers reopen their maps when they see a new one. Queries
+    search a snapshot of the maps and only retry if a compaction renumbered
+    rows while they ran.
+    """
+
+    def __init__(self, path: str, name: str = "documents", dtype: str = "float32",
+                 block_rows: int = 65536, ivf_min_rows: int = 200000, ivf_nprobe: int = 16,
+                 quantization: Optional[str] = None, rescore_candidates: int = 256):
+        """
+        Initialize vector store.
+
+        Args:
+            path: Directory holding the matrix files and SQLite sidecar
+            name: Collection name (file name prefix)
+            dtype: float32, or float16 for half the memory at the cost of a
+                conversion per scanned block (see module docstring)
+            block_rows: Rows scored per matrix product in exact search
+            ivf_min_rows: Live rows at which the IVF partitioning is built
+            ivf_nprobe: Inverted lists searched per query once IVF is built
+            quantization: none, int8 or binary codes to prefilter with; None keeps
+                the store's mode. A store that has rows keeps its mode either
+                way; build_codes(quantization) changes it.
+            rescore_candidates: Prefiltered rows per query rescored with the float vectors
+        """
+        self.path = path
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.block_rows = block_rows
+        self.ivf_min_rows = ivf_min_rows
+        self.ivf_nprobe = ivf_nprobe
+        self.quantization = quantization or "none"
+        self.rescore_candidates = rescore_candidates
+        create_quantizer(self.quantization)  # validates the mode
+
+        os.makedirs(path, exist_ok=True)
+        prefix = os.path.join(path, name)
+        self._vectors_path = f"{prefix}.vectors"
+        self._live_path = f"{prefix}.live"
+        self._lists_path = f"{prefix}.lists"
+        self._centroids_path = f"{prefix}.centroids.npy"
+        self._codes_path = f"{prefix}.codes"
+        self._quantizer_path = f"{prefix}.quantizer.npy"
+        self._lock_path = f"{prefix}.lock"
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(f"{prefix}.db", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT NOT NULL DEFAULT '{}'
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        # Views of the shared files, replaced when the stored version changes
+        self._version = None
+        self._maps = StoreMaps()
+
+        stored_dtype = self._read_meta().get("dtype", self.dtype.name)
+        if stored_dtype != self.dtype.name:
+            logger.warning(f"Vector store {name} was created with {stored_dtype} vectors; keeping {stored_dtype}")
+            self.dtype = np.dtype(stored_dtype)
+        meta = self._read_meta()
+        stored_quantization = meta.get("quantization", "none")
+        if quantization is None:
+            self.quantization = stored_quantization
+        elif int(meta.get("rows", 0)) and stored_quantization != quantization:
+            logger.warning(f"Vector store {name} holds {stored_quantization} codes; keeping {stored_quantization} "
+                           f"(build_codes('{quantization}') switches it)")
+        self._sync_quantization(meta)
+        self._refresh()
+
+    # -- metadata and locking -------------------------------------------------
+
+    def _read_meta(self) -> Dict[str, str]:
+        """Stored counters. Caller holds the lock."""
+        return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _write_meta(self, **values):
+        """Update counters and bump the version. Caller holds the lock and commits."""
+        meta = self._read_meta()
+        values["version"] = int(meta.get("version", 0)) + 1
+        values.setdefault("dtype", self.dtype.name)
+        values.setdefault("quantization", meta.get("quantization", self.quantization))
+        self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               [(key, str(value)) for key, value in values.items()])
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync_quantization(self, meta: Dict[str, str]):
+        """Adopt the stored quantization mode once the store has rows. Caller holds the lock."""
+        if int(meta.get("rows", 0)):
+            self.quantization = meta.get("quantization", "none")
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive write section across threads and processes."""
+        with self._lock, self._file_lock(exclusive=True):
+            # Another process may have switched the mode with build_codes
+            self._sync_quantization(self._read_meta())
+            try:
+                yield
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        self._refresh()
+
+    def _refresh(self):
+        """Reopen the memory maps if another write (in any process) changed the store."""
+        with self._lock:
+            version = self._read_meta().get("version")
+            if version == self._version:
+                return
+            with self._file_lock(exclusive=False):
+                meta = self._read_meta()
+                self._version = meta.get("version")
+                self._sync_quantization(meta)
+                self._maps = self._open_maps(meta)
+
+    def _open_maps(self, meta: Dict[str, str]) -> StoreMaps:
+        """Map the vector, live-flag, code and IVF files read-only. Caller holds the locks."""
+        rows = int(meta.get("rows", 0))
+        dim = int(meta["dim"]) if "dim" in meta else None
+        compactions = int(meta.get("compactions", 0))
+        if rows == 0 or dim is None:
+            return StoreMaps(rows=rows, dim=dim, compactions=compactions)
+
+        vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, dim))
+        live = np.memmap(self._live_path, dtype=np.uint8, mode="r", shape=(rows,))
+
+        codes = quantizer = None
+        quantization = meta.get("quantization", "none")
+        if quantization == self.quantization != "none":
+            quantizer = create_quantizer(quantization, params_path=self._quantizer_path)
+            codes = np.memmap(self._codes_path, dtype=self._code_dtype(), mode="r",
+                              shape=(rows, quantizer.code_width(dim)))
+
+        centroids = list_order = list_offsets = None
+        ivf_lists = int(meta.get("ivf_lists", 0))
+        if ivf_lists and os.path.exists(self._centroids_path):
+            centroids = np.load(self._centroids_path)
+            assignments = np.memmap(self._lists_path, dtype=np.int32, mode="r", shape=(rows,))
+            # Dead rows are assigned -1 and sort before every list
+            list_order = np.argsort(assignments, kind="stable")
+            list_offsets = np.searchsorted(assignments[list_order], np.arange(ivf_lists + 1))
+
+        return StoreMaps(rows=rows, dim=dim, compactions=compactions, vectors=vectors, live=live,
+                         codes=codes, quantizer=quantizer, centroids=centroids,
+                         list_order=list_order, list_offsets=list_offsets)
+
+    # -- writes ----------------------------------------------------------------
+
+    def _code_dtype(self) -> np.dtype:
+        return np.dtype(np.int8 if self.quantization == "int8" else np.uint8)
+
+    def _truncate_to(self, rows: int, dim: Optional[int], ivf: bool, code_width: int = 0):
+        """Drop bytes a crashed writer appended past the committed row count. Caller holds the locks."""
+        for path, row_bytes in ((self._vectors_path, (dim or 0) * self.dtype.itemsize),
+                                (self._live_path, 1), (self._lists_path, 4 if ivf else 0),
+                                (self._codes_path, code_width)):
+            if row_bytes and os.path.exists(path) and os.path.getsize(path) != rows * row_bytes:
+                os.truncate(path, rows * row_bytes)
+
+    def _assign_lists(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest IVF list of each (normalized) vector."""
+        centroids = np.load(self._centroids_path)
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _existing_ids(self, ids: List[str]) -> Dict[str, int]:
+        """Rows of the ids already stored. Caller holds the lock."""
+        rows = {}
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._conn.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({placeholders})", batch).fetchall())
+        return rows
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Append chunks; ids that already exist are skipped, as ChromaDB does."""
+        if not ids:
+            return
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+
+        with self._writing():
+            meta = self._read_meta()
+            rows = int(meta.get("rows", 0))
+            dim = int(meta["dim"]) if "dim" in meta else vectors.shape[1]
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimensionality {dim}")
+            ivf_lists = int(meta.get("ivf_lists", 0))
+
+            existing = self._existing_ids(list(ids))
+            keep, seen = [], set()
+            for index, chunk_id in enumerate(ids):
+                if chunk_id not in existing and chunk_id not in seen:
+                    keep.append(index)
+                    seen.add(chunk_id)
+            if len(keep) < len(ids):
+                logger.warning(f"Skipping {len(ids) - len(keep)} chunk ids that already exist in {self.name}")
+            if not keep:
+                return
+
+            new_vectors = vectors[keep]
+            quantizer = None
+            if self.quantization != "none":
+                # The first batch calibrates the codes; build_codes recalibrates as the corpus grows
+                quantizer = create_quantizer(self.quantization, sample=new_vectors, params_path=self._quantizer_path)
+                if not os.path.exists(self._quantizer_path):
+                    save_quantizer(quantizer, self._quantizer_path)
+            self._truncate_to(rows, dim, bool(ivf_lists), quantizer.code_width(dim) if quantizer else 0)
+            with open(self._vectors_path, "ab") as f:
+                f.write(new_vectors.astype(self.dtype).tobytes())
+            with open(self._live_path, "ab") as f:
+                f.write(b"\x01" * len(keep))
+            if ivf_lists:
+                with open(self._lists_path, "ab") as f:
+                    f.write(self._assign_lists(new_vectors).tobytes())
+            if quantizer:
+                with open(self._codes_path, "ab") as f:
+                    f.write(quantizer.encode(new_vectors).tobytes())
+
+            self._conn.executemany(
+                "INSERT INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(rows + offset, ids[index], documents[index], json.dumps(metadatas[index] or {}))
+                 for offset, index in enumerate(keep)]
+            )
+            live = int(meta.get("live", 0)) + len(keep)
+            # The first rows fix the store's quantization mode
+            self._write_meta(rows=rows + len(keep), dim=dim, live=live,
+                             **({"quantization": self.quantization} if rows == 0 else {}))
+
+        if self.quantization != "none" and live >= 1000 and live >= 4 * int(meta.get("quantized_rows", 0) or 0):
+            self.build_codes()
+        if live >= self.ivf_min_rows and live >= 2 * int(meta.get("ivf_trained_rows", 0) or 0):
+            self.build_ivf()
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Update chunks that exist and add the rest."""
+        with self._lock:
+            existing = self._existing_ids(list(ids))
+        update = [i for i, chunk_id in enumerate(ids) if chunk_id in existing]
+        insert = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+        pick = lambda values, indexes: [values[i] for i in indexes] if values is not None else None
+        if update:
+            self.update([ids[i] for i in update], pick(embeddings, update), pick(documents, update),
+                        pick(metadatas, update))
+        if insert:
+            self.add([ids[i] for i in insert], pick(embeddings, insert), pick(documents, insert),
+                     pick(metadatas, insert))
+
+    def update(self, ids: List[str], embeddings: Optional[List[List[float]]] = None,
+               documents: Optional[List[str]] = None, metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Replace documents or embeddings and merge metadata (None values remove keys)."""
+        if not ids:
+            return
+        with self._writing():
+            meta = self._read_meta()
+            existing = self._existing_ids(list(ids))
+            missing = [chunk_id for chunk_id in ids if chunk_id not in existing]
+            if missing:
+                logger.warning(f"Update of {len(missing)} missing chunk ids in {self.name} ignored")
+
+            if metadatas is not None:
+                for chunk_id, metadata in zip(ids, metadatas):
+                    if chunk_id not in existing or metadata is None:
+                        continue
+                    stored = json.loads(self._conn.execute(
+                        "SELECT metadata FROM chunks WHERE id = ?", (chunk_id,)).fetchone()[0])
+                    for key, value in metadata.items():
+                        if value is None:
+                            stored.pop(key, None)
+                        else:
+                            stored[key] = value
+                    self._conn.execute("UPDATE chunks SET metadata = ? WHERE id = ?", (json.dumps(stored), chunk_id))
+
+            if documents is not None:
+                self._conn.executemany("UPDATE chunks SET document = ? WHERE id = ?",
+                                       [(document, chunk_id) for chunk_id, document in zip(ids, documents)
+                                        if chunk_id in existing])
+
+            if embeddings is not None:
+                rows = int(meta.get("rows", 0))
+                present = [(existing[chunk_id], vector) for chunk_id, vector in zip(ids, embeddings)
+                           if chunk_id in existing]
+                if present:
+                    indexes = np.array([row for row, _ in present])
+                    vectors = normalize_rows(np.asarray([vector for _, vector in present], dtype=np.float32))
+                    writable = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+",
+                                         shape=(rows, int(meta["dim"])))
+                    writable[indexes] = vectors.astype(self.dtype)
+                    writable.flush()
+                    if self.quantization != "none":
+                        quantizer = create_quantizer(self.quantization, sample=vectors, params_path=self._quantizer_path)
+                        codes = np.memmap(self._codes_path, dtype=self._code_dtype(), mode="r+",
+                                          shape=(rows, quantizer.code_width(int(meta["dim"]))))
+                        codes[indexes] = quantizer.encode(vectors)
+                        codes.flush()
+                    if int(meta.get("ivf_lists", 0)):
+                        lists = np.memmap(self._lists_path, dtype=np.int32, mode="r+", shape=(rows,))
+                        lists[indexes] = self._assign_lists(vectors)
+                        lists.flush()
+
+            self._write_meta()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Delete chunks by id and/or metadata filter; where={} with no ids deletes everything."""
+        with self._writing():
+            meta = self._read_meta()
+            condition, params = where_to_sql(where)
+            if ids is not None:
+                rows = [row for chunk_id, row in self._existing_ids(list(ids)).items()]
+                if where:
+                    rows = [row for (row,) in self._conn.execute(
+                        f"SELECT row FROM chunks WHERE ({condition}) AND row IN ({','.join('?' * len(rows))})",
+                        [*params, *rows]).fetchall()] if rows else []
+            elif where is not None:
+                rows = [row for (row,) in self._conn.execute(
+                    f"SELECT row FROM chunks WHERE {condition}", params).fetchall()]
+            else:
+                rows = []
+            if not rows:
+                return
+
+            total = int(meta.get("rows", 0))
+            for start in range(0, len(rows), 500):
+                batch = rows[start:start + 500]
+                self._conn.execute(f"DELETE FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch)
+            live_flags = np.memmap(self._live_path, dtype=np.uint8, mode="r+", shape=(total,))
+            live_flags[np.array(rows)] = 0
+            live_flags.flush()
+            if int(meta.get("ivf_lists", 0)):
+                lists = np.memmap(self._lists_path, dtype=np.int32, mode="r+", shape=(total,))
+                lists[np.array(rows)] = -1
+                lists.flush()
+
+            live = int(meta.get("live", 0)) - len(rows)
+            self._write_meta(live=live)
+            if total - live > max(1000, live):
+                self._compact(total, int(meta["dim"]), int(meta.get("ivf_lists", 0)))
+
+    def _compact(self, rows: int, dim: int, ivf_lists: int):
+        """Rewrite the files without dead rows and renumber the chunks. Caller holds the write locks."""
+        live_flags = np.fromfile(self._live_path, dtype=np.uint8, count=rows)
+        keep = np.flatnonzero(live_flags)
+        vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, dim))
+
+        replacements = [(self._vectors_path, np.ascontiguousarray(vectors[keep])),
+                        (self._live_path, np.ones(len(keep), dtype=np.uint8))]
+        if ivf_lists:
+            lists = np.fromfile(self._lists_path, dtype=np.int32, count=rows)
+            replacements.append((self._lists_path, lists[keep]))
+        if self.quantization != "none":
+            codes = np.fromfile(self._codes_path, dtype=self._code_dtype()).reshape(rows, -1)
+            replacements.append((self._codes_path, codes[keep]))
+        del vectors
+
+        # Ascending order keeps every new row number free when it is assigned
+        self._conn.executemany("UPDATE chunks SET row = ? WHERE row = ?",
+                               [(new_row, int(old_row)) for new_row, old_row in enumerate(keep)])
+        for path, data in replacements:
+            data.tofile(f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+        compactions = int(self._read_meta().get("compactions", 0)) + 1
+        self._write_meta(rows=len(keep), live=len(keep), compactions=compactions)
+        logger.info(f"Compacted vector store {self.name}: {rows} -> {len(keep)} rows")
+
+    def build_codes(self, quantization: Optional[str] = None, sample_size: int = 50000):
+        """
+        (Re)encode every row, recalibrated on a sample of live rows.
+
+        Args:
+            quantization: Switch the store to this mode (none, int8 or binary);
+                the current mode is rebuilt if not given
+            sample_size: Rows the quantizer is calibrated on
+        """
+        if quantization is not None:
+            create_quantizer(quantization)  # validates the mode
+        with self._writing():
+            if quantization is not None:
+                self.quantization = quantization
+            meta = self._read_meta()
+            rows, live = int(meta.get("rows", 0)), int(meta.get("live", 0))
+            if self.quantization == "none" or rows == 0:
+                self._write_meta(quantization=self.quantization)
+                return
+            dim = int(meta["dim"])
+
+            vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, dim))
+            live_rows = np.flatnonzero(np.fromfile(self._live_path, dtype=np.uint8, count=rows))
+            # Every row needs a code, so a store with only dead rows calibrates on those
+            pool = live_rows if len(live_rows) else np.arange(rows)
+            sample = np.random.default_rng(0).choice(pool, size=min(sample_size, len(pool)), replace=False)
+            quantizer = create_quantizer(self.quantization, sample=np.asarray(vectors[np.sort(sample)], dtype=np.float32))
+
+            codes = np.empty((rows, quantizer.code_width(dim)), dtype=self._code_dtype())
+            for start in range(0, rows, self.block_rows):
+                block = np.asarray(vectors[start:start + self.block_rows], dtype=np.float32)
+                codes[start:start + len(block)] = quantizer.encode(block)
+            del vectors
+
+            save_quantizer(quantizer, self._quantizer_path)
+            codes.tofile(f"{self._codes_path}.tmp")
+            os.replace(f"{self._codes_path}.tmp", self._codes_path)
+            self._write_meta(quantization=self.quantization, quantized_rows=live)
+        logger.info(f"Built {self.quantization} codes for {self.name} over {live} rows")
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: int = 50000):
+        """Train IVF centroids on a sample of live rows and assign every row to its nearest list."""
+        with self._writing():
+            meta = self._read_meta()
+            rows, live = int(meta.get("rows", 0)), int(meta.get("live", 0))
+            if live == 0:
+                return
+            dim = int(meta["dim"])
+            nlist = max(1, min(nlist or int(np.sqrt(live)), live))
+
+            vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, dim))
+            live_rows = np.flatnonzero(np.fromfile(self._live_path, dtype=np.uint8, count=rows))
+            sample = np.random.default_rng(0).choice(live_rows, size=min(sample_size, len(live_rows)), replace=False)
+            centroids = spherical_kmeans(np.asarray(vectors[np.sort(sample)], dtype=np.float32),
+                                         min(nlist, len(sample)), iterations)
+
+            assignments = np.full(rows, -1, dtype=np.int32)
+            for start in range(0, rows, self.block_rows):
+                block = np.asarray(vectors[start:start + self.block_rows], dtype=np.float32)
+                assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            assignments[np.setdiff1d(np.arange(rows), live_rows)] = -1
+            del vectors
+
+            np.save(f"{self._centroids_path}.tmp.npy", centroids)
+            os.replace(f"{self._centroids_path}.tmp.npy", self._centroids_path)
+            assignments.tofile(f"{self._lists_path}.tmp")
+            os.replace(f"{self._lists_path}.tmp", self._lists_path)
+            self._write_meta(ivf_lists=len(centroids), ivf_trained_rows=live)
+        logger.info(f"Built IVF index for {self.name}: {len(centroids)} lists over {live} rows")
+
+    # -- reads -----------------------------------------------------------------
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._read_meta().get("live", 0))
+
+    @staticmethod
+    def _exact_scorer(maps: StoreMaps, queries: np.ndarray):
+        vectors = maps.vectors
+        return lambda index: queries @ np.asarray(vectors[index], dtype=np.float32).T
+
+    @staticmethod
+    def _code_scorer(maps: StoreMaps, queries: np.ndarray):
+        codes, quantizer = maps.codes, maps.quantizer
+        prepared = quantizer.prepare_queries(queries)
+        return lambda index: quantizer.score(prepared, np.asarray(codes[index]))
+
+    def _top_k(self, maps: StoreMaps, queries: np.ndarray, k: int, rows: Optional[np.ndarray] = None,
+               scorer=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Best k (row, score) per query over the given rows, or every live row in blocks."""
+        live = maps.live
+        scorer = scorer or self._exact_scorer(maps, queries)
+        if rows is not None:
+            rows = np.sort(rows[live[rows] == 1])
+            return self._select(scorer(rows), rows[None, :].repeat(len(queries), axis=0), k)
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, maps.rows, self.block_rows):
+            stop = min(start + self.block_rows, maps.rows)
+            scores = scorer(slice(start, stop))
+            scores[:, live[start:stop] == 0] = -np.inf
+            block_rows = np.arange(start, stop)[None, :].repeat(len(queries), axis=0)
+            best_rows, best_scores = self._select(np.hstack([best_scores, scores]),
+                                                  np.hstack([best_rows, block_rows]), k)
+        return best_rows, best_scores
+
+    @staticmethod
+    def _select(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Keep the k highest-scoring columns of each row."""
+        if scores.shape[1] > k:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, top, axis=1)
+            rows = np.take_along_axis(rows, top, axis=1)
+        return rows, scores
+
+    def _search(self, maps: StoreMaps, queries: np.ndarray, k: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        Best k (rows, scores) per query over the whole store.
+
+        IVF, when built, restricts each query to its probed lists. With codes,
+        the scan ranks by code score and only the shortlist is scored exactly.
+        """
+        ivf = maps.centroids is not None
+        if maps.codes is None:
+            if not ivf:
+                rows, scores = self._top_k(maps, queries, k)
+                return list(rows), list(scores)
+            found = [self._top_k(maps, query[None, :], k, self._ivf_rows(maps, query)) for query in queries]
+            return [rows[0] for rows, _ in found], [scores[0] for _, scores in found]
+
+        shortlist_size = max(self.rescore_candidates, k)
+        if ivf:
+            shortlists = [self._top_k(maps, query[None, :], shortlist_size, self._ivf_rows(maps, query),
+                                      self._code_scorer(maps, query[None, :])) for query in queries]
+            shortlists = [(rows[0], scores[0]) for rows, scores in shortlists]
+        else:
+            rows, scores = self._top_k(maps, queries, shortlist_size, scorer=self._code_scorer(maps, queries))
+            shortlists = list(zip(rows, scores))
+
+        results_rows, results_scores = [], []
+        for query, (rows, code_scores) in zip(queries, shortlists):
+            rescored_rows, rescored = self._top_k(maps, query[None, :], k, rows[np.isfinite(code_scores)])
+            results_rows.append(rescored_rows[0])
+            results_scores.append(rescored[0])
+        return results_rows, results_scores
+
+    def _ivf_rows(self, maps: StoreMaps, query: np.ndarray) -> np.ndarray:
+        """Rows in the ivf_nprobe lists nearest to a query."""
+        nprobe = min(self.ivf_nprobe, len(maps.centroids))
+        lists = np.argpartition(-(maps.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([maps.list_order[maps.list_offsets[i]:maps.list_offsets[i + 1]] for i in lists])
+
+    def _fetch(self, rows: List[int], columns: str = "row, id, document, metadata") -> Dict[int, tuple]:
+        result = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            for record in self._conn.execute(
+                    f"SELECT {columns} FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch):
+                result[record[0]] = record
+        return result
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Iterable[str] = ("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        """Nearest chunks to each query embedding by cosine similarity, best first."""
+        include = set(include)
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+
+        for _ in range(3):
+            self._refresh()
+            with self._lock:
+                maps = self._maps
+                if maps.vectors is None:
+                    return self._query_result(len(queries), include)
+                candidate_rows = None
+                if where:
+                    condition, params = where_to_sql(where)
+                    candidate_rows = np.array([row for (row,) in self._conn.execute(
+                        f"SELECT row FROM chunks WHERE {condition}", params)], dtype=np.int64)
+                    # Rows added after the snapshot are not in its maps
+                    candidate_rows = candidate_rows[candidate_rows < maps.rows]
+
+            k = max(1, n_results)
+            if candidate_rows is not None:
+                rows, scores = self._top_k(maps, queries, k, candidate_rows)
+            else:
+                rows, scores = self._search(maps, queries, k)
+
+            with self._lock:
+                ranked = []
+                for query_rows, query_scores in zip(rows, scores):
+                    order = np.argsort(-query_scores)
+                    ranked.append([(int(query_rows[i]), float(query_scores[i])) for i in order
+                                   if np.isfinite(query_scores[i])])
+                records = self._fetch(sorted({row for hits in ranked for row, _ in hits}))
+                # Other writes leave row numbers alone (deleted rows are simply not fetched);
+                # a compaction renumbers them, so search again against the new maps
+                if int(self._read_meta().get("compactions", 0)) != maps.compactions:
+                    continue
+
+            result = self._query_result(0, include)
+            for hits in ranked:
+                hits = [(row, score) for row, score in hits if row in records]
+                result["ids"].append([records[row][1] for row, _ in hits])
+                if "distances" in include:
+                    result["distances"].append([1.0 - score for _, score in hits])
+                if "documents" in include:
+                    result["documents"].append([records[row][2] for row, _ in hits])
+                if "metadatas" in include:
+                    result["metadatas"].append([json.loads(records[row][3]) for row, _ in hits])
+            return result
+
+        raise RuntimeError(f"Vector store {self.name} was compacted during every query attempt")
+
+    @staticmethod
+    def _query_result(queries: int, include: set) -> Dict[str, Any]:
+        return {
+            "ids": [[] for _ in range(queries)],
+            "distances": [[] for _ in range(queries)] if "distances" in include else None,
+            "documents": [[] for _ in range(queries)] if "documents" in include else None,
+            "metadatas": [[] for _ in range(queries)] if "metadatas" in include else None,
+            "embeddings": None
+        }
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Iterable[str] = ("metadatas", "documents")) -> Dict[str, Any]:
+        """Chunks by id and/or metadata filter, in insertion order (or the order of ids)."""
+        include = set(include)
+        condition, params = where_to_sql(where)
+        self._refresh()
+
+        with self._lock:
+            if ids is not None:
+                records = []
+                for start in range(0, len(ids), 500):
+                    batch = list(ids[start:start + 500])
+                    records.extend(self._conn.execute(
+                        f"SELECT row, id, document, metadata FROM chunks "
+                        f"WHERE ({condition}) AND id IN ({','.join('?' * len(batch))})",
+                        [*params, *batch]).fetchall())
+                position = {chunk_id: index for index, chunk_id in enumerate(ids)}
+                records.sort(key=lambda record: position[record[1]])
+                records = records[offset or 0:(offset or 0) + limit if limit is not None else None]
+            else:
+                records = self._conn.execute(
+                    f"SELECT row, id, document, metadata FROM chunks WHERE {condition} "
+                    f"ORDER BY row LIMIT ? OFFSET ?",
+                    [*params, -1 if limit is None else limit, offset or 0]).fetchall()
+
+            embeddings = None
+            if "embeddings" in include:
+                vectors = self._maps.vectors
+                embeddings = ([np.asarray(vectors[record[0]], dtype=np.float32).tolist() for record in records]
+                              if vectors is not None else [])
+
+        return {
+            "ids": [record[1] for record in records],
+            "documents": [record[2] for record in records] if "documents" in include else None,
+            "metadatas": [json.loads(record[3]) for record in records] if "metadatas" in include else None,
+            "embeddings": embeddings
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Vector store statistics."""
+        self._refresh()
+        with self._lock:
+            meta = self._read_meta()
+            rows = int(meta.get("rows", 0))
+            maps = self._maps
+            return {
+                "backend": "numpy",
+                "rows": rows,
+                "live": int(meta.get("live", 0)),
+                "dimension": maps.dim,
+                "dtype": self.dtype.name,
+                "matrix_mb": rows * (maps.dim or 0) * self.dtype.itemsize / (1024 * 1024),
+                "ivf_lists": int(meta.get("ivf_lists", 0)),
+                "ivf_nprobe": self.ivf_nprobe,
+                "quantization": meta.get("quantization", self.quantization),
+                "codes_mb": (maps.codes.nbytes if maps.codes is not None else 0) / (1024 * 1024),
+                "rescore_candidates": self.rescore_candidates,
+                "version": int(meta.get("version", 0))
+            }
+
+    def live_vectors(self) -> np.ndarray:
+        """Float32 copy of every live vector, in row order."""
+        self._refresh()
+        with self._lock:
+            maps = self._maps
+        if maps.vectors is None:
+            return np.empty((0, maps.dim or 0), dtype=np.float32)
+        return np.asarray(maps.vectors[np.flatnonzero(maps.live)], dtype=np.float32)
+
+    def close(self):
+        with self._lock:
+            self._maps = StoreMaps()
+            self._conn.close()
+
+def copy_collection(source: VectorStore, target: VectorStore, batch_size: int = 1000) -> int:
+    """Copy every chunk (id, embedding, document, metadata) of one store into another; returns the count."""
+    copied = 0
+    while True:
+        batch = source.get(limit=batch_size, offset=copied, include=["embeddings", "documents", "metadatas"])
+        if not len(batch["ids"]):
+            return copied
+        target.add(ids=list(batch["ids"]), embeddings=[list(vector) for vector in batch["embeddings"]],
+                   documents=list(batch["documents"]),
+                   metadatas=[metadata or {} for metadata in batch["metadatas"]])
+        copied += len(batch["ids"])
@@ -366,6 +366,12 @@ class TestQueryEndpoints:
         
         assert response.status_code == 422  # Validation error
 
+    def test_query_stream_rejects_session_id(self, test_client):
+        """Test streaming query refuses a session id it cannot honour."""
+        response = test_client.post("/query/stream", json={"question": "And for sale items?", "session_id": "s1"})
+        
+        assert response.status_code == 400
+
     def test_query_very_long_question(self, test_client):
         """Test query with very long question."""
         long_question = "What is " + "very " * 1000 + "long question?"
@@ -170,13 +170,14 @@ class TestEssentialFunctionality:
         with patch('app.main.get_rag_system') as mock_get_rag:
             mock_rag = Mock()
             mock_rag.collection.count.return_value = 5
-            mock_rag.rag_query.return_value = {
+            mock_rag.run_in_executor = AsyncMock(side_effect=lambda func, *args, **kwargs: func(*args, **kwargs))
+            mock_rag.rag_query_async = AsyncMock(return_value={
                 "answer": "Test answer",
                 "sources": [{"title": "Test", "source": "test.txt"}],
                 "context_used": 1,
                 "context_tokens": 100,
                 "efficiency_ratio": 0.5
-            }
+            })
             mock_get_rag.return_value = mock_rag
             
             response = test_client.post(
@@ -201,13 +202,14 @@ class TestEssentialFunctionality:
         with patch('app.main.get_rag_system') as mock_get_rag:
             mock_rag = Mock()
             mock_rag.collection.count.return_value = 0
-            mock_rag.rag_query.return_value = {
+            mock_rag.run_in_executor = AsyncMock(side_effect=lambda func, *args, **kwargs: func(*args, **kwargs))
+            mock_rag.rag_query_async = AsyncMock(return_value={
                 "answer": "No documents available to answer your question.",
                 "sources": [],
                 "context_used": 0,
                 "context_tokens": 0,
                 "efficiency_ratio": 0.0
-            }
+            })
             mock_get_rag.return_value = mock_rag
             
             response = test_client.post(
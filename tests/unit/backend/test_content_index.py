@@ -0,0 +1,61 @@
+"""
+Unit tests for the content hash index.
+
+Tests file hash lookups, shared chunk references, and ownership hand-over
+when a document that owns shared chunks is released.
+"""
+
+import pytest
+import os
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.content_index import ContentHashIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Provide an empty content hash index."""
+    return ContentHashIndex(str(tmp_path / "content_index.db"))
+
+
+@pytest.mark.unit
+class TestContentHashIndex:
+    """Test ContentHashIndex functionality."""
+
+    def test_file_hash_lookup(self, index):
+        """Test registered file hashes resolve to their document."""
+        assert index.find_file("abc") is None
+
+        index.register_file("abc", "doc_1")
+
+        assert index.find_file("abc") == "doc_1"
+
+    def test_lookup_stored_chunks(self, index):
+        """Test stored chunk hashes resolve to their chunk ids."""
+        index.add_document_refs("doc_1", [(0, "h1", "doc_doc_1_chunk_0"), (1, "h2", "doc_doc_1_chunk_1")],
+                                [("h1", "doc_doc_1_chunk_0"), ("h2", "doc_doc_1_chunk_1")])
+
+        assert index.lookup_chunks(["h2", "h3"]) == {"h2": "doc_doc_1_chunk_1"}
+        assert index.document_chunk_count("doc_1") == 2
+
+    def test_release_unshared_document(self, index):
+        """Test releasing a document with no shared chunks reassigns nothing."""
+        index.register_file("abc", "doc_1")
+        index.add_document_refs("doc_1", [(0, "h1", "c1")], [("h1", "c1")])
+
+        assert index.release_document("doc_1") == {}
+        assert index.lookup_chunks(["h1"]) == {}
+        assert index.find_file("abc") is None
+
+    def test_release_hands_shared_chunks_to_other_document(self, index):
+        """Test shared chunks move to a document still referencing them."""
+        index.add_document_refs("doc_1", [(0, "h1", "c1"), (1, "h2", "c2")], [("h1", "c1"), ("h2", "c2")])
+        index.add_document_refs("doc_2", [(0, "h3", "c3"), (1, "h1", "c1")], [("h3", "c3")])
+
+        reassigned = index.release_document("doc_1")
+
+        assert reassigned == {"c1": ("doc_2", 1)}
+        assert index.lookup_chunks(["h1", "h2"]) == {"h1": "c1"}
+        assert index.get_stats()["chunk_references"] == 2
@@ -0,0 +1,99 @@
+"""
+Unit tests for query-aware context compression.
+
+Tests sentence splitting, budgeted sentence selection, and backfilling
+the sentence index for chunks ingested before it existed.
+"""
+
+import pytest
+import os
+
+import numpy as np
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.context_compression import SentenceIndex, TokenCounter, ContextCompressor, split_sentences
+
+VOCABULARY = ["refund", "window", "days", "shipping", "free", "office", "opened", "support"]
+
+
+def encode(texts):
+    """Bag-of-words vectors over a tiny vocabulary."""
+    return [[float(word in text.lower()) for word in VOCABULARY] + [0.01] for text in texts]
+
+
+CHUNK = {
+    "chunk_id": "doc_1_chunk_0",
+    "doc_id": "1",
+    "title": "Policy",
+    "score": 0.8,
+    "chunk_index": 0,
+    "content": ("Our office opened in 2019 in Lisbon. The refund window is 30 days from delivery. "
+                "Shipping is free on orders over fifty euros. Support answers within one day.")
+}
+
+
+@pytest.fixture
+def compressor(tmp_path):
+    """Provide a compressor with an empty sentence index and estimated token counts."""
+    index = SentenceIndex(str(tmp_path / "sentence_index.db"))
+    yield ContextCompressor(index, TokenCounter(), encode, "test-model", token_budget=40)
+    index.close()
+
+
+@pytest.mark.unit
+class TestContextCompression:
+    """Test ContextCompressor functionality."""
+
+    def test_split_sentences_offsets_and_short_fragments(self):
+        """Test sentences are returned as trimmed offsets and short fragments merge forward."""
+        text = "  First sentence is here. Fig. 2. Second sentence follows it.\n\nThird paragraph text."
+
+        sentences = [text[start:end] for start, end in split_sentences(text)]
+
+        assert sentences == ["First sentence is here.", "Fig. 2. Second sentence follows it.",
+                             "Third paragraph text."]
+
+    def test_compress_keeps_relevant_sentences_within_budget(self, compressor):
+        """Test the question's sentences are kept in order and unrelated ones dropped."""
+        query = np.array(encode(["refund window days shipping"])[0])
+
+        context, stats = compressor.compress(query, [CHUNK])
+
+        assert context.startswith("Document: Policy")
+        assert "The refund window is 30 days from delivery. Shipping is free" in context
+        assert "office" not in context and "Support" not in context
+        assert stats["sentences_selected"] == 2
+        assert stats["context_tokens"] <= compressor.token_budget
+
+        compressor.token_budget = 5
+        context, stats = compressor.compress(query, [CHUNK])
+        assert stats["sentences_selected"] == 1
+        assert "refund window" in context
+
+    def test_missing_chunks_are_backfilled(self, compressor):
+        """Test chunks absent from the index are split and stored on first use, then read back."""
+        query = np.array(encode(["support"])[0])
+        assert compressor.sentence_index.get_many("test-model", ["doc_1_chunk_0"]) == {}
+
+        compressor.compress(query, [CHUNK])
+
+        offsets, vectors = compressor.sentence_index.get_many("test-model", ["doc_1_chunk_0"])["doc_1_chunk_0"]
+        assert len(offsets) == 4 and vectors.shape == (4, len(VOCABULARY) + 1)
+        assert compressor.sentence_index.get_many("other-model", ["doc_1_chunk_0"]) == {}
+
+        compressor.sentence_index.remove_chunks(["doc_1_chunk_0"])
+        assert compressor.sentence_index.get_stats()["sentences"] == 0
+
+    def test_token_counter_falls_back_to_estimate(self):
+        """Test a failing tokenizer switches the counter to the word estimate."""
+        def broken_tokenizer(texts, add_special_tokens=False):
+            raise RuntimeError("no vocabulary")
+
+        counter = TokenCounter(broken_tokenizer, "broken")
+
+        assert counter.count("one two three four five six seven eight nine ten") == 13
+        assert counter.name == "estimate"
+        assert TokenCounter(lambda texts, add_special_tokens=False: {"input_ids": [[1, 2, 3]] * len(texts)},
+                            "fake").count_many(["a", "b"]) == [3, 3]
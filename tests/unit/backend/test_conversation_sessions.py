@@ -0,0 +1,92 @@
+"""
+Unit tests for conversation sessions.
+
+Tests history rendering, rolling summarization under the token budget,
+and idle and size-based session eviction.
+"""
+
+import pytest
+import time
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.conversation_sessions import ConversationSessionStore, ConversationTurn, summarize_turn
+
+
+@pytest.fixture
+def store():
+    """Provide a store with a small history budget."""
+    return ConversationSessionStore(max_history_tokens=100, max_summary_tokens=60, min_recent_turns=2)
+
+
+def long_answer(topic):
+    return f"The {topic} policy is described in the handbook. " + "It has many further details. " * 6
+
+
+@pytest.mark.unit
+class TestConversationSessionStore:
+    """Test ConversationSessionStore functionality."""
+
+    def test_history_messages_follow_turn_order(self, store):
+        """Test turns render as alternating user and assistant messages after any summary."""
+        session = store.get_or_create("s1")
+        store.record_turn(session, "What is the refund window?", "30 days.")
+        store.record_turn(session, "And for sale items?", "14 days.")
+
+        messages = session.history_messages()
+
+        assert [message["role"] for message in messages] == ["user", "assistant", "user", "assistant"]
+        assert messages[2]["content"] == "And for sale items?"
+        assert store.get_or_create("s1") is session
+        assert store.get("missing") is None
+
+    def test_turn_replays_message_as_sent(self, store):
+        """Test a turn's user message is replayed verbatim while the summary keeps the bare question."""
+        session = store.get_or_create("s1")
+        sent = "Context:\nRefunds take 30 days.\n\nQuestion: What is the refund window?"
+        store.record_turn(session, "What is the refund window?", "30 days.", message=sent)
+
+        assert session.history_messages()[0] == {"role": "user", "content": sent}
+        assert session.turns[0].tokens == sum(store.token_counter.count_many([sent, "30 days."]))
+        assert session.to_dict()["turns"][0]["question"] == "What is the refund window?"
+        assert summarize_turn(session.turns[0]) == "- Q: What is the refund window? A: 30 days."
+
+    def test_old_turns_fold_into_summary(self, store):
+        """Test exceeding the budget folds the oldest turns in bulk and keeps recent ones verbatim."""
+        session = store.get_or_create("s1")
+        for topic in ["refund", "shipping", "warranty", "privacy"]:
+            store.record_turn(session, f"What is the {topic} policy?", long_answer(topic))
+
+        assert len(session.turns) == 2
+        assert session.turns[-1].question == "What is the privacy policy?"
+        assert session.turn_count == 4
+        assert session.summary and session.summary_tokens <= store.max_summary_tokens
+        assert session.summary[-1].startswith("- Q: What is the shipping policy? A: The shipping policy")
+        assert session.history_messages()[0]["role"] == "system"
+        assert store.get_stats()["folded_turns"] == 2
+
+    def test_summarize_turn_uses_first_sentence(self):
+        """Test a summary line holds the question and the answer's first sentence."""
+        line = summarize_turn(ConversationTurn("Who approves leave?", "Your manager approves it. HR is notified.", 10))
+
+        assert line == "- Q: Who approves leave? A: Your manager approves it."
+
+    def test_idle_and_excess_sessions_are_evicted(self):
+        """Test sessions idle past the TTL expire and the least recently used go first at the cap."""
+        store = ConversationSessionStore(max_sessions=2, idle_ttl=60.0)
+        first = store.get_or_create("a")
+        store.get_or_create("b")
+        store.get_or_create("a")
+        store.get_or_create("c")
+
+        assert store.get("b") is None
+        assert store.get("a") is first
+
+        first.last_active = time.time() - 120
+        assert store.get("a") is None
+        assert store.delete("c") and not store.delete("c")
+
+        generated = store.get_or_create()
+        assert len(generated.session_id) == 32
@@ -0,0 +1,95 @@
+"""
+Unit tests for the document catalog.
+
+Tests upserts, updates with extra fields, filtering, sorting and
+keyset pagination.
+"""
+
+import pytest
+import os
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.document_catalog import DocumentCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """Provide a catalog with five documents."""
+    catalog = DocumentCatalog(str(tmp_path / "document_catalog.db"))
+    catalog.upsert_documents([
+        {
+            "doc_id": f"doc_{i}",
+            "title": f"Report {i}",
+            "file_type": "pdf" if i % 2 else "txt",
+            "file_size": i * 100,
+            "chunk_count": i,
+            "upload_timestamp": f"2025-01-0{i + 1}T00:00:00",
+            "processing_notes": ["ok"]
+        }
+        for i in range(5)
+    ])
+    return catalog
+
+
+@pytest.mark.unit
+class TestDocumentCatalog:
+    """Test DocumentCatalog functionality."""
+
+    def test_get_and_update(self, catalog):
+        """Test rows round-trip and unknown update keys are kept as extra fields."""
+        assert catalog.get("doc_2")["title"] == "Report 2"
+        assert catalog.get("missing") is None
+
+        assert catalog.update("doc_2", {"status": "archived", "current_version_id": "v2"})
+
+        entry = catalog.get("doc_2")
+        assert entry["status"] == "archived"
+        assert entry["current_version_id"] == "v2"
+        assert entry["processing_notes"] == "ok"
+
+    def test_filter_and_sort(self, catalog):
+        """Test filtering and default newest-first ordering."""
+        entries, total, _ = catalog.query(file_type="pdf")
+
+        assert total == 2
+        assert [entry["doc_id"] for entry in entries] == ["doc_3", "doc_1"]
+
+        entries, total, _ = catalog.query(min_size=200, sort_by="file_size", descending=False)
+        assert [entry["doc_id"] for entry in entries] == ["doc_2", "doc_3", "doc_4"]
+
+    def test_keyset_pagination(self, catalog):
+        """Test cursors walk every document exactly once."""
+        seen = []
+        cursor = None
+        while True:
+            entries, total, cursor = catalog.query(limit=2, cursor=cursor)
+            seen.extend(entry["doc_id"] for entry in entries)
+            if cursor is None:
+                break
+
+        assert total == 5
+        assert seen == ["doc_4", "doc_3", "doc_2", "doc_1", "doc_0"]
+
+    def test_invalid_cursor(self, catalog):
+        """Test malformed cursors are rejected."""
+        with pytest.raises(ValueError):
+            catalog.query(limit=2, cursor="not-a-cursor")
+
+    def test_delete_and_stats(self, catalog):
+        """Test deletes and aggregate statistics."""
+        assert catalog.delete("doc_4")
+        assert not catalog.delete("doc_4")
+
+        stats = catalog.get_stats()
+        assert stats["total_documents"] == 4
+        assert stats["total_size_bytes"] == 600
+        assert stats["file_type_distribution"] == {"pdf": 2, "txt": 2}
+
+    def test_get_many(self, catalog):
+        """Test batched lookups return only existing documents."""
+        entries = catalog.get_many(["doc_1", "doc_3", "missing", "doc_1"])
+
+        assert sorted(entries) == ["doc_1", "doc_3"]
+        assert entries["doc_3"]["title"] == "Report 3"
@@ -211,6 +211,7 @@ class TestDocumentManager:
             mock_collection = Mock()
             mock_collection.get.side_effect = Exception("Database error")
             mock_rag.collection = mock_collection
+            mock_rag.document_catalog.get.side_effect = Exception("Database error")
             mock_get_rag.return_value = mock_rag
             
             # Create a new document manager with the mocked RAG system
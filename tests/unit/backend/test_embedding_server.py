@@ -0,0 +1,104 @@
+"""
+Unit tests for the embedding server.
+
+Tests the text framing, encoding through the socket for small and bulk
+requests, and RemoteEncoder's fallback to in-process encoding.
+"""
+
+import pytest
+import asyncio
+import threading
+from unittest.mock import patch
+
+import numpy as np
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.encoder_backends import Encoder
+from app.embedding_server import (EmbeddingServer, connect_remote_encoder,
+                                  pack_texts, unpack_texts)
+
+
+class LengthModel:
+    """Stand-in model: [length, vowels, spaces, 1] per text."""
+
+    def encode(self, texts, **kwargs):
+        return np.array([[len(text), sum(c in "aeiou" for c in text), text.count(" "), 1.0]
+                         for text in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+
+@pytest.fixture
+def local_encoder():
+    return Encoder(LengthModel(), "test-model", "torch")
+
+
+@pytest.fixture
+def server(tmp_path, local_encoder):
+    """Run an embedding server on its own event loop thread."""
+    server = EmbeddingServer(str(tmp_path / "embeddings.sock"), local_encoder, max_batch_size=4, max_wait_ms=2.0)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result(timeout=5)
+    server.loop = loop
+    yield server
+    if os.path.exists(server.socket_path):
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+@pytest.mark.unit
+class TestEmbeddingServer:
+    """Test EmbeddingServer and RemoteEncoder functionality."""
+
+    def test_text_framing_round_trip(self):
+        """Test texts survive packing, including empty and non-ASCII ones."""
+        texts = ["hello", "", "Größe und Preis", "日本語"]
+
+        assert unpack_texts(pack_texts(texts), len(texts)) == texts
+        with pytest.raises(ValueError):
+            unpack_texts(pack_texts(texts) + b"x", len(texts))
+
+    def test_remote_encoding_matches_local(self, server, local_encoder):
+        """Test small (batched) and bulk (direct) requests return the local vectors."""
+        remote = connect_remote_encoder(server.socket_path, "test-model")
+        small = ["one query"]
+        bulk = [f"document number {i}" for i in range(10)]
+
+        assert remote.cache_key == "test-model" and remote.backend == "remote:torch"
+        np.testing.assert_array_equal(remote.encode(small), local_encoder.encode(small))
+        np.testing.assert_array_equal(remote.encode(bulk), local_encoder.encode(bulk))
+        assert remote.encode("single text").shape == (4,)
+        assert server.stats["bulk_requests"] == 1
+        assert remote.get_stats()["remote_calls"] == 3
+
+        # Concurrent callers each get their own pooled connection and their own vector
+        results = {}
+        threads = [threading.Thread(target=lambda i=i: results.update({i: remote.encode(["q" * i])}))
+                   for i in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert {i: vectors[0][0] for i, vectors in results.items()} == {i: i for i in range(1, 9)}
+
+    def test_falls_back_in_process_when_server_stops(self, server, local_encoder):
+        """Test a stopped server switches encoding in process, and unusable servers are not connected."""
+        remote = connect_remote_encoder(server.socket_path, "test-model")
+        assert connect_remote_encoder(server.socket_path, "other-model") is None
+
+        asyncio.run_coroutine_threadsafe(server.close(), server.loop).result(timeout=5)
+        with patch('app.embedding_server.load_encoder', return_value=local_encoder) as load:
+            vectors = remote.encode(["after shutdown"])
+            remote.encode(["still local"])
+
+        np.testing.assert_array_equal(vectors, local_encoder.encode(["after shutdown"]))
+        load.assert_called_once_with("test-model", "torch")
+        assert remote.get_stats()["failures"] == 1 and remote.get_stats()["fallback_calls"] == 2
+        assert connect_remote_encoder(server.socket_path, "test-model") is None
@@ -0,0 +1,103 @@
+"""
+Unit tests for the micro-batching embedding service.
+
+Tests batching of concurrent requests, deduplication, error propagation,
+and the async encode path.
+"""
+
+import pytest
+import asyncio
+import threading
+from unittest.mock import Mock
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.embedding_service import EmbeddingBatcher
+
+
+def make_encoder(calls):
+    """Encoder returning [len(text), index] vectors and recording each batch."""
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+    return encode
+
+
+@pytest.mark.unit
+class TestEmbeddingBatcher:
+    """Test EmbeddingBatcher functionality."""
+
+    def test_concurrent_requests_share_batches(self):
+        """Test that concurrent encodes are grouped into fewer encoder calls."""
+        calls = []
+        batcher = EmbeddingBatcher(make_encoder(calls), max_batch_size=16, max_wait_ms=50, monitor=Mock())
+        texts = [f"query {i}" for i in range(8)]
+        results = {}
+        barrier = threading.Barrier(len(texts))
+
+        def worker(text):
+            barrier.wait()
+            results[text] = batcher.encode(text, timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in texts]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        batcher.shutdown()
+
+        assert len(calls) < len(texts)
+        assert sum(len(batch) for batch in calls) == len(texts)
+        assert all(results[text][0] == float(len(text)) for text in texts)
+        assert batcher.get_stats()["total_requests"] == len(texts)
+
+    def test_batch_size_limit(self):
+        """Test that no encoder call exceeds max_batch_size."""
+        calls = []
+        batcher = EmbeddingBatcher(make_encoder(calls), max_batch_size=3, max_wait_ms=20, monitor=Mock())
+
+        results = batcher.encode_many([f"text {i}" for i in range(7)], timeout=5)
+        batcher.shutdown()
+
+        assert len(results) == 7
+        assert all(len(batch) <= 3 for batch in calls)
+
+    def test_duplicate_texts_encoded_once(self):
+        """Test that identical texts in one batch are encoded once."""
+        calls = []
+        batcher = EmbeddingBatcher(make_encoder(calls), max_batch_size=8, max_wait_ms=50, monitor=Mock())
+
+        results = batcher.encode_many(["same", "same", "other"], timeout=5)
+        batcher.shutdown()
+
+        assert results[0] == results[1]
+        assert calls[0].count("same") == 1
+
+    def test_encoder_error_propagates(self):
+        """Test that encoder failures are raised to every waiting caller."""
+        def failing_encode(texts):
+            raise RuntimeError("encoder down")
+
+        batcher = EmbeddingBatcher(failing_encode, max_wait_ms=1, monitor=Mock())
+
+        with pytest.raises(RuntimeError, match="encoder down"):
+            batcher.encode("text", timeout=5)
+        batcher.shutdown()
+
+        assert batcher.get_stats()["errors"] == 1
+
+    def test_encode_async(self):
+        """Test async encodes resolve without blocking the event loop."""
+        calls = []
+        batcher = EmbeddingBatcher(make_encoder(calls), max_batch_size=8, max_wait_ms=20, monitor=Mock())
+
+        async def run():
+            return await asyncio.gather(*(batcher.encode_async(f"q{i}") for i in range(4)))
+
+        results = asyncio.run(run())
+        batcher.shutdown()
+
+        assert len(results) == 4
+        assert all(vector[0] == 2.0 for vector in results)
@@ -0,0 +1,77 @@
+"""
+Unit tests for the persistent embedding store.
+
+Tests round-tripping vectors, model isolation, persistence across
+reopen, and size-capped eviction.
+"""
+
+import pytest
+import os
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.embedding_store import PersistentEmbeddingStore
+
+
+@pytest.mark.unit
+class TestPersistentEmbeddingStore:
+    """Test PersistentEmbeddingStore functionality."""
+
+    def test_put_and_get(self, tmp_path):
+        """Test stored vectors are returned for the same model and text."""
+        store = PersistentEmbeddingStore(str(tmp_path / "embeddings.db"))
+        store.put_many("model-a", ["hello", "world"], [[0.5, 1.0], [2.0, -1.5]])
+
+        assert store.get_many("model-a", ["world", "missing", "hello"]) == [[2.0, -1.5], None, [0.5, 1.0]]
+        assert store.get_stats()["hits"] == 2
+        assert store.get_stats()["misses"] == 1
+
+    def test_models_are_isolated(self, tmp_path):
+        """Test the same text under a different model is a miss."""
+        store = PersistentEmbeddingStore(str(tmp_path / "embeddings.db"))
+        store.put("model-a", "hello", [1.0, 2.0])
+
+        assert store.get("model-b", "hello") is None
+
+    def test_persists_across_reopen(self, tmp_path):
+        """Test embeddings survive closing and reopening the store."""
+        db_path = str(tmp_path / "embeddings.db")
+        store = PersistentEmbeddingStore(db_path)
+        store.put("model-a", "hello", [1.0, 2.0])
+        store.close()
+
+        reopened = PersistentEmbeddingStore(db_path)
+        assert reopened.get("model-a", "hello") == [1.0, 2.0]
+        assert reopened.get_stats()["entries"] == 1
+
+    def test_eviction_removes_least_recently_used(self, tmp_path):
+        """Test exceeding max_entries evicts the least recently accessed entries."""
+        store = PersistentEmbeddingStore(str(tmp_path / "embeddings.db"), max_entries=4, evict_to_ratio=0.5)
+        store.put_many("m", ["a", "b", "c", "d"], [[1.0], [2.0], [3.0], [4.0]])
+        store.get("m", "a")  # touch "a" so it is the most recent
+
+        store.put("m", "e", [5.0])
+
+        stats = store.get_stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 3
+        assert store.get("m", "e") == [5.0]
+
+    def test_hits_buffer_access_times_until_next_write(self, tmp_path):
+        """Test lookups do not write and their access times land with the next put."""
+        import sqlite3
+
+        db_path = str(tmp_path / "embeddings.db")
+        store = PersistentEmbeddingStore(db_path)
+        store.put("m", "a", [1.0])
+        reader = sqlite3.connect(db_path)
+        stored_at = reader.execute("SELECT last_accessed FROM embeddings").fetchone()[0]
+
+        store.get("m", "a")
+        assert reader.execute("SELECT last_accessed FROM embeddings").fetchone()[0] == stored_at
+
+        store.put("m", "b", [2.0])
+        touched = reader.execute("SELECT last_accessed FROM embeddings WHERE rowid = 1").fetchone()[0]
+        assert touched > stored_at
+        reader.close()
@@ -0,0 +1,72 @@
+"""
+Unit tests for encoder backends.
+
+Tests cache keys per backend, falling back to PyTorch when an ONNX backend
+cannot be loaded, and the parity report against a reference encoder.
+"""
+
+import pytest
+from unittest.mock import patch
+
+import numpy as np
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.encoder_backends import Encoder, check_parity, default_backend, load_encoder
+
+
+class HashingModel:
+    """Deterministic stand-in model: one pseudo-random vector per text, plus optional noise."""
+
+    def __init__(self, noise=0.0):
+        self.noise = noise
+
+    def encode(self, texts, **kwargs):
+        vectors = []
+        for text in texts:
+            rng = np.random.default_rng(sum(map(ord, text)))
+            vector = rng.normal(size=16)
+            if self.noise:
+                vector += np.random.default_rng(len(text)).normal(scale=self.noise, size=16)
+            vectors.append(vector)
+        return np.array(vectors, dtype=np.float32)
+
+
+@pytest.mark.unit
+class TestEncoderBackends:
+    """Test encoder backend functionality."""
+
+    def test_cache_key_separates_quantized_vectors(self):
+        """Test int8 vectors are keyed apart from float vectors of the same model."""
+        assert Encoder(HashingModel(), "all-MiniLM-L6-v2", "torch").cache_key == "all-MiniLM-L6-v2"
+        assert Encoder(HashingModel(), "all-MiniLM-L6-v2", "onnx").cache_key == "all-MiniLM-L6-v2"
+        assert Encoder(HashingModel(), "all-MiniLM-L6-v2", "onnx-int8").cache_key == "all-MiniLM-L6-v2@onnx-int8"
+
+    def test_unavailable_onnx_backend_falls_back_to_torch(self, monkeypatch):
+        """Test a backend that fails to load yields a torch encoder, and unknown names default to torch."""
+        def fake_sentence_transformer(name, backend="torch", **kwargs):
+            if backend == "onnx":
+                raise ImportError("optimum is not installed")
+            return HashingModel()
+
+        with patch('sentence_transformers.SentenceTransformer', side_effect=fake_sentence_transformer):
+            encoder = load_encoder("all-MiniLM-L6-v2", "onnx")
+
+        assert encoder.backend == "torch"
+        monkeypatch.setenv("EMBEDDING_BACKEND", "tensorrt")
+        assert default_backend() == "torch"
+
+    def test_parity_reports_drift_and_speed(self):
+        """Test identical encoders report no drift and a noisy one reports measurable drift."""
+        reference = Encoder(HashingModel(), "model", "torch")
+
+        same = check_parity(Encoder(HashingModel(), "model", "onnx"), reference, min_timed_texts=24)
+        noisy = check_parity(Encoder(HashingModel(noise=0.5), "model", "onnx-int8"), reference,
+                             min_timed_texts=24)
+
+        assert same["max_drift"] < 1e-5 and same["neighbour_agreement"] == 1.0
+        assert 0.0 < noisy["max_drift"] < 1.0 and noisy["mean_cosine"] < same["mean_cosine"]
+        assert noisy["candidate_backend"] == "onnx-int8" and noisy["texts"] == 12
+        assert noisy["speedup"] > 0
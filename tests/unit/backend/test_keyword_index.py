@@ -0,0 +1,116 @@
+"""
+Unit tests for the BM25 keyword index.
+
+Tests ranking, incremental removal and reassignment, and persistence
+across reopening the index.
+"""
+
+import pytest
+import os
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.keyword_index import BM25Index, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Provide an index with three chunks."""
+    index = BM25Index(str(tmp_path / "keyword_index.db"))
+    index.add_chunks([
+        ("c1", "doc_1", "Reset your password from the account settings page."),
+        ("c2", "doc_1", "Billing invoices are emailed monthly."),
+        ("c3", "doc_2", "Password password password rules require twelve characters.")
+    ])
+    yield index
+    index.close()
+
+
+@pytest.mark.unit
+class TestBM25Index:
+    """Test BM25Index functionality."""
+
+    def test_tokenize_drops_stop_words(self):
+        """Test tokenization lowercases and removes stop words and single characters."""
+        assert tokenize("How to Reset THE password, a 2FA code") == ["how", "reset", "password", "2fa", "code"]
+
+    def test_search_ranks_by_bm25(self, index):
+        """Test matching chunks are ranked and non-matching ones are excluded."""
+        hits = index.search("password reset")
+
+        assert [chunk_id for chunk_id, _, _ in hits] == ["c1", "c3"]
+        assert hits[0][1] == "doc_1"
+        assert hits[0][2] > hits[1][2] > 0
+        assert index.search("nonexistent terms") == []
+
+    def test_remove_and_reassign(self, index):
+        """Test removed chunks stop matching and reassigned chunks report their new owner."""
+        assert index.remove_chunks(["c1", "missing"]) == 1
+        index.reassign_chunks({"c3": "doc_3"})
+
+        hits = index.search("password")
+        assert [(chunk_id, doc_id) for chunk_id, doc_id, _ in hits] == [("c3", "doc_3")]
+        assert index.get_stats()["chunks"] == 2
+
+    def test_persists_across_reopen(self, index, tmp_path):
+        """Test a reopened index returns the same results."""
+        index.add_chunks([("c2", "doc_1", "Invoices and password changes")])
+        expected = index.search("password invoices")
+
+        reopened = BM25Index(str(tmp_path / "keyword_index.db"))
+        try:
+            assert reopened.search("password invoices") == expected
+            assert reopened.get_stats() == index.get_stats()
+        finally:
+            reopened.close()
+
+    def test_top_k_over_many_chunks(self, index):
+        """Test top-k selection returns the best chunks in order and reuses freed slots."""
+        index.add_chunks([(f"n{i}", f"doc_n{i}", "network " * (i + 1) + "filler text") for i in range(50)])
+        index.remove_chunks([f"n{i}" for i in range(10)])
+        index.add_chunks([("fresh", "doc_fresh", "network " * 100)])
+
+        hits = index.search("network", top_k=3)
+
+        assert [chunk_id for chunk_id, _, _ in hits] == ["fresh", "n49", "n48"]
+        assert len(index) == 44
+
+
+@pytest.mark.unit
+class TestSemanticSearchKeywordSide:
+    """Test the search engine's keyword retriever over the BM25 index."""
+
+    @pytest.mark.asyncio
+    async def test_keyword_search_returns_hits(self):
+        """Test BM25 hits are resolved to their documents and scaled to 0-1."""
+        from unittest.mock import AsyncMock, Mock, patch
+        from app.document_manager import DocumentMetadata
+        from app.search_engine import QueryIntent, SemanticSearchEngine
+
+        rag_system = Mock()
+        rag_system.keyword_search_async = AsyncMock(return_value=[
+            {"doc_id": "doc_1", "content": "Reset your password.", "score": 4.0},
+            {"doc_id": "doc_2", "content": "Password rules.", "score": 2.0}
+        ])
+        with patch('app.search_engine.DocumentManager'):
+            engine = SemanticSearchEngine(rag_system=rag_system)
+        engine.doc_manager.get_documents = AsyncMock(side_effect=lambda doc_ids: {
+            doc_id: DocumentMetadata(
+                doc_id=doc_id, title=f"Title {doc_id}", file_type="txt", original_filename=f"{doc_id}.txt",
+                file_size=10, upload_timestamp="2025-01-01T00:00:00"
+            )
+            for doc_id in doc_ids
+        })
+        intent = QueryIntent(
+            original_query="reset password", normalized_query="reset password", intent_type="search",
+            entities=[], keywords=["reset", "password"], semantic_concepts=[], complexity_score=0.1,
+            expanded_terms=[], filters={}, confidence=1.0
+        )
+
+        results = await engine._keyword_search(intent, max_results=5)
+
+        assert [result['doc_id'] for result in results] == ["doc_1", "doc_2"]
+        assert [result['keyword_score'] for result in results] == [1.0, 0.5]
+        assert results[0]['title'] == "Title doc_1"
+        assert all(result['search_type'] == 'keyword' for result in results)
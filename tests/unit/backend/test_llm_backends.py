@@ -0,0 +1,233 @@
+"""
+Unit tests for LLM backend routing.
+
+Tests least-outstanding-requests selection, exclusion of failed backends,
+skipping backends whose circuit breaker is open, session affinity,
+hedging eligibility, and hedged requests in the sync and async clients.
+"""
+
+import pytest
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.llm_backends import LLMBackendPool, normalize_backend_url
+from app.rag_backend import LocalLLMClient, AsyncLocalLLMClient
+
+
+def make_breaker(available=True):
+    """Create a stand-in circuit breaker."""
+    breaker = Mock()
+    breaker.can_attempt.return_value = available
+    breaker.state = 'CLOSED' if available else 'OPEN'
+    breaker.failure_count = 0
+    return breaker
+
+
+@pytest.fixture
+def pool():
+    """Provide a pool of three backends."""
+    return LLMBackendPool.from_urls(["box1:11434", "box2:11434", "http://box3:11434/"],
+                                    breaker_factory=make_breaker)
+
+
+@pytest.mark.unit
+class TestLLMBackendPool:
+    """Test LLMBackendPool functionality."""
+
+    def test_from_urls_normalizes_and_dedupes(self):
+        """Test backend URLs are normalized and duplicates dropped."""
+        pool = LLMBackendPool.from_urls(["box1:11434", "http://box1:11434/", "box2:11434"],
+                                        breaker_factory=make_breaker,
+                                        pool_factory=lambda url, index: f"pool{index}")
+
+        assert [backend.url for backend in pool.backends] == ["http://box1:11434", "http://box2:11434"]
+        assert [backend.http_pool for backend in pool.backends] == ["pool0", "pool1"]
+        assert normalize_backend_url(" localhost:11434/ ") == "http://localhost:11434"
+
+    def test_choose_least_outstanding(self, pool):
+        """Test new requests go to the backend with the fewest requests in flight."""
+        box1, box2, box3 = pool.backends
+
+        with pool.track(box1), pool.track(box2):
+            assert pool.choose() is box3
+            with pool.track(box3), pool.track(box3):
+                assert pool.choose() in (box1, box2)
+
+        assert all(backend.outstanding == 0 for backend in pool.backends)
+        assert box3.total_requests == 2
+
+    def test_choose_rotates_idle_backends(self, pool):
+        """Test ties between idle backends are spread across all of them."""
+        chosen = {pool.choose().url for _ in range(6)}
+        assert len(chosen) == 3
+
+    def test_choose_skips_open_and_excluded(self, pool):
+        """Test open breakers are skipped and excluded backends are a last resort."""
+        box1, box2, box3 = pool.backends
+        box2.circuit_breaker.can_attempt.return_value = False
+
+        assert pool.choose(exclude=[box1]) is box3
+        assert pool.choose(exclude=[box1, box3]) in (box1, box3)
+
+        box1.circuit_breaker.can_attempt.return_value = False
+        box3.circuit_breaker.can_attempt.return_value = False
+        assert pool.choose() is None
+        assert not pool.any_available()
+
+    def test_choose_with_affinity_is_sticky(self, pool):
+        """Test an affinity key keeps its backend regardless of load and moves only when it fails."""
+        home = pool.choose(affinity="session-1")
+
+        with pool.track(home), pool.track(home):
+            assert pool.choose(affinity="session-1") is home
+        assert {pool.choose(affinity=f"session-{i}").url for i in range(30)} == \
+            {backend.url for backend in pool.backends}
+
+        home.circuit_breaker.can_attempt.return_value = False
+        moved = pool.choose(affinity="session-1")
+        assert moved is not None and moved is not home
+        assert pool.choose(exclude=[moved], affinity="session-1") not in (home, moved)
+
+    def test_should_hedge_needs_second_backend(self, pool):
+        """Test hedging is only used when enabled and two backends are available."""
+        assert not pool.should_hedge()
+
+        pool.hedge_enabled = True
+        assert pool.should_hedge()
+        assert not pool.should_hedge(affinity="session-1")
+
+        pool.backends[1].circuit_breaker.can_attempt.return_value = False
+        pool.backends[2].circuit_breaker.can_attempt.return_value = False
+        assert not pool.should_hedge()
+
+    def test_record_failure_and_stats(self, pool):
+        """Test failures reach the backend's circuit breaker and show in stats."""
+        box1 = pool.backends[0]
+        pool.record_failure(box1)
+        pool.record_hedge()
+
+        box1.circuit_breaker.record_failure.assert_called_once()
+        stats = pool.get_stats()
+        assert stats["backends"][0]["failures"] == 1
+        assert stats["hedged"] == 1
+
+
+@pytest.fixture
+def hedged_pool():
+    """Provide a two-backend pool that hedges after 50ms, routing first to box1."""
+    pool = LLMBackendPool.from_urls(["box1:11434", "box2:11434"], breaker_factory=make_breaker,
+                                    hedge_enabled=True, hedge_delay=0.05)
+    pool.backends[1].outstanding = 1
+    return pool
+
+
+@pytest.mark.unit
+class TestHedgedStream:
+    """Test LocalLLMClient._hedged_stream."""
+
+    @staticmethod
+    def _client(pool, slow_backends):
+        """Create a client whose backends in slow_backends never answer until cancelled."""
+        with patch('app.rag_backend.get_pool_manager'):
+            client = LocalLLMClient(backend_urls=["box1:11434"], scheduler=Mock())
+        client.backends = pool
+        client.launched_at = {}
+        client.cancelled = {}
+
+        def fake_stream(backend, messages, model, temperature, max_tokens, cancel=None):
+            client.launched_at[backend.name] = time.time()
+            if backend.name in slow_backends:
+                if cancel.wait(timeout=5):
+                    client.cancelled[backend.name] = True
+                    return
+                yield "too late"
+                return
+            yield f"from {backend.name}"
+            yield "!"
+
+        client._stream_chat = fake_stream
+        return client
+
+    def test_fast_primary_is_not_hedged(self, hedged_pool):
+        """Test a backend that answers within the delay is used alone."""
+        client = self._client(hedged_pool, slow_backends=set())
+        started = time.time()
+
+        tokens = list(client._hedged_stream([], "m", 0.7, 100))
+
+        assert tokens == ["from box1:11434", "!"]
+        assert list(client.launched_at) == ["box1:11434"]
+        assert time.time() - started < hedged_pool.hedge_delay
+        assert hedged_pool.stats == {"hedged": 0, "hedge_wins": 0}
+
+    def test_hedge_fires_after_delay_and_first_responder_wins(self, hedged_pool):
+        """Test a slow primary is hedged after the delay, the hedge wins and the primary is cancelled."""
+        client = self._client(hedged_pool, slow_backends={"box1:11434"})
+
+        tokens = list(client._hedged_stream([], "m", 0.7, 100))
+
+        assert tokens == ["from box2:11434", "!"]
+        delay = client.launched_at["box2:11434"] - client.launched_at["box1:11434"]
+        assert delay >= hedged_pool.hedge_delay
+        assert hedged_pool.stats == {"hedged": 1, "hedge_wins": 1}
+        # The loser's thread stops and releases its outstanding count once it sees the cancel
+        deadline = time.time() + 1
+        while hedged_pool.backends[0].outstanding and time.time() < deadline:
+            time.sleep(0.01)
+        assert client.cancelled == {"box1:11434": True}
+        assert hedged_pool.backends[0].outstanding == 0
+
+
+@pytest.mark.unit
+class TestHedgedChat:
+    """Test AsyncLocalLLMClient._hedged_chat."""
+
+    @staticmethod
+    def _client(pool, slow_backends):
+        """Create an async client whose backends in slow_backends never produce a token."""
+        client = AsyncLocalLLMClient(backends=pool, scheduler=Mock())
+        client.launched_at = {}
+        client.cancelled = {}
+
+        async def fake_collect(backend, messages, model, temperature, max_tokens, first_tokens):
+            client.launched_at[backend.name] = time.time()
+            try:
+                if backend.name in slow_backends:
+                    await asyncio.sleep(5)
+                first_tokens.put_nowait(backend)
+                return f"from {backend.name}"
+            except asyncio.CancelledError:
+                client.cancelled[backend.name] = True
+                raise
+
+        client._stream_collect = fake_collect
+        return client
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_is_not_hedged(self, hedged_pool):
+        """Test a backend that answers within the delay is used alone."""
+        client = self._client(hedged_pool, slow_backends=set())
+
+        result = await client._hedged_chat([], "m", 0.7, 100, set())
+
+        assert result == "from box1:11434"
+        assert list(client.launched_at) == ["box1:11434"]
+        assert hedged_pool.stats == {"hedged": 0, "hedge_wins": 0}
+
+    @pytest.mark.asyncio
+    async def test_hedge_fires_after_delay_and_first_responder_wins(self, hedged_pool):
+        """Test a slow primary is hedged after the delay, the hedge wins and the primary is cancelled."""
+        client = self._client(hedged_pool, slow_backends={"box1:11434"})
+
+        result = await client._hedged_chat([], "m", 0.7, 100, set())
+
+        assert result == "from box2:11434"
+        delay = client.launched_at["box2:11434"] - client.launched_at["box1:11434"]
+        assert delay >= hedged_pool.hedge_delay
+        assert client.cancelled == {"box1:11434": True}
+        assert hedged_pool.stats == {"hedged": 1, "hedge_wins": 1}
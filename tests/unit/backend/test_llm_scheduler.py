@@ -0,0 +1,113 @@
+"""
+Unit tests for the LLM request scheduler.
+
+Tests per-model concurrency limits, priority dispatch order, fast
+rejection and displacement when the queue is full, and wait timeouts.
+"""
+
+import pytest
+import asyncio
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.llm_scheduler import LLMScheduler, LLMPriority, LLMQueueFullError
+
+
+@pytest.fixture
+def scheduler():
+    """Provide a scheduler allowing one generation per model."""
+    return LLMScheduler(default_concurrency=1, max_queue_depth=2, max_wait_seconds=5.0)
+
+
+@pytest.mark.unit
+class TestLLMScheduler:
+    """Test LLMScheduler functionality."""
+
+    def test_models_have_independent_limits(self, scheduler):
+        """Test a busy model does not block another model."""
+        scheduler.set_concurrency("big", 1)
+
+        with scheduler.slot("big"):
+            with scheduler.slot("small"):
+                stats = scheduler.get_stats()["models"]
+                assert stats["big"]["active"] == 1
+                assert stats["small"]["active"] == 1
+
+        assert scheduler.get_stats()["models"]["big"]["active"] == 0
+
+    def test_interactive_dispatched_before_background(self, scheduler):
+        """Test queued requests start in priority order, not arrival order."""
+        order = []
+
+        async def run(name, priority, hold):
+            async with scheduler.async_slot("m", priority):
+                order.append(name)
+                await hold.wait()
+
+        async def main():
+            release = asyncio.Event()
+            first = asyncio.create_task(run("first", LLMPriority.INTERACTIVE, release))
+            await asyncio.sleep(0)
+            background = asyncio.create_task(run("background", LLMPriority.BACKGROUND, asyncio.Event()))
+            await asyncio.sleep(0)
+            interactive = asyncio.create_task(run("interactive", LLMPriority.INTERACTIVE, asyncio.Event()))
+            await asyncio.sleep(0)
+
+            assert scheduler.get_stats()["models"]["m"]["queued"] == 2
+            release.set()
+            await asyncio.sleep(0.05)
+            for task in (first, background, interactive):
+                task.cancel()
+            await asyncio.gather(first, background, interactive, return_exceptions=True)
+
+        asyncio.run(main())
+        assert order == ["first", "interactive"]
+
+    def test_full_queue_rejects_or_displaces(self, scheduler):
+        """Test a full queue rejects equal priority work and displaces lower priority work."""
+        async def main():
+            results = {}
+
+            async def run(name, priority):
+                try:
+                    async with scheduler.async_slot("m", priority):
+                        await asyncio.sleep(0.01)
+                    results[name] = "ran"
+                except LLMQueueFullError:
+                    results[name] = "rejected"
+
+            async with scheduler.async_slot("m", LLMPriority.INTERACTIVE):
+                tasks = [asyncio.create_task(run("bg1", LLMPriority.BACKGROUND)),
+                         asyncio.create_task(run("bg2", LLMPriority.BACKGROUND))]
+                await asyncio.sleep(0)
+
+                with pytest.raises(LLMQueueFullError):
+                    async with scheduler.async_slot("m", LLMPriority.BACKGROUND):
+                        pass
+
+                tasks.append(asyncio.create_task(run("interactive", LLMPriority.INTERACTIVE)))
+                await asyncio.sleep(0)
+
+            await asyncio.gather(*tasks)
+            return results
+
+        results = asyncio.run(main())
+
+        assert results == {"bg1": "ran", "bg2": "rejected", "interactive": "ran"}
+        stats = scheduler.get_stats()
+        assert stats["rejected"] == 1
+        assert stats["displaced"] == 1
+
+    def test_wait_timeout(self, scheduler):
+        """Test a request that cannot get a slot in time fails and leaves the queue."""
+        with scheduler.slot("m"):
+            with pytest.raises(LLMQueueFullError):
+                with scheduler.slot("m", timeout=0.01):
+                    pass
+
+            assert scheduler.get_stats()["models"]["m"]["queued"] == 0
+
+        with scheduler.slot("m"):
+            assert scheduler.get_stats()["timed_out"] == 1
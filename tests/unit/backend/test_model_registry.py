@@ -0,0 +1,86 @@
+"""
+Unit tests for the embedding model registry.
+
+Tests that each model is loaded once and shared, that concurrent first
+requests trigger a single load, and per-model load statistics.
+"""
+
+import pytest
+import threading
+from unittest.mock import Mock
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.model_registry import EmbeddingModelRegistry
+
+
+@pytest.fixture
+def loads():
+    """Record the names passed to the loader."""
+    return []
+
+
+@pytest.fixture
+def registry(loads):
+    """Provide a registry whose loader returns a fresh stand-in model per load."""
+    def loader(name, backend):
+        loads.append((name, backend))
+        return Mock(name=name, device="cpu", backend=backend)
+    return EmbeddingModelRegistry(loader=loader)
+
+
+@pytest.mark.unit
+class TestEmbeddingModelRegistry:
+    """Test EmbeddingModelRegistry functionality."""
+
+    def test_models_are_loaded_once_and_shared(self, registry, loads):
+        """Test repeated requests for a model return the same instance without reloading."""
+        first = registry.get("all-MiniLM-L6-v2", "torch")
+        second = registry.get("all-MiniLM-L6-v2", "torch")
+        other = registry.get("distiluse-base-multilingual-cased", "torch")
+        quantized = registry.get("all-MiniLM-L6-v2", "onnx-int8")
+
+        assert first is second and first is not other and first is not quantized
+        assert loads == [("all-MiniLM-L6-v2", "torch"), ("distiluse-base-multilingual-cased", "torch"),
+                         ("all-MiniLM-L6-v2", "onnx-int8")]
+        assert registry.is_loaded("all-MiniLM-L6-v2", "torch")
+
+        stats = registry.get_stats()
+        assert stats["loaded_models"] == 3
+        assert stats["models"]["all-MiniLM-L6-v2@torch"]["references"] == 2
+        assert stats["models"]["all-MiniLM-L6-v2@torch"]["device"] == "cpu"
+        assert stats["models"]["all-MiniLM-L6-v2@onnx-int8"]["backend"] == "onnx-int8"
+        assert stats["process_rss_mb"] > 0
+
+    def test_concurrent_first_requests_load_once(self, registry, loads):
+        """Test threads racing for an unloaded model all get the one instance."""
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("shared", "torch")))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert loads == [("shared", "torch")]
+        assert len({id(model) for model in results}) == 1
+
+    def test_failed_load_is_not_cached(self):
+        """Test a load error reaches the caller and the next request retries."""
+        attempts = []
+
+        def flaky_loader(name, backend):
+            attempts.append(name)
+            if len(attempts) == 1:
+                raise OSError("model files not found")
+            return Mock()
+
+        registry = EmbeddingModelRegistry(loader=flaky_loader)
+
+        with pytest.raises(OSError):
+            registry.get("model", "torch")
+        assert not registry.is_loaded("model", "torch")
+        assert registry.get("model", "torch") is not None
+        assert registry.unload("model", "torch") and not registry.is_loaded("model", "torch")
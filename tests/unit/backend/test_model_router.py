@@ -0,0 +1,81 @@
+"""
+Unit tests for model routing.
+
+Tests rule matching on intent, word count and context size, per-request
+hints, and the disabled (default route only) behaviour.
+"""
+
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.model_router import ModelRouter, ModelRoute, RoutingRule
+
+
+@pytest.fixture
+def router():
+    """Provide an enabled router with the default routes and rules."""
+    return ModelRouter(enabled=True)
+
+
+@pytest.mark.unit
+class TestModelRouter:
+    """Test ModelRouter functionality."""
+
+    def test_simple_lookup_uses_fast_route(self, router):
+        """Test short factual questions with little context go to the fast model."""
+        decision = router.route("What is the refund window?", context_tokens=200)
+
+        assert decision.route == "fast"
+        assert decision.model == router.routes["fast"].model
+        assert decision.intent == "question"
+
+    def test_comparison_and_analysis_use_large_route(self, router):
+        """Test comparison and analysis questions go to the large model."""
+        comparison = router.route("What is the difference between the basic and premium plans?")
+        analysis = router.route("Analyze the causes of the Q3 outage")
+
+        assert (comparison.route, comparison.reason) == ("large", "analytical")
+        assert (analysis.route, analysis.intent) == ("large", "analysis")
+
+    def test_long_context_uses_large_route(self, router):
+        """Test a simple question over a lot of context still goes to the large model."""
+        decision = router.route("What is the refund window?", context_tokens=2000)
+
+        assert (decision.route, decision.reason) == ("large", "long_context")
+
+    def test_unmatched_query_uses_default(self, router):
+        """Test queries no rule matches fall back to the default route."""
+        decision = router.route("What are all of the configuration options that the deployment "
+                                "guide lists for the staging environment?", context_tokens=300)
+
+        assert decision.route == "default"
+        assert decision.reason == "no_rule_matched"
+
+    def test_hint_overrides_rules(self, router):
+        """Test a known hint wins and an unknown hint is ignored."""
+        assert router.route("Compare plan A versus plan B", hint="fast").route == "fast"
+        assert router.route("Compare plan A versus plan B", hint="nonexistent").route == "large"
+
+    def test_disabled_router_uses_default(self):
+        """Test a disabled router sends everything to the default route."""
+        router = ModelRouter()
+        decision = router.route("Compare plan A versus plan B")
+
+        assert decision.route == "default"
+        assert decision.max_tokens is None
+        assert router.route("Compare plan A versus plan B", hint="large").route == "large"
+
+    def test_custom_rules_and_routes(self):
+        """Test configured rules are applied in order and routes can be repointed."""
+        router = ModelRouter(
+            routes={"default": ModelRoute("small-model"), "big": ModelRoute("big-model", max_tokens=900)},
+            rules=[RoutingRule(name="complex", route="big", min_complexity=0.9)],
+            enabled=True
+        )
+        router.set_route_model("default", "other-small-model")
+
+        assert router.route("Compare plan A versus plan B in detail").model == "big-model"
+        assert router.route("refund").model == "other-small-model"
@@ -0,0 +1,182 @@
+"""
+Unit tests for the performance cache.
+
+Tests basic get/set behaviour, tag-based invalidation, the get_or_compute
+storage hooks, stale-while-revalidate, and memory-bounded eviction for each strategy.
+"""
+
+import pytest
+import asyncio
+import time
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.performance_cache import PerformanceCache, CacheStrategy
+
+
+@pytest.fixture
+def cache():
+    """Provide a small LRU cache."""
+    cache = PerformanceCache(max_size=10, default_ttl=60.0, cleanup_interval=60.0)
+    yield cache
+    cache.shutdown()
+
+
+@pytest.mark.unit
+class TestPerformanceCache:
+    """Test PerformanceCache functionality."""
+
+    def test_set_and_get(self, cache):
+        """Test stored values are returned and misses return None."""
+        cache.set("a", {"answer": 1})
+
+        assert cache.get("a") == {"answer": 1}
+        assert cache.get("missing") is None
+
+    def test_invalidate_tags(self, cache):
+        """Test invalidating a tag removes only the entries carrying it."""
+        cache.set("q1", "one", tags=["doc:1"])
+        cache.set("q2", "two", tags=["doc:1", "doc:2"])
+        cache.set("q3", "three", tags=["doc:3"])
+
+        assert cache.invalidate_tags(["doc:1"]) == 2
+
+        assert cache.get("q1") is None
+        assert cache.get("q2") is None
+        assert cache.get("q3") == "three"
+        assert cache.get_stats()["invalidations"] == 2
+
+    def test_replacing_entry_drops_old_tags(self, cache):
+        """Test overwriting a key re-tags it."""
+        cache.set("q1", "old", tags=["doc:1"])
+        cache.set("q1", "new", tags=["doc:2"])
+
+        assert cache.invalidate_tags(["doc:1"]) == 0
+        assert cache.get("q1") == "new"
+
+    def test_get_or_compute_tags_and_should_cache(self, cache):
+        """Test computed values are tagged, and skipped when should_cache rejects them."""
+        async def compute():
+            return {"sources": ["doc:7"]}
+
+        asyncio.run(cache.get_or_compute("q", compute, tags_func=lambda value: value["sources"]))
+        assert cache.invalidate_tags(["doc:7"]) == 1
+
+        asyncio.run(cache.get_or_compute("q", compute, should_cache=lambda value: False))
+        assert cache.get("q") is None
+
+    def test_get_or_compute_serves_stale_while_refreshing(self):
+        """Test an expired entry within the grace period is served flagged stale and refreshed."""
+        cache = PerformanceCache(max_size=10, default_ttl=60.0, stale_grace=60.0)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"answer": len(calls)}
+
+        async def scenario():
+            cache.set("q", {"answer": 0}, ttl=0.01)
+            await asyncio.sleep(0.02)
+            assert cache.get("q") is None
+
+            first = await cache.get_or_compute("q", compute, mark_stale=lambda value: {**value, "stale": True})
+            second = await cache.get_or_compute("q", compute)
+            assert first == {"answer": 0, "stale": True}
+            assert second == {"answer": 0}
+
+            await asyncio.sleep(0.01)
+            return await cache.get_or_compute("q", compute)
+
+        try:
+            assert asyncio.run(scenario()) == {"answer": 1}
+            assert len(calls) == 1
+            assert cache.get_stats()["stale_hits"] == 2
+
+            # A rejected refresh leaves the stale value in place; past the grace it is a miss
+            cache.set("e", "good", ttl=0.01)
+            time.sleep(0.02)
+            result = asyncio.run(cache.get_or_compute("e", compute, should_cache=lambda value: False))
+            assert result == "good" and cache.lookup("e", allow_stale=True) == ("good", True)
+            cache.stale_grace = 0.0
+            assert cache.lookup("e", allow_stale=True) == (None, False)
+        finally:
+            cache.shutdown()
+
+    def test_memory_accounting_tracks_removals(self, cache):
+        """Test the running memory total follows sets, overwrites and removals."""
+        cache.set("a", "x" * 1000, tags=["doc:1"])
+        cache.set("b", "y" * 2000)
+        cache.set("a", "z" * 500)
+
+        expected = sum(entry.size_bytes for entry in cache._cache.values())
+        assert cache._memory_bytes == expected
+
+        cache.delete("a")
+        cache.invalidate_tags(["doc:1"])
+        cache.delete("b")
+        assert cache._memory_bytes == 0
+
+
+@pytest.mark.unit
+class TestPerformanceCacheEviction:
+    """Test eviction against count and byte limits."""
+
+    def test_evicts_until_value_fits_memory_limit(self):
+        """Test one large insert evicts as many entries as needed."""
+        cache = PerformanceCache(max_size=100, cleanup_interval=60.0, max_memory_mb=1)
+        try:
+            for i in range(8):
+                cache.set(f"small{i}", "x" * 100_000)
+
+            assert cache.set("large", "y" * 700_000)
+
+            assert cache.get("large") is not None
+            assert cache._memory_bytes <= cache.max_memory_bytes
+            assert cache.get_stats()["evictions"] >= 5
+        finally:
+            cache.shutdown()
+
+    def test_rejects_value_larger_than_limit(self):
+        """Test values that can never fit are not cached."""
+        cache = PerformanceCache(max_size=10, cleanup_interval=60.0, max_memory_mb=1)
+        try:
+            cache.set("kept", "x")
+            assert not cache.set("huge", "y" * 2_000_000)
+            assert cache.get("kept") == "x"
+        finally:
+            cache.shutdown()
+
+    def test_lfu_evicts_least_frequently_used(self):
+        """Test the LFU heap evicts the entry with the fewest accesses."""
+        cache = PerformanceCache(max_size=3, cleanup_interval=60.0, strategy=CacheStrategy.LFU)
+        try:
+            for key in ("a", "b", "c"):
+                cache.set(key, key)
+            for _ in range(3):
+                cache.get("a")
+                cache.get("c")
+            cache.get("b")
+
+            cache.set("d", "d")
+
+            assert cache.get("b") is None
+            assert cache.get("a") == "a"
+            assert cache.get("c") == "c"
+        finally:
+            cache.shutdown()
+
+    def test_ttl_only_evicts_soonest_expiry(self):
+        """Test TTL_ONLY evicts the entry closest to expiring when full."""
+        cache = PerformanceCache(max_size=2, cleanup_interval=60.0, strategy=CacheStrategy.TTL_ONLY)
+        try:
+            cache.set("long", 1, ttl=600)
+            cache.set("short", 2, ttl=30)
+            cache.set("new", 3, ttl=300)
+
+            assert cache.get("short") is None
+            assert cache.get("long") == 1
+            assert cache.get("new") == 3
+        finally:
+            cache.shutdown()
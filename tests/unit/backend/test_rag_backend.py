@@ -10,7 +10,7 @@ Date: 2025-08-04
 
 import pytest
 import numpy as np
-from unittest.mock import Mock, patch, MagicMock, PropertyMock
+from unittest.mock import Mock, patch, MagicMock, PropertyMock, AsyncMock, ANY
 from typing import List, Dict, Any
 import requests
 
@@ -19,7 +19,10 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
-from app.rag_backend import LocalRAGSystem, LocalLLMClient
+from app.rag_backend import (LocalRAGSystem, LocalLLMClient, AsyncLocalLLMClient, LLMFailureAnswer,
+                             LLM_UNAVAILABLE_ANSWER)
+from app.model_registry import EmbeddingModelRegistry
+from app.encoder_backends import Encoder
 import chromadb
 from sentence_transformers import SentenceTransformer
 
@@ -238,6 +241,133 @@ class TestLocalLLMClient:
             assert request_data['options']['num_predict'] == 500
             assert response == "Custom response"
 
+    def test_chat_stream_yields_tokens(self):
+        """Test streaming chat yields tokens from Ollama's NDJSON stream."""
+        mock_response = create_mock_http_session_response(status_code=200)
+        mock_response.iter_lines.return_value = [
+            b'{"message": {"content": "Hello"}, "done": false}',
+            b'',
+            b'{"message": {"content": " world"}, "done": false}',
+            b'{"message": {"content": ""}, "done": true}'
+        ]
+        
+        mock_pooled_conn, mock_session = mock_connection_pool_with_response(mock_response)
+        
+        with patch('app.rag_backend.get_pool_manager') as mock_pool_manager:
+            mock_http_pool = Mock()
+            mock_http_pool.get_connection.return_value = mock_pooled_conn
+            mock_http_pool.return_connection = Mock()
+            
+            mock_manager = Mock()
+            mock_manager.create_ollama_pool.return_value = mock_http_pool
+            mock_pool_manager.return_value = mock_manager
+            
+            client = LocalLLMClient()
+            client.http_pool = mock_http_pool  # Override with mock
+            
+            tokens = list(client.chat_stream([{"role": "user", "content": "Hi"}]))
+            
+            assert tokens == ["Hello", " world"]
+            assert mock_session.post.call_args[1]['json']['stream'] is True
+            mock_http_pool.return_connection.assert_called_once_with(mock_pooled_conn, error_occurred=False)
+
+    def test_chat_stream_raises_on_api_error(self):
+        """Test streaming chat raises instead of yielding an error string."""
+        mock_response = create_mock_http_session_response(status_code=500, text_data="boom")
+        mock_pooled_conn, mock_session = mock_connection_pool_with_response(mock_response)
+        
+        with patch('app.rag_backend.get_pool_manager') as mock_pool_manager:
+            mock_http_pool = Mock()
+            mock_http_pool.get_connection.return_value = mock_pooled_conn
+            
+            mock_manager = Mock()
+            mock_manager.create_ollama_pool.return_value = mock_http_pool
+            mock_pool_manager.return_value = mock_manager
+            
+            client = LocalLLMClient()
+            client.http_pool = mock_http_pool  # Override with mock
+            
+            with pytest.raises(Exception) as exc_info:
+                list(client.chat_stream([{"role": "user", "content": "Hi"}]))
+            
+            assert "500" in str(exc_info.value)
+            assert client.circuit_breaker.failure_count == 1
+            mock_http_pool.return_connection.assert_called_once_with(mock_pooled_conn, error_occurred=True)
+
+    def test_chat_fails_over_to_another_backend(self):
+        """Test a failed attempt is retried on a backend that has not failed."""
+        failing_conn, failing_session = mock_connection_pool_with_response(
+            create_mock_http_session_response(status_code=500, text_data="boom")
+        )
+        working_conn, working_session = mock_connection_pool_with_response(
+            create_mock_http_session_response(status_code=200, json_data={"message": {"content": "From box2"}})
+        )
+
+        with patch('app.rag_backend.get_pool_manager'):
+            client = LocalLLMClient(backend_urls=["box1:11434", "box2:11434"])
+
+        box1, box2 = client.backends.backends
+        box1.http_pool = Mock(get_connection=Mock(return_value=failing_conn))
+        box2.http_pool = Mock(get_connection=Mock(return_value=working_conn))
+        box2.outstanding = 1  # route the first attempt to box1
+
+        with patch('app.rag_backend.time.sleep'):
+            response = client.chat([{"role": "user", "content": "Hi"}])
+
+        assert response == "From box2"
+        assert failing_session.post.call_args[0][0] == "http://box1:11434/api/chat"
+        assert working_session.post.call_args[0][0] == "http://box2:11434/api/chat"
+        assert box1.circuit_breaker.failure_count == 1
+        assert box2.circuit_breaker.failure_count == 0
+
+
+@pytest.mark.unit
+class TestAsyncLocalLLMClient:
+    """Test suite for the non-blocking AsyncLocalLLMClient."""
+
+    @staticmethod
+    def _client_with_transport(handler):
+        import asyncio
+        import httpx
+        
+        client = AsyncLocalLLMClient(base_url="http://ollama.test")
+        client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+        client._client_loop = asyncio.get_running_loop()
+        return client
+
+    @pytest.mark.asyncio
+    async def test_chat_success(self):
+        """Test async chat returns the message content."""
+        import httpx
+        
+        def handler(request):
+            assert request.url.path == "/api/chat"
+            return httpx.Response(200, json={"message": {"content": "Async answer"}})
+        
+        client = self._client_with_transport(handler)
+        response = await client.chat([{"role": "user", "content": "Hi"}])
+        
+        assert response == "Async answer"
+        assert client.circuit_breaker.state == 'CLOSED'
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_chat_failure_opens_circuit(self):
+        """Test repeated async failures open the shared circuit breaker."""
+        import httpx
+        
+        client = self._client_with_transport(lambda request: httpx.Response(500, text="boom"))
+        client.circuit_breaker.failure_threshold = 1
+        
+        with patch('app.rag_backend.asyncio.sleep', new=AsyncMock()):
+            response = await client.chat([{"role": "user", "content": "Hi"}])
+        
+        assert "not available" in response
+        assert isinstance(response, LLMFailureAnswer)
+        assert client.circuit_breaker.state == 'OPEN'
+        assert await client.chat([{"role": "user", "content": "Hi"}]) is LLM_UNAVAILABLE_ANSWER
+        await client.aclose()
+
 
 @pytest.mark.unit
 class TestLocalRAGSystem:
@@ -245,9 +375,8 @@ class TestLocalRAGSystem:
 
     def test_init(self, temp_directory, mock_llm_client):
         """Test RAG system initialization."""
-        with patch('sentence_transformers.SentenceTransformer') as mock_encoder:
-            mock_encoder.return_value = Mock()
-            
+        registry = EmbeddingModelRegistry(loader=lambda name, backend: Encoder(Mock(), name, backend))
+        with patch('app.rag_backend.get_model_registry', return_value=registry):
             rag_system = LocalRAGSystem(
                 llm_client=mock_llm_client,
                 data_path=temp_directory
@@ -303,14 +432,16 @@ class TestLocalRAGSystem:
         """Test embedding generation with caching."""
         text = "This is test text"
         
-        # Mock the encoder - it should return numpy array for single text
-        mock_embedding = np.array([0.1, 0.2, 0.3])
+        # Mock the encoder - query embeddings go through the batching service,
+        # so the encoder is called with a list of texts
+        mock_embedding = np.array([[0.1, 0.2, 0.3]])
         rag_system.encoder.encode = Mock(return_value=mock_embedding)
         
         embedding = rag_system._generate_embedding_with_cache(text)
         
         assert len(embedding) == 3
-        assert embedding == mock_embedding.tolist()
+        assert embedding == mock_embedding[0].tolist()
+        assert rag_system.encoder.encode.call_args[0][0] == [text]
 
     def test_add_documents_single(self, rag_system, sample_documents):
         """Test adding a single document."""
@@ -578,6 +709,272 @@ class TestLocalRAGSystem:
         assert len(result["sources"]) == 0
         assert "don't have specific information" in result["answer"]
 
+    @pytest.mark.asyncio
+    async def test_rag_query_async_uses_async_client(self, rag_system, mock_llm_client):
+        """Test the async query path awaits the async LLM client instead of the sync one."""
+        rag_system.rag_cache.clear()
+        rag_system.adaptive_retrieval_async = AsyncMock(return_value=[
+            {"title": "Doc 1", "content": "Async content.", "score": 0.8, "doc_id": "d1"}
+        ])
+        rag_system.async_llm_client = Mock()
+        rag_system.async_llm_client.chat = AsyncMock(return_value="Async response")
+        
+        result = await rag_system.rag_query_async("What is async?")
+        cached = await rag_system.rag_query_async("What is async?")
+        
+        assert result["answer"] == "Async response"
+        assert result["cache_hit"] is False
+        assert cached["cache_hit"] is True
+        rag_system.async_llm_client.chat.assert_awaited_once()
+        mock_llm_client.chat.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_model_routing_selects_model_per_query(self, rag_system):
+        """Test simple lookups use the fast model, comparisons the large one, and hints override both."""
+        rag_system.rag_cache.clear()
+        rag_system.model_router.enabled = True
+        rag_system.adaptive_retrieval_async = AsyncMock(return_value=[
+            {"title": "Doc 1", "content": "Short context.", "score": 0.8, "doc_id": "d1"}
+        ])
+        rag_system.async_llm_client = Mock()
+        rag_system.async_llm_client.chat = AsyncMock(return_value="Routed answer")
+        routes = rag_system.model_router.routes
+
+        simple = await rag_system.rag_query_async("What is the refund window?")
+        assert rag_system.async_llm_client.chat.call_args.kwargs["model"] == routes["fast"].model
+        assert simple["model_route"]["route"] == "fast"
+
+        comparison = await rag_system.rag_query_async("Compare the basic plan versus the premium plan")
+        assert rag_system.async_llm_client.chat.call_args.kwargs["model"] == routes["large"].model
+        assert comparison["model_route"]["reason"] == "analytical"
+
+        hinted = await rag_system.rag_query_async("What is the refund window?", model_hint="large")
+        assert rag_system.async_llm_client.chat.call_args.kwargs["model"] == routes["large"].model
+        assert hinted["cache_hit"] is False
+
+    @pytest.mark.asyncio
+    async def test_session_turns_carry_history_to_one_backend(self, rag_system):
+        """Test a follow-up turn sends earlier turns as history, pinned to the session's backend."""
+        rag_system.adaptive_retrieval_async = AsyncMock(return_value=[
+            {"title": "Policy", "content": "Refunds are accepted within 30 days.", "score": 0.8, "doc_id": "d1"}
+        ])
+        rag_system.async_llm_client = Mock()
+        rag_system.async_llm_client.chat = AsyncMock(side_effect=["Thirty days.", "Fourteen days."])
+
+        first = await rag_system.rag_query_async("What is the refund window?", session_id="s1")
+        second = await rag_system.rag_query_async("And for sale items?", session_id="s1")
+
+        assert first["session_id"] == second["session_id"] == "s1"
+        assert second["answer"] == "Fourteen days." and second["cache_hit"] is False
+        first_messages = rag_system.async_llm_client.chat.call_args_list[0].args[0]
+        call = rag_system.async_llm_client.chat.call_args
+        # The earlier turn is replayed exactly as sent, so the prompt extends the cached one
+        assert call.args[0][:len(first_messages)] == first_messages
+        assert first_messages[-1]["content"].endswith("Question: What is the refund window?")
+        assert call.args[0][len(first_messages)] == {"role": "assistant", "content": "Thirty days."}
+        assert call.kwargs["affinity"] == "s1"
+        assert call.kwargs["keep_alive"] == rag_system.sessions.keep_alive
+        rag_system.adaptive_retrieval_async.assert_called_with("What is the refund window? And for sale items?",
+                                                               max_chunks=ANY)
+
+    def test_numpy_store_migrates_chroma_collection(self, rag_system, tmp_path):
+        """Test an empty NumPy vector store is filled from the existing ChromaDB collection."""
+        from app.vector_store import NumpyVectorStore
+        
+        vectors = np.eye(4, dtype=np.float32)[:3]
+        rag_system.chroma_client.get_or_create_collection("documents").add(
+            ids=["c0", "c1", "c2"], embeddings=vectors.tolist(), documents=["A", "B", "C"],
+            metadatas=[{"doc_id": "d0"}, {"doc_id": "d1"}, {"doc_id": "d2"}])
+        rag_system.collection = NumpyVectorStore(str(tmp_path / "vector_store"))
+        
+        rag_system._migrate_chroma_collection()
+        rag_system._migrate_chroma_collection()  # a non-empty store is left alone
+        
+        assert rag_system.collection.count() == 3
+        results = rag_system.collection.query(query_embeddings=[vectors[1].tolist()], n_results=1)
+        assert results["ids"] == [["c1"]]
+        assert results["documents"] == [["B"]] and results["metadatas"] == [[{"doc_id": "d1"}]]
+        rag_system.collection.close()
+
+    @pytest.mark.asyncio
+    async def test_extractive_answer_skips_llm_for_conclusive_retrieval(self, rag_system):
+        """Test a strong match answers from the chunk's sentences and a weak one still calls the LLM."""
+        rag_system.rag_cache.clear()
+        rag_system.extractive_answers_enabled = True
+        rag_system.async_llm_client = Mock()
+        rag_system.async_llm_client.chat = AsyncMock(return_value="LLM answer")
+        content = ("Our office opened in 2019. The refund window is 30 days from delivery. "
+                   "Shipping is free over $50.")
+        rag_system.adaptive_retrieval_async = AsyncMock(return_value=[
+            {"title": "Policy", "content": content, "score": 0.9, "doc_id": "d1"}
+        ])
+
+        result = await rag_system.rag_query_async("What is the refund window?")
+
+        assert result["response_type"] == "extractive"
+        assert result["answer"].startswith("The refund window is 30 days from delivery.")
+        assert "Shipping" not in result["answer"]
+        rag_system.async_llm_client.chat.assert_not_called()
+
+        rag_system.adaptive_retrieval_async = AsyncMock(return_value=[
+            {"title": "Policy", "content": content, "score": 0.5, "doc_id": "d1"}
+        ])
+        weak = await rag_system.rag_query_async("How long is the refund window?")
+
+        assert weak["response_type"] == "rag"
+        rag_system.async_llm_client.chat.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_rag_query_batch_dedupes_and_queries_once(self, rag_system):
+        """Test a batch embeds and retrieves unique questions in one call each and answers every index."""
+        rag_system.rag_cache.clear()
+        rag_system._encode_batch = Mock(side_effect=lambda texts: [[0.1] * 384 for _ in texts])
+        rag_system.collection = Mock()
+        rag_system.collection.count.return_value = 10
+        rag_system.collection.query.return_value = {
+            "ids": [["c1"], ["c2"]],
+            "documents": [["Alpha content."], ["Beta content."]],
+            "metadatas": [[{"title": "A", "source": "s", "doc_id": "a"}],
+                          [{"title": "B", "source": "s", "doc_id": "b"}]],
+            "distances": [[0.1], [0.2]]
+        }
+        rag_system.async_llm_client = Mock()
+        rag_system.async_llm_client.chat = AsyncMock(side_effect=lambda messages, **kwargs: "Answer")
+
+        results = [result async for result in rag_system.rag_query_batch(["What is alpha?", "What is beta?",
+                                                                          "What is alpha?", ""])]
+
+        assert sorted(result["index"] for result in results) == [0, 1, 2, 3]
+        rag_system._encode_batch.assert_called_once_with(["What is alpha?", "What is beta?"])
+        rag_system.collection.query.assert_called_once()
+        assert len(rag_system.collection.query.call_args.kwargs["query_embeddings"]) == 2
+        assert rag_system.async_llm_client.chat.await_count == 2
+
+        by_index = {result["index"]: result for result in results}
+        assert by_index[0]["sources"][0]["doc_id"] == "a"
+        assert by_index[1]["sources"][0]["doc_id"] == "b"
+        assert by_index[3]["error"] == "Empty query"
+
+    def test_rag_query_stream_events(self, rag_system, mock_llm_client):
+        """Test streaming RAG query emits sources, tokens and done, then caches."""
+        query = "What is streaming?"
+        rag_system.rag_cache.clear()
+        rag_system.adaptive_retrieval = Mock(return_value=[
+            {"title": "Doc 1", "content": "Streaming sends tokens early.", "score": 0.9, "doc_id": "d1"}
+        ])
+        mock_llm_client.chat_stream.return_value = iter(["Tokens ", "arrive ", "early."])
+        
+        events = list(rag_system.rag_query_stream(query))
+        
+        assert [e["type"] for e in events] == ["sources", "token", "token", "token", "done"]
+        assert events[0]["sources"] == [{"title": "Doc 1", "score": "0.90", "doc_id": "d1"}]
+        assert events[-1]["cache_hit"] is False
+        
+        # A repeated query is replayed from the cache without calling the LLM again
+        cached_events = list(rag_system.rag_query_stream(query))
+        assert cached_events[1]["content"] == "Tokens arrive early."
+        assert cached_events[-1]["cache_hit"] is True
+        mock_llm_client.chat_stream.assert_called_once()
+
+    def test_rag_query_stream_does_not_cache_failures(self, rag_system, mock_llm_client):
+        """Test a failed stream emits an error event and is not cached."""
+        query = "What happens when the LLM fails?"
+        rag_system.rag_cache.clear()
+        rag_system.adaptive_retrieval = Mock(return_value=[])
+        mock_llm_client.chat_stream.side_effect = Exception("LLM down")
+        
+        events = list(rag_system.rag_query_stream(query))
+        
+        assert events[-1]["type"] == "error"
+        assert rag_system.rag_cache.get(rag_system._rag_cache_key(query, None)) is None
+
+    @pytest.mark.asyncio
+    async def test_llm_unavailable_answer_is_not_cached(self, rag_system):
+        """Test the breaker's unavailable answer is returned but recomputed on the next query."""
+        rag_system.rag_cache.clear()
+        rag_system.async_llm_client = Mock()
+        rag_system.async_llm_client.chat = AsyncMock(side_effect=[
+            LLM_UNAVAILABLE_ANSWER,
+            "The refund window is 30 days."
+        ])
+        rag_system.adaptive_retrieval_async = AsyncMock(return_value=[
+            {"title": "Policy", "content": "Refunds are accepted.", "score": 0.5, "doc_id": "d1"}
+        ])
+        
+        first = await rag_system.rag_query_async("What is the refund window?")
+        second = await rag_system.rag_query_async("What is the refund window?")
+        
+        assert first["answer"] == LLM_UNAVAILABLE_ANSWER
+        assert second["answer"] == "The refund window is 30 days."
+        assert second["cache_hit"] is False and not second.get("stale")
+        
+        third = await rag_system.rag_query_async("What is the refund window?")
+        assert third["cache_hit"] is True
+        assert rag_system.async_llm_client.chat.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_async_answers_build_context_off_the_event_loop(self, rag_system):
+        """Test context compression and token counting never run on the event loop thread."""
+        import asyncio
+        
+        def on_event_loop():
+            try:
+                asyncio.get_running_loop()
+                return True
+            except RuntimeError:
+                return False
+        
+        blocking_calls = []
+        
+        def compress(query_embedding, chunks):
+            blocking_calls.append(("compress", on_event_loop()))
+            return "Refunds are accepted within 30 days.", {
+                "sentences_selected": 1, "sentences_available": 2, "context_tokens": 8,
+                "token_budget": 1500, "tokenizer": "test"
+            }
+        
+        def count_tokens(text):
+            blocking_calls.append(("count_tokens", on_event_loop()))
+            return len(text.split())
+        
+        rag_system.context_compressor.compress = Mock(side_effect=compress)
+        rag_system._count_tokens = Mock(side_effect=count_tokens)
+        rag_system._generate_embedding_with_cache = Mock(side_effect=AssertionError("blocking embed"))
+        rag_system._generate_embedding_with_cache_async = AsyncMock(return_value=[0.1] * 384)
+        rag_system.adaptive_retrieval_async = AsyncMock(return_value=[
+            {"title": "Policy", "content": "Refunds are accepted within 30 days. Shipping is free.",
+             "score": 0.5, "doc_id": "d1"}
+        ])
+        rag_system.extractive_answers_enabled = False
+        rag_system.async_llm_client = Mock()
+        rag_system.async_llm_client.chat = AsyncMock(return_value="Within 30 days.")
+        docs = await rag_system.adaptive_retrieval_async("refund window")
+        
+        await rag_system.generate_answer_async("What is the refund window?", docs)
+        await rag_system.rag_query_async("And for sale items?", session_id="loop-check")
+        
+        assert [name for name, _ in blocking_calls] == ["compress", "count_tokens", "compress"]
+        assert not any(on_loop for _, on_loop in blocking_calls)
+        rag_system._generate_embedding_with_cache.assert_not_called()
+        sent = rag_system.async_llm_client.chat.call_args_list[-1][0][0][-1]["content"]
+        assert sent.startswith("Context:\nRefunds are accepted within 30 days.")
+
+    @pytest.mark.asyncio
+    async def test_answer_worded_like_a_failure_is_cached(self, rag_system):
+        """Test only the clients' failure sentinel is kept out of the cache, not its wording."""
+        rag_system.rag_cache.clear()
+        rag_system.async_llm_client = Mock()
+        rag_system.async_llm_client.chat = AsyncMock(return_value=str(LLM_UNAVAILABLE_ANSWER))
+        rag_system.adaptive_retrieval_async = AsyncMock(return_value=[
+            {"title": "Status", "content": "The model may be unavailable.", "score": 0.5, "doc_id": "d1"}
+        ])
+        
+        await rag_system.rag_query_async("What does the status page say?")
+        second = await rag_system.rag_query_async("What does the status page say?")
+        
+        assert second["cache_hit"] is True
+        assert rag_system.async_llm_client.chat.call_count == 1
+
     def test_error_handling_embedding_failure(self, rag_system):
         """Test error handling when embedding generation fails."""
         documents = [{"title": "Test", "content": "Test content", "source": "test"}]
@@ -632,6 +1029,132 @@ class TestLocalRAGSystem:
         assert duration < 1.0
         assert "Successfully added" in result
 
+    def test_add_documents_encodes_in_batches(self, rag_system):
+        """Test ingestion encodes chunks across documents in bounded batches."""
+        documents = [
+            {"title": f"Doc {i}", "content": f"Short document number {i}.", "doc_id": f"batch_{i}"}
+            for i in range(5)
+        ]
+        
+        rag_system.collection = Mock()
+        rag_system.collection.count = Mock(return_value=0)
+        rag_system.ingest_batch_size = 2
+        rag_system.encoder.encode = Mock(side_effect=lambda texts, **kwargs: np.zeros((len(texts), 384)))
+        
+        result = rag_system.add_documents(documents)
+        
+        assert "5 chunks" in result
+        # One encode call for the chunks, one for their sentences and one
+        # ChromaDB write per batch of 2 chunks
+        assert rag_system.encoder.encode.call_count == 6
+        assert rag_system.collection.add.call_count == 3
+        batch_sizes = [len(call[1]["ids"]) for call in rag_system.collection.add.call_args_list]
+        assert batch_sizes == [2, 2, 1]
+        chunk_calls = rag_system.encoder.encode.call_args_list[0::2]
+        assert [len(call[0][0]) for call in chunk_calls] == [2, 2, 1]
+        assert all(call[1]["batch_size"] == rag_system.embedding_batch_size for call in chunk_calls)
+
+    def test_reingest_reuses_persistent_embeddings(self, rag_system):
+        """Test re-ingesting unchanged content skips the encoder."""
+        documents = [{"title": "Doc", "content": "Unchanged document content.", "doc_id": "persist_1"}]
+        
+        rag_system.collection = Mock()
+        rag_system.collection.count = Mock(return_value=0)
+        rag_system.encoder.encode = Mock(side_effect=lambda texts, **kwargs: np.ones((len(texts), 384)))
+        
+        rag_system._index_sentences = Mock()  # sentence vectors live in the sentence index
+        
+        rag_system.add_documents(documents)
+        assert rag_system.encoder.encode.call_count == 1
+        
+        rag_system.add_documents(documents)
+        assert rag_system.encoder.encode.call_count == 1
+        assert rag_system.embedding_store.get_stats()["hits"] == 1
+
+    def test_query_embeddings_are_not_persisted(self, rag_system):
+        """Test query-time embeddings skip the persistent store."""
+        rag_system.encoder.encode = Mock(side_effect=lambda texts, **kwargs: np.ones((len(texts), 384)))
+        
+        rag_system._generate_embedding_with_cache("A question that was never ingested?")
+        
+        assert rag_system.encoder.encode.call_count == 1
+        assert rag_system.embedding_store.get_stats()["entries"] == 0
+
+    def test_add_documents_deduplicates_files_and_chunks(self, rag_system):
+        """Test identical files are skipped and shared chunks are stored once."""
+        shared = "Shared boilerplate paragraph."
+        documents = [
+            {"title": "A", "content": shared, "doc_id": "dedup_a", "file_hash": "hash_a"},
+            {"title": "B", "content": shared, "doc_id": "dedup_b", "file_hash": "hash_b"},
+        ]
+        
+        rag_system.collection = Mock()
+        rag_system.collection.count = Mock(return_value=0)
+        rag_system.encoder.encode = Mock(side_effect=lambda texts, **kwargs: np.ones((len(texts), 384)))
+        
+        result = rag_system.add_documents(documents)
+        
+        # Document B stores only its private anchor copy of the shared chunk
+        assert "(2 chunks)" in result
+        stored_ids = [i for call in rag_system.collection.add.call_args_list for i in call[1]["ids"]]
+        assert stored_ids == ["doc_dedup_a_chunk_0", "doc_dedup_b_chunk_0"]
+        assert rag_system.find_document_by_file_hash("hash_a") == "dedup_a"
+        
+        # Re-adding identical file bytes is a no-op
+        rag_system.collection.add.reset_mock()
+        result = rag_system.add_documents([{"title": "A copy", "content": shared, "doc_id": "dedup_c", "file_hash": "hash_a"}])
+        
+        assert "1 duplicate files skipped" in result
+        rag_system.collection.add.assert_not_called()
+
+    def test_document_mutations_invalidate_cached_answers(self, rag_system):
+        """Test answers are evicted when a cited document changes or new content arrives."""
+        cited = {"answer": "A", "sources": [{"title": "Doc", "score": "0.90", "doc_id": "inv_1"}]}
+        unrelated = {"answer": "B", "sources": [{"title": "Other", "score": "0.90", "doc_id": "inv_2"}]}
+        no_context = {"answer": "C", "sources": []}
+        
+        rag_system._cache_rag_result("inv:cited", cited, rag_system.collection_generation)
+        rag_system._cache_rag_result("inv:unrelated", unrelated, rag_system.collection_generation)
+        rag_system._cache_rag_result("inv:none", no_context, rag_system.collection_generation)
+        
+        rag_system.invalidate_documents(["inv_1"])
+        assert rag_system.rag_cache.get("inv:cited") is None
+        assert rag_system.rag_cache.get("inv:unrelated") is not None
+        assert rag_system.rag_cache.get("inv:none") is not None
+        
+        rag_system.invalidate_documents(["inv_3"], documents_added=True)
+        assert rag_system.rag_cache.get("inv:none") is None
+        assert rag_system.rag_cache.get("inv:unrelated") is not None
+        
+        # Answers computed before a mutation are not stored after it
+        stale_generation = rag_system.collection_generation - 1
+        rag_system._cache_rag_result("inv:stale", unrelated, stale_generation)
+        assert rag_system.rag_cache.get("inv:stale") is None
+
+    def test_semantic_cache_serves_paraphrases(self, rag_system):
+        """Test a paraphrased question reuses the answer until the collection changes."""
+        embeddings = {
+            "how do I reset my password": [1.0, 0.0, 0.0],
+            "how can I reset my password?": [0.99, 0.03, 0.0]
+        }
+        answer = {"answer": "Use the reset link", "sources": [{"title": "FAQ", "score": "0.90", "doc_id": "faq"}],
+                  "response_type": "rag"}
+        rag_system.semantic_cache_enabled = True
+        rag_system._generate_embedding_with_cache = Mock(side_effect=lambda text: embeddings[text])
+        rag_system._compute_rag_query = Mock(return_value=answer)
+
+        first = rag_system.rag_query("how do I reset my password")
+        second = rag_system.rag_query("how can I reset my password?")
+
+        assert rag_system._compute_rag_query.call_count == 1
+        assert not first["cache_hit"]
+        assert second["cache_hit"]
+        assert second["answer"] == "Use the reset link"
+
+        rag_system.invalidate_documents(["faq"])
+        rag_system.rag_query("how can I reset my password?")
+        assert rag_system._compute_rag_query.call_count == 2
+
     def test_memory_efficiency(self, rag_system, sample_documents):
         """Test memory efficiency during operations."""
         import psutil
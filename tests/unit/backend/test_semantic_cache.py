@@ -0,0 +1,64 @@
+"""
+Unit tests for the semantic query cache.
+
+Tests paraphrase hits within the distance threshold, generation and scope
+checks, LRU replacement and hit/miss statistics.
+"""
+
+import pytest
+import numpy as np
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.semantic_cache import SemanticQueryCache
+
+
+@pytest.fixture
+def cache():
+    """Provide a small semantic cache."""
+    return SemanticQueryCache(max_entries=3, max_distance=0.05, ttl=60.0)
+
+
+@pytest.mark.unit
+class TestSemanticQueryCache:
+    """Test SemanticQueryCache functionality."""
+
+    def test_near_duplicate_query_hits(self, cache):
+        """Test a query within the cosine distance threshold reuses the answer."""
+        cache.store("reset password", [1.0, 0.0, 0.0], {"answer": "A"}, generation=0)
+
+        assert cache.lookup([0.99, 0.05, 0.0], generation=0) == {"answer": "A"}
+        assert cache.lookup([0.0, 1.0, 0.0], generation=0) is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_generation_and_scope_must_match(self, cache):
+        """Test answers from an older collection generation or other parameters are not served."""
+        cache.store("q", [1.0, 0.0], {"answer": "A"}, generation=1, scope=(None, 0.25))
+
+        assert cache.lookup([1.0, 0.0], generation=2, scope=(None, 0.25)) is None
+        assert cache.lookup([1.0, 0.0], generation=1, scope=(5, 0.25)) is None
+        assert cache.lookup([1.0, 0.0], generation=1, scope=(None, 0.25)) == {"answer": "A"}
+
+    def test_full_cache_replaces_least_recently_used(self, cache):
+        """Test the least recently used entry is overwritten when the cache is full."""
+        vectors = np.eye(4).tolist()
+        for i in range(3):
+            cache.store(f"q{i}", vectors[i], {"answer": i}, generation=0)
+        cache.lookup(vectors[0], generation=0)
+
+        cache.store("q3", vectors[3], {"answer": 3}, generation=0)
+
+        assert cache.lookup(vectors[1], generation=0) is None
+        assert cache.lookup(vectors[0], generation=0) == {"answer": 0}
+        assert cache.lookup(vectors[3], generation=0) == {"answer": 3}
+        assert cache.get_stats()["entries"] == 3
+
+    def test_zero_vector_is_not_indexed(self, cache):
+        """Test degenerate embeddings are rejected."""
+        assert not cache.store("q", [0.0, 0.0], {"answer": "A"}, generation=0)
+        assert cache.lookup([0.0, 0.0], generation=0) is None
@@ -0,0 +1,231 @@
+"""
+Unit tests for the NumPy vector store.
+
+Tests exact search against brute force, metadata filters, updates and
+deletes with compaction, visibility of another instance's writes, queries
+running alongside writes, IVF recall, quantized prefiltering with float
+rescoring, and quantization mode changes.
+"""
+
+import pytest
+import os
+
+import numpy as np
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from app.vector_store import NumpyVectorStore
+
+
+def _vectors(rows, dim=32, seed=0):
+    return np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+
+
+@pytest.mark.unit
+class TestNumpyVectorStore:
+    """Test NumpyVectorStore functionality."""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """Store with small blocks so searches span several of them."""
+        store = NumpyVectorStore(str(tmp_path / "vectors"), dtype="float32", block_rows=64)
+        yield store
+        store.close()
+
+    def test_query_matches_brute_force(self, store):
+        """Test the top results and distances equal an exhaustive cosine search."""
+        vectors = _vectors(300)
+        store.add(ids=[f"c{i}" for i in range(300)], embeddings=vectors.tolist(),
+                  documents=[f"doc {i}" for i in range(300)],
+                  metadatas=[{"doc_id": str(i % 3)} for i in range(300)])
+        queries = _vectors(2, seed=1)
+
+        results = store.query(query_embeddings=queries.tolist(), n_results=5)
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        for query, ids, distances in zip(queries, results["ids"], results["distances"]):
+            scores = normalized @ (query / np.linalg.norm(query))
+            expected = np.argsort(-scores)[:5]
+            assert ids == [f"c{i}" for i in expected]
+            assert distances == pytest.approx([1 - scores[i] for i in expected], abs=1e-5)
+        assert results["documents"][0][0] == f"doc {results['ids'][0][0][1:]}"
+        assert store.count() == 300
+
+    def test_where_filters_and_get(self, store):
+        """Test metadata filters apply to query, get and delete."""
+        store.add(ids=["a", "b", "c"], embeddings=_vectors(3).tolist(), documents=["A", "B", "C"],
+                  metadatas=[{"doc_id": "1", "detected_language": "en"},
+                             {"doc_id": "2", "detected_language": "de"},
+                             {"doc_id": 1, "detected_language": "en"}])
+
+        results = store.query(query_embeddings=_vectors(1, seed=2).tolist(), n_results=10,
+                              where={"doc_id": "1"})
+        assert results["ids"] == [["a"]]
+        assert store.get(where={"detected_language": "en"})["ids"] == ["a", "c"]
+        assert store.get(where={"doc_id": {"$in": ["1", "2"]}}, include=["metadatas"])["ids"] == ["a", "b"]
+        assert store.get(ids=["c", "a"])["documents"] == ["C", "A"]
+        assert store.get(limit=1, offset=1)["ids"] == ["b"]
+
+        store.delete(where={"doc_id": 1})
+        assert store.get()["ids"] == ["a", "b"]
+
+    def test_update_merges_metadata(self, store):
+        """Test update merges metadata keys and replaces embeddings."""
+        vectors = _vectors(2)
+        store.add(ids=["a", "b"], embeddings=vectors.tolist(), metadatas=[{"doc_id": "1", "title": "x"}, {}])
+
+        store.update(ids=["a"], metadatas=[{"title": "y", "section": 2}])
+        store.update(ids=["b"], embeddings=[(-vectors[0]).tolist()])
+
+        assert store.get(ids=["a"])["metadatas"] == [{"doc_id": "1", "title": "y", "section": 2}]
+        results = store.query(query_embeddings=[(-vectors[0]).tolist()], n_results=1)
+        assert results["ids"] == [["b"]]
+
+    def test_delete_compacts_and_other_instances_see_writes(self, tmp_path):
+        """Test writes are visible to a second instance, including row renumbering on compaction."""
+        path = str(tmp_path / "vectors")
+        writer = NumpyVectorStore(path, dtype="float16")
+        reader = NumpyVectorStore(path, dtype="float16")
+        vectors = _vectors(1500)
+        writer.add(ids=[f"c{i}" for i in range(1500)], embeddings=vectors.tolist())
+        assert reader.count() == 1500
+
+        writer.delete(ids=[f"c{i}" for i in range(1200)])
+
+        stats = reader.get_stats()
+        assert stats["rows"] == 300  # compacted
+        assert reader.count() == 300
+        results = reader.query(query_embeddings=[vectors[1400].tolist()], n_results=1)
+        assert results["ids"] == [["c1400"]]
+        assert results["distances"][0][0] == pytest.approx(0.0, abs=1e-3)
+
+        writer.delete(where={})
+        assert reader.count() == 0
+        assert reader.query(query_embeddings=[vectors[0].tolist()], n_results=3)["ids"] == [[]]
+
+    def test_queries_run_alongside_writes(self, store):
+        """Test queries stay correct while another thread keeps adding chunks."""
+        import threading
+
+        vectors = _vectors(700)
+        store.add(ids=[f"c{i}" for i in range(100)], embeddings=vectors[:100].tolist())
+        errors = []
+
+        def write():
+            for i in range(100, 700):
+                store.add(ids=[f"c{i}"], embeddings=[vectors[i].tolist()])
+
+        def read():
+            try:
+                while writer.is_alive():
+                    for i in range(0, 100, 7):
+                        results = store.query(query_embeddings=[vectors[i].tolist()], n_results=3)
+                        assert results["ids"][0][0] == f"c{i}"
+                        assert results["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+            except Exception as e:
+                errors.append(e)
+
+        writer = threading.Thread(target=write)
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        writer.start()
+        for thread in readers:
+            thread.start()
+        for thread in [writer, *readers]:
+            thread.join()
+
+        assert errors == []
+        assert store.count() == 700
+
+    def test_ivf_recall(self, tmp_path):
+        """Test IVF search finds most exact neighbours of clustered data."""
+        rng = np.random.default_rng(3)
+        centers = rng.normal(size=(20, 32))
+        vectors = centers[rng.integers(0, 20, size=2000)] + 0.3 * rng.normal(size=(2000, 32))
+        store = NumpyVectorStore(str(tmp_path / "vectors"), dtype="float32", ivf_min_rows=1000, ivf_nprobe=4)
+        store.add(ids=[str(i) for i in range(2000)], embeddings=vectors.tolist())
+        assert store.get_stats()["ivf_lists"] > 1
+
+        queries = vectors[:20] + 0.05 * rng.normal(size=(20, 32))
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        results = store.query(query_embeddings=queries.tolist(), n_results=10)
+
+        recall = []
+        for query, ids in zip(queries, results["ids"]):
+            exact = set(str(i) for i in np.argsort(-(normalized @ query))[:10])
+            recall.append(len(exact & set(ids)) / 10)
+        assert np.mean(recall) >= 0.9
+        store.close()
+
+    @pytest.mark.parametrize("quantization", ["int8", "binary"])
+    def test_quantized_prefilter_with_rescoring(self, tmp_path, quantization):
+        """Test code prefiltering plus float rescoring finds the exact neighbours and distances."""
+        vectors = _vectors(3000, dim=384)
+        store = NumpyVectorStore(str(tmp_path / "vectors"), dtype="float32", block_rows=512,
+                                 quantization=quantization, rescore_candidates=300)
+        store.add(ids=[str(i) for i in range(3000)], embeddings=vectors.tolist())
+        store.delete(ids=["1"])
+
+        queries = vectors[:10] + 0.1 * _vectors(10, dim=384, seed=4)
+        results = store.query(query_embeddings=queries.tolist(), n_results=5)
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        recall = []
+        for query, ids, distances in zip(queries, results["ids"], results["distances"]):
+            scores = normalized @ (query / np.linalg.norm(query))
+            scores[1] = -np.inf
+            exact = [str(i) for i in np.argsort(-scores)[:5]]
+            recall.append(len(set(exact) & set(ids)) / 5)
+            assert distances == pytest.approx([1 - scores[int(i)] for i in ids], abs=1e-5)
+            assert "1" not in ids
+        assert np.mean(recall) >= 0.9
+
+        stats = store.get_stats()
+        assert stats["quantization"] == quantization
+        assert stats["matrix_mb"] / stats["codes_mb"] == pytest.approx(32 if quantization == "binary" else 4)
+        store.close()
+
+    def test_quantization_mode_changes_only_through_build_codes(self, tmp_path):
+        """Test reopening keeps the stored codes whatever mode is asked for, and build_codes switches it."""
+        path = str(tmp_path / "vectors")
+        vectors = _vectors(1200, dim=64)
+        store = NumpyVectorStore(path, quantization="int8")
+        store.add(ids=[str(i) for i in range(1200)], embeddings=vectors.tolist())
+        store.close()
+        codes_mtime = os.path.getmtime(os.path.join(path, "documents.codes"))
+
+        for quantization in (None, "none", "binary"):
+            reopened = NumpyVectorStore(path, quantization=quantization)
+            assert reopened.quantization == "int8"
+            assert reopened.get_stats()["codes_mb"] > 0
+            reopened.close()
+        assert os.path.getmtime(os.path.join(path, "documents.codes")) == codes_mtime
+
+        store = NumpyVectorStore(path)
+        store.build_codes("binary")
+        stats = store.get_stats()
+        assert stats["quantization"] == "binary"
+        assert stats["matrix_mb"] / stats["codes_mb"] == pytest.approx(32)
+        assert store.query(query_embeddings=[vectors[7].tolist()], n_results=1)["ids"] == [["7"]]
+        store.build_codes("none")
+        assert store.get_stats()["codes_mb"] == 0
+        store.close()
+        store = NumpyVectorStore(path)
+        assert store.quantization == "none"
+        store.close()
+
+    def test_quantization_report(self):
+        """Test the report covers both codes and that more candidates never lower recall."""
+        from app.embedding_quantization import quantization_report
+
+        vectors = _vectors(2000, dim=64)
+        report = quantization_report(vectors, vectors[:20] + 0.1 * _vectors(20, dim=64, seed=5),
+                                     k=10, candidates=(20, 200))
+
+        by_mode = {}
+        for entry in report["quantized"]:
+            by_mode.setdefault(entry["quantization"], []).append(entry["recall_at_k"])
+        assert set(by_mode) == {"int8", "binary"}
+        assert all(recalls[0] <= recalls[1] for recalls in by_mode.values())
+        assert by_mode["int8"][1] >= 0.95
+        assert report["exact"]["bytes_per_vector"] == 256